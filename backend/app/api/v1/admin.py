@@ -1,7 +1,9 @@
 # classroom-customer-service-rag-phase-1\backend\app\api\v1\admin.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import List
+from app.core.registry import get_config, get_registry
+from app.api.v1.profiling import require_admin
 
 router = APIRouter()
 
@@ -11,7 +13,10 @@ class Tenant(BaseModel):
 
 @router.get("/tenants")
 async def list_tenants():
-    return [{"id": 1, "name": "default", "config": {}}]
+    return [
+        {"id": t.id, "name": t.name, "config": {"plan": t.plan, **dict(t.options)}}
+        for t in get_config().tenants.values()
+    ]
 
 @router.post("/tenants")
 async def create_tenant(tenant: Tenant):
@@ -20,3 +25,16 @@ async def create_tenant(tenant: Tenant):
 @router.put("/config")
 async def update_global_config(config: dict):
     return {"status": "updated", "new_config": config}
+
+# Config routes need X-Admin-Token, like the profiling routes: a reload swaps models, prompts and tenants
+@router.get("/config/version", dependencies=[Depends(require_admin)])
+async def get_config_version():
+    # Currently loaded snapshot of models.yaml, prompts and tenants.yaml
+    return get_registry().status()
+
+@router.post("/config/reload", dependencies=[Depends(require_admin)])
+async def reload_config():
+    registry = get_registry()
+    if not registry.reload():
+        raise HTTPException(status_code=422, detail=registry.last_error)
+    return registry.status()
@@ -1,9 +1,20 @@
 # classroom-customer-service-rag-phase-1\backend\app\api\v1\chat.py
-import yaml
 import os
-from fastapi import APIRouter
+import json
+import asyncio
+import time
+import uuid
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
+from app.core.tenancy import DEFAULT_TENANT_ID, validate_tenant_id
+from app.core.access import trusted_roles
+from app.core.registry import get_config
+from app.core.admission import RateLimited, get_admission_controller
+from app.core.singleflight import get_single_flight, request_key
+from app.core.profiling import annotate, get_slow_request_log, stage
 
 router = APIRouter()
 
@@ -15,6 +26,8 @@ class ChatCompletionRequest(BaseModel):
     model: str
     messages: List[Message]
     stream: Optional[bool] = False
+    # Server-side session; when set, history comes from the session store instead of `messages`
+    session_id: Optional[str] = None
 
 # @router.post("/v1/chat/completions")
 # async def openai_compatible_chat(request: ChatCompletionRequest):
@@ -22,7 +35,6 @@ class ChatCompletionRequest(BaseModel):
 
 @router.get("/models")
 async def list_models():
-    models_file = "/resources/models.yaml"
     model_list = []
     
     # helper fallback
@@ -42,27 +54,32 @@ async def list_models():
             }
         ]
 
-    if os.path.exists(models_file):
-        try:
-            with open(models_file, "r") as f:
-                data = yaml.safe_load(f)
-                if "models" in data:
-                    for m in data["models"]:
-                        # OpenAI format
-                        model_list.append({
-                            "id": m["id"],
-                            "object": "model",
-                            "created": 1677610602, # dummy timestamp
-                            "owned_by": m.get("provider", "system")
-                        })
-        except Exception as e:
-            print(f"Error reading models file: {e}")
-            # fall back if parsing fails
-            model_list = get_fallback_models()
+    try:
+        # Served from the in-memory config snapshot; no file I/O per call
+        for m in get_config().models:
+            # OpenAI format
+            model_list.append({
+                "id": m.id,
+                "object": "model",
+                "created": 1677610602, # dummy timestamp
+                "owned_by": m.provider
+            })
+    except Exception as e:
+        print(f"Error reading models config: {e}")
+        # fall back if the config could not be loaded
+        model_list = get_fallback_models()
     
     if not model_list:
         model_list = get_fallback_models()
 
+    # Virtual model: lets the router pick a concrete model per request
+    model_list.insert(0, {
+        "id": "auto",
+        "object": "model",
+        "created": 1677610602,
+        "owned_by": "router"
+    })
+
     return {
         "object": "list",
         "data": model_list
@@ -70,132 +87,335 @@ async def list_models():
 
 
 @router.post("/chat/completions")
-async def chat_completions(request: ChatCompletionRequest):
+async def chat_completions(
+    request: ChatCompletionRequest,
+    x_tenant: Optional[str] = Header(default=None),
+    x_session_id: Optional[str] = Header(default=None),
+    x_roles: Optional[str] = Header(default=None),
+    x_roles_signature: Optional[str] = Header(default=None)
+):
+    tenant_id = x_tenant or DEFAULT_TENANT_ID
+    try:
+        validate_tenant_id(tenant_id)
+        # Caller's roles, only when signed by a trusted front end (app.core.access). Retrieval and
+        # the FAQ fast path only use content those roles, or everyone, may see; no roles = public only.
+        from app.services.retrieval.vector_store.base import PUBLIC_PERMISSION, permission_list
+        signed = trusted_roles(tenant_id, x_roles, x_roles_signature)
+        roles = sorted(p for p in permission_list(signed) if p != PUBLIC_PERMISSION)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 0. Admission control: shed load early with 429 + Retry-After (see app.main handler)
+    admission = get_admission_controller()
+    admission.admit(tenant_id)
+    session_id = request.session_id or x_session_id
+
+    # Per-stage timings; kept in the slow-request log when the request takes over SLOW_REQUEST_MS
+    slow_log = get_slow_request_log()
+    trace = slow_log.begin("chat", tenant_id=tenant_id, model=request.model, stream=bool(request.stream))
+    response = None
+    try:
+        response = await _chat(request, tenant_id, session_id, admission, roles)
+        return response
+    finally:
+        if isinstance(response, StreamingResponse):
+            response.body_iterator = slow_log.traced_stream(trace, response.body_iterator)
+        else:
+            slow_log.finish(trace)
+
+
+async def _chat(request: ChatCompletionRequest, tenant_id: str, session_id: Optional[str], admission, roles: Optional[List[str]] = None):
+    # FAQ fast path: a near-exact match of a stored FAQ question is answered without retrieval or an LLM call
+    faq, query_vector = await _faq_match(request, tenant_id, admission, roles)
+    if faq is not None:
+        return await _faq_response(request, faq, tenant_id, session_id)
+
+    if os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() != "true":
+        if request.stream:
+            chunks, release = await _start_stream(request, tenant_id, session_id, admission, roles, query_vector)
+            # Also runs when the client leaves before the generator starts (its finally never would)
+            return StreamingResponse(chunks, media_type="text/event-stream", background=BackgroundTask(release))
+        return await _answer(request, tenant_id, session_id, admission, roles, query_vector)
+
+    # Identical requests already in flight share one retrieval + LLM call instead of repeating it
+    flights = get_single_flight()
+    key = request_key(
+        tenant_id, request.model, session_id, bool(request.stream), roles,
+        [{"role": m.role, "content": m.content} for m in request.messages]
+    )
+    try:
+        if request.stream:
+            chunks = await flights.stream(key, lambda: _leader_stream(request, tenant_id, session_id, admission, roles, query_vector))
+            return StreamingResponse(chunks, media_type="text/event-stream")
+        return await flights.do(key, lambda: _answer(request, tenant_id, session_id, admission, roles, query_vector))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out waiting for an identical in-flight request")
+
+
+async def _faq_match(
+    request: ChatCompletionRequest, tenant_id: str, admission, roles: Optional[List[str]] = None
+) -> Tuple[Optional[dict], Optional[Any]]:
+    """
+    (stored FAQ entry matching the latest user message, its query embedding) when the fast path is
+    on for the tenant. On a miss retrieval reuses the embedding instead of encoding the message again.
+    Enabled per tenant with `faq_fast_path` in tenants.yaml (default FAQ_FAST_PATH); `faq_threshold`
+    overrides FAQ_MATCH_THRESHOLD.
+    """
+    if request.messages[-1].role != "user":
+        return None, None
+    try:
+        tenant = get_config().tenant(tenant_id)
+    except Exception as e:
+        print(f"Config unavailable for the FAQ fast path: {e}")
+        return None, None
+    options = tenant.options if tenant else {}
+    if not options.get("faq_fast_path", os.getenv("FAQ_FAST_PATH", "false").lower() == "true"):
+        return None, None
+
+    from app.services.generation.embeddings import get_embedding_service
+    from app.services.retrieval.faq import get_faq_index
+    query_vector = None
+    try:
+        async with admission.stage("embed").slot():
+            with stage("embed"):
+                # Off the event loop: encoding would stall every other in-flight request
+                query_vector = await asyncio.to_thread(lambda: get_embedding_service().get_embedding(request.messages[-1].content))
+        with stage("faq"):
+            match = get_faq_index().match(tenant_id, query_vector, threshold=options.get("faq_threshold"), roles=roles)
+    except RateLimited:
+        raise
+    except Exception as e:
+        print(f"FAQ lookup failed: {e}")
+        return None, query_vector
+    if match is not None:
+        print(f"FAQ fast path hit ({match['score']:.3f}): {match['question']}")
+    return match, query_vector
+
+
+async def _faq_response(request: ChatCompletionRequest, faq: dict, tenant_id: str, session_id: Optional[str]):
+    answer = faq["answer"]
+    if session_id:
+        from app.services.conversation.session_store import get_session_store
+        session_store = get_session_store()
+        session = await session_store.get(session_id, tenant_id)
+        session_store.append_turn(session, request.messages[-1].content, answer)
+
+    if request.stream:
+        async def chunks():
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            yield _sse_chunk(completion_id, "faq", {"role": "assistant"})
+            # Paragraph deltas keep the client's incremental rendering
+            parts = answer.split("\n")
+            for i, part in enumerate(parts):
+                yield _sse_chunk(completion_id, "faq", {"content": part + ("\n" if i < len(parts) - 1 else "")})
+            yield _sse_chunk(completion_id, "faq", {}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "faq",
+        "choices": [{
+            "index": 0,
+            "message": {
+                "role": "assistant",
+                "content": answer
+            },
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+
+async def _prepare(
+    request: ChatCompletionRequest, tenant_id: str, session_id: Optional[str], admission,
+    roles: Optional[List[str]] = None, query_vector: Optional[Any] = None
+) -> dict:
+    """
+    Retrieval, prompt assembly and model routing; returns what the LLM call needs.
+    `query_vector` is the latest user message's embedding when the FAQ lookup already computed it.
+    """
     # 1. Extract latest user query and history
     user_query = request.messages[-1].content
+    session = None
+    session_store = None
+    if session_id:
+        # Stateful mode: summary + recent turns from the store, only the latest message from the client
+        from app.services.conversation.session_store import get_session_store
+        session_store = get_session_store()
+        with stage("session"):
+            session = await session_store.get(session_id, tenant_id)
+        history = session.history_messages()
+    else:
+        history = [
+            {"role": m.role, "content": m.content}
+            for m in request.messages[:-1] # Exclude the last message which we handled as 'user_query'
+            if m.role in ["user", "assistant"]
+        ]
+    conversation = [m for m in history if m["role"] != "system"] + [{"role": "user", "content": user_query}]
     
-    search_query = user_query
-    if len(request.messages) > 1:
-        last_exchange = request.messages[-2].content if request.messages[-2].role == "assistant" else ""
-        if len(request.messages) > 2 and request.messages[-3].role == "user":
-             last_exchange = request.messages[-3].content + " " + last_exchange
-        
-        if len(user_query.split()) < 15: 
-             # Find last user message
-             for m in reversed(request.messages[:-1]):
-                 if m.role == "user":
-                     search_query = f"{m.content} {user_query}"
-                     break
+    from app.services.retrieval.multi_query import MultiQueryRetriever, fuse_history, llm_rewriter
+    search_query = fuse_history(conversation)
+    retrieval_mode = os.getenv("RETRIEVAL_MODE", "multi_query").lower()
     
     print(f"Processing query: {user_query}")
     print(f"Search query derived from history: {search_query}")
     
-    # 2. Embed query
-    from app.services.generation.embeddings import EmbeddingService
-    embedder = EmbeddingService()
-    query_vector = embedder.get_embedding(search_query)
-    
-    # 3. Retrieve context
-    from app.services.retrieval.vector_store.milvus import MilvusClient
-    vector_store = MilvusClient()
+    # 2. Embed query & 3. Retrieve context
+    from app.services.generation.embeddings import get_embedding_service
+    from app.services.retrieval.vector_store.base import get_vector_store
+    hits = []
     try:
-        context_docs = await vector_store.search(query_vector, limit=5)
-        context_text = "\n\n".join(context_docs)
+        # The first call loads the model; neither that nor encoding may block the event loop
+        embedder = await asyncio.to_thread(get_embedding_service)
+        vector_store = get_vector_store()
+        if retrieval_mode == "multi_query":
+            # Raw + history-fused variants (plus an LLM rewrite of follow-ups with MULTI_QUERY_REWRITE),
+            # embedded together and searched in one batched call
+            rewriter = llm_rewriter if os.getenv("MULTI_QUERY_REWRITE", "false").lower() == "true" else None
+            retriever = MultiQueryRetriever(embedder, vector_store, rewriter=rewriter, admission=admission)
+            hits = await retriever.retrieve(conversation, limit=5, tenant_id=tenant_id, filters={"roles": roles}, query_vector=query_vector)
+        else:
+            if query_vector is None or search_query != user_query:
+                async with admission.stage("embed").slot():
+                    with stage("embed"):
+                        query_vector = await asyncio.to_thread(embedder.get_embedding, search_query)
+            async with admission.stage("search").slot():
+                with stage("search"):
+                    hits = (await vector_store.search_batch(query_vector, limit=5, tenant_id=tenant_id, filters={"roles": roles}))[0]
+        context_text = "\n\n".join(hit.text for hit in hits)
+    except RateLimited:
+        raise
     except Exception as e:
         print(f"Retrieval failed: {e}")
         context_text = ""
         
     print(f"Retrieved context length: {len(context_text)}")
 
-    # 4. Construct System Prompt with Context
-    system_prompt = f"""You are a helpful customer service assistant for Kaiser Permanente. 
-Use the following context to answer the user's question. If the answer is not in the context, say you don't know.
+    # Prompt assembly and model routing, timed together as the "prompt" stage
+    with stage("prompt"):
+        # 4. Construct System Prompt with Context
+        config = get_config()
+        system_prompt = config.context_template.format(system_prompt=config.system_prompt, context=context_text)
 
-Context:
-{context_text}
-"""
-    
-    # 5. Call LLM (supports both Groq and OpenAI)
-    import os
-    from openai import OpenAI
-    
-    # Determine which LLM provider to use
-    llm_provider = os.getenv("LLM_PROVIDER", "groq").lower()
-    
-    if llm_provider == "openai":
-        # OpenAI configuration
-        api_key = os.getenv("OPENAI_API_KEY")
-        base_url = None  # Use default OpenAI endpoint
-        default_model = "gpt-4o-mini"
-        print(f"Using OpenAI LLM provider")
-    else:
-        # Groq configuration (default)
-        api_key = os.getenv("GROQ_API_KEY")
-        base_url = "https://api.groq.com/openai/v1"
-        default_model = "llama-3.3-70b-versatile"
-        print(f"Using Groq LLM provider")
-    
-    if not api_key:
-        return {
-            "id": "error",
-            "object": "chat.completion",
-            "created": 0,
-            "model": request.model,
-            "choices": [{
-                "index": 0,
-                "message": {
-                    "role": "assistant",
-                    "content": f"Error: No API key configured for {llm_provider.upper()}. Please set {llm_provider.upper()}_API_KEY environment variable."
-                },
-                "finish_reason": "stop"
-            }]
-        }
-        
-    client = OpenAI(api_key=api_key, base_url=base_url)
-    
-    # Prepare messages
-    # 1. System Prompt
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    # 2. Add Chat History (from request)
-    history_messages = [
-        {"role": m.role, "content": m.content} 
-        for m in request.messages[:-1] # Exclude the last message which we handled as 'user_query'
-        if m.role in ["user", "assistant"]
-    ]
-    messages.extend(history_messages)
+        # 5. Prepare messages
+        # 1. System Prompt
+        messages = [{"role": "system", "content": system_prompt}]
+
+        # 2. Add Chat History (from the session or the request)
+        messages.extend(history)
+
+        # 3. Add Current User Query (with RAG context context already in system prompt, but we repeat query here)
+        messages.append({"role": "user", "content": user_query})
+
+        # 6. Call LLM through the shared gateway (pooled clients, timeouts, retries, failover)
+        from app.services.generation.llm_gateway import get_llm_gateway
+        from app.services.generation.model_router import AUTO_MODEL_ID, get_model_router, log_routing
+        gateway = get_llm_gateway()
+
+        # 7. Route `auto` requests to a model from cheap signals; explicit model ids are honoured
+        router = None
+        decision = None
+        model = request.model or None
+        if model in (None, AUTO_MODEL_ID):
+            router = get_model_router(available_providers=list(gateway.providers))
+            decision = router.route(user_query, [hit.score for hit in hits], len(context_text), tenant_id)
+            model = decision.model or None
+            print(f"Routed to {model}: {decision.reason}")
     
-    # 3. Add Current User Query (with RAG context context already in system prompt, but we repeat query here)
-    messages.append({"role": "user", "content": user_query})
+    def on_complete(info: dict, ok: bool):
+        if session is not None and ok:
+            # Queued for batched persistence; does not block the response
+            session_store.append_turn(session, user_query, info.get("content", ""))
+        if router is None:
+            return
+        latency_ms = info.get("total_ms") if ok else None
+        router.record(info.get("model", model), latency_ms, ok=ok)
+        log_routing(decision, tenant_id, user_query, latency_ms, ok, info.get("usage"))
     
+    return {"gateway": gateway, "messages": messages, "model": model, "on_complete": on_complete}
+
+
+def _release_once(limiter):
+    # The stream's finally and the response's background task may both release the same slot
+    released = False
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            limiter.release()
+    return release
+
+
+async def _start_stream(
+    request: ChatCompletionRequest, tenant_id: str, session_id: Optional[str], admission,
+    roles: Optional[List[str]] = None, query_vector: Optional[Any] = None
+):
+    """
+    (SSE chunk generator, release). The LLM slot is held until the stream ends or release() is called.
+    """
+    prepared = await _prepare(request, tenant_id, session_id, admission, roles, query_vector)
+    # The LLM slot is taken before responding so a saturated stage can still return 429
+    llm_stage = admission.stage("llm")
+    with stage("llm_wait"):
+        await llm_stage.acquire()
+    release = _release_once(llm_stage)
+    chunks = _stream_completion(
+        prepared["gateway"], prepared["messages"], prepared["model"], prepared["on_complete"], release=release
+    )
+    return chunks, release
+
+
+async def _leader_stream(
+    request: ChatCompletionRequest, tenant_id: str, session_id: Optional[str], admission,
+    roles: Optional[List[str]] = None, query_vector: Optional[Any] = None
+):
+    # The single-flight pump drains the generator to completion, so its finally releases the slot
+    chunks, _ = await _start_stream(request, tenant_id, session_id, admission, roles, query_vector)
+    return chunks
+
+
+async def _answer(
+    request: ChatCompletionRequest, tenant_id: str, session_id: Optional[str], admission,
+    roles: Optional[List[str]] = None, query_vector: Optional[Any] = None
+) -> dict:
+    prepared = await _prepare(request, tenant_id, session_id, admission, roles, query_vector)
+    gateway, on_complete = prepared["gateway"], prepared["on_complete"]
+    llm_stage = admission.stage("llm")
+    with stage("llm_wait"):
+        await llm_stage.acquire()
     try:
-        response = client.chat.completions.create(
-            model=request.model or default_model,
-            messages=messages,
-            stream=False # simplified for now
-        )
+        with stage("llm"):
+            result = await gateway.complete(prepared["messages"], model=prepared["model"])
+        annotate(model=result.model, provider=result.provider, llm_first_token_ms=round(result.first_token_ms, 1))
+        print(f"LLM answered via {result.provider} in {result.total_ms:.0f} ms (first token {result.first_token_ms:.0f} ms)")
+        on_complete({"model": result.model, "total_ms": result.total_ms, "usage": result.usage, "content": result.content}, True)
         
+        usage = result.usage or {}
         return {
-            "id": response.id,
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
             "object": "chat.completion",
-            "created": response.created,
-            "model": response.model,
+            "created": int(time.time()),
+            "model": result.model,
             "choices": [{
                 "index": 0,
                 "message": {
                     "role": "assistant",
-                    "content": response.choices[0].message.content
+                    "content": result.content
                 },
                 "finish_reason": "stop"
             }],
             "usage": {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0)
             }
         }
     except Exception as e:
         print(f"LLM call failed: {e}")
+        on_complete({}, False)
         return {
             "id": "error",
             "object": "chat.completion",
@@ -210,3 +430,46 @@ Context:
                 "finish_reason": "stop"
             }]
         }
+    finally:
+        llm_stage.release()
+
+
+def _sse_chunk(completion_id: str, model: str, delta: dict, finish_reason: Optional[str] = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def _stream_completion(gateway, messages: List[dict], model: Optional[str], on_complete=None, release=None):
+    # OpenAI-compatible SSE framing: role chunk, content deltas, stop chunk, [DONE]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    model_name = model or "rag"
+    info = {}
+    parts = []
+    try:
+        # Inside the try: a client that leaves after the first chunk still releases the slot
+        yield _sse_chunk(completion_id, model_name, {"role": "assistant"})
+        # Includes time the client takes to read the stream
+        with stage("llm"):
+            async for delta in gateway.stream_chat(messages, model=model, result=info):
+                parts.append(delta)
+                yield _sse_chunk(completion_id, model_name, {"content": delta})
+        annotate(model=info.get("model", model), llm_first_token_ms=info.get("first_token_ms"))
+        if on_complete:
+            info["content"] = "".join(parts)
+            on_complete(info, True)
+    except Exception as e:
+        print(f"LLM stream failed: {e}")
+        if on_complete:
+            on_complete(info, False)
+        yield _sse_chunk(completion_id, model_name, {"content": f"I encountered an error processing your request: {str(e)}"})
+    finally:
+        if release:
+            release()
+    yield _sse_chunk(completion_id, model_name, {}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
@@ -1,10 +1,33 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Optional
 
 router = APIRouter()
 
+class ReindexRequest(BaseModel):
+    # False keeps the stored vectors and only rebuilds the index (e.g. new index params)
+    reembed: bool = True
+    index_params: Optional[dict] = None
+    drop_old: bool = False
+
 @router.post("/db/reindex")
-async def reindex_database():
-    return {"status": "reindexing_started"}
+async def reindex_database(request: Optional[ReindexRequest] = None):
+    # Builds a shadow collection in the background and swaps the alias when verified
+    from app.services.retrieval.reindex import start_reindex, ReindexInProgress
+    request = request or ReindexRequest()
+    try:
+        job = await start_reindex(reembed=request.reembed, index_params=request.index_params, drop_old=request.drop_old)
+    except ReindexInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"job_id": job.job_id, "status": "reindexing_started"}
+
+@router.get("/db/reindex/{job_id}")
+async def get_reindex_status(job_id: str):
+    from app.services.retrieval.reindex import get_reindex_job
+    job = get_reindex_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown reindex job")
+    return job.to_dict()
 
 @router.post("/db/purge")
 async def purge_database():
@@ -1,16 +1,45 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import Optional
+from app.api.v1.profiling import require_admin
 
-router = APIRouter()
+# Each in-flight question makes generation and judge calls that bypass chat admission control
+MAX_EVAL_CONCURRENCY = 32
+MAX_EVAL_TOP_K = 50
+
+# Runs spend LLM budget and reports quote tenant documents: same X-Admin-Token as the profiling routes
+router = APIRouter(dependencies=[Depends(require_admin)])
 
 class EvalRunRequest(BaseModel):
-    dataset_id: str
-    metrics: list[str]
+    # File name (without .json) in EVAL_DATASET_DIR
+    dataset_id: str = "golden_set"
+    # answer_f1, faithfulness, answer_correctness; all when omitted
+    metrics: Optional[list[str]] = None
+    tenant_id: Optional[str] = None
+    model: Optional[str] = None
+    judge_model: Optional[str] = None
+    top_k: int = Field(5, ge=1, le=MAX_EVAL_TOP_K)
+    concurrency: Optional[int] = Field(None, ge=1, le=MAX_EVAL_CONCURRENCY)
+    # Earlier run to compare against; regressions are listed under `comparison`
+    baseline_run_id: Optional[str] = None
 
 @router.post("/eval/run")
 async def run_evaluation(request: EvalRunRequest):
-    return {"run_id": "eval-456", "status": "started"}
+    # Runs in the background; poll /eval/results/{run_id}
+    from app.services.evaluation.runner import start_eval
+    options = request.model_dump(exclude={"dataset_id", "baseline_run_id"}, exclude_none=True)
+    try:
+        job = start_eval(request.dataset_id, baseline_run_id=request.baseline_run_id, **options)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset {request.dataset_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"run_id": job.run_id, "status": "started", "questions": job.total}
 
 @router.get("/eval/results/{run_id}")
 async def get_eval_results(run_id: str):
-    return {"run_id": run_id, "score": 0.85, "details": {}}
+    from app.services.evaluation.runner import get_eval_job
+    job = get_eval_job(run_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown evaluation run")
+    return job.to_dict()
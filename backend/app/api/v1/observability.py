@@ -10,6 +10,36 @@ async def get_metrics_summary():
         "avg_latency_ms": 120
     }
 
+@router.get("/metrics/llm")
+async def get_llm_metrics():
+    # Per-provider first-token/total latency percentiles, retries and hedges
+    from app.services.generation.llm_gateway import get_llm_gateway
+    return get_llm_gateway().metrics()
+
+@router.get("/metrics/router")
+async def get_router_metrics():
+    # Rolling p95, error rate and degraded flag per routable model
+    from app.services.generation.model_router import get_model_router
+    return get_model_router().metrics()
+
+@router.get("/metrics/admission")
+async def get_admission_metrics():
+    # Per-stage in-flight/queue/rejection counts and per-tenant rate-limit state
+    from app.core.admission import get_admission_controller
+    return get_admission_controller().metrics()
+
+@router.get("/metrics/singleflight")
+async def get_singleflight_metrics():
+    # Identical in-flight chat requests served by another caller's work
+    from app.core.singleflight import get_single_flight
+    return get_single_flight().metrics()
+
+@router.get("/metrics/faq")
+async def get_faq_metrics():
+    # FAQ fast path lookups, hits and hit rate per tenant
+    from app.services.retrieval.faq import get_faq_index
+    return get_faq_index().metrics()
+
 @router.get("/health/detailed")
 async def detailed_health():
     return {
@@ -0,0 +1,99 @@
+"""
+profiling.py
+Admin-only diagnostics: CPU profile, tracemalloc snapshots/diffs (API process and Celery
+workers) and the slow-request log. Every route needs `X-Admin-Token: $ADMIN_TOKEN`; with
+ADMIN_TOKEN unset the routes are disabled.
+"""
+import os
+import asyncio
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.core.profiling import ProfilerBusy, get_memory_tracker, get_slow_request_log, sample_stacks
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    expected = os.getenv("ADMIN_TOKEN", "")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.post("/profile/cpu")
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$")
+):
+    # Samples run in a worker thread, so the event loop (and its stacks) keep serving requests
+    max_seconds = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    try:
+        profile = await asyncio.to_thread(sample_stacks, min(seconds, max_seconds), interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "json":
+        return profile
+    # Collapsed stacks: `flamegraph.pl profile.txt > profile.svg`, or drop into speedscope
+    return PlainTextResponse(profile["collapsed"] + "\n", headers={"X-Profile-Samples": str(profile["samples"])})
+
+@router.get("/profile/memory")
+async def memory_status():
+    return get_memory_tracker().status()
+
+@router.post("/profile/memory/start")
+async def memory_start(frames: int = Query(25, ge=1, le=100)):
+    return get_memory_tracker().start(frames)
+
+@router.post("/profile/memory/snapshot")
+async def memory_snapshot(limit: int = Query(25, ge=1, le=500)):
+    try:
+        return await asyncio.to_thread(get_memory_tracker().snapshot, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/profile/memory/diff")
+async def memory_diff(from_id: Optional[int] = None, to_id: Optional[int] = None, limit: int = Query(25, ge=1, le=500)):
+    try:
+        return await asyncio.to_thread(get_memory_tracker().diff, from_id, to_id, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/profile/memory/stop")
+async def memory_stop():
+    return get_memory_tracker().stop()
+
+@router.post("/profile/worker/{action}")
+async def worker_diagnostics(
+    action: str,
+    frames: int = Query(25, ge=1, le=100),
+    from_id: Optional[int] = None,
+    to_id: Optional[int] = None,
+    limit: int = Query(25, ge=1, le=500)
+):
+    """
+    Runs a diagnostics action (memory status/start/snapshot/diff/stop, or slow_requests) in
+    whichever Celery ingestion worker picks the task up; the reply carries its pid.
+    """
+    from app.workers.tasks.profiling_tasks import ACTIONS
+    if action not in ACTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown action {action!r}; expected one of {sorted(ACTIONS)}")
+    from app.workers.celery_app import celery_app
+    result = celery_app.send_task(
+        "worker_diagnostics",
+        kwargs={"action": action, "frames": frames, "from_id": from_id, "to_id": to_id, "limit": limit},
+        queue=os.getenv("PROFILE_WORKER_QUEUE") or None
+    )
+    try:
+        return await asyncio.to_thread(result.get, timeout=float(os.getenv("PROFILE_WORKER_TIMEOUT", "30")))
+    except Exception as e:
+        raise HTTPException(status_code=504, detail=f"Worker did not answer: {e}")
+
+@router.get("/slow-requests")
+async def slow_requests(limit: int = Query(50, ge=1, le=1000), kind: Optional[str] = None):
+    # Newest first; each entry has total_ms and the per-stage breakdown
+    log = get_slow_request_log()
+    return {**log.metrics(), "entries": log.entries(limit, kind)}
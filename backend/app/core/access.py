@@ -0,0 +1,28 @@
+"""
+access.py
+Trusted caller roles for permission filtering.
+
+Roles travel in `X-Roles` (comma-separated) and are only believed when `X-Roles-Signature`
+is the hex HMAC-SHA256 of "<tenant_id>\\n<roles>" under ROLES_SIGNING_KEY, which only trusted
+front ends (the Open WebUI bridge) hold. Anything else, including a missing header or an unset
+key, yields no roles: the caller sees public content only.
+"""
+import os
+import hmac
+import hashlib
+from typing import Optional
+
+def sign_roles(tenant_id: str, roles: str, key: str) -> str:
+    message = f"{tenant_id}\n{roles}".encode("utf-8")
+    return hmac.new(key.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+def trusted_roles(tenant_id: str, roles: Optional[str], signature: Optional[str]) -> str:
+    """
+    The roles header when its signature checks out for this tenant, else "" (public only).
+    """
+    key = os.getenv("ROLES_SIGNING_KEY", "")
+    if not key or not roles or not signature:
+        return ""
+    if not hmac.compare_digest(signature, sign_roles(tenant_id, roles, key)):
+        return ""
+    return roles
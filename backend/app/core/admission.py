@@ -0,0 +1,196 @@
+# classroom-customer-service-rag-phase-1\backend\app\core\admission.py
+"""
+Per-tenant admission control and load shedding.
+
+- Token-bucket rate limit per tenant (limits from tenants.yaml, falling back to per-plan defaults).
+  Tenants not listed in tenants.yaml share one bucket, so rotating X-Tenant values neither
+  resets the limit nor grows the bucket map.
+- Bounded in-flight concurrency per pipeline stage (embed, search, llm) with a queue-wait deadline
+- Rejections raise RateLimited, which the API turns into a fast 429 with Retry-After
+"""
+import os
+import time
+import math
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Callable
+
+from app.core.registry import get_config
+
+# Bucket (and metrics key) of every tenant not listed in tenants.yaml
+SHARED_BUCKET = "default"
+
+# requests/second and burst per plan when a tenant has no explicit rate_limit
+PLAN_RATE_LIMITS = {
+    "basic": (2.0, 5),
+    "standard": (10.0, 20),
+    "enterprise": (50.0, 100),
+}
+
+DEFAULT_STAGE_LIMITS = {
+    # stage: (max in flight, max queue wait seconds)
+    "embed": (8, 0.5),
+    "search": (32, 0.5),
+    "llm": (64, 2.0),
+}
+
+class RateLimited(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.updated = clock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Takes tokens if available and returns 0; otherwise returns seconds until enough refill.
+        """
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+class StageLimiter:
+    def __init__(self, name: str, max_in_flight: int, max_queue_wait: float):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue_wait = max_queue_wait
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_wait_ms = deque(maxlen=1000)
+
+    async def acquire(self):
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RateLimited(f"{self.name} stage saturated ({self.max_in_flight} in flight)", self.max_queue_wait)
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        self.queue_wait_ms.append((time.perf_counter() - start) * 1000)
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self.queue_wait_ms)
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_wait_p99_ms": round(waits[int(0.99 * (len(waits) - 1))], 2) if waits else None,
+        }
+
+class AdmissionController:
+    def __init__(self, stage_limits: Optional[Dict[str, tuple]] = None, config_source: Callable = get_config):
+        self.config_source = config_source
+        self.stages: Dict[str, StageLimiter] = {}
+        for name, (max_in_flight, max_wait) in (stage_limits or DEFAULT_STAGE_LIMITS).items():
+            max_in_flight = int(os.getenv(f"ADMISSION_{name.upper()}_CONCURRENCY", max_in_flight))
+            max_wait = float(os.getenv(f"ADMISSION_{name.upper()}_QUEUE_WAIT", max_wait))
+            self.stages[name] = StageLimiter(name, max_in_flight, max_wait)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._config_version = None
+        self.tenant_admitted: Dict[str, int] = {}
+        self.tenant_rejected: Dict[str, int] = {}
+
+    def _limits_for(self, config, tenant_id: str) -> tuple:
+        tenant = config.tenant(tenant_id)
+        plan = tenant.plan if tenant else "standard"
+        rate, burst = PLAN_RATE_LIMITS.get(plan, PLAN_RATE_LIMITS["standard"])
+        if tenant is not None and tenant.options.get("rate_limit"):
+            limit = tenant.options["rate_limit"]
+            rate = float(limit.get("requests_per_second", rate))
+            burst = int(limit.get("burst", burst))
+        return rate, burst
+
+    def _bucket(self, tenant_id: str) -> tuple:
+        """
+        (bucket key, bucket): the tenant's own bucket if tenants.yaml lists it, else the shared one.
+        """
+        config = self.config_source()
+        if config.version != self._config_version:
+            # tenants.yaml was reloaded: re-apply limits, keeping current token levels; tenants
+            # that were removed fall back to the shared bucket
+            for known_id in list(self._buckets):
+                if known_id != SHARED_BUCKET and known_id not in config.tenants:
+                    del self._buckets[known_id]
+                    continue
+                self._buckets[known_id].rate, self._buckets[known_id].burst = self._limits_for(config, known_id)
+            self._config_version = config.version
+        key = tenant_id if tenant_id != SHARED_BUCKET and tenant_id in config.tenants else SHARED_BUCKET
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(*self._limits_for(config, key))
+            self._buckets[key] = bucket
+        return key, bucket
+
+    def admit(self, tenant_id: str):
+        """
+        Charges one request against the tenant's bucket; raises RateLimited when it is empty.
+        """
+        key, bucket = self._bucket(tenant_id)
+        wait = bucket.try_acquire()
+        if wait > 0:
+            self.tenant_rejected[key] = self.tenant_rejected.get(key, 0) + 1
+            raise RateLimited(f"Rate limit exceeded for tenant {tenant_id}", wait)
+        self.tenant_admitted[key] = self.tenant_admitted.get(key, 0) + 1
+
+    def stage(self, name: str) -> StageLimiter:
+        return self.stages[name]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "stages": {name: stage.snapshot() for name, stage in self.stages.items()},
+            "tenants": {
+                tenant_id: {
+                    "admitted": self.tenant_admitted.get(tenant_id, 0),
+                    "rejected": self.tenant_rejected.get(tenant_id, 0),
+                    "tokens": round(bucket.tokens, 2),
+                    "rate": bucket.rate,
+                    "burst": bucket.burst,
+                }
+                for tenant_id, bucket in self._buckets.items()
+            },
+        }
+
+_controller: Optional[AdmissionController] = None
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
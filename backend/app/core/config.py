@@ -4,6 +4,8 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Classroom CS RAG"
     API_V1_STR: str = "/api/v1"
+    # Mounted from ./resources in docker-compose (models.yaml, prompts.yaml, tenants.yaml)
+    RESOURCES_DIR: str = "/resources"
     
     # Add other config vars here
     
@@ -0,0 +1,280 @@
+"""
+profiling.py
+On-demand diagnostics for a live process: sampling CPU profiler, tracemalloc snapshots and a
+slow-request log.
+
+Nothing runs while idle: the sampler thread exists only for the duration of a profile and
+tracemalloc is started explicitly. Requests carry a RequestTrace in a contextvar; stage()
+adds to it and is a no-op without one, and only traces over SLOW_REQUEST_MS are kept.
+"""
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+class ProfilerBusy(RuntimeError):
+    """Another CPU profile is already running in this process."""
+
+# CPU: sampling profiler
+
+_profile_lock = threading.Lock()
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # Per function, not per line, so samples from one function aggregate into one frame
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Dict[str, Any]:
+    """
+    Samples the stacks of every other thread every `interval` seconds for `seconds` and
+    returns them in collapsed form ("thread;outer;...;inner count" per line), which
+    flamegraph.pl and speedscope read directly.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A CPU profile is already running")
+    try:
+        own = threading.get_ident()
+        counts: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}").replace(";", ","))
+                counts[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+        return {
+            "samples": samples,
+            "seconds": round(time.perf_counter() - started, 3),
+            "interval_ms": interval * 1000,
+            "collapsed": "\n".join(f"{stack} {n}" for stack, n in counts.most_common()),
+        }
+    finally:
+        _profile_lock.release()
+
+# Memory: tracemalloc snapshots and diffs
+
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+def _stat_row(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    row = {"location": f"{frame.filename}:{frame.lineno}", "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        row["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        row["count_diff"] = stat.count_diff
+    return row
+
+class MemoryTracker:
+    """
+    tracemalloc control for one process. Snapshots are kept (up to max_snapshots, oldest
+    dropped first) so growth can be diffed between any two of them.
+    """
+    def __init__(self, max_snapshots: int = None):
+        self.max_snapshots = max_snapshots or int(os.getenv("PROFILE_MAX_SNAPSHOTS", "10"))
+        self.snapshots: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "pid": os.getpid(),
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "traced_mb": round(current / 2**20, 2),
+            "peak_mb": round(peak / 2**20, 2),
+            "snapshots": [{"id": i, "taken_at": taken_at} for i, (taken_at, _) in self.snapshots.items()],
+        }
+
+    def start(self, frames: int = 25) -> Dict[str, Any]:
+        # More frames attribute allocations better but make every allocation slower while tracing
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        with self._lock:
+            self.snapshots.clear()
+        tracemalloc.stop()
+        return self.status()
+
+    def snapshot(self, limit: int = 25) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; start it first")
+        snap = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self.snapshots[snapshot_id] = (time.time(), snap)
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+        return {
+            **self.status(),
+            "id": snapshot_id,
+            "top": [_stat_row(s) for s in snap.statistics("lineno")[:limit]],
+        }
+
+    def diff(self, from_id: int = None, to_id: int = None, limit: int = 25) -> Dict[str, Any]:
+        """
+        Largest allocation changes from one snapshot to another (default: oldest to newest).
+        """
+        with self._lock:
+            ids = list(self.snapshots)
+            if len(ids) < 2 and (from_id is None or to_id is None):
+                raise RuntimeError("Need two snapshots to diff")
+            from_id = ids[0] if from_id is None else from_id
+            to_id = ids[-1] if to_id is None else to_id
+            if from_id not in self.snapshots or to_id not in self.snapshots:
+                raise KeyError(f"Unknown snapshot id (have {ids})")
+            old, new = self.snapshots[from_id][1], self.snapshots[to_id][1]
+        stats = new.compare_to(old, "lineno")
+        return {
+            "pid": os.getpid(),
+            "from": from_id,
+            "to": to_id,
+            "size_diff_kb": round(sum(s.size_diff for s in stats) / 1024, 1),
+            "top": [_stat_row(s) for s in stats[:limit]],
+        }
+
+_memory_tracker: Optional[MemoryTracker] = None
+
+def get_memory_tracker() -> MemoryTracker:
+    global _memory_tracker
+    if _memory_tracker is None:
+        _memory_tracker = MemoryTracker()
+    return _memory_tracker
+
+# Slow-request log
+
+class RequestTrace:
+    __slots__ = ("kind", "started", "started_at", "stages", "attrs", "done")
+
+    def __init__(self, kind: str, attrs: Dict[str, Any]):
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.stages: Dict[str, float] = {}
+        self.attrs = attrs
+        self.done = False
+
+    def add(self, name: str, ms: float):
+        # Repeated stages (e.g. a second embed for a rewritten query) accumulate
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+@contextmanager
+def stage(name: str):
+    """
+    Times the block into the current request's trace; does nothing outside a traced request.
+    """
+    trace = _current_trace.get()
+    if trace is None or trace.done:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, (time.perf_counter() - start) * 1000)
+
+def start_trace(kind: str, **attrs) -> RequestTrace:
+    """
+    Traces the current task outside the slow-request log (e.g. one evaluation question);
+    the caller reads trace.stages when done.
+    """
+    trace = RequestTrace(kind, attrs)
+    _current_trace.set(trace)
+    return trace
+
+def annotate(**attrs):
+    # Extra fields (model, first-token latency, ...) for the current trace's log entry
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+class SlowRequestLog:
+    """
+    Bounded ring buffer of requests slower than threshold_ms, with their per-stage timings.
+    threshold_ms <= 0 disables tracing altogether.
+    """
+    def __init__(self, threshold_ms: float = None, size: int = None):
+        self.threshold_ms = threshold_ms if threshold_ms is not None else float(os.getenv("SLOW_REQUEST_MS", "2000"))
+        self.entries_buffer: deque = deque(maxlen=size or int(os.getenv("SLOW_REQUEST_LOG_SIZE", "200")))
+        self.traced = 0
+        self.slow = 0
+
+    def begin(self, kind: str, **attrs) -> Optional[RequestTrace]:
+        if self.threshold_ms <= 0:
+            return None
+        trace = RequestTrace(kind, attrs)
+        _current_trace.set(trace)
+        return trace
+
+    def finish(self, trace: Optional[RequestTrace], **attrs):
+        if trace is None or trace.done:
+            return
+        trace.done = True
+        total_ms = (time.perf_counter() - trace.started) * 1000
+        self.traced += 1
+        if total_ms < self.threshold_ms:
+            return
+        self.slow += 1
+        stages = {name: round(ms, 1) for name, ms in trace.stages.items()}
+        self.entries_buffer.append({
+            "kind": trace.kind,
+            "started_at": trace.started_at,
+            "total_ms": round(total_ms, 1),
+            "stages": stages,
+            # Time outside any named stage (routing, serialization, waiting on the client)
+            "other_ms": round(max(total_ms - sum(trace.stages.values()), 0.0), 1),
+            **trace.attrs,
+            **attrs,
+        })
+
+    async def traced_stream(self, trace: Optional[RequestTrace], chunks: AsyncIterator) -> AsyncIterator:
+        # Streamed responses end when the last chunk is sent, not when the endpoint returns
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            self.finish(trace)
+
+    def entries(self, limit: int = 50, kind: str = None) -> List[Dict[str, Any]]:
+        rows = [e for e in reversed(self.entries_buffer) if kind is None or e["kind"] == kind]
+        return rows[:limit]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "traced": self.traced,
+            "slow": self.slow,
+            "buffered": len(self.entries_buffer),
+            "capacity": self.entries_buffer.maxlen,
+        }
+
+_slow_request_log: Optional[SlowRequestLog] = None
+
+def get_slow_request_log() -> SlowRequestLog:
+    global _slow_request_log
+    if _slow_request_log is None:
+        _slow_request_log = SlowRequestLog()
+    return _slow_request_log
@@ -0,0 +1,271 @@
+# classroom-customer-service-rag-phase-1\backend\app\core\registry.py
+"""
+In-memory config registry for models, prompts and tenants.
+
+The YAML files are loaded and validated once into an immutable ConfigSnapshot. A daemon
+thread polls their modification times and swaps in a new snapshot when they change; the swap
+is a single reference assignment, so readers never take a lock. An invalid edit is rejected
+and the previous snapshot stays active.
+"""
+import os
+import time
+import hashlib
+import threading
+from types import MappingProxyType
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple, Mapping
+
+import yaml
+from app.core.config import settings
+
+KNOWN_PLANS = ("basic", "standard", "enterprise")
+KNOWN_TIERS = ("small", "large")
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful customer service assistant for Kaiser Permanente. \n"
+    "Use the following context to answer the user's question. If the answer is not in the context, say you don't know."
+)
+
+class ConfigError(Exception):
+    pass
+
+@dataclass(frozen=True)
+class ModelEntry:
+    id: str
+    provider: str
+    type: str = "chat"
+    tier: str = "large"
+    cost_per_1k_tokens: float = 0.0
+    latency_p50_ms: float = 1000.0
+
+@dataclass(frozen=True)
+class ProviderEntry:
+    name: str
+    base_url: Optional[str]
+    api_key_env: str
+    default_model: str
+
+@dataclass(frozen=True)
+class TenantEntry:
+    id: str
+    name: str
+    plan: str
+    # Any further per-tenant keys from tenants.yaml, read-only
+    options: Mapping[str, Any]
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    version: str
+    loaded_at: float
+    models: Tuple[ModelEntry, ...]
+    providers: Mapping[str, ProviderEntry]
+    tenants: Mapping[str, TenantEntry]
+    system_prompt: str
+    context_template: str
+    sources: Mapping[str, float]
+
+    def tenant(self, tenant_id: str) -> Optional[TenantEntry]:
+        # Tenants not listed individually inherit the `default` entry
+        return self.tenants.get(tenant_id) or self.tenants.get("default")
+
+    def model(self, model_id: str) -> Optional[ModelEntry]:
+        return next((m for m in self.models if m.id == model_id), None)
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _read_yaml(path: str) -> Tuple[Dict[str, Any], bytes]:
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        data = yaml.safe_load(raw) or {}
+    except yaml.YAMLError as e:
+        raise ConfigError(f"{path}: invalid YAML: {e}")
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: expected a mapping at the top level")
+    return data, raw
+
+class ConfigRegistry:
+    def __init__(self, resources_dir: str = None, system_prompts_file: str = None):
+        resources_dir = resources_dir or settings.RESOURCES_DIR
+        self.files = {
+            "models": os.path.join(resources_dir, "models.yaml"),
+            "prompts": os.path.join(resources_dir, "prompts.yaml"),
+            "tenants": os.path.join(resources_dir, "tenants.yaml"),
+            "system_prompts": system_prompts_file or os.getenv("SYSTEM_PROMPTS_FILE", "/init_data/prompts/system_prompts.yaml"),
+        }
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_error: Optional[str] = None
+        self.reloads = 0
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        # Hot path: one attribute read, no lock
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.reload()
+            snapshot = self._snapshot
+        return snapshot
+
+    def _mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for path in self.files.values():
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = 0.0
+        return mtimes
+
+    def load(self) -> ConfigSnapshot:
+        """
+        Reads and validates every file into a new snapshot; raises ConfigError on invalid content.
+        """
+        mtimes = self._mtimes()
+        digest = hashlib.sha256()
+        data = {}
+        for name, path in self.files.items():
+            if os.path.exists(path):
+                data[name], raw = _read_yaml(path)
+                digest.update(name.encode() + b"\0" + raw)
+            else:
+                data[name] = {}
+
+        # --- models.yaml ---
+        models = []
+        for m in data["models"].get("models", []) or []:
+            if not isinstance(m, dict) or not m.get("id") or not m.get("provider"):
+                raise ConfigError(f"models.yaml: every model needs an id and a provider, got {m!r}")
+            tier = m.get("tier", "large")
+            if tier not in KNOWN_TIERS:
+                raise ConfigError(f"models.yaml: model {m['id']} has unknown tier {tier!r}")
+            models.append(ModelEntry(
+                id=str(m["id"]),
+                provider=str(m["provider"]),
+                type=m.get("type", "chat"),
+                tier=tier,
+                cost_per_1k_tokens=float(m.get("cost_per_1k_tokens", 0.0)),
+                latency_p50_ms=float(m.get("latency_p50_ms", 1000))
+            ))
+        if len({m.id for m in models}) != len(models):
+            raise ConfigError("models.yaml: duplicate model ids")
+
+        providers = {}
+        for name, spec in (data["models"].get("providers") or {}).items():
+            if not isinstance(spec, dict) or not spec.get("default_model"):
+                raise ConfigError(f"models.yaml: provider {name} needs a default_model")
+            providers[name] = ProviderEntry(
+                name=name,
+                base_url=spec.get("base_url"),
+                api_key_env=spec.get("api_key_env", f"{name.upper()}_API_KEY"),
+                default_model=spec["default_model"]
+            )
+
+        # --- tenants.yaml ---
+        tenants = {}
+        for t in data["tenants"].get("tenants", []) or []:
+            if not isinstance(t, dict) or not t.get("id"):
+                raise ConfigError(f"tenants.yaml: every tenant needs an id, got {t!r}")
+            plan = t.get("plan", "standard")
+            if plan not in KNOWN_PLANS:
+                raise ConfigError(f"tenants.yaml: tenant {t['id']} has unknown plan {plan!r}")
+            options = {k: v for k, v in t.items() if k not in ("id", "name", "plan")}
+            tenants[str(t["id"])] = TenantEntry(id=str(t["id"]), name=t.get("name", str(t["id"])), plan=plan, options=_freeze(options))
+
+        # --- prompts.yaml / system_prompts.yaml ---
+        system_prompt = (
+            data["system_prompts"].get("default_system_prompt")
+            or (data["prompts"].get("system") or {}).get("default")
+            or DEFAULT_SYSTEM_PROMPT
+        )
+        context_template = (data["prompts"].get("rag") or {}).get("system_context_template", "{system_prompt}\n\nContext:\n{context}\n")
+        if not isinstance(context_template, str) or "{context}" not in context_template:
+            raise ConfigError("prompts.yaml: rag.system_context_template must contain {context}")
+        try:
+            # Same call as chat: any other placeholder would fail every request
+            context_template.format(system_prompt="", context="")
+        except (KeyError, IndexError, ValueError) as e:
+            raise ConfigError(f"prompts.yaml: rag.system_context_template may only use {{system_prompt}} and {{context}}: {e!r}")
+
+        return ConfigSnapshot(
+            version=digest.hexdigest()[:12],
+            loaded_at=time.time(),
+            models=tuple(models),
+            providers=MappingProxyType(providers),
+            tenants=MappingProxyType(tenants),
+            system_prompt=system_prompt.strip(),
+            context_template=context_template,
+            sources=MappingProxyType(mtimes)
+        )
+
+    def reload(self) -> bool:
+        """
+        Loads a new snapshot and swaps it in. Returns False (keeping the old snapshot) if validation fails.
+        """
+        with self._reload_lock:
+            try:
+                snapshot = self.load()
+            except Exception as e:
+                # Any malformed file (e.g. a string where a mapping belongs) keeps the old snapshot
+                self.last_error = str(e) if isinstance(e, ConfigError) else f"{type(e).__name__}: {e}"
+                print(f"Config reload rejected: {self.last_error}")
+                if self._snapshot is None:
+                    raise
+                return False
+            changed = self._snapshot is None or snapshot.version != self._snapshot.version
+            self._snapshot = snapshot
+            self.last_error = None
+            if changed:
+                self.reloads += 1
+                print(f"Loaded config version {snapshot.version}")
+            return True
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            current = self._snapshot
+            if current is not None and self._mtimes() != dict(current.sources):
+                self.reload()
+
+    def start_watching(self, interval: float = None):
+        if self._watcher is not None:
+            return
+        interval = interval if interval is not None else float(os.getenv("CONFIG_WATCH_INTERVAL", "2"))
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reloads": self.reloads,
+            "watching": self._watcher is not None,
+            "last_error": self.last_error,
+            "files": {name: {"path": path, "mtime": snapshot.sources.get(path) if snapshot else None} for name, path in self.files.items()},
+            "models": len(snapshot.models) if snapshot else 0,
+            "tenants": len(snapshot.tenants) if snapshot else 0,
+        }
+
+_registry: Optional[ConfigRegistry] = None
+
+def get_registry() -> ConfigRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ConfigRegistry()
+    return _registry
+
+def get_config() -> ConfigSnapshot:
+    return get_registry().snapshot
@@ -0,0 +1,145 @@
+# classroom-customer-service-rag-phase-1\backend\app\core\singleflight.py
+"""
+Request coalescing (single-flight) for identical in-flight requests.
+
+The first caller for a key runs the work in a detached task; concurrent callers with the same
+key await that task instead of repeating it. Streams are fanned out: every subscriber replays
+the chunks produced so far and then follows the live stream. Errors reach every caller.
+"""
+import os
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, AsyncIterator, Optional
+
+def request_key(*parts: Any) -> str:
+    """
+    Canonical hash of the request parts (dict keys sorted, no whitespace differences).
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class _Broadcast:
+    """
+    Buffers items from one async iterator and replays them to any number of subscribers.
+    """
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._cond = asyncio.Condition()
+
+    async def pump(self, source: AsyncIterator[Any]):
+        try:
+            async for item in source:
+                async with self._cond:
+                    self.items.append(item)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    async def subscribe(self, idle_timeout: float) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            async with self._cond:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: len(self.items) > position or self.done),
+                    timeout=idle_timeout
+                )
+                new_items = self.items[position:]
+                done, error = self.done, self.error
+            for item in new_items:
+                yield item
+            position += len(new_items)
+            if done and position >= len(self.items):
+                if error is not None:
+                    raise error
+                return
+
+class SingleFlight:
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout if timeout is not None else float(os.getenv("SINGLEFLIGHT_TIMEOUT", "120"))
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def _track(self, registry: Dict[str, asyncio.Task], key: str, task: asyncio.Task):
+        registry[key] = task
+
+        def _done(t: asyncio.Task):
+            if registry.get(key) is t:
+                del registry[key]
+            if t.cancelled() or t.exception() is not None:
+                self.errors += 1
+        task.add_done_callback(_done)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs fn once per key among concurrent callers and returns its result to all of them.
+        The shared work is shielded, so one caller disconnecting does not cancel it for the others.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(fn())
+            self._track(self._calls, key, task)
+        else:
+            self.coalesced += 1
+        return await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+
+    async def stream(self, key: str, start: Callable[[], Awaitable[AsyncIterator[Any]]]) -> AsyncIterator[Any]:
+        """
+        `start` does any up-front work (which may raise, e.g. RateLimited) and returns the source
+        iterator. Concurrent callers share one source; each gets its own replaying subscriber.
+        """
+        task = self._streams.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(self._open_stream(key, start))
+            self._streams[key] = task
+        else:
+            self.coalesced += 1
+        broadcast = await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+        return broadcast.subscribe(self.timeout)
+
+    async def _open_stream(self, key: str, start: Callable[[], Awaitable[AsyncIterator[Any]]]) -> _Broadcast:
+        opener = asyncio.current_task()
+
+        def _release(_=None):
+            # Late arrivals may join until the source finishes; afterwards the key is free again
+            if self._streams.get(key) is opener:
+                del self._streams[key]
+
+        try:
+            source = await start()
+        except BaseException:
+            self.errors += 1
+            _release()
+            raise
+        broadcast = _Broadcast()
+        broadcast.pump_task = asyncio.create_task(broadcast.pump(source))
+        broadcast.pump_task.add_done_callback(_release)
+        return broadcast
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "in_flight_calls": len(self._calls),
+            "in_flight_streams": len(self._streams),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
+
+_single_flight: Optional[SingleFlight] = None
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
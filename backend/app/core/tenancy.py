@@ -0,0 +1,17 @@
+# classroom-customer-service-rag-phase-1\backend\app\core\tenancy.py
+import re
+
+DEFAULT_TENANT_ID = "default_tenant"
+
+# Tenant ids end up in Milvus filter expressions and partition keys,
+# so only a conservative identifier alphabet is accepted.
+_TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+
+def validate_tenant_id(tenant_id: str) -> str:
+    """
+    Returns the tenant id unchanged if it is a safe identifier, otherwise raises ValueError.
+    """
+    # fullmatch: `$` alone would also accept a trailing newline
+    if not isinstance(tenant_id, str) or not _TENANT_ID_PATTERN.fullmatch(tenant_id):
+        raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+    return tenant_id
@@ -1,7 +1,11 @@
 # classroom-customer-service-rag-phase-1\backend\app\main.py
-from fastapi import FastAPI
+import os
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.core.config import settings
-from app.api.v1 import chat, ingest, admin, eval, database, observability
+from app.core.admission import RateLimited
+from app.api.v1 import chat, ingest, admin, eval, database, observability, profiling
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -22,6 +26,45 @@ app.include_router(admin.router, prefix=settings.API_V1_STR, tags=["admin"])
 app.include_router(eval.router, prefix=settings.API_V1_STR, tags=["evaluation"])
 app.include_router(database.router, prefix=settings.API_V1_STR, tags=["database"])
 app.include_router(observability.router, prefix=settings.API_V1_STR, tags=["observability"])
+app.include_router(profiling.router, prefix=f"{settings.API_V1_STR}/admin", tags=["profiling"])
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    # Fast rejection: clients back off for Retry-After seconds instead of queueing until timeout
+    return JSONResponse(
+        status_code=429,
+        content={"error": {"message": exc.reason, "type": "rate_limit_exceeded"}},
+        headers={"Retry-After": exc.retry_after_header}
+    )
+
+@app.on_event("startup")
+async def startup():
+    # Load and validate config once, then watch the files for hot reloads
+    from app.core.registry import get_registry
+    registry = get_registry()
+    registry.reload()
+    registry.start_watching()
+    # Model load off the boot path: /health answers at once and the first chat does not wait for it
+    if os.getenv("PRELOAD_EMBEDDING_MODEL", "true").lower() == "true":
+        asyncio.get_running_loop().run_in_executor(None, _preload_embedding_model)
+
+def _preload_embedding_model():
+    from app.services.generation.embeddings import get_embedding_service
+    try:
+        get_embedding_service()
+        print("Embedding model preloaded")
+    except Exception as e:
+        print(f"Embedding model preload failed: {e}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    from app.core.registry import get_registry
+    from app.services.generation.llm_gateway import close_llm_gateway
+    from app.services.conversation.session_store import close_session_store
+    # Flush queued session writes before the pooled LLM connections go away
+    await close_session_store()
+    await close_llm_gateway()
+    get_registry().stop_watching()
 
 @app.get("/health")
 def health_check():
@@ -0,0 +1,21 @@
+"""
+base.py
+Chunk produced by the chunkers, with the location metadata that is stored alongside it.
+"""
+from dataclasses import dataclass
+
+# Milvus VARCHAR column size for heading_path
+MAX_HEADING_PATH = 1024
+
+@dataclass
+class Chunk:
+    text: str
+    # 1-based source page; 0 when the source has no pages (plain text, HTML)
+    page: int = 0
+    # Enclosing section titles, outermost first, joined with " > "
+    heading_path: str = ""
+    # Tokens counted by the chunker (without the model's special tokens); 0 when not counted
+    token_count: int = 0
+
+def heading_path(titles) -> str:
+    return " > ".join(t for t in titles if t)[:MAX_HEADING_PATH]
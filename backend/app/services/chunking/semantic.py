@@ -1,65 +1,78 @@
+import os
+import importlib.util
 from typing import List, Any, Union
-try:
-    from docling.chunking import HybridChunker
-    from docling.document_converter import ConversionResult
-    DOCLING_CHUNK_AVAILABLE = True
-except ImportError:
-    DOCLING_CHUNK_AVAILABLE = False
+from app.services.chunking.base import Chunk, heading_path
+
+# Checked without importing; HybridChunker is imported when a chunker is built
+DOCLING_CHUNK_AVAILABLE = importlib.util.find_spec("docling") is not None
+TOKENIZER_AVAILABLE = importlib.util.find_spec("transformers") is not None
 
 class SemanticChunker:
-    def __init__(self, tokenizer: str = "intfloat/e5-base-v2", max_tokens: int = 512, overlap: int = 50):
+    def __init__(self, tokenizer: str = "intfloat/e5-base-v2", max_tokens: int = 512, overlap: int = 50, mode: str = None):
+        self.tokenizer_name = tokenizer
         self.max_tokens = max_tokens
         self.overlap = overlap
-        if DOCLING_CHUNK_AVAILABLE:
+        # CHUNKER_MODE: "docling" (HybridChunker over the document structure) or
+        # "token" (TokenChunker: sentences packed to the exact token budget, token-level overlap)
+        self.mode = (mode or os.getenv("CHUNKER_MODE", "docling")).lower()
+        if self.mode not in ("docling", "token"):
+            raise ValueError(f"Unknown CHUNKER_MODE {self.mode!r}")
+        self.chunker = None
+        self._token_chunker = None
+        if self.mode == "docling" and DOCLING_CHUNK_AVAILABLE:
+            from docling.chunking import HybridChunker
             # The HybridChunker uses a tokenizer to ensure chunks fit into model constraints
             # It respects headings, sections, and tables out of the box.
             self.chunker = HybridChunker(
                 tokenizer=tokenizer,
                 merge_peers=True
             )
-        else:
-            self.chunker = None
 
-    def chunk(self, content: Union[str, Any]) -> List[str]:
+    @property
+    def token_chunker(self):
+        if self._token_chunker is None:
+            from app.services.chunking.token_chunker import TokenChunker, load_tokenizer
+            self._token_chunker = TokenChunker(load_tokenizer(self.tokenizer_name), max_tokens=self.max_tokens, overlap=self.overlap)
+        return self._token_chunker
+
+    def chunk(self, content: Union[str, Any]) -> List[Chunk]:
         """
-        Chunks the content. 
-        If content is a Docling ConversionResult, uses structural chunking.
-        If content is a string, uses a simple fallback or Docling text-based chunking.
+        Chunks the content into Chunk objects (text plus page and heading path where known).
+        In docling mode a Docling ConversionResult gets structural chunking; plain strings, and
+        everything in token mode, go through the token-exact chunker when a tokenizer is
+        installed, else through a character split.
         """
-        print("Chunking document with Docling structure-awareness...")
-        
-        if not DOCLING_CHUNK_AVAILABLE:
-            return self._fallback_chunk(str(content))
-
         try:
-            if isinstance(content, str):
-                # For raw strings, we use the chunker's text processing
-                # Better than simple character split as it preserves sentences
-                chunks = list(self.chunker.chunk_text(content))
-                return [c.text for c in chunks]
-            
-            # Handle Docling ConversionResult (Structure-aware)
-            # This respects tables, headers, and section hierarchies
-            chunk_iter = self.chunker.chunk(content.document)
-            
-            processed_chunks = []
-            for chunk in chunk_iter:
-                # We can extract extra metadata from chunk here if needed
-                # chunk.meta contains section info, parent headers etc.
-                chunk_text = self.chunker.serialize(chunk)
-                processed_chunks.append(chunk_text)
-                
-            return processed_chunks
-
+            if self.mode == "docling" and self.chunker is not None and not isinstance(content, str):
+                print("Chunking document with Docling structure-awareness...")
+                return self._docling_chunk(content)
+            if TOKENIZER_AVAILABLE:
+                print("Chunking document to the tokenizer's exact budget...")
+                return self.token_chunker.chunk(content)
         except Exception as e:
-            print(f"Docling chunking failed, falling back: {e}")
-            return self._fallback_chunk(str(content))
+            print(f"Chunking failed, falling back: {e}")
+        return self._fallback_chunk(content if isinstance(content, str) else content.document.export_to_markdown())
+
+    def _docling_chunk(self, content: Any) -> List[Chunk]:
+        # Handle Docling ConversionResult (Structure-aware)
+        # This respects tables, headers, and section hierarchies
+        processed_chunks = []
+        for chunk in self.chunker.chunk(content.document):
+            # chunk.meta carries the enclosing headings and the source items with their pages
+            meta = chunk.meta
+            pages = [prov.page_no for item in (getattr(meta, "doc_items", None) or []) for prov in (item.prov or [])]
+            processed_chunks.append(Chunk(
+                text=self.chunker.serialize(chunk),
+                page=min(pages) if pages else 0,
+                heading_path=heading_path(getattr(meta, "headings", None) or [])
+            ))
+        return processed_chunks
 
-    def _fallback_chunk(self, text: str) -> List[str]:
-        # Quick fallback if Docling fails or is not available
+    def _fallback_chunk(self, text: str) -> List[Chunk]:
+        # Quick fallback if no tokenizer is installed; chunks may exceed the model's token limit
         chunk_size = 1000
         overlap = 200
         chunks = []
         for i in range(0, len(text), chunk_size - overlap):
-            chunks.append(text[i:i + chunk_size])
+            chunks.append(Chunk(text=text[i:i + chunk_size]))
         return chunks
@@ -0,0 +1,205 @@
+"""
+token_chunker.py
+Token-exact chunking with the embedding model's fast tokenizer.
+
+Documents are split into blocks (one per section, so every chunk has a single heading path),
+all blocks are tokenized in one batch call with offset mappings, and sentences are packed
+into chunks of at most the model's token budget. Consecutive chunks of a block share
+`overlap` tokens. Chunk text is the exact source span of its tokens, so re-encoding a chunk
+(with the "passage: " prefix and special tokens) stays within the model limit instead of
+being silently truncated.
+"""
+import os
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import List, Any, Tuple, Optional
+
+from app.services.chunking.base import Chunk, heading_path
+
+# Sentence ends (terminal punctuation, optional closing quote/bracket, whitespace) and line breaks
+_SENTENCE_BREAK = re.compile(r"[.!?][\"')\]]*\s+|\n\s*")
+_MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+# Docling items that carry no chunkable body text
+_SKIP_LABELS = {"page_header", "page_footer", "picture"}
+
+PASSAGE_PREFIX = "passage: "
+
+@dataclass
+class _Block:
+    heading_path: str = ""
+    text: str = ""
+    # (char offset, page) where each page's text starts within the block
+    pages: List[Tuple[int, int]] = field(default_factory=list)
+
+    def append(self, text: str, page: int):
+        if self.text:
+            self.text += "\n"
+        if not self.pages or self.pages[-1][1] != page:
+            self.pages.append((len(self.text), page))
+        self.text += text
+
+    def page_at(self, offset: int) -> int:
+        if not self.pages:
+            return 0
+        i = bisect_right([start for start, _ in self.pages], offset) - 1
+        return self.pages[max(i, 0)][1]
+
+def load_tokenizer(model_name: str = None):
+    # transformers is imported here; it is only needed where chunking happens
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name or os.getenv("EMBEDDING_MODEL", "intfloat/e5-base-v2"), use_fast=True)
+
+class TokenChunker:
+    def __init__(self, tokenizer: Any = None, max_tokens: int = 512, overlap: int = 50, prefix: str = PASSAGE_PREFIX):
+        """
+        tokenizer: a Hugging Face fast tokenizer (offset mappings are required); loaded for
+        EMBEDDING_MODEL when omitted. max_tokens is the model's input limit; the special tokens
+        and the prefix EmbeddingService adds are subtracted from it to get the chunk budget.
+        """
+        self.tokenizer = tokenizer if tokenizer is not None else load_tokenizer()
+        self.max_tokens = min(max_tokens, getattr(self.tokenizer, "model_max_length", max_tokens) or max_tokens)
+        self.prefix = prefix
+        prefix_tokens = len(self.tokenizer(prefix, add_special_tokens=False)["input_ids"]) if prefix else 0
+        self.budget = self.max_tokens - self.tokenizer.num_special_tokens_to_add() - prefix_tokens
+        if not 0 <= overlap < self.budget:
+            raise ValueError(f"overlap must be in [0, {self.budget}), got {overlap}")
+        self.overlap = overlap
+
+    def chunk(self, content: Any) -> List[Chunk]:
+        """
+        Chunks a string (markdown headings and form-feed page breaks are honoured) or a Docling
+        ConversionResult (section headers and page provenance from the document items).
+        """
+        if isinstance(content, str):
+            blocks = self._text_blocks(content)
+        else:
+            blocks = self._docling_blocks(content.document)
+        return self.chunk_blocks(blocks)
+
+    def chunk_blocks(self, blocks: List[_Block]) -> List[Chunk]:
+        blocks = [b for b in blocks if b.text.strip()]
+        if not blocks:
+            return []
+        # One batched call through the Rust tokenizer for the whole document
+        encoded = self.tokenizer(
+            [b.text for b in blocks], add_special_tokens=False, return_offsets_mapping=True
+        )
+        chunks = []
+        for block, offsets in zip(blocks, encoded["offset_mapping"]):
+            chunks.extend(self._pack(block, offsets))
+        return chunks
+
+    def _pack(self, block: _Block, offsets: List[Tuple[int, int]]) -> List[Chunk]:
+        text = block.text
+        n = len(offsets)
+        if n == 0:
+            return []
+        # Token indices where a sentence starts, and where cutting cannot split a word
+        sentence_chars = [0] + [m.end() for m in _SENTENCE_BREAK.finditer(text)]
+        token_starts = [start for start, _ in offsets]
+        sentence_starts = sorted({bisect_left(token_starts, c) for c in sentence_chars} - {n})
+        word_starts = [i for i in range(n) if self._word_start(text, offsets, i)]
+
+        chunks = []
+        start, prev_end = 0, 0
+        while True:
+            limit = start + self.budget
+            if limit >= n:
+                end = n
+            else:
+                end = self._cut(sentence_starts, prev_end, limit) or self._cut(word_starts, prev_end, limit) or limit
+            span_start, span_end = offsets[start][0], offsets[end - 1][1]
+            chunks.append(Chunk(
+                text=text[span_start:span_end],
+                page=block.page_at(span_start),
+                heading_path=block.heading_path,
+                token_count=end - start,
+            ))
+            if end >= n:
+                return chunks
+            # Token-level overlap, moved back to the start of the word it lands in
+            next_start = end - self.overlap
+            snapped = self._cut(word_starts, start, next_start)
+            start, prev_end = (snapped or max(next_start, start + 1)), end
+
+    @staticmethod
+    def _cut(positions: List[int], after: int, limit: int) -> Optional[int]:
+        # Largest position p with after < p <= limit
+        i = bisect_right(positions, limit) - 1
+        if i >= 0 and positions[i] > after:
+            return positions[i]
+        return None
+
+    @staticmethod
+    def _word_start(text: str, offsets: List[Tuple[int, int]], i: int) -> bool:
+        if i == 0:
+            return True
+        start, prev_end = offsets[i][0], offsets[i - 1][1]
+        if start > prev_end or start == 0:
+            return True
+        # Adjacent tokens: a boundary unless both sides are word characters (a sub-word piece)
+        return not (text[start - 1].isalnum() and text[start].isalnum())
+
+    def _text_blocks(self, text: str) -> List[_Block]:
+        blocks = [_Block()]
+        titles: List[Tuple[int, str]] = []
+        has_pages = "\f" in text
+        for page_index, page_text in enumerate(text.split("\f")):
+            page = page_index + 1 if has_pages else 0
+            lines: List[str] = []
+            for line in page_text.split("\n"):
+                heading = _MARKDOWN_HEADING.match(line)
+                if heading is None:
+                    lines.append(line)
+                    continue
+                if lines:
+                    blocks[-1].append("\n".join(lines), page)
+                    lines = []
+                level = len(heading.group(1))
+                titles = [t for t in titles if t[0] < level] + [(level, heading.group(2))]
+                blocks.append(_Block(heading_path=heading_path(t for _, t in titles)))
+                # The heading stays in the chunk text: it is useful context for the embedding
+                blocks[-1].append(line.strip(), page)
+            if lines:
+                blocks[-1].append("\n".join(lines), page)
+        return blocks
+
+    def _docling_blocks(self, document: Any) -> List[_Block]:
+        blocks = [_Block()]
+        titles: List[Tuple[int, str]] = []
+        for item, _ in document.iterate_items():
+            label = getattr(item, "label", "")
+            label = getattr(label, "value", label)
+            if label in _SKIP_LABELS:
+                continue
+            prov = getattr(item, "prov", None)
+            page = prov[0].page_no if prov else 0
+            if label in ("title", "section_header"):
+                level = 0 if label == "title" else getattr(item, "level", 1)
+                titles = [t for t in titles if t[0] < level] + [(level, item.text.strip())]
+                blocks.append(_Block(heading_path=heading_path(t for _, t in titles)))
+                blocks[-1].append(item.text.strip(), page)
+                continue
+            if label == "table":
+                try:
+                    text = item.export_to_markdown(doc=document)
+                except TypeError:
+                    text = item.export_to_markdown()
+            else:
+                text = getattr(item, "text", "")
+            if text and text.strip():
+                blocks[-1].append(text.strip(), page)
+        return blocks
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Tokens each text takes as embedding input (prefix and special tokens included).
+        """
+        encoded = self.tokenizer([self.prefix + t for t in texts], add_special_tokens=True)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def oversized(self, chunks: List[Chunk]) -> List[int]:
+        # Indices of chunks the model would truncate; empty for this chunker's output
+        counts = self.count_tokens([c.text for c in chunks])
+        return [i for i, n in enumerate(counts) if n > self.max_tokens]
@@ -0,0 +1,325 @@
+"""
+session_store.py
+Server-side conversation state keyed by (tenant, session id).
+
+Keeps recent turns and a rolling summary of older turns in memory so the prompt sent to the
+LLM stays roughly constant in size. Turns and summaries are persisted to Postgres
+(`chat_history` / `chat_sessions`) by a background writer in batches, off the request path.
+While Postgres is unreachable at most SESSION_MAX_PENDING turns wait for the next flush; older
+ones are dropped and counted.
+"""
+import os
+import uuid
+import time
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+def normalize_session_id(raw: str) -> str:
+    """
+    chat_history.session_id is a UUID column; non-UUID client ids are mapped to a stable uuid5.
+    """
+    try:
+        return str(uuid.UUID(str(raw)))
+    except ValueError:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"session:{raw}"))
+
+def session_key(tenant_id: str, raw: str) -> str:
+    """
+    Storage id of a client session id within one tenant. The same client id (or a guessed one)
+    under another tenant is a different session.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"session:{tenant_id}:{normalize_session_id(raw)}"))
+
+@dataclass
+class Turn:
+    user: str
+    assistant: str
+    created_at: float = field(default_factory=time.time)
+
+@dataclass
+class Session:
+    session_id: str
+    tenant_id: str = ""
+    summary: str = ""
+    turns: List[Turn] = field(default_factory=list)
+    summarized_turns: int = 0
+    summarizing: bool = False
+
+    def history_messages(self) -> List[Dict[str, str]]:
+        """
+        Prompt history: the rolling summary (if any) followed by the unsummarized recent turns.
+        """
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn.user})
+            messages.append({"role": "assistant", "content": turn.assistant})
+        return messages
+
+def extractive_summary(summary: str, turns: List[Turn], max_chars: int) -> str:
+    """
+    Fallback summarizer: appends a one-line digest per turn and keeps the most recent max_chars.
+    """
+    lines = [summary] if summary else []
+    for turn in turns:
+        answer = turn.assistant.split(". ")[0][:200]
+        lines.append(f"- User asked: {turn.user[:200]} | Assistant: {answer}")
+    text = "\n".join(lines)
+    return text[-max_chars:]
+
+class PostgresPersister:
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.pool = None
+
+    async def _pool(self):
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+        return self.pool
+
+    async def write_turns(self, rows: List[tuple]):
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            await conn.executemany(
+                "INSERT INTO chat_history (session_id, user_message, assistant_message, tenant_id) VALUES ($1::uuid, $2, $3, $4)",
+                rows
+            )
+
+    async def write_summaries(self, rows: List[tuple]):
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            await conn.executemany(
+                """INSERT INTO chat_sessions (session_id, summary, summarized_turns, tenant_id, updated_at)
+                   VALUES ($1::uuid, $2, $3, $4, NOW())
+                   ON CONFLICT (session_id) DO UPDATE
+                   SET summary = EXCLUDED.summary, summarized_turns = EXCLUDED.summarized_turns, updated_at = NOW()""",
+                rows
+            )
+
+    async def load(self, session_id: str, tenant_id: str, recent_turns: int) -> Optional[Session]:
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            meta = await conn.fetchrow(
+                "SELECT summary, summarized_turns FROM chat_sessions WHERE session_id = $1::uuid AND tenant_id = $2",
+                session_id, tenant_id
+            )
+            summarized = (meta["summarized_turns"] or 0) if meta is not None else 0
+            # The first `summarized` turns are already in the summary; only later ones come back verbatim
+            rows = await conn.fetch(
+                """SELECT user_message, assistant_message, ts FROM (
+                       SELECT id, user_message, assistant_message, extract(epoch from created_at) AS ts,
+                              row_number() OVER (ORDER BY id) AS turn
+                       FROM chat_history WHERE session_id = $1::uuid AND tenant_id = $2
+                   ) history WHERE turn > $3 ORDER BY id DESC LIMIT $4""",
+                session_id, tenant_id, summarized, recent_turns
+            )
+        if meta is None and not rows:
+            return None
+        session = Session(session_id=session_id, tenant_id=tenant_id, summarized_turns=summarized)
+        if meta is not None:
+            session.summary = meta["summary"] or ""
+        session.turns = [Turn(r["user_message"], r["assistant_message"], float(r["ts"])) for r in reversed(rows)]
+        return session
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+class SessionStore:
+    def __init__(
+        self,
+        persister=None,
+        summarizer: Optional[Callable[[str, List[Turn]], Awaitable[str]]] = None,
+        keep_recent_turns: int = None,
+        summarize_batch: int = None,
+        max_summary_chars: int = None,
+        max_sessions: int = None,
+        flush_interval: float = None,
+        flush_batch: int = None,
+        max_pending: int = None
+    ):
+        self.persister = persister
+        # Optional async (summary, turns) -> new summary; extractive fallback otherwise
+        self.summarizer = summarizer
+        self.keep_recent_turns = keep_recent_turns or int(os.getenv("SESSION_RECENT_TURNS", "4"))
+        self.summarize_batch = summarize_batch or int(os.getenv("SESSION_SUMMARIZE_BATCH", "4"))
+        self.max_summary_chars = max_summary_chars or int(os.getenv("SESSION_MAX_SUMMARY_CHARS", "2000"))
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv("SESSION_FLUSH_INTERVAL", "1.0"))
+        self.flush_batch = flush_batch or int(os.getenv("SESSION_FLUSH_BATCH", "200"))
+        self.max_pending = max_pending or int(os.getenv("SESSION_MAX_PENDING", "10000"))
+        # Turns dropped because persistence stayed behind by more than max_pending
+        self.dropped_turns = 0
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._pending_turns: List[tuple] = []
+        self._pending_summaries: Dict[str, tuple] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._background: set = set()
+
+    def _ensure_writer(self):
+        if self.persister is None or self._writer is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def get(self, session_id: str, tenant_id: str) -> Session:
+        session_id = session_key(tenant_id, session_id)
+        session = self._sessions.get(session_id)
+        if session is None:
+            if self.persister is not None:
+                try:
+                    session = await self.persister.load(session_id, tenant_id, self.keep_recent_turns + self.summarize_batch)
+                except Exception as e:
+                    print(f"Failed to load session {session_id}: {e}")
+            session = session or Session(session_id=session_id, tenant_id=tenant_id)
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def append_turn(self, session: Session, user: str, assistant: str):
+        """
+        Records a turn in memory and queues it for persistence; never blocks on I/O.
+        """
+        session.turns.append(Turn(user, assistant))
+        if self.persister is not None:
+            self._ensure_writer()
+            self._pending_turns.append((session.session_id, user, assistant, session.tenant_id))
+            self._trim_pending()
+            if len(self._pending_turns) >= self.flush_batch:
+                self._wakeup.set()
+
+        # Fold the oldest turns into the summary once enough have accumulated beyond the recent window
+        if not session.summarizing and len(session.turns) >= self.keep_recent_turns + self.summarize_batch:
+            session.summarizing = True
+            task = asyncio.create_task(self._summarize(session))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def _summarize(self, session: Session):
+        try:
+            batch = session.turns[:self.summarize_batch]
+            summary = None
+            if self.summarizer is not None:
+                try:
+                    summary = await self.summarizer(session.summary, batch)
+                except Exception as e:
+                    print(f"Session summarizer failed, using extractive summary: {e}")
+            if not summary:
+                summary = extractive_summary(session.summary, batch, self.max_summary_chars)
+            session.summary = summary[-self.max_summary_chars:]
+            # Only drop the turns that were summarized; new turns may have arrived meanwhile
+            del session.turns[:len(batch)]
+            session.summarized_turns += len(batch)
+            if self.persister is not None:
+                self._pending_summaries[session.session_id] = (
+                    session.session_id, session.summary, session.summarized_turns, session.tenant_id
+                )
+                self._ensure_writer()
+        finally:
+            session.summarizing = False
+
+    def _trim_pending(self):
+        # Bounded while Postgres is down: the oldest turns go first
+        overflow = len(self._pending_turns) - self.max_pending
+        if overflow > 0:
+            del self._pending_turns[:overflow]
+            self.dropped_turns += overflow
+            print(f"Session persistence is behind; dropped {overflow} queued turns ({self.dropped_turns} so far)")
+        while len(self._pending_summaries) > self.max_pending:
+            self._pending_summaries.pop(next(iter(self._pending_summaries)))
+
+    async def _write_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        turns, self._pending_turns = self._pending_turns, []
+        summaries, self._pending_summaries = list(self._pending_summaries.values()), {}
+        # The writes are retried separately so rows that made it in are never inserted twice.
+        # Summaries wait for the turns they count: load() skips the first summarized_turns rows
+        try:
+            if turns:
+                await self.persister.write_turns(turns)
+                turns = []
+            if summaries:
+                await self.persister.write_summaries(summaries)
+                summaries = []
+        except Exception as e:
+            # Keep the unwritten rows for the next flush rather than losing them
+            print(f"Session persistence failed ({len(turns)} turns, {len(summaries)} summaries): {e}")
+            self._pending_turns = turns + self._pending_turns
+            for row in summaries:
+                self._pending_summaries.setdefault(row[0], row)
+            self._trim_pending()
+
+    async def close(self):
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        if self.persister is not None:
+            await self.flush()
+            if hasattr(self.persister, "close"):
+                await self.persister.close()
+
+def _postgres_dsn() -> str:
+    return os.getenv("DATABASE_URL") or "postgresql://{user}:{password}@{host}:{port}/{db}".format(
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+        host=os.getenv("POSTGRES_HOST", "postgres"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        db=os.getenv("POSTGRES_DB", "rag_app")
+    )
+
+async def llm_summarizer(summary: str, turns: List[Turn]) -> str:
+    """
+    Incremental summary through the shared LLM gateway, bounded by SESSION_SUMMARY_TIMEOUT.
+    """
+    from app.services.generation.llm_gateway import get_llm_gateway
+    transcript = "\n".join(f"User: {t.user}\nAssistant: {t.assistant}" for t in turns)
+    messages = [
+        {"role": "system", "content": "Update the running summary of a customer service conversation. Keep names, ids, plan details and open questions. Reply with the summary only, under 150 words."},
+        {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+    ]
+    result = await asyncio.wait_for(
+        get_llm_gateway().complete(messages, model=os.getenv("SESSION_SUMMARY_MODEL") or None),
+        timeout=float(os.getenv("SESSION_SUMMARY_TIMEOUT", "10"))
+    )
+    return result.content.strip()
+
+_store: Optional[SessionStore] = None
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        persister = None
+        if ASYNCPG_AVAILABLE and os.getenv("SESSION_PERSIST", "true").lower() == "true":
+            persister = PostgresPersister(_postgres_dsn())
+        summarizer = llm_summarizer if os.getenv("SESSION_SUMMARIZER", "llm").lower() == "llm" else None
+        _store = SessionStore(persister=persister, summarizer=summarizer)
+    return _store
+
+async def close_session_store():
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
@@ -0,0 +1,461 @@
+"""
+runner.py
+RAG evaluation over a golden question set. One run reports retrieval hit rate/MRR, answer
+metrics and per-stage latency percentiles.
+
+Questions run concurrently (EVAL_CONCURRENCY at a time). They go through the same retrieval,
+prompt template and LLM gateway as /chat/completions. Generation and LLM-judge calls are cached
+on disk (EVAL_CACHE_DIR), keyed by a hash of their full input. A re-run only pays for calls whose
+input changed: a retrieval change that alters a question's context regenerates that answer, and
+unchanged questions are served from the cache. Retrieval always runs live. Latency percentiles
+only count calls that actually ran, so cache hits are reported separately.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import tempfile
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from app.core.profiling import stage, start_trace
+from app.core.tenancy import DEFAULT_TENANT_ID, validate_tenant_id
+
+# <repo>/evaluation; in the backend container /evaluation (see docker-compose)
+EVAL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))), "evaluation")
+
+ANSWER_METRICS = ["answer_f1", "faithfulness", "answer_correctness"]
+# Metrics scored by the LLM judge; answer_f1 is token overlap with the ground truth
+JUDGE_METRICS = {"faithfulness", "answer_correctness"}
+LATENCY_STAGES = ["embed", "search", "generate", "judge", "total"]
+PERCENTILES = [50, 90, 95, 99]
+
+FAITHFULNESS_PROMPT = """You grade answers produced by a retrieval-augmented assistant.
+Rate how well every claim in the ANSWER is supported by the CONTEXT (1 = fully supported,
+0 = unsupported or contradicted). An answer that says the context lacks the information is
+fully supported when it does.
+
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+ANSWER: {answer}
+
+Reply with JSON only: {{"score": <number between 0 and 1>, "reason": "<one sentence>"}}"""
+
+CORRECTNESS_PROMPT = """You grade answers produced by a retrieval-augmented assistant.
+Rate how well the ANSWER agrees with the REFERENCE answer on the facts the question asks for
+(1 = same facts, 0 = wrong or missing). Ignore wording and extra detail that does not conflict.
+
+QUESTION: {question}
+
+REFERENCE: {ground_truth}
+
+ANSWER: {answer}
+
+Reply with JSON only: {{"score": <number between 0 and 1>, "reason": "<one sentence>"}}"""
+
+_WORD = re.compile(r"\w+")
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_DATASET_ID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+class DiskCache:
+    """
+    JSON values in one file per key (sha256 of the input), sharded by key prefix and written
+    atomically, so concurrent runs and interrupted writes never leave a partial entry.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(kind: str, payload: Dict[str, Any]) -> str:
+        data = json.dumps({"kind": kind, **payload}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._file(key), "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+def dataset_path(dataset_id: str) -> str:
+    if not _DATASET_ID.match(dataset_id) or dataset_id.startswith("."):
+        raise ValueError(f"Invalid dataset id {dataset_id!r}")
+    directory = os.getenv("EVAL_DATASET_DIR", os.path.join(EVAL_DIR, "datasets"))
+    return os.path.join(directory, dataset_id if dataset_id.endswith(".json") else f"{dataset_id}.json")
+
+def load_golden_set(path: str) -> List[Dict[str, Any]]:
+    """
+    Questions from a golden set: a JSON list of {"query", "ground_truth", "contexts"}, where
+    contexts names the source documents that answer the question (matched against document_id).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    if not isinstance(items, list) or not all(isinstance(i, dict) and i.get("query") for i in items):
+        raise ValueError(f"{path}: expected a list of objects with a 'query'")
+    return items
+
+def token_f1(answer: str, reference: str) -> float:
+    predicted = _WORD.findall(answer.lower())
+    expected = _WORD.findall(reference.lower())
+    if not predicted or not expected:
+        return float(predicted == expected)
+    remaining = {}
+    for w in expected:
+        remaining[w] = remaining.get(w, 0) + 1
+    common = 0
+    for w in predicted:
+        if remaining.get(w, 0) > 0:
+            remaining[w] -= 1
+            common += 1
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(predicted), common / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+def parse_judge_score(text: str) -> Optional[float]:
+    # JSON as asked; a bare number when the judge ignores the format
+    match = _JSON_OBJECT.search(text or "")
+    score = None
+    if match:
+        try:
+            score = float(json.loads(match.group()).get("score"))
+        except (ValueError, TypeError, AttributeError):
+            score = None
+    if score is None:
+        number = _NUMBER.search(text or "")
+        score = float(number.group()) if number else None
+    return None if score is None else min(max(score, 0.0), 1.0)
+
+def retrieval_metrics(hits: List[Any], expected: List[str]) -> Dict[str, float]:
+    expected = {os.path.basename(e) for e in expected}
+    rank = None
+    found = set()
+    for i, hit in enumerate(hits):
+        doc = hit.metadata.get("document_id") or os.path.basename(hit.metadata.get("source") or "")
+        if doc in expected:
+            found.add(doc)
+            if rank is None:
+                rank = i + 1
+    return {
+        "hit": 1.0 if rank else 0.0,
+        "reciprocal_rank": 1.0 / rank if rank else 0.0,
+        "recall": len(found) / len(expected),
+    }
+
+def percentiles(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    result = {"count": len(values)}
+    for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        result[f"p{p}"] = round(float(v), 1)
+    result["max"] = round(max(values), 1)
+    return result
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 4) if values else None
+
+class EvalRunner:
+    def __init__(
+        self,
+        embedder,
+        vector_store,
+        gateway,
+        cache: Optional[DiskCache] = None,
+        prompt_config=None,
+        model: Optional[str] = None,
+        judge_model: Optional[str] = None,
+        metrics: Optional[List[str]] = None,
+        top_k: int = 5,
+        concurrency: int = None,
+        tenant_id: str = DEFAULT_TENANT_ID
+    ):
+        """
+        model: generation model (gateway default when None); judge_model defaults to EVAL_JUDGE_MODEL,
+        then to the generation model. prompt_config supplies system_prompt and context_template
+        (the shared config snapshot when None). cache=None disables caching.
+        """
+        unknown = set(metrics or []) - set(ANSWER_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metrics {sorted(unknown)}; supported: {ANSWER_METRICS}")
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.gateway = gateway
+        self.cache = cache
+        self.prompt_config = prompt_config
+        self.model = model or os.getenv("EVAL_MODEL") or None
+        self.judge_model = judge_model or os.getenv("EVAL_JUDGE_MODEL") or self.model
+        self.metrics = list(metrics) if metrics else list(ANSWER_METRICS)
+        self.top_k = top_k
+        self.concurrency = concurrency or int(os.getenv("EVAL_CONCURRENCY", "4"))
+        self.tenant_id = validate_tenant_id(tenant_id)
+
+    async def run(self, questions: List[Dict[str, Any]], on_progress=None) -> Dict[str, Any]:
+        """
+        Evaluates every question (at most `concurrency` in flight) and returns the report.
+        on_progress(done) is called as questions finish.
+        """
+        from app.services.retrieval.multi_query import MultiQueryRetriever
+        retriever = MultiQueryRetriever(self.embedder, self.vector_store)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        done = 0
+
+        async def bounded(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+            nonlocal done
+            async with semaphore:
+                result = await self._question(retriever, index, item)
+            done += 1
+            if on_progress:
+                on_progress(done)
+            return result
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i, item) for i, item in enumerate(questions)))
+        return self.report(results, time.perf_counter() - start)
+
+    async def _question(self, retriever, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        # Each question runs in its own task, so its trace collects only its own stage timings
+        trace = start_trace("eval", question=index)
+        query = item["query"]
+        result: Dict[str, Any] = {"index": index, "query": query, "cached": {}, "scores": {}}
+        try:
+            hits = await retriever.retrieve([{"role": "user", "content": query}], limit=self.top_k, tenant_id=item.get("tenant_id", self.tenant_id))
+            result["retrieved"] = [hit.metadata.get("document_id") for hit in hits]
+            if item.get("contexts"):
+                result["retrieval"] = retrieval_metrics(hits, item["contexts"])
+            context = "\n\n".join(hit.text for hit in hits)
+
+            answer, result["cached"]["generate"] = await self._generate(query, context)
+            result["answer"] = answer
+            if "answer_f1" in self.metrics and item.get("ground_truth"):
+                result["scores"]["answer_f1"] = round(token_f1(answer, item["ground_truth"]), 4)
+            judged = [m for m in self.metrics if m in JUDGE_METRICS and (m != "answer_correctness" or item.get("ground_truth"))]
+            scores = await asyncio.gather(*(self._judge(m, item, context, answer) for m in judged))
+            for metric, (score, cached) in zip(judged, scores):
+                result["scores"][metric] = score
+                result["cached"][metric] = cached
+        except Exception as e:
+            print(f"Evaluation of question {index} failed: {e}")
+            result["error"] = str(e)
+        result["stages_ms"] = {name: round(ms, 1) for name, ms in trace.stages.items()}
+        result["stages_ms"]["total"] = round((time.perf_counter() - trace.started) * 1000, 1)
+        trace.done = True
+        return result
+
+    def _messages(self, question: str, context: str) -> List[Dict[str, str]]:
+        # Same prompt assembly as /chat/completions for a single-turn question
+        config = self.prompt_config
+        if config is None:
+            from app.core.registry import get_config
+            config = get_config()
+        system_prompt = config.context_template.format(system_prompt=config.system_prompt, context=context)
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": question}]
+
+    async def _complete(self, kind: str, messages: List[Dict[str, str]], model: Optional[str]) -> Tuple[str, bool]:
+        """
+        Completion text for the messages, from the cache when this exact input was seen before.
+        Only uncached calls are timed (stage `kind`).
+        """
+        key = None
+        if self.cache is not None:
+            key = DiskCache.key(kind, {"model": model, "messages": messages})
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached["content"], True
+        with stage(kind):
+            result = await self.gateway.complete(messages, model=model)
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, {"content": result.content, "model": result.model})
+        return result.content, False
+
+    async def _generate(self, question: str, context: str) -> Tuple[str, bool]:
+        return await self._complete("generate", self._messages(question, context), self.model)
+
+    async def _judge(self, metric: str, item: Dict[str, Any], context: str, answer: str) -> Tuple[Optional[float], bool]:
+        template = FAITHFULNESS_PROMPT if metric == "faithfulness" else CORRECTNESS_PROMPT
+        prompt = template.format(context=context, question=item["query"], ground_truth=item.get("ground_truth", ""), answer=answer)
+        text, cached = await self._complete("judge", [{"role": "user", "content": prompt}], self.judge_model)
+        score = parse_judge_score(text)
+        if score is None:
+            print(f"Unparsable {metric} verdict: {text[:200]!r}")
+        return score, cached
+
+    def report(self, results: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+        scored = [r for r in results if "retrieval" in r]
+        latency = {}
+        for name in LATENCY_STAGES:
+            latency[name] = percentiles([r["stages_ms"][name] for r in results if name in r["stages_ms"]])
+        return {
+            "questions": len(results),
+            "errors": sum("error" in r for r in results),
+            "seconds": round(seconds, 2),
+            "config": {
+                "tenant_id": self.tenant_id, "model": self.model, "judge_model": self.judge_model,
+                "metrics": self.metrics, "top_k": self.top_k, "concurrency": self.concurrency,
+            },
+            "retrieval": {
+                "evaluated": len(scored),
+                "hit_rate": _mean([r["retrieval"]["hit"] for r in scored]),
+                "mrr": _mean([r["retrieval"]["reciprocal_rank"] for r in scored]),
+                "recall": _mean([r["retrieval"]["recall"] for r in scored]),
+            },
+            "answers": {m: _mean([r["scores"].get(m) for r in results]) for m in self.metrics},
+            "latency_ms": latency,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "per_question": results,
+        }
+
+# Report values compared against a baseline: dotted path -> True when higher is better
+CHECKED = {
+    "retrieval.hit_rate": True,
+    "retrieval.mrr": True,
+    **{f"answers.{m}": True for m in ANSWER_METRICS},
+    **{f"latency_ms.{s}.p95": False for s in ("embed", "search", "total")},
+}
+
+def _lookup(report: Dict[str, Any], path: str):
+    value = report
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def compare_reports(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2) -> Dict[str, Any]:
+    """
+    Per-metric change against a baseline report and the metrics that regressed beyond tolerance.
+    Generation/judge latency is not gated: it depends on the provider and on cache hits.
+    """
+    changes, regressions = {}, []
+    for path, higher_is_better in CHECKED.items():
+        base, current = _lookup(baseline, path), _lookup(report, path)
+        if base in (None, 0) or current is None:
+            continue
+        change = (current - base) / base
+        changes[path] = {"baseline": base, "current": current, "change": round(change, 4)}
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(path)
+    return {"tolerance": tolerance, "changes": changes, "regressions": regressions}
+
+@dataclass
+class EvalJob:
+    run_id: str
+    dataset_id: str
+    status: str = "pending" # pending, running, completed, failed
+    total: int = 0
+    completed: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    baseline_run_id: Optional[str] = None
+    report: Optional[Dict[str, Any]] = None
+    comparison: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["progress"] = round(self.completed / self.total, 4) if self.total else None
+        return data
+
+_jobs: Dict[str, EvalJob] = {}
+_tasks: Dict[str, asyncio.Task] = {}
+
+def _results_dir() -> str:
+    return os.getenv("EVAL_RESULTS_DIR", os.path.join(EVAL_DIR, "results"))
+
+def _cache() -> DiskCache:
+    return DiskCache(os.getenv("EVAL_CACHE_DIR", os.path.join(EVAL_DIR, ".cache")))
+
+def _save(job: EvalJob):
+    os.makedirs(_results_dir(), exist_ok=True)
+    path = os.path.join(_results_dir(), f"{job.run_id}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(job.to_dict(), f, indent=2)
+    os.replace(path + ".tmp", path)
+
+async def _run_job(job: EvalJob, questions: List[Dict[str, Any]], options: Dict[str, Any]):
+    from app.services.generation.embeddings import get_embedding_service
+    from app.services.generation.llm_gateway import get_llm_gateway
+    from app.services.retrieval.vector_store.base import get_vector_store
+    job.status = "running"
+    try:
+        # Model load on first use; kept off the event loop
+        embedder = await asyncio.to_thread(get_embedding_service)
+        runner = EvalRunner(embedder, get_vector_store(), get_llm_gateway(), cache=_cache(), **options)
+
+        def progress(done: int):
+            job.completed = done
+
+        job.report = await runner.run(questions, on_progress=progress)
+        if job.baseline_run_id:
+            baseline = get_eval_job(job.baseline_run_id)
+            if baseline is not None and baseline.report:
+                job.comparison = compare_reports(job.report, baseline.report)
+        job.status = "completed"
+    except Exception as e:
+        print(f"Evaluation run {job.run_id} failed: {e}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        _save(job)
+        _tasks.pop(job.run_id, None)
+
+def start_eval(dataset_id: str, baseline_run_id: Optional[str] = None, **options) -> EvalJob:
+    """
+    Starts an evaluation run in the background of the running event loop. The dataset and the
+    options are checked first, so bad input fails the request instead of the job.
+    Options: metrics, model, judge_model, top_k, concurrency, tenant_id (see EvalRunner).
+    """
+    questions = load_golden_set(dataset_path(dataset_id))
+    unknown = set(options.get("metrics") or []) - set(ANSWER_METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics {sorted(unknown)}; supported: {ANSWER_METRICS}")
+    validate_tenant_id(options.get("tenant_id", DEFAULT_TENANT_ID))
+    job = EvalJob(run_id=f"eval-{uuid.uuid4().hex[:12]}", dataset_id=dataset_id, total=len(questions), baseline_run_id=baseline_run_id)
+    _jobs[job.run_id] = job
+    _tasks[job.run_id] = asyncio.create_task(_run_job(job, questions, options))
+    return job
+
+def get_eval_job(run_id: str) -> Optional[EvalJob]:
+    """
+    The run from this process, or its saved results from an earlier one (EVAL_RESULTS_DIR).
+    """
+    job = _jobs.get(run_id)
+    if job is not None or not _DATASET_ID.match(run_id):
+        return job
+    try:
+        with open(os.path.join(_results_dir(), f"{run_id}.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    data.pop("progress", None)
+    return EvalJob(**data)
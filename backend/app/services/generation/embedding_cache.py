@@ -0,0 +1,203 @@
+"""
+embedding_cache.py
+Persistent content-hash cache for passage embeddings.
+
+Vectors live in a memory-mapped float32 matrix (`vectors.f32`, one row per slot); the hash index
+is a parallel memory-mapped array of 16-byte keys (`keys.u8`) plus last-use ticks (`ticks.i8`).
+The key is a hash of (model id, exact text fed to the model), so a model change never returns
+stale vectors. When full, the least recently used slots are evicted in one batch.
+
+One process writes at a time (flock on `cache.lock`); others open the cache read-only. Readers
+check the key stored in a slot on every lookup, so a slot the writer evicted and reused is a miss
+rather than another text's vector, and they reload their key -> slot map when the writer's
+generation counter (`generation.i8`) moves on.
+"""
+import os
+import json
+import time
+import fcntl
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+KEY_BYTES = 16
+
+def cache_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()[:KEY_BYTES]
+
+class EmbeddingCache:
+    def __init__(
+        self, path: str, dim: int, capacity: int = None, evict_fraction: float = 0.1,
+        writer: bool = True, refresh_seconds: float = 5.0
+    ):
+        self.path = path
+        self.dim = dim
+        self.capacity = capacity or int(os.getenv("EMBEDDING_CACHE_CAPACITY", "1000000"))
+        self.evict_fraction = evict_fraction
+        self.refresh_seconds = refresh_seconds
+        os.makedirs(path, exist_ok=True)
+
+        # Request handlers share one instance across threads; slots must not be claimed twice
+        self._mutex = threading.Lock()
+        self._lock_file = open(os.path.join(path, "cache.lock"), "a+")
+        self.writable = False
+        if writer:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.writable = True
+            except OSError:
+                print(f"Embedding cache {path} is locked by another process; opening read-only")
+
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta.get("dim") != dim:
+                raise ValueError(f"Embedding cache {path} holds dim {meta.get('dim')} vectors, expected {dim}")
+            # The file size fixes the capacity; a different setting applies to a fresh cache only
+            self.capacity = meta["capacity"]
+        elif self.writable:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim, "capacity": self.capacity}, f)
+        else:
+            raise FileNotFoundError(f"Embedding cache {path} is not initialized")
+
+        mode = "r+" if self.writable else "r"
+        self.vectors = self._open("vectors.f32", np.float32, (self.capacity, dim), mode)
+        self.keys = self._open("keys.u8", np.uint8, (self.capacity, KEY_BYTES), mode)
+        # 0 marks a free slot; otherwise a monotonically increasing use counter
+        self.ticks = self._open("ticks.i8", np.int64, (self.capacity,), mode)
+        # Bumped by the writer after every change to the key -> slot mapping
+        self.generation = self._open("generation.i8", np.int64, (1,), mode)
+
+        self._load_index()
+        self._tick = int(self.ticks.max()) if len(self._index) else 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _open(self, name: str, dtype, shape: Tuple[int, ...], mode: str) -> np.memmap:
+        file_path = os.path.join(self.path, name)
+        if not os.path.exists(file_path):
+            # Sparse file: disk is only used for slots that get written
+            with open(file_path, "wb") as f:
+                f.truncate(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        return np.memmap(file_path, dtype=dtype, mode=mode, shape=shape)
+
+    def _load_index(self):
+        used = np.flatnonzero(self.ticks)
+        self._index: Dict[bytes, int] = {self.keys[slot].tobytes(): int(slot) for slot in used}
+        # Popped from the end, so free slots are reused lowest first
+        self._free: List[int] = np.flatnonzero(self.ticks == 0)[::-1].tolist()
+        self._generation = int(self.generation[0])
+        self._loaded_at = time.monotonic()
+
+    def _refresh(self):
+        # Readers only: pick up the writer's inserts, at most once per refresh_seconds
+        if self._generation != int(self.generation[0]) and time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get_many(self, keys: List[bytes]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Returns (vectors, missing positions). Rows at missing positions are zero.
+        """
+        out = np.zeros((len(keys), self.dim), dtype=np.float32)
+        with self._mutex:
+            if not self.writable:
+                self._refresh()
+            slots = [self._index.get(k) for k in keys]
+            found = [i for i, s in enumerate(slots) if s is not None]
+            if found:
+                found_slots = np.array([slots[i] for i in found])
+                rows = self.vectors[found_slots]
+                # The slot may have been evicted and reused by the writer since the index was read
+                current = np.all(self.keys[found_slots] == np.frombuffer(b"".join(keys[i] for i in found), dtype=np.uint8).reshape(-1, KEY_BYTES), axis=1)
+                found = [i for i, ok in zip(found, current) if ok]
+                out[found] = rows[current]
+                if self.writable and found:
+                    self._tick += 1
+                    self.ticks[found_slots[current]] = self._tick
+            found_set = set(found)
+            missing = [i for i in range(len(keys)) if i not in found_set]
+            self.hits += len(found)
+            self.misses += len(missing)
+        return out, missing
+
+    def _evict(self):
+        count = max(1, int(self.capacity * self.evict_fraction))
+        victims = np.argpartition(self.ticks, count - 1)[:count]
+        for slot in victims:
+            self._index.pop(self.keys[slot].tobytes(), None)
+            self._free.append(int(slot))
+        self.ticks[victims] = 0
+        # Cleared so readers holding an old index see a key mismatch, not a stale vector
+        self.keys[victims] = 0
+        self.evictions += len(victims)
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        if not self.writable:
+            return
+        with self._mutex:
+            self._tick += 1
+            for key, vector in zip(keys, vectors):
+                slot = self._index.get(key)
+                if slot is None:
+                    if not self._free:
+                        self._evict()
+                    slot = self._free.pop()
+                    # Vector before key: a reader that matches the key always gets the full vector
+                    self.vectors[slot] = vector
+                    self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                    self._index[key] = slot
+                else:
+                    self.vectors[slot] = vector
+                self.ticks[slot] = self._tick
+            self.generation[0] += 1
+
+    def flush(self):
+        if self.writable:
+            with self._mutex:
+                self.vectors.flush()
+                self.keys.flush()
+                self.ticks.flush()
+                self.generation.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "writable": self.writable,
+        }
+
+    def close(self):
+        self.flush()
+        self._lock_file.close()
+
+def embedding_report(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cache effect between two EmbeddingService.stats() snapshots, e.g. for one ingest job.
+    """
+    hits = after["cache_hits"] - before["cache_hits"]
+    encoded = after["encoded"] - before["encoded"]
+    seconds = after["encode_seconds"] - before["encode_seconds"]
+    lookups = hits + encoded
+    per_text = seconds / encoded if encoded else None
+    return {
+        "texts": lookups,
+        "cache_hits": hits,
+        "encoded": encoded,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "encode_seconds": round(seconds, 3),
+        # Estimated from this job's own encode rate
+        "seconds_saved": round(hits * per_text, 3) if per_text else None,
+    }
@@ -1,39 +1,179 @@
 import os
-from sentence_transformers import SentenceTransformer
+import time
+import threading
+import numpy as np
+from typing import Optional
+from app.services.generation.embedding_cache import EmbeddingCache, cache_key
+
+_caches = {}
+
+def get_embedding_cache(dim: int, writer: bool = True) -> Optional[EmbeddingCache]:
+    """
+    One cache per process and directory (EMBEDDING_CACHE_DIR); None when caching is disabled.
+    Only a writer takes the cross-process write lock; the first open in a process decides.
+    Also None while a read-only open finds no cache yet (the writer has not created it); the
+    next call tries again.
+    """
+    path = os.getenv("EMBEDDING_CACHE_DIR")
+    if not path:
+        return None
+    if path not in _caches:
+        try:
+            _caches[path] = EmbeddingCache(path, dim, writer=writer)
+        except FileNotFoundError as e:
+            print(f"{e}; embedding without the cache for now")
+            return None
+    return _caches[path]
 
 class EmbeddingService:
-    def __init__(self):
+    def __init__(self, cache_writer: bool = True):
         # Initialize local embedding model: intfloat/e5-base-v2
         # Dimensions: 768
-        self.model = SentenceTransformer('intfloat/e5-base-v2')
+        # The model id is stored per row (embedding_model) so backfills can find stale vectors
+        self.model_name = os.getenv("EMBEDDING_MODEL", "intfloat/e5-base-v2")
+        # Imported here: torch + transformers take seconds to import and only model users need them
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(self.model_name)
         self.dimension = 768
+        # Always L2-normalized: the vector stores turn squared L2 distance into cosine similarity
+        # (distance_to_score), which only holds for unit vectors
+        self.normalize = True
+        # Passage vectors are cached by content hash; unchanged chunks are never re-encoded.
+        # Ingestion writes the cache; the API process (cache_writer=False) only reads it.
+        # Opened on the first passage batch, so query-only processes never touch it
+        self.cache_writer = cache_writer
+        self.cache: Optional[EmbeddingCache] = None
+        self._cache_namespace = f"{self.model_name}|normalize={self.normalize}"
+        self.cache_hits = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "cache_hits": self.cache_hits,
+            "encoded": self.encoded,
+            "encode_seconds": self.encode_seconds,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
 
-    def get_embedding(self, text: str, is_query: bool = True) -> list[float]:
+    def flush_cache(self):
+        if self.cache is not None:
+            self.cache.flush()
+
+    def _cached(self, processed_texts: list[str], encode) -> np.ndarray:
+        """
+        Looks the texts up in the cache and encodes only the misses with `encode`.
         """
-        Generates embedding for a single text.
+        if self.cache is None:
+            self.cache = get_embedding_cache(self.dimension, writer=self.cache_writer)
+        if self.cache is None:
+            missing = list(range(len(processed_texts)))
+            embeddings = None
+        else:
+            keys = [cache_key(self._cache_namespace, t) for t in processed_texts]
+            embeddings, missing = self.cache.get_many(keys)
+            self.cache_hits += len(processed_texts) - len(missing)
+        if not missing:
+            return embeddings
+
+        start = time.perf_counter()
+        fresh = encode([processed_texts[i] for i in missing])
+        self.encode_seconds += time.perf_counter() - start
+        self.encoded += len(missing)
+        if embeddings is None:
+            return fresh
+        embeddings[missing] = fresh
+        self.cache.put_many([keys[i] for i in missing], fresh)
+        return embeddings
+
+    def _encode(self, texts, batch_size: int = 32) -> np.ndarray:
+        # Keep the model output as a float32 ndarray; never round-trip through Python lists.
+        embeddings = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize,
+            show_progress_bar=False
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def get_embedding(self, text: str, is_query: bool = True) -> np.ndarray:
+        """
+        Generates embedding for a single text as a float32 vector of shape (dimension,).
         E5 models require 'query: ' prefix for queries and 'passage: ' for documents.
+        Raises on failure instead of returning a placeholder vector.
         """
         prefix = "query: " if is_query else "passage: "
         text = prefix + text.replace("\n", " ")
-        
+
         try:
-            embedding = self.model.encode(text).tolist()
-            return embedding
+            return self._encode(text)
         except Exception as e:
             print(f"Error generating embedding: {e}")
-            return [0.0] * self.dimension
+            raise
 
-    def get_embeddings(self, texts: list[str], is_query: bool = False) -> list[list[float]]:
+    def get_embeddings(self, texts: list[str], is_query: bool = False) -> np.ndarray:
         """
-        Generates embeddings for a list of texts (batch).
+        Generates embeddings for a list of texts (batch) as a float32 matrix of shape (len(texts), dimension).
         Default is_query=False because this is mostly used during ingestion (passages).
+        Raises on failure so zero vectors never reach the vector store.
         """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
         prefix = "query: " if is_query else "passage: "
         processed_texts = [prefix + t.replace("\n", " ") for t in texts]
-        
+
         try:
-            embeddings = self.model.encode(processed_texts).tolist()
-            return embeddings
+            # One-off queries would only push passages out of the cache
+            if is_query:
+                return self._encode(processed_texts)
+            return self._cached(processed_texts, self._encode)
         except Exception as e:
             print(f"Error generating embeddings batch: {e}")
-            return [[0.0] * self.dimension for _ in texts]
+            raise
+
+    def start_pool(self, processes: int):
+        """
+        Starts worker processes that each hold a copy of the model, for large offline batches.
+        """
+        return self.model.start_multi_process_pool(target_devices=["cpu"] * processes)
+
+    @staticmethod
+    def stop_pool(pool):
+        from sentence_transformers import SentenceTransformer
+        SentenceTransformer.stop_multi_process_pool(pool)
+
+    def get_embeddings_pooled(self, texts: list[str], pool, batch_size: int = 64) -> np.ndarray:
+        """
+        Passage embeddings computed across the worker pool; same output as get_embeddings.
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        processed_texts = ["passage: " + t.replace("\n", " ") for t in texts]
+
+        def encode(batch):
+            embeddings = self.model.encode_multi_process(
+                batch,
+                pool,
+                batch_size=batch_size,
+                normalize_embeddings=self.normalize
+            )
+            return np.ascontiguousarray(embeddings, dtype=np.float32)
+        return self._cached(processed_texts, encode)
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+def get_embedding_service() -> EmbeddingService:
+    """
+    Process-wide instance for request handlers, so the model is loaded once rather than per request.
+    It opens the passage cache read-only: the write lock belongs to ingestion.
+    """
+    global _service
+    if _service is None:
+        # The startup preload and a first request may race; only one loads the model
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService(cache_writer=False)
+    return _service
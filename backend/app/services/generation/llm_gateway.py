@@ -0,0 +1,371 @@
+"""
+llm_gateway.py
+Shared LLM gateway: pooled keep-alive async clients per provider, connect/first-token/total
+timeouts, jittered retries on 429/5xx, optional hedging to a secondary provider when the
+primary's first token is late, and per-provider latency metrics.
+"""
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, AsyncIterator
+
+import httpx
+from openai import AsyncOpenAI, APIStatusError, APIConnectionError, APITimeoutError
+from app.core.registry import get_config
+
+DEFAULT_PROVIDERS = {
+    "groq": {
+        "base_url": "https://api.groq.com/openai/v1",
+        "api_key_env": "GROQ_API_KEY",
+        "default_model": "llama-3.3-70b-versatile",
+    },
+    "openai": {
+        "base_url": "https://api.openai.com/v1",
+        "api_key_env": "OPENAI_API_KEY",
+        "default_model": "gpt-4o-mini",
+    },
+}
+
+class LLMGatewayError(Exception):
+    pass
+
+class FirstTokenTimeout(LLMGatewayError):
+    pass
+
+@dataclass
+class ProviderConfig:
+    name: str
+    base_url: Optional[str]
+    api_key: Optional[str]
+    default_model: str
+    models: List[str] = field(default_factory=list)
+
+@dataclass
+class LLMResult:
+    content: str
+    model: str
+    provider: str
+    first_token_ms: float
+    total_ms: float
+    usage: Optional[Dict[str, int]] = None
+
+class LatencyStats:
+    """
+    Rolling latency window and counters for one provider.
+    """
+    def __init__(self, window: int = 500):
+        self.first_token_ms = deque(maxlen=window)
+        self.total_ms = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @staticmethod
+    def _percentile(values, pct: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return round(ordered[index], 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "first_token_ms": {"p50": self._percentile(self.first_token_ms, 50), "p95": self._percentile(self.first_token_ms, 95)},
+            "total_ms": {"p50": self._percentile(self.total_ms, 50), "p95": self._percentile(self.total_ms, 95)},
+        }
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (APIConnectionError, APITimeoutError, FirstTokenTimeout))
+
+class _Attempt:
+    """
+    An opened provider stream whose first content delta has already arrived.
+    """
+    def __init__(self, provider: str, model: str, stream, iterator, first_delta: str, started: float, first_token_at: float):
+        self.provider = provider
+        self.model = model
+        self.stream = stream
+        self.iterator = iterator
+        self.first_delta = first_delta
+        self.started = started
+        self.first_token_at = first_token_at
+        self.usage = None
+
+    async def close(self):
+        try:
+            await self.stream.close()
+        except Exception:
+            pass
+
+class LLMGateway:
+    def __init__(
+        self,
+        providers: Dict[str, ProviderConfig],
+        primary: str,
+        secondary: Optional[str] = None,
+        connect_timeout: float = None,
+        first_token_timeout: float = None,
+        total_timeout: float = None,
+        max_retries: int = None,
+        hedge_after: Optional[float] = None,
+        max_connections: int = None
+    ):
+        self.providers = providers
+        self.primary = primary
+        self.secondary = secondary if secondary in providers and secondary != primary else None
+        self.connect_timeout = connect_timeout if connect_timeout is not None else float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+        self.first_token_timeout = first_token_timeout if first_token_timeout is not None else float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "10"))
+        self.total_timeout = total_timeout if total_timeout is not None else float(os.getenv("LLM_TOTAL_TIMEOUT", "60"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
+        # Hedging is off unless a delay is configured (seconds to wait for the primary's first token)
+        if hedge_after is None and os.getenv("LLM_HEDGE_AFTER"):
+            hedge_after = float(os.getenv("LLM_HEDGE_AFTER"))
+        self.hedge_after = hedge_after
+        self.max_connections = max_connections or int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+        self.stats: Dict[str, LatencyStats] = {name: LatencyStats() for name in providers}
+        self._clients: Dict[str, AsyncOpenAI] = {}
+
+    @classmethod
+    def from_config(cls, config=None, **kwargs) -> "LLMGateway":
+        """
+        Builds providers from the `providers` section of models.yaml in the config snapshot (falling
+        back to built-in Groq/OpenAI defaults). Providers without an API key in the environment are skipped.
+        """
+        config = config or get_config()
+        provider_specs = {
+            name: {"base_url": p.base_url, "api_key_env": p.api_key_env, "default_model": p.default_model}
+            for name, p in config.providers.items()
+        } or DEFAULT_PROVIDERS
+        providers = {}
+        for name, spec in provider_specs.items():
+            api_key = os.getenv(spec["api_key_env"])
+            if not api_key:
+                continue
+            providers[name] = ProviderConfig(
+                name=name,
+                base_url=spec.get("base_url"),
+                api_key=api_key,
+                default_model=spec["default_model"],
+                models=[m.id for m in config.models if m.provider == name]
+            )
+
+        primary = os.getenv("LLM_PROVIDER", "groq").lower()
+        if primary not in providers and providers:
+            primary = next(iter(providers))
+        secondary = os.getenv("LLM_SECONDARY_PROVIDER")
+        if secondary is None:
+            secondary = next((name for name in providers if name != primary), None)
+        return cls(providers, primary, secondary, **kwargs)
+
+    def _client(self, provider: str) -> AsyncOpenAI:
+        # One pooled keep-alive client per provider, created lazily and reused across requests
+        client = self._clients.get(provider)
+        if client is None:
+            config = self.providers[provider]
+            http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.total_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections, keepalive_expiry=60)
+            )
+            client = AsyncOpenAI(api_key=config.api_key, base_url=config.base_url, http_client=http_client, max_retries=0)
+            self._clients[provider] = client
+        return client
+
+    def provider_for_model(self, model: Optional[str]) -> str:
+        for name, config in self.providers.items():
+            if model and (model in config.models or model == config.default_model):
+                return name
+        return self.primary
+
+    async def _open(self, provider: str, model: str, messages: List[Dict[str, str]]) -> _Attempt:
+        started = time.perf_counter()
+        stream = await self._client(provider).chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        iterator = stream.__aiter__()
+        delta = ""
+        try:
+            while not delta:
+                chunk = await asyncio.wait_for(iterator.__anext__(), timeout=self.first_token_timeout)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+        except StopAsyncIteration:
+            delta = ""
+        except asyncio.TimeoutError:
+            await stream.close()
+            raise FirstTokenTimeout(f"{provider} produced no token within {self.first_token_timeout}s")
+        except BaseException:
+            # Includes cancellation of a losing hedge: release the connection back to the pool
+            await stream.close()
+            raise
+        return _Attempt(provider, model, stream, iterator, delta, started, time.perf_counter())
+
+    async def _open_with_retries(self, provider: str, model: str, messages: List[Dict[str, str]]) -> _Attempt:
+        stats = self.stats[provider]
+        for retry in range(self.max_retries + 1):
+            stats.requests += 1
+            try:
+                return await self._open(provider, model, messages)
+            except Exception as e:
+                stats.errors += 1
+                if retry >= self.max_retries or not _is_retryable(e):
+                    raise
+                stats.retries += 1
+                # Full-jitter exponential backoff, honouring Retry-After when the provider sends one
+                delay = random.uniform(0, min(4.0, 0.25 * (2 ** retry)))
+                if isinstance(e, APIStatusError):
+                    retry_after = e.response.headers.get("retry-after")
+                    if retry_after:
+                        try:
+                            delay = max(delay, min(float(retry_after), 10.0))
+                        except ValueError:
+                            pass
+                print(f"LLM call to {provider} failed ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _start(self, model: Optional[str], messages: List[Dict[str, str]]) -> _Attempt:
+        if not self.providers:
+            raise LLMGatewayError("No LLM provider configured. Please set GROQ_API_KEY or OPENAI_API_KEY.")
+
+        primary = self.provider_for_model(model)
+        primary_model = model or self.providers[primary].default_model
+        secondary = self.secondary if self.secondary != primary else (self.primary if self.primary != primary else None)
+
+        tasks = {asyncio.create_task(self._open_with_retries(primary, primary_model, messages)): primary}
+        hedged = False
+        winner = None
+        last_error = None
+        try:
+            if secondary and self.hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+                if not done:
+                    # Primary's first token is late: race a hedged request on the secondary provider
+                    hedged = True
+                    self.stats[primary].hedges += 1
+                    tasks[asyncio.create_task(self._open_with_retries(secondary, self.providers[secondary].default_model, messages))] = secondary
+
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task.result()
+                        break
+                    last_error = task.exception()
+                    print(f"LLM provider {tasks[task]} failed: {last_error}")
+        finally:
+            # Also runs when the caller is cancelled (client gone mid-hedge): every attempt other than
+            # the winner is cancelled or, if it already opened a stream, closed, so no connection leaks
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(outcome, _Attempt) and outcome is not winner:
+                    await outcome.close()
+
+        if winner is not None:
+            if hedged and winner.provider == secondary:
+                self.stats[secondary].hedge_wins += 1
+            return winner
+        # Neither hedge succeeded (or no hedge was sent): fail over once to the secondary provider,
+        # only for errors another provider could fix (a 4xx on this request would fail there too)
+        if secondary and not hedged and _is_retryable(last_error):
+            return await self._open_with_retries(secondary, self.providers[secondary].default_model, messages)
+        raise last_error
+
+    async def stream_chat(self, messages: List[Dict[str, str]], model: Optional[str] = None, result: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Yields content deltas. If `result` is given it is filled with provider/model/timings once the stream ends.
+        """
+        deadline = time.perf_counter() + self.total_timeout
+        attempt = await self._start(model, messages)
+        stats = self.stats[attempt.provider]
+        stats.first_token_ms.append((attempt.first_token_at - attempt.started) * 1000)
+        try:
+            if attempt.first_delta:
+                yield attempt.first_delta
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise LLMGatewayError(f"{attempt.provider} exceeded total timeout of {self.total_timeout}s")
+                try:
+                    chunk = await asyncio.wait_for(attempt.iterator.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise LLMGatewayError(f"{attempt.provider} exceeded total timeout of {self.total_timeout}s")
+                if getattr(chunk, "usage", None):
+                    attempt.usage = chunk.usage.model_dump() if hasattr(chunk.usage, "model_dump") else dict(chunk.usage)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            await attempt.close()
+            total_ms = (time.perf_counter() - attempt.started) * 1000
+            stats.total_ms.append(total_ms)
+            if result is not None:
+                result.update({
+                    "provider": attempt.provider,
+                    "model": attempt.model,
+                    "first_token_ms": (attempt.first_token_at - attempt.started) * 1000,
+                    "total_ms": total_ms,
+                    "usage": attempt.usage,
+                })
+
+    async def complete(self, messages: List[Dict[str, str]], model: Optional[str] = None) -> LLMResult:
+        info: Dict[str, Any] = {}
+        parts = [delta async for delta in self.stream_chat(messages, model=model, result=info)]
+        return LLMResult(
+            content="".join(parts),
+            model=info["model"],
+            provider=info["provider"],
+            first_token_ms=info["first_token_ms"],
+            total_ms=info["total_ms"],
+            usage=info["usage"]
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "primary": self.primary,
+            "secondary": self.secondary,
+            "hedge_after_s": self.hedge_after,
+            "providers": {name: stats.snapshot() for name, stats in self.stats.items()},
+        }
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.close()
+        self._clients = {}
+
+_gateway: Optional[LLMGateway] = None
+
+def get_llm_gateway() -> LLMGateway:
+    """
+    Process-wide gateway so connections are pooled across requests.
+    """
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway.from_config()
+    return _gateway
+
+async def close_llm_gateway():
+    global _gateway
+    if _gateway is not None:
+        await _gateway.aclose()
+        _gateway = None
@@ -0,0 +1,259 @@
+"""
+model_router.py
+Latency- and cost-aware model routing for `model: auto` requests.
+
+Picks a model tier from cheap signals (query length, retrieval score margin, context size and
+the tenant's plan), then the cheapest healthy model in that tier. Rolling latency and error
+rates per model are tracked so degraded models are routed around. Samples expire after
+ROUTER_SAMPLE_TTL seconds, so a degraded model (which gets no new traffic) returns to rotation
+and is judged again on fresh samples.
+"""
+import os
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+
+from app.core.registry import get_config
+
+AUTO_MODEL_ID = "auto"
+
+# Complexity score at which a plan escalates from the small to the large tier
+PLAN_ESCALATION = {
+    "basic": None,      # never escalates
+    "standard": 2,
+    "enterprise": 1,
+}
+DEFAULT_PLAN = "standard"
+
+@dataclass
+class ModelProfile:
+    id: str
+    provider: str
+    tier: str = "large"
+    cost_per_1k_tokens: float = 0.0
+    latency_p50_ms: float = 1000.0
+
+@dataclass
+class RoutingDecision:
+    model: str
+    tier: str
+    reason: str
+    signals: Dict[str, Any] = field(default_factory=dict)
+
+class _ModelHealth:
+    def __init__(self, window: int, ttl: float = None, clock=time.monotonic):
+        self.ttl = ttl if ttl is not None else float(os.getenv("ROUTER_SAMPLE_TTL", "300"))
+        self.clock = clock
+        # (recorded at, value) pairs, oldest first
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+
+    def _fresh(self, samples: deque) -> deque:
+        cutoff = self.clock() - self.ttl
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        return samples
+
+    @property
+    def latencies_ms(self) -> List[float]:
+        return [v for _, v in self._fresh(self._latencies)]
+
+    @property
+    def outcomes(self) -> List[int]:
+        return [v for _, v in self._fresh(self._outcomes)]
+
+    def add(self, latency_ms: Optional[float], ok: bool):
+        now = self.clock()
+        if ok and latency_ms is not None:
+            self._latencies.append((now, latency_ms))
+        self._outcomes.append((now, 1 if ok else 0))
+
+    def p95(self) -> Optional[float]:
+        latencies = self.latencies_ms
+        if len(latencies) < 5:
+            return None
+        ordered = sorted(latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def error_rate(self) -> float:
+        outcomes = self.outcomes
+        if not outcomes:
+            return 0.0
+        return 1.0 - sum(outcomes) / len(outcomes)
+
+def estimate_tokens(chars: int) -> int:
+    # ~4 characters per token for English prose
+    return max(1, chars // 4)
+
+def complexity_signals(query: str, scores: List[float], context_chars: int) -> Dict[str, Any]:
+    """
+    Cheap per-request signals and the resulting complexity score (0 = simple lookup).
+    """
+    words = len(query.split())
+    # Fused (RRF) multi-query hits are not in score order
+    ranked = sorted(scores, reverse=True)
+    top = ranked[0] if ranked else 0.0
+    margin = ranked[0] - ranked[1] if len(ranked) > 1 else top
+    complexity = 0
+    if words > int(os.getenv("ROUTER_SIMPLE_MAX_WORDS", "20")):
+        complexity += 1
+    if context_chars > int(os.getenv("ROUTER_SIMPLE_MAX_CONTEXT_CHARS", "6000")):
+        complexity += 1
+    if top < float(os.getenv("ROUTER_CONFIDENT_SCORE", "0.8")):
+        complexity += 1
+    if margin < float(os.getenv("ROUTER_MIN_MARGIN", "0.02")):
+        complexity += 1
+    return {
+        "query_words": words,
+        "top_score": round(top, 4),
+        "score_margin": round(margin, 4),
+        "context_chars": context_chars,
+        "complexity": complexity,
+    }
+
+class ModelRouter:
+    def __init__(
+        self,
+        models: List[ModelProfile],
+        tenant_plans: Dict[str, str],
+        available_providers: Optional[List[str]] = None,
+        window: int = 200,
+        degraded_factor: float = None,
+        max_error_rate: float = None
+    ):
+        self.available_providers = available_providers
+        self.window = window
+        self.config_version = None
+        self.models = [m for m in models if available_providers is None or m.provider in available_providers]
+        self.tenant_plans = tenant_plans
+        # A model is degraded when its rolling p95 exceeds degraded_factor x its latency prior
+        self.degraded_factor = degraded_factor if degraded_factor is not None else float(os.getenv("ROUTER_DEGRADED_FACTOR", "3"))
+        self.max_error_rate = max_error_rate if max_error_rate is not None else float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.2"))
+        self.health: Dict[str, _ModelHealth] = {m.id: _ModelHealth(window) for m in self.models}
+
+    @classmethod
+    def from_config(cls, config=None, available_providers: Optional[List[str]] = None) -> "ModelRouter":
+        config = config or get_config()
+        router = cls([], {}, available_providers=available_providers)
+        router.apply_config(config)
+        return router
+
+    def apply_config(self, config):
+        """
+        Takes models and tenant plans from a config snapshot, keeping rolling health for models that remain.
+        """
+        models = [
+            ModelProfile(
+                id=m.id,
+                provider=m.provider,
+                tier=m.tier,
+                cost_per_1k_tokens=m.cost_per_1k_tokens,
+                latency_p50_ms=m.latency_p50_ms
+            )
+            for m in config.models if m.type == "chat"
+        ]
+        self.models = [m for m in models if self.available_providers is None or m.provider in self.available_providers]
+        self.tenant_plans = {tenant_id: t.plan for tenant_id, t in config.tenants.items()}
+        self.health = {m.id: self.health.get(m.id) or _ModelHealth(self.window) for m in self.models}
+        self.config_version = config.version
+
+    def plan_for(self, tenant_id: str) -> str:
+        # Tenants not listed individually inherit the `default` entry
+        return self.tenant_plans.get(tenant_id, self.tenant_plans.get("default", DEFAULT_PLAN))
+
+    def is_degraded(self, model_id: str) -> bool:
+        health = self.health.get(model_id)
+        profile = next((m for m in self.models if m.id == model_id), None)
+        if health is None or profile is None:
+            return False
+        p95 = health.p95()
+        if p95 is not None and p95 > profile.latency_p50_ms * self.degraded_factor:
+            return True
+        return len(health.outcomes) >= 5 and health.error_rate() > self.max_error_rate
+
+    def expected_latency_ms(self, model_id: str) -> float:
+        health = self.health.get(model_id)
+        latencies = health.latencies_ms if health else []
+        if latencies:
+            ordered = sorted(latencies)
+            return ordered[len(ordered) // 2]
+        profile = next((m for m in self.models if m.id == model_id), None)
+        return profile.latency_p50_ms if profile else float("inf")
+
+    def route(self, query: str, scores: List[float], context_chars: int, tenant_id: str) -> RoutingDecision:
+        signals = complexity_signals(query, scores, context_chars)
+        plan = self.plan_for(tenant_id)
+        signals["plan"] = plan
+
+        escalate_at = PLAN_ESCALATION.get(plan, PLAN_ESCALATION[DEFAULT_PLAN])
+        tier = "large" if escalate_at is not None and signals["complexity"] >= escalate_at else "small"
+
+        # Cheapest healthy model in the tier, then the fastest healthy model the plan allows
+        in_tier = sorted((m for m in self.models if m.tier == tier), key=lambda m: m.cost_per_1k_tokens)
+        candidates = [m for m in in_tier if not self.is_degraded(m.id)]
+        reason = f"{tier} tier for complexity {signals['complexity']} on {plan} plan"
+        if not candidates:
+            allowed = [m for m in self.models if escalate_at is not None or m.tier == "small"]
+            candidates = sorted((m for m in allowed if not self.is_degraded(m.id)), key=lambda m: self.expected_latency_ms(m.id))
+            if candidates:
+                reason += "; tier degraded, routed to fastest healthy model"
+        candidates = candidates or in_tier or self.models
+        if not candidates:
+            return RoutingDecision(model="", tier=tier, reason="no models configured", signals=signals)
+        chosen = candidates[0]
+        return RoutingDecision(model=chosen.id, tier=chosen.tier, reason=reason, signals=signals)
+
+    def record(self, model_id: str, latency_ms: Optional[float], ok: bool = True):
+        health = self.health.get(model_id)
+        if health is None:
+            return
+        health.add(latency_ms, ok)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            m.id: {
+                "tier": m.tier,
+                "p95_ms": self.health[m.id].p95(),
+                "error_rate": round(self.health[m.id].error_rate(), 3),
+                "degraded": self.is_degraded(m.id),
+            }
+            for m in self.models
+        }
+
+def log_routing(decision: RoutingDecision, tenant_id: str, query: str, latency_ms: Optional[float], ok: bool, usage: Optional[Dict[str, int]] = None):
+    """
+    Appends one JSON line per routed request to ROUTER_LOG_PATH (if set) for offline replay.
+    """
+    log_path = os.getenv("ROUTER_LOG_PATH")
+    if not log_path:
+        return
+    record = {
+        "ts": int(time.time()),
+        "tenant_id": tenant_id,
+        "query": query,
+        "model": decision.model,
+        "tier": decision.tier,
+        "signals": decision.signals,
+        "latency_ms": latency_ms,
+        "ok": ok,
+        "usage": usage,
+    }
+    try:
+        with open(log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception as e:
+        print(f"Failed to write routing log: {e}")
+
+_router: Optional[ModelRouter] = None
+
+def get_model_router(available_providers: Optional[List[str]] = None) -> ModelRouter:
+    global _router
+    config = get_config()
+    if _router is None:
+        _router = ModelRouter.from_config(config, available_providers=available_providers)
+    elif _router.config_version != config.version:
+        # models.yaml / tenants.yaml were hot-reloaded
+        _router.apply_config(config)
+    return _router
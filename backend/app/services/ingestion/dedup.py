@@ -0,0 +1,195 @@
+"""
+dedup.py
+Near-duplicate chunk detection with MinHash signatures and LSH banding.
+
+Chunks are normalized, split into word shingles and hashed; the MinHash signature of every
+chunk is computed with one vectorized numpy pass per chunk (shingles x permutations). LSH bands
+propose candidate pairs, which are confirmed by the estimated Jaccard similarity. Used at
+ingestion time (before embedding) and offline by scripts/data_quality_checks.py.
+"""
+import os
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple, Hashable
+
+import numpy as np
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+# Multiplier for combining token hashes into shingle hashes
+SHINGLE_BASE = np.uint64(1000003)
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    # Case, punctuation and whitespace differences do not make a chunk distinct
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+def shingle_hashes(text: str, size: int) -> np.ndarray:
+    """
+    32-bit hashes of the word n-grams of text, as a uint64 array.
+    """
+    tokens = normalize_text(text).split(" ")
+    token_hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint64, count=len(tokens))
+    if len(token_hashes) <= size:
+        return np.array([zlib.crc32(" ".join(tokens).encode("utf-8"))], dtype=np.uint64)
+    # Polynomial combination of `size` consecutive token hashes, all windows at once
+    windows = np.lib.stride_tricks.sliding_window_view(token_hashes, size)
+    powers = SHINGLE_BASE ** np.arange(size, dtype=np.uint64)
+    return np.unique((windows * powers).sum(axis=1) & MAX_HASH)
+
+@dataclass
+class DedupResult:
+    keep: List[int]
+    # index of a dropped chunk -> key of the chunk it duplicates
+    duplicates: Dict[int, Hashable] = field(default_factory=dict)
+    similarities: Dict[int, float] = field(default_factory=dict)
+    # index of a kept chunk -> its signature, until commit() indexes it
+    signatures: Dict[int, np.ndarray] = field(default_factory=dict)
+
+class MinHashDeduper:
+    def __init__(
+        self,
+        num_perm: int = 128,
+        bands: int = 16,
+        threshold: float = None,
+        shingle_size: int = 5,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold if threshold is not None else float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % MERSENNE_PRIME
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % MERSENNE_PRIME
+        # LSH state: band -> bucket hash -> keys; key -> signature
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [dict() for _ in range(bands)]
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text, self.shingle_size)
+        # (shingles, num_perm) universal hashes; uint64 overflow wraps like the reference MinHash
+        permuted = ((hashes[:, None] * self._a + self._b) % MERSENNE_PRIME) & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.num_perm), dtype=np.uint32)
+        return np.stack([self.signature(t) for t in texts])
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        # Fraction of agreeing MinHash values estimates the Jaccard similarity of the shingle sets
+        return float(np.mean(a == b))
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key: Hashable, signature: np.ndarray):
+        self._signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def query(self, signature: np.ndarray) -> Optional[Tuple[Hashable, float]]:
+        """
+        Most similar indexed key at or above the threshold, or None.
+        """
+        candidates = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        best = None
+        for key in candidates:
+            score = self.similarity(signature, self._signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def dedup(self, texts: List[str], keys: List[Hashable], index: bool = True) -> DedupResult:
+        """
+        Checks texts against the index (and each other), indexing the ones that are kept.
+        With index=False the kept chunks are only indexed by commit(), e.g. once they are stored.
+        """
+        result = DedupResult(keep=[])
+        for i, signature in enumerate(self.signatures(texts)):
+            match = self.query(signature)
+            if match is None and result.keep and not index:
+                # Not indexed yet: earlier kept chunks of the same batch are compared directly
+                kept = np.stack([result.signatures[j] for j in result.keep])
+                scores = np.mean(kept == signature, axis=1)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    match = (keys[result.keep[best]], float(scores[best]))
+            if match is not None:
+                result.duplicates[i] = match[0]
+                result.similarities[i] = round(match[1], 3)
+                continue
+            if index:
+                self.add(keys[i], signature)
+            else:
+                result.signatures[i] = signature
+            result.keep.append(i)
+        return result
+
+    def commit(self, keys: List[Hashable], result: DedupResult):
+        # Indexes the chunks a dedup(index=False) call kept
+        for i, signature in result.signatures.items():
+            self.add(keys[i], signature)
+        result.signatures = {}
+
+def cluster_duplicates(deduper: MinHashDeduper, items: List[Tuple[Hashable, str]]) -> Dict[Hashable, List[Hashable]]:
+    """
+    Offline grouping: canonical key (first seen) -> keys of its near-duplicates.
+    """
+    clusters: Dict[Hashable, List[Hashable]] = {}
+    keys = [k for k, _ in items]
+    result = deduper.dedup([t for _, t in items], keys)
+    for i, canonical in result.duplicates.items():
+        clusters.setdefault(canonical, []).append(keys[i])
+    return clusters
+
+class DedupStats:
+    """
+    Per-job accounting of dropped chunks and of the embedding time they would have cost.
+    """
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+        self.chunks = 0
+        self.duplicates = 0
+        self.text_bytes_saved = 0
+        self.embedded_chunks = 0
+        self.embed_seconds = 0.0
+        # (document_id, chunk index) -> ((canonical document_id, chunk index), similarity)
+        self.links: Dict[Tuple[str, int], Tuple[Hashable, float]] = {}
+
+    def record(self, document_id: str, texts: List[str], result: DedupResult):
+        self.chunks += len(texts)
+        self.duplicates += len(result.duplicates)
+        for i, canonical in result.duplicates.items():
+            self.text_bytes_saved += len(texts[i].encode("utf-8"))
+            self.links[(document_id, i)] = (canonical, result.similarities[i])
+
+    def record_embedding(self, chunks: int, seconds: float):
+        self.embedded_chunks += chunks
+        self.embed_seconds += seconds
+
+    def report(self) -> Dict[str, Any]:
+        per_chunk = self.embed_seconds / self.embedded_chunks if self.embedded_chunks else None
+        vector_bytes = self.duplicates * self.dim * 4
+        return {
+            "chunks": self.chunks,
+            "duplicates": self.duplicates,
+            "duplicate_ratio": round(self.duplicates / self.chunks, 4) if self.chunks else 0.0,
+            "index_bytes_saved": vector_bytes + self.text_bytes_saved,
+            "vector_bytes_saved": vector_bytes,
+            "text_bytes_saved": self.text_bytes_saved,
+            "embedding_seconds_saved": round(self.duplicates * per_chunk, 3) if per_chunk else None,
+        }
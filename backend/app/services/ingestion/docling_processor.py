@@ -1,20 +1,18 @@
 import os
 import json
+import importlib.util
 from typing import Optional
 
-try:
-    from docling.document_converter import DocumentConverter
-    from docling_core.types.doc import DoclingDocument
-    DOCLING_AVAILABLE = True
-except ImportError:
-    DOCLING_AVAILABLE = False
-    print("Warning: docling not installed. Please install it using `pip install docling`.")
+# Checked without importing: docling pulls in torch and its layout models
+DOCLING_AVAILABLE = importlib.util.find_spec("docling") is not None
 
 class DoclingProcessor:
     def __init__(self):
         if DOCLING_AVAILABLE:
+            from docling.document_converter import DocumentConverter
             self.converter = DocumentConverter()
         else:
+            print("Warning: docling not installed. Please install it using `pip install docling`.")
             self.converter = None
 
     def process(self, file_path: str):
@@ -2,11 +2,11 @@
 s3.py
 Loader for fetching documents from S3.
 """
-import boto3
 import os
 
 class S3Loader:
     def __init__(self):
+        import boto3
         self.bucket_name = os.getenv("S3_BUCKET_NAME", "kaiser-docs")
         self.s3_client = boto3.client(
             's3',
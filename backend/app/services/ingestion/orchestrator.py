@@ -2,24 +2,62 @@
 orchestrator.py
 Orchestrates the ingestion process: Loading (Docling) -> Chunking -> Embedding -> Storing.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable
 import os
+import time
 import glob
+import asyncio
+from app.services.chunking.base import Chunk
 from app.services.chunking.semantic import SemanticChunker
-from app.services.retrieval.vector_store.milvus import MilvusClient
+from app.services.retrieval.vector_store.base import build_columns, get_vector_store, permission_list
 from app.services.generation.embeddings import EmbeddingService
+from app.services.generation.embedding_cache import embedding_report
 from app.services.ingestion.docling_processor import DoclingProcessor
+from app.services.ingestion.dedup import MinHashDeduper, DedupStats
+from app.services.retrieval.faq import extract_qa_pairs, get_faq_index
+from app.core.profiling import get_slow_request_log, stage
 
 class IngestionOrchestrator:
     def __init__(self):
         self.chunker = SemanticChunker()
-        self.vector_store = MilvusClient()
+        self.vector_store = get_vector_store()
         self.embedder = EmbeddingService()
         self.processor = DoclingProcessor()
+        # Near-duplicate filter: "skip" drops duplicates before embedding, "report" only counts them, "off" disables
+        self.dedup_mode = os.getenv("DEDUP_MODE", "skip").lower()
+        # "document" only drops repeats inside one document. "tenant" also drops chunks that repeat
+        # another document's; nothing links them back to that document, so deleting or re-ingesting
+        # it loses their content: opt in only for corpora that are never partially replaced
+        self.dedup_scope = os.getenv("DEDUP_SCOPE", "document").lower()
+        # Tenant scope: one index per (tenant, permission set); a chunk is only skipped when a chunk
+        # visible to exactly the same callers is stored
+        self.dedupers: Dict[Tuple[str, Tuple[str, ...]], MinHashDeduper] = {}
+        self.dedup_stats = DedupStats(dim=self.embedder.dimension)
+        # Set while an initial load goes through Milvus bulk import instead of per-document inserts
+        self.bulk = None
+        # Documents with at least this many Q/A pairs also feed the FAQ fast path
+        self.faq_min_pairs = int(os.getenv("FAQ_MIN_PAIRS", "3"))
 
-    async def ingest_directory(self, directory_path: str, tenant_id: str = "default_tenant"):
+    def _should_bulk_import(self, files: List[str]) -> bool:
+        """
+        Bulk import is used for first-time loads (empty collection) of at least BULK_IMPORT_MIN_BYTES
+        of source files; the collection's indexes are rebuilt once the import is in.
+        """
+        if not hasattr(self.vector_store, "collection"):
+            # Bulk import is Milvus-only
+            return False
+        from app.services.retrieval.bulk_import import bulk_import_available
+        min_bytes = int(os.getenv("BULK_IMPORT_MIN_BYTES", str(200 * 1024 * 1024)))
+        if min_bytes <= 0 or sum(os.path.getsize(f) for f in files) < min_bytes:
+            return False
+        if self.vector_store.collection.num_entities > 0:
+            return False
+        return bulk_import_available()
+
+    async def ingest_directory(self, directory_path: str, tenant_id: str = "default_tenant", bulk: Optional[bool] = None):
         """
         Ingests all supported files in a directory recursively.
+        bulk=None picks the bulk-import path automatically for large first-time loads.
         """
         print(f"Scanning directory: {directory_path}")
         if not os.path.exists(directory_path):
@@ -37,18 +75,57 @@ class IngestionOrchestrator:
 
         print(f"Found {len(files_to_ingest)} files to ingest.")
         
+        if bulk is None:
+            bulk = self._should_bulk_import(files_to_ingest)
+        index_params = None
+        if bulk:
+            from app.services.retrieval.bulk_import import BulkImporter
+            collection = self.vector_store.collection
+            self.bulk = BulkImporter(collection, chunk_store=self.vector_store.chunk_store)
+            index_params = await asyncio.to_thread(self.vector_store.drop_indexes, collection)
+            print(f"Using bulk import into {self.bulk.collection_name}")
+        
         results = []
-        for file_path in files_to_ingest:
-            success = await self.ingest_file(file_path, tenant_id=tenant_id)
-            results.append(success)
-            
+        embed_before = self.embedder.stats()
+        try:
+            for file_path in files_to_ingest:
+                success = await self.ingest_file(file_path, tenant_id=tenant_id)
+                results.append(success)
+            if bulk:
+                try:
+                    await asyncio.to_thread(self.bulk.finish)
+                except Exception as e:
+                    print(f"Bulk import failed: {e}")
+                    results.append(False)
+        finally:
+            if bulk:
+                # Indexes come back even after a failed import so the collection stays searchable
+                self.bulk.close()
+                self.bulk = None
+                await asyncio.to_thread(self.vector_store.create_indexes, collection, index_params)
+                await asyncio.to_thread(collection.load)
+        
+        if self.dedup_mode != "off":
+            print(f"Dedup report: {self.dedup_stats.report()}")
+        # Cache hits are chunks whose exact text was embedded before (unchanged pages on re-ingest)
+        self.embedder.flush_cache()
+        print(f"Embedding report: {embedding_report(embed_before, self.embedder.stats())}")
         return all(results)
 
     async def ingest_file(self, file_path: str, tenant_id: str = "default_tenant"):
         print(f"Starting ingestion for file: {file_path} (Tenant: {tenant_id})")
-        
+        # Per-stage timings; kept in the slow-request log when the file takes over SLOW_REQUEST_MS
+        slow_log = get_slow_request_log()
+        trace = slow_log.begin("ingest", tenant_id=tenant_id, document_id=os.path.basename(file_path))
+        try:
+            return await self._ingest_file(file_path, tenant_id)
+        finally:
+            slow_log.finish(trace)
+
+    async def _ingest_file(self, file_path: str, tenant_id: str):
         # 1. Pre-processing / Loading with Docling (returns ConversionResult or str)
-        content_obj = self.processor.process(file_path)
+        with stage("parse"):
+            content_obj = self.processor.process(file_path)
         
         if content_obj is None:
             print(f"Failed to extract content from {file_path}")
@@ -65,28 +142,104 @@ class IngestionOrchestrator:
             "language": "en", 
             "version": "1.0",
             "last_modified": int(file_stat.st_mtime),
-            "access_permissions": "role:customer_service"
+            "access_permissions": ["role:customer_service"]
         }
         
-        await self.ingest_document(metadata, content_obj)
+        try:
+            await self.ingest_document(metadata, content_obj)
+            with stage("faq"):
+                self._index_faq(metadata, content_obj)
+        except Exception as e:
+            # Embedding failures raise rather than storing placeholder vectors
+            print(f"Ingestion failed for {file_path}: {e}")
+            return False
         return True
 
     async def ingest_document(self, document_metadata: Dict[str, Any], content: Any):
         print(f"Starting chunking/embedding for: {document_metadata.get('document_id')}")
         
-        # 2. Structure-Aware Chunking (Docling)
-        chunks = self.chunker.chunk(content)
+        # 2. Structure-Aware Chunking (Docling, or token-exact with CHUNKER_MODE=token); Chunk objects
+        #    carry their page and heading path through to storage
+        with stage("chunk"):
+            chunks = self.chunker.chunk(content)
         print(f"Generated {len(chunks)} chunks")
         
         if not chunks:
             print("No chunks generated. Skipping storage.")
             return True
             
-        # 3. Embedding
-        embeddings = self.embedder.get_embeddings(chunks)
+        # 2b. Near-duplicate filter (repeated headers, disclaimers, contact blocks), before paying for embeddings
+        commit_dedup = None
+        if self.dedup_mode != "off":
+            with stage("dedup"):
+                chunks, commit_dedup = self._dedup(document_metadata, chunks)
+            if not chunks:
+                print("All chunks are duplicates of already ingested chunks. Skipping storage.")
+                return True
+        
+        # 3. Embedding (float32 matrix, one row per chunk)
+        embed_start = time.perf_counter()
+        with stage("embed"):
+            embeddings = self.embedder.get_embeddings([c.text for c in chunks])
+        self.dedup_stats.record_embedding(len(chunks), time.perf_counter() - embed_start)
         
-        # 4. Storage
-        await self.vector_store.upsert(chunks, document_metadata, embeddings)
+        # 4. Storage (tagged with the model so backfills can find stale vectors)
+        document_metadata = {**document_metadata, "embedding_model": self.embedder.model_name}
+        with stage("store"):
+            if self.bulk is not None:
+                await asyncio.to_thread(self.bulk.add, build_columns(chunks, document_metadata, embeddings))
+            elif not await self.vector_store.upsert(chunks, document_metadata, embeddings):
+                raise RuntimeError(f"Vector store upsert failed for {document_metadata.get('document_id')}")
+        # Only stored chunks may make later duplicates redundant
+        if commit_dedup is not None:
+            commit_dedup()
         
         print(f"Ingestion complete for: {document_metadata.get('document_id')}")
         return True
+
+    def _index_faq(self, document_metadata: Dict[str, Any], content: Any):
+        """
+        Indexes the questions of Q/A-structured documents with their answers attached.
+        The document is still chunked and embedded as prose for regular retrieval.
+        """
+        if self.faq_min_pairs <= 0:
+            return
+        text = content if isinstance(content, str) else content.document.export_to_markdown()
+        pairs = extract_qa_pairs(text)
+        if len(pairs) < self.faq_min_pairs:
+            # A re-ingested document that no longer qualifies must not keep answering from old entries
+            get_faq_index().remove(document_metadata.get("tenant_id", "default_tenant"), document_metadata.get("document_id", "unknown_doc"))
+            return
+        # Embedded as queries: they are matched against user questions, not passages
+        vectors = self.embedder.get_embeddings([p.question for p in pairs], is_query=True)
+        get_faq_index().put(
+            document_metadata.get("tenant_id", "default_tenant"), document_metadata.get("document_id", "unknown_doc"),
+            pairs, vectors, source=document_metadata.get("source", ""),
+            access_permissions=document_metadata.get("access_permissions")
+        )
+
+    def _dedup(self, document_metadata: Dict[str, Any], chunks: List[Chunk]) -> Tuple[List[Chunk], Callable[[], None]]:
+        """
+        Drops chunks that near-duplicate an earlier chunk of the same document or, with
+        DEDUP_SCOPE=tenant, one already ingested in this run for the same tenant and permission set.
+        Dropped chunks are linked to their canonical chunk in dedup_stats.links.
+        Returns the chunks to store and a callback that indexes the kept ones once they are stored.
+        """
+        tenant_id = document_metadata.get("tenant_id", "default_tenant")
+        document_id = document_metadata.get("document_id", "unknown_doc")
+        if self.dedup_scope == "tenant":
+            permissions = tuple(sorted(permission_list(document_metadata.get("access_permissions"))))
+            deduper = self.dedupers.setdefault((tenant_id, permissions), MinHashDeduper())
+        else:
+            # Chunks are still compared with each other within the batch
+            deduper = MinHashDeduper()
+        texts = [c.text for c in chunks]
+        keys = [(document_id, i) for i in range(len(chunks))]
+        result = deduper.dedup(texts, keys, index=False)
+        self.dedup_stats.record(document_id, texts, result)
+        if result.duplicates:
+            print(f"Dedup: {len(result.duplicates)} of {len(chunks)} chunks near-duplicate earlier chunks")
+        commit = lambda: deduper.commit(keys, result)
+        if self.dedup_mode == "report":
+            return chunks, commit
+        return [chunks[i] for i in result.keep], commit
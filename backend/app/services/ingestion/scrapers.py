@@ -2,11 +2,6 @@ import os
 import time
 import requests
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 class ScraperService:
     def __init__(self, output_dir: str):
@@ -19,6 +14,12 @@ class ScraperService:
         Scrapes HTML content using Selenium and BeautifulSoup.
         """
         print(f"Scraping HTML from {url}...")
+        # Selenium is only needed for rendered pages; imported here so other scrapes don't pay for it
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         
         # Configure Selenium options
         chrome_options = Options()
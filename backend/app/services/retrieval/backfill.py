@@ -0,0 +1,204 @@
+"""
+backfill.py
+Resumable re-embedding of stored chunks in place.
+
+Pages through rows whose `embedding_model` differs from the target in primary-key order, embeds
+each page across a pool of worker processes and writes the replacement rows in bulk (insert the
+new rows, then delete the old ones). A checkpoint file is updated after every page, so an
+interrupted run resumes where it stopped. Rows written before the field existed have an empty
+`embedding_model` and are picked up as well, which also repairs old placeholder vectors.
+"""
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from app.services.retrieval.vector_store.milvus import schema_columns
+from app.services.generation.embedding_cache import embedding_report
+from app.services.retrieval.chunk_store import attach_stored_fields
+
+@dataclass
+class BackfillCheckpoint:
+    target_model: str
+    last_id: int = -1
+    processed: int = 0
+    # Old row ids of the page being replaced; set before the insert, cleared after the delete
+    pending_ids: List[int] = field(default_factory=list)
+    started_at: float = field(default_factory=time.time)
+    updated_at: float = 0.0
+
+    @classmethod
+    def load(cls, path: str, target_model: str) -> "BackfillCheckpoint":
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("target_model") == target_model:
+                return cls(**data)
+            print(f"Checkpoint {path} is for {data.get('target_model')}; starting over for {target_model}")
+        return cls(target_model=target_model)
+
+    def save(self, path: str):
+        self.updated_at = time.time()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(self), f)
+        # Atomic on POSIX: a crash leaves either the old or the new checkpoint, never half of one
+        os.replace(tmp_path, path)
+
+class EmbeddingBackfill:
+    def __init__(
+        self,
+        collection,
+        embedder,
+        checkpoint_path: str,
+        chunk_store=None,
+        target_model: str = None,
+        batch_size: int = None,
+        processes: int = None,
+        report_every: float = 10.0
+    ):
+        self.collection = collection
+        self.embedder = embedder
+        self.checkpoint_path = checkpoint_path
+        # Set when the collection is lean (text lives in the chunk store)
+        self.chunk_store = chunk_store
+        self.target_model = target_model or embedder.model_name
+        self.batch_size = batch_size or int(os.getenv("BACKFILL_BATCH_SIZE", "1024"))
+        self.processes = processes if processes is not None else int(os.getenv("BACKFILL_PROCESSES", str(os.cpu_count() or 1)))
+        self.report_every = report_every
+        self.columns = schema_columns(collection)
+        if "embedding_model" not in self.columns:
+            raise RuntimeError(
+                "Collection has no embedding_model field; migrate it with POST /db/reindex before backfilling"
+            )
+        self.checkpoint = BackfillCheckpoint.load(checkpoint_path, self.target_model)
+
+    def _stale_expr(self, after_id: int) -> str:
+        return f"id > {after_id} and embedding_model != {json.dumps(self.target_model)}"
+
+    def count_remaining(self) -> int:
+        rows = self.collection.query(
+            expr=self._stale_expr(self.checkpoint.last_id), output_fields=["count(*)"], consistency_level="Strong"
+        )
+        return int(rows[0]["count(*)"])
+
+    def _recover(self):
+        """
+        Finishes a page interrupted between insert and delete: old rows that already have a
+        replacement are deleted; the rest are re-processed because the cursor did not advance.
+        """
+        ids = self.checkpoint.pending_ids
+        if not ids:
+            return
+        text_field = ["text"] if "text" in self.columns else []
+        existing = self.collection.query(expr=f"id in {ids}", output_fields=["id", "document_id"] + text_field)
+        attach_stored_fields(self.chunk_store, existing)
+        if existing:
+            document_ids = sorted({r["document_id"] for r in existing})
+            replaced = self.collection.query(
+                expr=f"embedding_model == {json.dumps(self.target_model)} and document_id in {json.dumps(document_ids)}",
+                output_fields=["id", "document_id"] + text_field
+            )
+            attach_stored_fields(self.chunk_store, replaced)
+            replaced_keys = {(r["document_id"], r["text"]) for r in replaced}
+            duplicates = [r["id"] for r in existing if (r["document_id"], r["text"]) in replaced_keys]
+            if duplicates:
+                self.collection.delete(expr=f"id in {duplicates}")
+                if self.chunk_store is not None:
+                    self.chunk_store.delete_many(duplicates)
+            print(f"Recovered interrupted page: {len(duplicates)} already replaced, {len(existing) - len(duplicates)} to redo")
+        self.checkpoint.pending_ids = []
+        self.checkpoint.save(self.checkpoint_path)
+
+    def _encode(self, texts: List[str], pool) -> np.ndarray:
+        if pool is not None:
+            return self.embedder.get_embeddings_pooled(texts, pool)
+        return self.embedder.get_embeddings(texts)
+
+    def _write_page(self, rows: List[Dict[str, Any]], vectors: np.ndarray):
+        old_ids = [r["id"] for r in rows]
+        self.checkpoint.pending_ids = old_ids
+        self.checkpoint.save(self.checkpoint_path)
+
+        columns = {name: [r.get(name) for r in rows] for name in self.columns}
+        columns["embedding"] = vectors
+        columns["embedding_model"] = [self.target_model] * len(rows)
+        result = self.collection.insert([columns[name] for name in self.columns])
+        if self.chunk_store is not None and "text" not in self.columns:
+            self.chunk_store.put_many(result.primary_keys, rows)
+        self.collection.delete(expr=f"id in {old_ids}")
+        if self.chunk_store is not None and "text" not in self.columns:
+            self.chunk_store.delete_many(old_ids)
+
+        self.checkpoint.last_id = max(self.checkpoint.last_id, max(old_ids))
+        self.checkpoint.processed += len(rows)
+        self.checkpoint.pending_ids = []
+        self.checkpoint.save(self.checkpoint_path)
+
+    def run(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Backfills until no stale rows remain (or `limit` rows were processed in this run).
+        """
+        self._recover()
+        remaining = self.count_remaining()
+        total = self.checkpoint.processed + remaining
+        print(f"Backfilling {remaining} chunks to {self.target_model} (resuming after id {self.checkpoint.last_id})")
+
+        output_fields = ["id"] + [c for c in self.columns if c not in ("embedding", "embedding_model")]
+        iterator = self.collection.query_iterator(
+            batch_size=self.batch_size, expr=self._stale_expr(self.checkpoint.last_id), output_fields=output_fields
+        )
+        lean = "text" not in self.columns
+        embed_before = self.embedder.stats()
+        pool = self.embedder.start_pool(self.processes) if self.processes > 1 else None
+        # One writer thread: the next page is encoded while the previous one is written
+        writer = ThreadPoolExecutor(max_workers=1)
+        pending_write = None
+        started = time.perf_counter()
+        last_report = started
+        done_this_run = 0
+        try:
+            while limit is None or done_this_run < limit:
+                rows = iterator.next()
+                if not rows:
+                    break
+                if lean:
+                    attach_stored_fields(self.chunk_store, rows)
+                vectors = self._encode([r["text"] for r in rows], pool)
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = writer.submit(self._write_page, rows, vectors)
+                done_this_run += len(rows)
+
+                now = time.perf_counter()
+                if now - last_report >= self.report_every:
+                    last_report = now
+                    rate = done_this_run / (now - started)
+                    left = max(total - self.checkpoint.processed - len(rows), 0)
+                    print(f"{self.checkpoint.processed + len(rows)}/{total} chunks, {rate:.0f} chunks/s, ETA {left / rate:.0f}s")
+            if pending_write is not None:
+                pending_write.result()
+        finally:
+            writer.shutdown(wait=True)
+            iterator.close()
+            if pool is not None:
+                self.embedder.stop_pool(pool)
+            self.embedder.flush_cache()
+
+        self.collection.flush()
+        elapsed = time.perf_counter() - started
+        summary = {
+            "target_model": self.target_model,
+            "processed_this_run": done_this_run,
+            "processed_total": self.checkpoint.processed,
+            "remaining": max(total - self.checkpoint.processed, 0),
+            "elapsed_seconds": round(elapsed, 1),
+            "chunks_per_sec": round(done_this_run / elapsed, 1) if elapsed > 0 else None,
+            "embedding": embedding_report(embed_before, self.embedder.stats()),
+        }
+        print(f"Backfill finished: {summary}")
+        return summary
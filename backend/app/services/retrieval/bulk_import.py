@@ -0,0 +1,267 @@
+"""
+bulk_import.py
+Bulk-import path for large loads into Milvus (initial ingestion, full reindex).
+
+Rows are buffered column by column and written as NumPy shards (one `<field>.npy` per field,
+BULK_IMPORT_SHARD_ROWS rows per shard) to the MinIO bucket Milvus reads from. NumPy import has
+no ARRAY support, so collections with ARRAY fields (access_permissions) get row-based JSON
+shards (`{"rows": [...]}`, one file per shard) instead. Each shard becomes one
+`utility.do_bulk_insert` task; the importer polls until every task is completed. Callers
+create the target without indexes and build them once after the import.
+
+For lean collections the chunk store is filled from the auto ids each task reports; Milvus
+assigns them in file row order. Milvus 2.4 does not always report them: when the count does not
+match the shard, its documents are deleted again (rows without stored text would be searchable
+but empty) and the import fails once every task has finished.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from pymilvus import Collection, DataType, utility
+
+from app.services.retrieval.vector_store.milvus import permission_column, schema_columns
+from app.services.retrieval.chunk_store import STORED_FIELDS
+
+try:
+    from minio import Minio
+    MINIO_AVAILABLE = True
+except ImportError:
+    MINIO_AVAILABLE = False
+
+INT_FIELDS = {"last_modified", "page"}
+
+class BulkImportError(RuntimeError):
+    pass
+
+def get_minio_client():
+    """
+    Client for the MinIO instance backing Milvus, or None when bulk import is not configured.
+    """
+    address = os.getenv("MINIO_ADDRESS")
+    if not MINIO_AVAILABLE or not address:
+        return None
+    return Minio(
+        address,
+        access_key=os.getenv("MINIO_ACCESS_KEY", "minioadmin"),
+        secret_key=os.getenv("MINIO_SECRET_KEY", "minioadmin"),
+        secure=os.getenv("MINIO_SECURE", "false").lower() == "true"
+    )
+
+def bulk_import_available() -> bool:
+    return get_minio_client() is not None
+
+def import_format(collection: Collection) -> str:
+    """
+    "numpy", or "json" when the collection has ARRAY fields, which NumPy import cannot load.
+    """
+    if any(getattr(f, "dtype", None) == DataType.ARRAY for f in collection.schema.fields):
+        return "json"
+    return "numpy"
+
+class BulkImporter:
+    def __init__(
+        self,
+        collection: Collection,
+        chunk_store=None,
+        minio_client=None,
+        bucket: str = None,
+        shard_rows: int = None,
+        timeout: float = None,
+        poll_interval: float = 2.0
+    ):
+        self.collection = collection
+        # Import tasks address the physical collection, not the alias
+        self.collection_name = collection.describe().get("collection_name", collection.name)
+        self.columns = schema_columns(collection)
+        self.format = import_format(collection)
+        self.chunk_store = chunk_store if "text" not in self.columns else None
+        self.minio = minio_client or get_minio_client()
+        if self.minio is None:
+            raise BulkImportError("Bulk import needs the minio package and MINIO_ADDRESS")
+        # Milvus' default bucket; paths passed to do_bulk_insert are relative to it
+        self.bucket = bucket or os.getenv("MINIO_BUCKET", "a-bucket")
+        if not self.minio.bucket_exists(self.bucket):
+            raise BulkImportError(f"MinIO bucket {self.bucket} does not exist")
+        self.shard_rows = shard_rows or int(os.getenv("BULK_IMPORT_SHARD_ROWS", "200000"))
+        self.timeout = timeout if timeout is not None else float(os.getenv("BULK_IMPORT_TIMEOUT", "3600"))
+        self.poll_interval = poll_interval
+        self.prefix = f"bulk_import/{self.collection_name}/{uuid.uuid4().hex[:12]}"
+        self.staging_dir = tempfile.mkdtemp(prefix="bulk_import_")
+
+        self._buffer: Dict[str, list] = {name: [] for name in self.columns if name != "embedding"}
+        self._vectors: List[np.ndarray] = []
+        self._records: List[Dict[str, Any]] = []
+        self._source_ids: List[int] = []
+        self._buffered = 0
+        # Caller's row id -> Milvus auto id, for rows added with source_ids
+        self.id_map: Dict[int, int] = {}
+        self.shards: List[Dict[str, Any]] = []
+        self.rows = 0
+        self.write_seconds = 0.0
+
+    def add(self, columns: Dict[str, Any], source_ids: Optional[List[int]] = None):
+        """
+        Buffers one batch of column-based rows (MilvusClient.build_columns layout); a shard is
+        written and uploaded whenever shard_rows are buffered. With source_ids, id_map maps them
+        to the auto ids Milvus assigns (a reindex mirrors deletes through it).
+        """
+        count = len(columns["embedding"])
+        self._vectors.append(np.ascontiguousarray(columns["embedding"], dtype=np.float32))
+        for name, values in self._buffer.items():
+            if name == "access_permissions":
+                # Lists for the ARRAY form (JSON shards), joined strings for legacy VARCHAR
+                values.extend(permission_column(columns[name], as_array=self.format == "json"))
+            else:
+                values.extend(columns[name])
+        if self.chunk_store is not None:
+            self._records.extend({f: columns[f][i] for f in STORED_FIELDS} for i in range(count))
+        if source_ids is not None:
+            self._source_ids.extend(source_ids)
+        self._buffered += count
+        self.rows += count
+        if self._buffered >= self.shard_rows:
+            self._write_shard()
+
+    def _write_shard(self):
+        started = time.perf_counter()
+        shard_name = f"shard_{len(self.shards):05d}"
+        local_dir = os.path.join(self.staging_dir, shard_name)
+        os.makedirs(local_dir)
+        if self.format == "json":
+            files = [self._upload(local_dir, shard_name, "rows.json", self._write_json_rows)]
+        else:
+            arrays = {"embedding": np.concatenate(self._vectors)}
+            for name, values in self._buffer.items():
+                arrays[name] = np.asarray(values, dtype=np.int64 if name in INT_FIELDS else np.str_)
+            files = [
+                self._upload(local_dir, shard_name, f"{name}.npy", lambda path, name=name: np.save(path, arrays[name]))
+                for name in self.columns
+            ]
+
+        records_path = None
+        documents: Dict[str, set] = {}
+        if self.chunk_store is not None:
+            records_path = os.path.join(local_dir, "stored.json")
+            with open(records_path, "w") as f:
+                json.dump(self._records, f)
+            # What to delete again if Milvus does not report the shard's auto ids
+            for tenant_id, document_id in zip(self._buffer["tenant_id"], self._buffer["document_id"]):
+                documents.setdefault(tenant_id, set()).add(document_id)
+        self.shards.append({
+            "name": shard_name, "files": files, "rows": self._buffered, "records_path": records_path,
+            "source_ids": self._source_ids, "documents": documents
+        })
+
+        self._buffer = {name: [] for name in self._buffer}
+        self._vectors = []
+        self._records = []
+        self._source_ids = []
+        self._buffered = 0
+        self.write_seconds += time.perf_counter() - started
+
+    def _upload(self, local_dir: str, shard_name: str, file_name: str, write) -> str:
+        path = os.path.join(local_dir, file_name)
+        write(path)
+        object_name = f"{self.prefix}/{shard_name}/{file_name}"
+        self.minio.fput_object(self.bucket, object_name, path)
+        # Only the current shard is ever on local disk
+        os.remove(path)
+        return object_name
+
+    def _write_json_rows(self, path: str):
+        # Streamed row by row: a shard of 768-dim vectors is too large to build as one string
+        vectors = np.concatenate(self._vectors)
+        with open(path, "w") as f:
+            f.write('{"rows": [')
+            for i in range(self._buffered):
+                row = {"embedding": vectors[i].tolist()}
+                for name, values in self._buffer.items():
+                    row[name] = int(values[i]) if name in INT_FIELDS else values[i]
+                if i:
+                    f.write(",")
+                json.dump(row, f)
+            f.write("]}")
+
+    def _on_imported(self, shard: Dict[str, Any], state):
+        if state.row_count != shard["rows"]:
+            raise BulkImportError(f"{shard['name']}: imported {state.row_count} rows, expected {shard['rows']}")
+        if self.chunk_store is not None or shard["source_ids"]:
+            ids = list(state.ids or [])
+            if len(ids) != shard["rows"]:
+                if self.chunk_store is not None:
+                    self._discard(shard)
+                raise BulkImportError(f"{shard['name']}: Milvus reported {len(ids)} auto ids for {shard['rows']} rows")
+            self.id_map.update(zip(shard["source_ids"], ids))
+        if self.chunk_store is not None:
+            with open(shard["records_path"], "r") as f:
+                records = json.load(f)
+            self.chunk_store.put_many(ids, records)
+
+    def _discard(self, shard: Dict[str, Any]):
+        # Whole documents: a document split across shards is incomplete either way
+        for tenant_id, document_ids in shard["documents"].items():
+            self.collection.delete(expr=f"tenant_id == {json.dumps(tenant_id)} and document_id in {json.dumps(sorted(document_ids))}")
+        print(f"Bulk import: removed the documents of {shard['name']}; their text could not be stored")
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Writes the last shard, runs one import task per shard and blocks until all are done.
+        """
+        if self._buffered:
+            self._write_shard()
+        started = time.perf_counter()
+        pending = {}
+        for shard in self.shards:
+            task_id = utility.do_bulk_insert(collection_name=self.collection_name, files=shard["files"])
+            pending[task_id] = shard
+        print(f"Bulk import: {self.rows} rows in {len(self.shards)} shards submitted to {self.collection_name}")
+
+        # Tasks cannot be recalled once submitted, so every one is seen through (and, for lean
+        # collections, every completed shard gets its text) before a failure is raised
+        errors = []
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            for task_id in list(pending):
+                state = utility.get_bulk_insert_state(task_id=task_id)
+                if state.state_name in ("Failed", "Failed and cleaned"):
+                    pending.pop(task_id)
+                    errors.append(f"Bulk insert task {task_id} failed: {state.failed_reason}")
+                elif state.state_name == "Completed":
+                    try:
+                        self._on_imported(pending.pop(task_id), state)
+                    except BulkImportError as e:
+                        errors.append(str(e))
+            if pending:
+                if time.monotonic() > deadline:
+                    raise BulkImportError(f"Bulk import timed out with {len(pending)} tasks pending")
+                time.sleep(self.poll_interval)
+        if errors:
+            raise BulkImportError("; ".join(errors))
+
+        import_seconds = time.perf_counter() - started
+        total_seconds = self.write_seconds + import_seconds
+        summary = {
+            "rows": self.rows,
+            "shards": len(self.shards),
+            "write_seconds": round(self.write_seconds, 2),
+            "import_seconds": round(import_seconds, 2),
+            "rows_per_sec": round(self.rows / total_seconds, 1) if total_seconds > 0 else None,
+        }
+        print(f"Bulk import finished: {summary}")
+        return summary
+
+    def close(self):
+        # Shards are only needed until Milvus has read them
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        for shard in self.shards:
+            for object_name in shard["files"]:
+                try:
+                    self.minio.remove_object(self.bucket, object_name)
+                except Exception as e:
+                    print(f"Could not remove {object_name}: {e}")
@@ -0,0 +1,135 @@
+"""
+chunk_store.py
+Side store for chunk text and display-only metadata, keyed by the Milvus primary key.
+
+With CHUNK_STORE set, Milvus keeps only the vectors and the scalar fields used in filters;
+the text, source, source_system and version of each chunk live here as one compressed record
+(zstd when available, zlib otherwise) in SQLite. Search results are resolved with one batched
+lookup per search.
+"""
+import os
+import json
+import zlib
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Iterable
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Fields moved out of Milvus when the chunk store is enabled
+STORED_FIELDS = ["text", "source", "source_system", "version", "heading_path"]
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+# SQLite caps the number of bound parameters per statement
+_MAX_PARAMS = 900
+
+class ChunkStore:
+    def __init__(self, path: str, level: int = 3):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Calls arrive from asyncio.to_thread workers; one connection guarded by a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, codec INTEGER NOT NULL, payload BLOB NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.codec = CODEC_ZSTD if ZSTD_AVAILABLE else CODEC_ZLIB
+        self.level = level
+        if ZSTD_AVAILABLE:
+            self._compressor = zstandard.ZstdCompressor(level=level)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def _compress(self, record: Dict[str, Any]) -> bytes:
+        raw = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        if self.codec == CODEC_ZSTD:
+            return self._compressor.compress(raw)
+        return zlib.compress(raw, self.level)
+
+    def _decompress(self, codec: int, payload: bytes) -> Dict[str, Any]:
+        if codec == CODEC_ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("Chunk store holds zstd records but zstandard is not installed")
+            raw = self._decompressor.decompress(payload)
+        else:
+            raw = zlib.decompress(payload)
+        return json.loads(raw)
+
+    def put_many(self, ids: Iterable[int], records: Iterable[Dict[str, Any]]):
+        rows = [(int(i), self.codec, self._compress({f: r[f] for f in STORED_FIELDS if f in r})) for i, r in zip(ids, records)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, codec, payload) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def get_many(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Records for the ids that exist, in one query per 900 ids.
+        """
+        found = {}
+        ids = [int(i) for i in ids]
+        with self._lock:
+            for start in range(0, len(ids), _MAX_PARAMS):
+                batch = ids[start:start + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT id, codec, payload FROM chunks WHERE id IN ({placeholders})", batch).fetchall()
+                found.update((row_id, (codec, payload)) for row_id, codec, payload in rows)
+        return {row_id: self._decompress(codec, payload) for row_id, (codec, payload) in found.items()}
+
+    def delete_many(self, ids: List[int]):
+        ids = [int(i) for i in ids]
+        with self._lock:
+            for start in range(0, len(ids), _MAX_PARAMS):
+                batch = ids[start:start + _MAX_PARAMS]
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, payload_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM chunks").fetchone()
+        return {
+            "chunks": count,
+            "payload_bytes": payload_bytes,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "codec": "zstd" if self.codec == CODEC_ZSTD else "zlib",
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def attach_stored_fields(store: Optional[ChunkStore], rows: List[Dict[str, Any]], id_field: str = "id"):
+    """
+    Fills text/source/... into rows read from a lean collection (no-op for rows that have them).
+    """
+    if store is None:
+        return
+    missing = [r[id_field] for r in rows if r.get("text") is None]
+    if not missing:
+        return
+    records = store.get_many(missing)
+    for r in rows:
+        record = records.get(r[id_field])
+        if record is not None:
+            for f in STORED_FIELDS:
+                if r.get(f) is None:
+                    r[f] = record.get(f)
+
+_stores: Dict[str, ChunkStore] = {}
+
+def get_chunk_store() -> Optional[ChunkStore]:
+    """
+    The store at CHUNK_STORE (a SQLite file path), or None when the side store is disabled.
+    """
+    path = os.getenv("CHUNK_STORE")
+    if not path:
+        return None
+    if path not in _stores:
+        _stores[path] = ChunkStore(path)
+    return _stores[path]
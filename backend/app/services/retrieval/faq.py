@@ -0,0 +1,221 @@
+"""
+faq.py
+FAQ fast path: questions from Q/A-structured sources, indexed with their answers attached.
+
+At ingestion, documents whose text has explicit Q/A structure (numbered questions or "Q:"/"A:"
+pairs) get their questions embedded and stored per tenant in FAQ_INDEX_DIR (one .npz file per
+tenant, replaced atomically). At query time a user question that matches a stored question
+above the threshold is answered with the stored answer, without retrieval or an LLM call.
+Readers pick up files rewritten by the ingestion process on their next lookup.
+"""
+import os
+import re
+import time
+import threading
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from app.core.tenancy import validate_tenant_id
+from app.services.retrieval.vector_store.base import allowed_permissions, permission_list
+
+# "3. How do I ...?" / "3) ..." and "Q: ..." / "Question: ..."
+_NUMBERED = re.compile(r"^\s*(\d{1,3})[.)]\s+(\S.{8,300})$")
+_Q_PREFIX = re.compile(r"^\s*(?:Q|Question)\s*[:.]\s*(\S.{8,300})$", re.IGNORECASE)
+_A_PREFIX = re.compile(r"^\s*(?:A|Answer)\s*[:.]\s*", re.IGNORECASE)
+# Lines that end an answer or carry no text of their own
+_STOP_LINES = re.compile(r"^\s*(back to top|return to top)\s*$", re.IGNORECASE)
+_SKIP_LINES = re.compile(r"^\s*(figure\s+\d+.*|[\s﻿​*:]*)$", re.IGNORECASE)
+
+MAX_ANSWER_CHARS = 2000
+
+@dataclass
+class QAPair:
+    question: str
+    answer: str
+
+def _join(lines: List[str]) -> str:
+    # Scraped pages break sentences around links; only sentence-final lines end a paragraph
+    text = ""
+    for line in lines:
+        line = line.strip().replace("﻿", "")
+        if not text:
+            text = line
+        elif text[-1] in ".!?:":
+            text += "\n" + line
+        else:
+            text += " " + line
+    return text[:MAX_ANSWER_CHARS].strip()
+
+def extract_qa_pairs(text: str) -> List[QAPair]:
+    """
+    Q/A pairs from FAQ-style text. Numbered questions must run 1, 2, 3, ... so numbered steps
+    inside an answer are not mistaken for questions.
+    """
+    pairs: List[QAPair] = []
+    question: Optional[str] = None
+    answer: List[str] = []
+    expected = 1
+    # Next number of a numbered list that started inside the current answer
+    list_next = None
+
+    def close():
+        if question and answer:
+            body = _join(answer)
+            if body:
+                pairs.append(QAPair(question=question, answer=body))
+
+    for line in text.splitlines():
+        numbered = _NUMBERED.match(line)
+        prefixed = _Q_PREFIX.match(line)
+        number = int(numbered.group(1)) if numbered else None
+        is_question = line.rstrip().endswith("?")
+        # A new section may restart the numbering with a question; steps of a list in the
+        # answer win over the question numbering unless the line is itself a question
+        if numbered and (is_question or number != list_next) and (number == expected or (number == 1 and is_question)):
+            close()
+            expected = number + 1
+            question, answer, list_next = numbered.group(2).strip(), [], None
+        elif prefixed:
+            close()
+            question, answer, list_next = prefixed.group(1).strip(), [], None
+        elif question is not None:
+            if _STOP_LINES.match(line):
+                close()
+                question, answer = None, []
+            elif not _SKIP_LINES.match(line):
+                if numbered and number in (1, list_next):
+                    list_next = number + 1
+                answer.append(_A_PREFIX.sub("", line, count=1))
+    close()
+    return pairs
+
+class FaqIndex:
+    def __init__(self, path: str = None, threshold: float = None):
+        self.path = path or os.getenv("FAQ_INDEX_DIR", "/faq_index")
+        self.threshold = threshold if threshold is not None else float(os.getenv("FAQ_MATCH_THRESHOLD", "0.93"))
+        self._lock = threading.Lock()
+        # tenant -> (file mtime, arrays)
+        self._loaded: Dict[str, Tuple[float, Dict[str, np.ndarray]]] = {}
+        self.lookups: Dict[str, int] = {}
+        self.hits: Dict[str, int] = {}
+        self.lookup_ms: List[float] = []
+
+    def _file(self, tenant_id: str) -> str:
+        return os.path.join(self.path, f"{validate_tenant_id(tenant_id)}.npz")
+
+    def _load(self, tenant_id: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self._file(tenant_id)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        cached = self._loaded.get(tenant_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        self._loaded[tenant_id] = (mtime, arrays)
+        return arrays
+
+    def put(
+        self, tenant_id: str, document_id: str, pairs: List[QAPair], vectors: np.ndarray, source: str = "", access_permissions=None
+    ):
+        """
+        Replaces the tenant's entries for document_id with pairs (vectors are the question embeddings).
+        access_permissions are the document's, so answers are only served to roles that may see it.
+        """
+        with self._lock:
+            current = self._load(tenant_id)
+            columns = {"vectors": [], "questions": [], "answers": [], "document_ids": [], "sources": [], "permissions": []}
+            if current is not None:
+                keep = current["document_ids"] != document_id
+                for name in columns:
+                    # Files written before permissions were stored: their entries stay restricted (empty)
+                    columns[name] = list(current[name][keep]) if name in current else [""] * int(keep.sum())
+            columns["vectors"].extend(np.asarray(vectors, dtype=np.float32))
+            columns["questions"].extend(p.question for p in pairs)
+            columns["answers"].extend(p.answer for p in pairs)
+            columns["document_ids"].extend([document_id] * len(pairs))
+            columns["sources"].extend([source] * len(pairs))
+            columns["permissions"].extend([",".join(permission_list(access_permissions))] * len(pairs))
+
+            os.makedirs(self.path, exist_ok=True)
+            path = self._file(tenant_id)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(
+                tmp_path,
+                vectors=np.asarray(columns["vectors"], dtype=np.float32).reshape(-1, vectors.shape[1]),
+                **{name: np.asarray(values, dtype=np.str_) for name, values in columns.items() if name != "vectors"}
+            )
+            # Readers see the old or the new file, never a partial one
+            os.replace(tmp_path, path)
+            self._loaded.pop(tenant_id, None)
+        print(f"FAQ index for {tenant_id}: {len(pairs)} questions from {document_id}")
+
+    def remove(self, tenant_id: str, document_id: str) -> bool:
+        """
+        Drops the entries of document_id (e.g. re-ingested without enough Q/A pairs to be indexed).
+        Returns whether it had any.
+        """
+        data = self._load(tenant_id)
+        if data is None or not (data["document_ids"] == document_id).any():
+            return False
+        self.put(tenant_id, document_id, [], np.empty((0, data["vectors"].shape[1]), dtype=np.float32))
+        return True
+
+    def match(self, tenant_id: str, query_vector: np.ndarray, threshold: float = None, roles=None) -> Optional[Dict[str, Any]]:
+        """
+        Best stored question for the (normalized) query embedding if its cosine similarity
+        reaches the threshold, else None. With roles, only entries from documents the caller
+        may see are considered. Every call counts toward the hit rate.
+        """
+        started = time.perf_counter()
+        threshold = self.threshold if threshold is None else threshold
+        self.lookups[tenant_id] = self.lookups.get(tenant_id, 0) + 1
+        data = self._load(tenant_id)
+        result = None
+        if data is not None and len(data["vectors"]):
+            scores = data["vectors"] @ np.asarray(query_vector, dtype=np.float32).reshape(-1)
+            if roles is not None:
+                allowed = set(allowed_permissions(roles))
+                permissions = data.get("permissions", np.full(len(scores), "", dtype=np.str_))
+                visible = np.array([bool(allowed.intersection(p.split(","))) for p in permissions], dtype=bool)
+                scores = np.where(visible, scores, -np.inf)
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                self.hits[tenant_id] = self.hits.get(tenant_id, 0) + 1
+                result = {
+                    "question": str(data["questions"][best]),
+                    "answer": str(data["answers"][best]),
+                    "document_id": str(data["document_ids"][best]),
+                    "source": str(data["sources"][best]),
+                    "score": float(scores[best]),
+                }
+        self.lookup_ms.append((time.perf_counter() - started) * 1000)
+        del self.lookup_ms[:-1000]
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = sum(self.lookups.values())
+        hits = sum(self.hits.values())
+        return {
+            "threshold": self.threshold,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "lookup_ms_p50": round(float(np.percentile(self.lookup_ms, 50)), 3) if self.lookup_ms else None,
+            "tenants": {
+                t: {"lookups": n, "hits": self.hits.get(t, 0), "hit_rate": round(self.hits.get(t, 0) / n, 4)}
+                for t, n in self.lookups.items()
+            },
+        }
+
+_faq_index: Optional[FaqIndex] = None
+
+def get_faq_index() -> FaqIndex:
+    global _faq_index
+    if _faq_index is None:
+        _faq_index = FaqIndex()
+    return _faq_index
@@ -0,0 +1,168 @@
+"""
+multi_query.py
+Multi-query retrieval for conversational follow-ups.
+
+Builds several query variants for the latest user turn (raw query, history-fused query and an
+optional LLM rewrite bounded by a strict timeout), embeds them in one batch, runs them through a
+single batched vector search and fuses the ranked lists with Reciprocal Rank Fusion.
+"""
+import os
+import time
+import asyncio
+import contextlib
+import numpy as np
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from app.core.tenancy import DEFAULT_TENANT_ID
+from app.core.profiling import stage
+
+# Follow-ups shorter than this (in words) are fused with the previous user turn
+FOLLOW_UP_MAX_WORDS = 15
+
+def fuse_history(messages: List[Dict[str, str]]) -> str:
+    """
+    Returns the latest user query, prefixed with the previous user turn when the query
+    looks like a short follow-up.
+    """
+    user_query = messages[-1]["content"]
+    if len(messages) > 1 and len(user_query.split()) < FOLLOW_UP_MAX_WORDS:
+        for m in reversed(messages[:-1]):
+            if m["role"] == "user":
+                return f"{m['content']} {user_query}"
+    return user_query
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Any]], k: int = 60) -> List[Any]:
+    """
+    Fuses ranked hit lists by sum of 1 / (k + rank). Hits are keyed by their id;
+    the copy with the best individual score is kept.
+    """
+    fused_scores: Dict[Any, float] = {}
+    best_hit: Dict[Any, Any] = {}
+    for hits in ranked_lists:
+        for rank, hit in enumerate(hits):
+            fused_scores[hit.id] = fused_scores.get(hit.id, 0.0) + 1.0 / (k + rank + 1)
+            if hit.id not in best_hit or hit.score > best_hit[hit.id].score:
+                best_hit[hit.id] = hit
+    ordered = sorted(fused_scores, key=lambda hit_id: fused_scores[hit_id], reverse=True)
+    return [best_hit[hit_id] for hit_id in ordered]
+
+async def llm_rewriter(messages: List[Dict[str, str]]) -> str:
+    """
+    Standalone rewrite of the latest user turn through the shared LLM gateway (MULTI_QUERY_REWRITE).
+    MultiQueryRetriever drops it when it takes longer than QUERY_REWRITE_TIMEOUT.
+    """
+    from app.services.generation.llm_gateway import get_llm_gateway
+    transcript = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages[-6:])
+    prompt = [
+        {"role": "system", "content": "Rewrite the user's last message as a standalone search query for a customer service knowledge base. Resolve pronouns and references from the conversation. Reply with the query only."},
+        {"role": "user", "content": transcript}
+    ]
+    result = await get_llm_gateway().complete(prompt, model=os.getenv("QUERY_REWRITE_MODEL") or None)
+    return result.content
+
+class MultiQueryRetriever:
+    def __init__(
+        self,
+        embedder,
+        vector_store,
+        rewriter: Optional[Callable[[List[Dict[str, str]]], Awaitable[str]]] = None,
+        rewrite_timeout: Optional[float] = None,
+        rrf_k: int = 60,
+        admission=None
+    ):
+        self.embedder = embedder
+        self.vector_store = vector_store
+        # Optional async callable producing a standalone rewrite of the latest turn
+        self.rewriter = rewriter
+        self.rewrite_timeout = rewrite_timeout if rewrite_timeout is not None else float(os.getenv("QUERY_REWRITE_TIMEOUT", "0.4"))
+        self.rrf_k = rrf_k
+        # Optional AdmissionController bounding in-flight embed/search work
+        self.admission = admission
+
+    @contextlib.asynccontextmanager
+    async def _stage(self, name: str):
+        # Admission slot when bounded; timed into the request's trace (slow-request log) either way
+        if self.admission is None:
+            with stage(name):
+                yield
+            return
+        async with self.admission.stage(name).slot():
+            with stage(name):
+                yield
+
+    def build_variants(self, messages: List[Dict[str, str]]) -> List[str]:
+        """
+        Static variants: the raw query and, for follow-ups, the history-fused query.
+        """
+        variants = [messages[-1]["content"]]
+        fused = fuse_history(messages)
+        if fused not in variants:
+            variants.append(fused)
+        return variants
+
+    async def _rewrite(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        try:
+            rewritten = await asyncio.wait_for(self.rewriter(messages), timeout=self.rewrite_timeout)
+            return rewritten.strip() if rewritten else None
+        except asyncio.TimeoutError:
+            print(f"Query rewrite exceeded {self.rewrite_timeout}s, skipping")
+        except Exception as e:
+            print(f"Query rewrite failed: {e}")
+        return None
+
+    async def retrieve(
+        self,
+        messages: List[Dict[str, str]],
+        limit: int = 5,
+        tenant_id: str = DEFAULT_TENANT_ID,
+        min_score: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        query_vector: Optional[np.ndarray] = None
+    ) -> List[Any]:
+        """
+        Fused hits for the latest turn. `query_vector`, when given, is the query embedding of the
+        raw latest message (e.g. from the FAQ lookup) and is not computed again.
+        """
+        start = time.perf_counter()
+        variants = self.build_variants(messages)
+
+        # Start the LLM rewrite first so it overlaps with embedding the static variants
+        rewrite_task = None
+        if self.rewriter is not None and len(messages) > 1:
+            rewrite_task = asyncio.create_task(self._rewrite(messages))
+
+        try:
+            if query_vector is None:
+                async with self._stage("embed"):
+                    vectors = await asyncio.to_thread(self.embedder.get_embeddings, variants, True)
+            else:
+                vectors = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+                if len(variants) > 1:
+                    async with self._stage("embed"):
+                        rest = await asyncio.to_thread(self.embedder.get_embeddings, variants[1:], True)
+                    vectors = np.concatenate([vectors, rest])
+        except BaseException:
+            if rewrite_task is not None:
+                rewrite_task.cancel()
+            raise
+
+        if rewrite_task is not None:
+            rewritten = await rewrite_task
+            if rewritten and rewritten not in variants:
+                variants.append(rewritten)
+                async with self._stage("embed"):
+                    extra = await asyncio.to_thread(self.embedder.get_embeddings, [rewritten], True)
+                vectors = np.concatenate([vectors, extra])
+
+        # One batched search for all variants; over-fetch so fusion has material to rerank
+        async with self._stage("search"):
+            ranked_lists = await self.vector_store.search_batch(
+                vectors,
+                limit=limit * 2,
+                tenant_id=tenant_id,
+                min_score=min_score,
+                filters=filters
+            )
+        fused = reciprocal_rank_fusion(ranked_lists, k=self.rrf_k)[:limit]
+
+        print(f"Multi-query retrieval: {len(variants)} variants, {len(fused)} hits in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return fused
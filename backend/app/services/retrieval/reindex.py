@@ -0,0 +1,374 @@
+"""
+reindex.py
+Online reindex of the document collection into a versioned shadow collection.
+
+1. Create `<alias>_v<timestamp>` with the document schema (optionally new index params)
+2. Copy every row from the live collection, re-embedding the stored chunk text (no re-parsing),
+   throttled so live searches keep their latency
+3. Catch up rows written during the copy, drop copies of rows deleted from the source since
+   (re-ingested documents), then verify row counts and sampled recall
+4. Point the alias at the new collection; readers follow it without a restart, and deletes that
+   raced the swap are applied once more
+
+Above BULK_IMPORT_MIN_ROWS the bulk copy goes through Milvus bulk import (NumPy shards in
+MinIO) into an unindexed target, and the index is built once afterwards.
+"""
+import os
+import time
+import uuid
+import random
+import asyncio
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from pymilvus import Collection, utility
+
+from app.services.retrieval.vector_store.milvus import (
+    MilvusClient, SCALAR_FIELDS, permission_column, permissions_are_array, schema_columns
+)
+from app.services.generation.embedding_cache import embedding_report
+from app.services.retrieval.chunk_store import attach_stored_fields
+from app.services.retrieval.bulk_import import BulkImporter, bulk_import_available
+
+class ReindexInProgress(RuntimeError):
+    pass
+
+@dataclass
+class ReindexJob:
+    job_id: str
+    reembed: bool = True
+    status: str = "pending" # pending, creating, copying, importing, catching_up, verifying, swapping, completed, failed
+    source: Optional[str] = None
+    target: Optional[str] = None
+    total: int = 0
+    copied: int = 0
+    # Copied rows removed again because the source deleted them during the job
+    deleted: int = 0
+    rows_per_sec: float = 0.0
+    throttled_seconds: float = 0.0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    verification: Dict[str, Any] = field(default_factory=dict)
+    # Embedding cache hits vs. encoded texts for this job
+    embedding: Dict[str, Any] = field(default_factory=dict)
+    # Bulk import summary when the copy went through bulk import
+    bulk_import: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["progress"] = round(self.copied / self.total, 4) if self.total else None
+        remaining = max(self.total - self.copied, 0)
+        data["eta_seconds"] = round(remaining / self.rows_per_sec, 1) if self.status == "copying" and self.rows_per_sec else None
+        return data
+
+def _count(collection: Collection) -> int:
+    rows = collection.query(expr="", output_fields=["count(*)"], consistency_level="Strong")
+    return int(rows[0]["count(*)"])
+
+class Reindexer:
+    def __init__(
+        self,
+        store: MilvusClient,
+        embedder=None,
+        index_params: Optional[Dict[str, Any]] = None,
+        batch_size: int = None,
+        max_rows_per_sec: float = None,
+        recall_sample: int = None,
+        recall_k: int = 10,
+        min_recall: float = None,
+        drop_old: bool = False,
+        admission=None,
+        bulk_min_rows: int = None
+    ):
+        self.store = store
+        # None copies the stored vectors as-is (index parameter change only)
+        self.embedder = embedder
+        self.index_params = index_params
+        self.batch_size = batch_size or int(os.getenv("REINDEX_BATCH_SIZE", "512"))
+        self.max_rows_per_sec = max_rows_per_sec if max_rows_per_sec is not None else float(os.getenv("REINDEX_MAX_ROWS_PER_SEC", "2000"))
+        self.recall_sample = recall_sample if recall_sample is not None else int(os.getenv("REINDEX_RECALL_SAMPLE", "200"))
+        self.recall_k = recall_k
+        self.min_recall = min_recall if min_recall is not None else float(os.getenv("REINDEX_MIN_RECALL", "0.95"))
+        self.drop_old = drop_old
+        # 0 disables bulk import
+        self.bulk_min_rows = bulk_min_rows if bulk_min_rows is not None else int(os.getenv("BULK_IMPORT_MIN_ROWS", "100000"))
+        # Live traffic gauges: the copy backs off while searches or embeddings are queueing
+        self.admission = admission
+        self.chunk_store = getattr(store, "chunk_store", None)
+        # Source ids copied so far; their chunk store records go if the old collection is dropped
+        self._copied_ids: List[int] = []
+        # Source id -> target id (auto ids differ), to mirror deletes made during the copy
+        self._id_map: Dict[int, int] = {}
+        self._rng = random.Random(0)
+        self._samples: List[tuple] = []
+        self._seen = 0
+
+    async def _throttle(self, job: ReindexJob, rows: int, batch_started: float, bulk: bool = False):
+        # Bulk shards go to MinIO rather than the serving Milvus, so only the live-traffic backoff applies
+        if self.max_rows_per_sec > 0 and not bulk:
+            pause = rows / self.max_rows_per_sec - (time.perf_counter() - batch_started)
+            if pause > 0:
+                job.throttled_seconds += pause
+                await asyncio.sleep(pause)
+        if self.admission is not None:
+            waited = 0.0
+            while waited < 5.0 and any(self.admission.stage(s).waiting > 0 for s in ("embed", "search")):
+                await asyncio.sleep(0.1)
+                waited += 0.1
+            job.throttled_seconds += waited
+
+    def _sample(self, rows: List[dict], vectors: np.ndarray):
+        # Reservoir sample of copied rows for the recall check
+        for row, vector in zip(rows, vectors):
+            self._seen += 1
+            if len(self._samples) < self.recall_sample:
+                self._samples.append((row["tenant_id"], row["text"], vector))
+            else:
+                slot = self._rng.randrange(self._seen)
+                if slot < self.recall_sample:
+                    self._samples[slot] = (row["tenant_id"], row["text"], vector)
+
+    async def _copy(
+        self,
+        job: ReindexJob,
+        source: Collection,
+        target: Collection,
+        expr: str,
+        importer: Optional[BulkImporter] = None
+    ) -> int:
+        """
+        Streams rows matching expr from source into target (or into the importer's shards).
+        Returns the largest primary key copied.
+        """
+        # Older collections may lack newer fields (e.g. embedding_model); copy what exists
+        source_fields = set(schema_columns(source))
+        scalar_fields = [f for f in SCALAR_FIELDS if f in source_fields]
+        output_fields = ["id"] + scalar_fields + ([] if self.embedder is not None else ["embedding"])
+        target_columns = schema_columns(target)
+        target_array = permissions_are_array(target)
+        iterator = await asyncio.to_thread(
+            source.query_iterator, batch_size=self.batch_size, expr=expr, output_fields=output_fields
+        )
+        max_id = -1
+        copy_started = time.perf_counter()
+        copied_here = 0
+        try:
+            while True:
+                batch_started = time.perf_counter()
+                rows = await asyncio.to_thread(iterator.next)
+                if not rows:
+                    break
+                # Lean sources keep text in the chunk store
+                await asyncio.to_thread(attach_stored_fields, self.chunk_store, rows)
+                columns = {f: [r[f] for r in rows] for f in SCALAR_FIELDS if f in rows[0]}
+                # Chunks stored before heading paths were recorded have none
+                columns["heading_path"] = [r.get("heading_path") or "" for r in rows]
+                if "access_permissions" in columns:
+                    # Legacy VARCHAR permissions become arrays in the new schema
+                    columns["access_permissions"] = permission_column(columns["access_permissions"], target_array)
+                if self.embedder is not None:
+                    vectors = await asyncio.to_thread(self.embedder.get_embeddings, [r["text"] for r in rows])
+                    columns["embedding_model"] = [self.embedder.model_name] * len(rows)
+                else:
+                    vectors = np.asarray([r["embedding"] for r in rows], dtype=np.float32)
+                    columns.setdefault("embedding_model", [""] * len(rows))
+                columns["embedding"] = vectors
+                if importer is not None:
+                    await asyncio.to_thread(importer.add, columns, [r["id"] for r in rows])
+                else:
+                    entities = [columns[name] for name in target_columns]
+                    result = await asyncio.to_thread(target.insert, entities)
+                    self._id_map.update(zip((r["id"] for r in rows), result.primary_keys))
+                    if self.chunk_store is not None and "text" not in target_columns:
+                        await asyncio.to_thread(self.chunk_store.put_many, result.primary_keys, rows)
+                self._copied_ids.extend(r["id"] for r in rows)
+
+                self._sample(rows, vectors)
+                max_id = max(max_id, max(r["id"] for r in rows))
+                job.copied += len(rows)
+                copied_here += len(rows)
+                job.rows_per_sec = round(copied_here / (time.perf_counter() - copy_started), 1)
+                await self._throttle(job, len(rows), batch_started, bulk=importer is not None)
+        finally:
+            iterator.close()
+        return max_id
+
+    async def _apply_deletes(self, job: ReindexJob, source: Collection, target: Collection):
+        """
+        Deletes the copies of rows that are no longer in the source (delete_document during the job),
+        found by diffing the copied ids against the source's current ids.
+        """
+        live = set()
+        iterator = await asyncio.to_thread(source.query_iterator, batch_size=16384, expr="id >= 0", output_fields=["id"])
+        try:
+            while True:
+                rows = await asyncio.to_thread(iterator.next)
+                if not rows:
+                    break
+                live.update(r["id"] for r in rows)
+        finally:
+            iterator.close()
+        gone = [self._id_map.pop(source_id) for source_id in [s for s in self._id_map if s not in live]]
+        lean = self.chunk_store is not None and "text" not in schema_columns(target)
+        for start in range(0, len(gone), self.batch_size):
+            batch = gone[start:start + self.batch_size]
+            await asyncio.to_thread(target.delete, expr=f"id in {batch}")
+            if lean:
+                await asyncio.to_thread(self.chunk_store.delete_many, batch)
+        if gone:
+            job.deleted += len(gone)
+            print(f"Removed {len(gone)} copied rows deleted from {job.source} during the reindex")
+
+    async def _verify(self, job: ReindexJob, source: Collection, target: Collection) -> bool:
+        source_count, target_count = await asyncio.gather(
+            asyncio.to_thread(_count, source), asyncio.to_thread(_count, target)
+        )
+        # Self-recall: each sampled chunk's own vector should find that chunk in the new index
+        found = 0
+        by_tenant: Dict[str, List[tuple]] = {}
+        for tenant_id, text, vector in self._samples:
+            by_tenant.setdefault(tenant_id, []).append((text, vector))
+        for tenant_id, samples in by_tenant.items():
+            results = await asyncio.to_thread(
+                target.search,
+                data=[v for _, v in samples],
+                anns_field="embedding",
+                param={"metric_type": "L2", "params": {"nprobe": 16}},
+                limit=self.recall_k,
+                expr=self.store._tenant_expr(tenant_id),
+                output_fields=["text"]
+            )
+            for (text, _), hits in zip(samples, results):
+                if any(hit.entity.get("text") == text for hit in hits):
+                    found += 1
+        recall = found / len(self._samples) if self._samples else 1.0
+        job.verification = {
+            "source_rows": source_count,
+            "target_rows": target_count,
+            "sampled": len(self._samples),
+            f"recall_at_{self.recall_k}": round(recall, 4),
+            "min_recall": self.min_recall,
+        }
+        ok = target_count >= source_count and recall >= self.min_recall
+        job.verification["passed"] = ok
+        return ok
+
+    async def run(self, job: ReindexJob):
+        alias = self.store.alias
+        embed_before = self.embedder.stats() if self.embedder is not None else None
+        try:
+            if not alias:
+                raise ValueError("MILVUS_ALIAS is empty; an online reindex needs an alias to swap")
+            source = Collection(alias)
+            job.source = source.describe().get("collection_name", self.store.collection_name)
+            job.target = f"{alias}_v{int(time.time())}"
+
+            # 1. Shadow collection (indexed after the import when bulk importing)
+            job.status = "creating"
+            job.total = await asyncio.to_thread(_count, source)
+            bulk = 0 < self.bulk_min_rows <= job.total and bulk_import_available()
+            if bulk:
+                target = await asyncio.to_thread(self.store.create_collection, job.target, self.index_params, build_index=False)
+            else:
+                target = await asyncio.to_thread(self.store.create_collection, job.target, self.index_params)
+
+            # 2. Bulk copy (writes keep landing in the source through the alias meanwhile)
+            job.status = "copying"
+            if bulk:
+                importer = await asyncio.to_thread(BulkImporter, target, self.chunk_store)
+                try:
+                    max_id = await self._copy(job, source, target, "id >= 0", importer)
+                    job.status = "importing"
+                    job.bulk_import = await asyncio.to_thread(importer.finish)
+                    self._id_map.update(importer.id_map)
+                finally:
+                    await asyncio.to_thread(importer.close)
+                await asyncio.to_thread(self.store.create_indexes, target, self.index_params)
+            else:
+                max_id = await self._copy(job, source, target, "id >= 0")
+
+            # 3. Catch up rows inserted during the copy; auto ids increase monotonically
+            job.status = "catching_up"
+            caught_up = await self._copy(job, source, target, f"id > {max_id}")
+            max_id = max(max_id, caught_up)
+            await self._apply_deletes(job, source, target)
+            await asyncio.to_thread(target.flush)
+            await asyncio.to_thread(target.load)
+
+            job.status = "verifying"
+            if not await self._verify(job, source, target):
+                raise RuntimeError(f"Verification failed: {job.verification}")
+
+            # 4. Atomic switch, then copy anything written between the catch-up and the swap
+            job.status = "swapping"
+            await asyncio.to_thread(utility.alter_alias, job.target, alias)
+            await self._copy(job, source, target, f"id > {max_id}")
+            await self._apply_deletes(job, source, target)
+            await asyncio.to_thread(target.flush)
+            print(f"Alias {alias} now points at {job.target} (was {job.source})")
+
+            if self.drop_old:
+                old = Collection(job.source)
+                await asyncio.to_thread(old.release)
+                await asyncio.to_thread(old.drop)
+                if self.chunk_store is not None:
+                    await asyncio.to_thread(self.chunk_store.delete_many, self._copied_ids)
+                print(f"Dropped {job.source}")
+            job.status = "completed"
+        except Exception as e:
+            print(f"Reindex {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            # The alias still points at the old collection; remove the partial copy
+            if job.target and job.target != job.source and utility.has_collection(job.target) and not self._swapped(alias, job):
+                utility.drop_collection(job.target)
+        finally:
+            if embed_before is not None:
+                self.embedder.flush_cache()
+                job.embedding = embedding_report(embed_before, self.embedder.stats())
+            job.finished_at = time.time()
+
+    @staticmethod
+    def _swapped(alias: str, job: ReindexJob) -> bool:
+        try:
+            return Collection(alias).describe().get("collection_name") == job.target
+        except Exception:
+            return False
+
+_jobs: Dict[str, ReindexJob] = {}
+_tasks: Dict[str, asyncio.Task] = {}
+
+def _reindex_running() -> bool:
+    return any(not task.done() for task in _tasks.values())
+
+async def start_reindex(reembed: bool = True, index_params: Optional[Dict[str, Any]] = None, drop_old: bool = False) -> ReindexJob:
+    """
+    Starts a reindex in the background of the running event loop; one job at a time.
+    """
+    if _reindex_running():
+        raise ReindexInProgress("A reindex job is already running")
+
+    from app.core.admission import get_admission_controller
+    embedder = None
+    if reembed:
+        # The API process's shared instance: a second model copy would double its memory.
+        # Loading it (first use) and connecting to Milvus block, so neither runs on the event loop
+        from app.services.generation.embeddings import get_embedding_service
+        embedder = await asyncio.to_thread(get_embedding_service)
+    store = await asyncio.to_thread(MilvusClient)
+    # Another request may have started a job while this one was waiting
+    if _reindex_running():
+        raise ReindexInProgress("A reindex job is already running")
+    reindexer = Reindexer(
+        store, embedder=embedder, index_params=index_params,
+        drop_old=drop_old, admission=get_admission_controller()
+    )
+    job = ReindexJob(job_id=uuid.uuid4().hex[:12], reembed=reembed)
+    _jobs[job.job_id] = job
+    _tasks[job.job_id] = asyncio.create_task(reindexer.run(job))
+    return job
+
+def get_reindex_job(job_id: str) -> Optional[ReindexJob]:
+    return _jobs.get(job_id)
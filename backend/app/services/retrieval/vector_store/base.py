@@ -0,0 +1,127 @@
+"""
+base.py
+Common interface for vector store backends and the factory that picks one.
+
+VECTOR_STORE_BACKEND selects the backend: "milvus" (default, vector_store/milvus.py) or "local"
+(in-process memory-mapped store, vector_store/local.py). Both return SearchHit lists with the
+same score semantics (cosine similarity; EmbeddingService always L2-normalizes).
+"""
+import os
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Union, Protocol, runtime_checkable
+
+import numpy as np
+
+from app.core.tenancy import DEFAULT_TENANT_ID, validate_tenant_id
+from app.services.chunking.base import Chunk
+
+@dataclass
+class SearchHit:
+    id: int
+    score: float
+    distance: float
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+# Permission every caller holds: chunks tagged with it are visible to all roles
+PUBLIC_PERMISSION = "public"
+# Milvus ARRAY<VARCHAR> bounds for access_permissions
+MAX_PERMISSIONS = 32
+MAX_PERMISSION_LENGTH = 128
+
+def permission_list(value: Union[str, List[str], None]) -> List[str]:
+    """
+    Distinct permissions from a list or a comma-separated string (the legacy VARCHAR form),
+    e.g. "role:customer_service,role:billing". An empty value means public.
+    """
+    items = value.split(",") if isinstance(value, str) else list(value or [])
+    permissions = list(dict.fromkeys(p.strip() for p in items if p and p.strip()))
+    if len(permissions) > MAX_PERMISSIONS or any(len(p) > MAX_PERMISSION_LENGTH for p in permissions):
+        raise ValueError(f"At most {MAX_PERMISSIONS} permissions of up to {MAX_PERMISSION_LENGTH} characters")
+    return permissions or [PUBLIC_PERMISSION]
+
+def allowed_permissions(roles: Union[str, List[str]]) -> List[str]:
+    # A chunk is visible when it shares one of these with the caller: the caller's roles or public
+    return list(dict.fromkeys(permission_list(roles) + [PUBLIC_PERMISSION]))
+
+def distance_to_score(distance: float) -> float:
+    # Squared L2 distance between unit vectors (EmbeddingService output): d = 2 - 2*cos
+    return 1.0 - distance / 2.0
+
+def score_to_distance(score: float) -> float:
+    return 2.0 * (1.0 - score)
+
+def build_columns(chunks: List[Union[Chunk, str]], metadata: Dict[str, Any], embeddings: np.ndarray) -> Dict[str, Any]:
+    """
+    Column-based data for one document's chunks, with the defaults every backend stores.
+    Chunk objects supply their own page and heading path; plain strings take the document's.
+    """
+    count = len(chunks)
+    chunks = [c if isinstance(c, Chunk) else Chunk(text=c) for c in chunks]
+    return {
+        "embedding": embeddings,
+        "text": [c.text for c in chunks],
+        "tenant_id": [validate_tenant_id(metadata.get("tenant_id", DEFAULT_TENANT_ID))] * count,
+        "document_id": [metadata.get("document_id", "unknown_doc")] * count,
+        "source": [metadata.get("source", "unknown")] * count,
+        "source_system": [metadata.get("source_system", "system")] * count,
+        "language": [metadata.get("language", "en")] * count,
+        "version": [metadata.get("version", "1.0")] * count,
+        "last_modified": [int(metadata.get("last_modified", 0))] * count,
+        "access_permissions": [permission_list(metadata.get("access_permissions"))] * count,
+        "page": [c.page or metadata.get("page", 0) for c in chunks],
+        "heading_path": [c.heading_path for c in chunks],
+        "embedding_model": [metadata.get("embedding_model", "")] * count,
+    }
+
+@runtime_checkable
+class VectorStore(Protocol):
+    async def upsert(self, chunks: List[Union[Chunk, str]], metadata: Dict[str, Any], embeddings: np.ndarray) -> bool:
+        """
+        Stores one document's chunks (Chunk objects or plain text) with their embeddings
+        (float32, one row per chunk).
+        """
+        ...
+
+    async def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        limit: int = 5,
+        tenant_id: str = DEFAULT_TENANT_ID,
+        min_score: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[SearchHit]]:
+        """
+        One list of hits per query vector, best first, restricted to the tenant.
+        Supported filters: document_id (str or list), language, last_modified_from, last_modified_to,
+        roles (the caller's roles: only chunks sharing one of them, or public chunks, are searched;
+        None searches regardless of permissions).
+        """
+        ...
+
+    async def search(
+        self, query_vector: np.ndarray, limit: int = 5, tenant_id: str = DEFAULT_TENANT_ID, roles: Optional[List[str]] = None
+    ) -> List[str]:
+        ...
+
+    async def delete_document(self, document_id: str, tenant_id: str = DEFAULT_TENANT_ID) -> int:
+        """
+        Removes every chunk of the document for the tenant. Returns the number of chunks removed.
+        """
+        ...
+
+_local_stores: Dict[str, Any] = {}
+
+def get_vector_store() -> VectorStore:
+    backend = os.getenv("VECTOR_STORE_BACKEND", "milvus").lower()
+    if backend == "milvus":
+        from app.services.retrieval.vector_store.milvus import MilvusClient
+        return MilvusClient()
+    if backend == "local":
+        from app.services.retrieval.vector_store.local import LocalVectorStore
+        # In-process data: one instance per path is shared by every caller
+        path = os.getenv("LOCAL_VECTOR_STORE_PATH", "")
+        if path not in _local_stores:
+            _local_stores[path] = LocalVectorStore(path or None)
+        return _local_stores[path]
+    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {backend}")
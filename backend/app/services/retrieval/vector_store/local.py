@@ -0,0 +1,337 @@
+"""
+local.py
+In-process vector store: memory-mapped float32 vectors with NumPy top-k search.
+
+Meant for hermetic tests and benchmarks, and for small tenants whose corpus fits in RAM.
+Vectors live in `vectors.f32` (grown by doubling) and row metadata in an append-only
+`rows.jsonl` where deletes are tombstone lines, so a store reopens from its directory.
+Without a path everything stays in memory.
+
+Search is exact by default: one matrix product of the queries against the rows that pass the
+tenant/document filters, then argpartition. With nlist > 0 the rows are clustered (k-means)
+once enough are stored, and each query only scans the rows of its nprobe nearest clusters.
+"""
+import os
+import json
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional, Union
+
+import numpy as np
+
+from app.core.tenancy import DEFAULT_TENANT_ID, validate_tenant_id
+from app.services.chunking.base import Chunk
+from app.services.retrieval.vector_store.base import SearchHit, allowed_permissions, build_columns, distance_to_score, permission_list
+
+ROW_FIELDS = [
+    "text", "tenant_id", "document_id", "source", "source_system",
+    "language", "version", "last_modified", "access_permissions", "page", "heading_path", "embedding_model"
+]
+# Same hit metadata as the Milvus backend
+OUTPUT_FIELDS = ["source", "page", "heading_path", "document_id", "tenant_id", "language", "last_modified"]
+# String fields filtered on, kept as integer codes per row
+CODED_FIELDS = ["tenant_id", "document_id", "language"]
+# k-means wants a few dozen points per cluster before it is worth training
+TRAIN_POINTS_PER_LIST = 39
+
+class LocalVectorStore:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        dim: int = 768,
+        nlist: int = None,
+        nprobe: int = None,
+        initial_capacity: int = 1024
+    ):
+        self.path = path
+        self.dim = dim
+        self.nlist = nlist if nlist is not None else int(os.getenv("LOCAL_STORE_NLIST", "0"))
+        self.nprobe = nprobe or int(os.getenv("LOCAL_STORE_NPROBE", "8"))
+        self.chunk_store = None
+        self.centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._count = 0
+        self._rows: List[Dict[str, Any]] = []
+        self._codes: Dict[str, Dict[str, int]] = {f: {} for f in CODED_FIELDS}
+        # Inverted index for the role filter: permission -> slots of the rows carrying it
+        self._permission_slots: Dict[str, List[int]] = {}
+        self._log = None
+
+        capacity = initial_capacity
+        replay = []
+        if path:
+            os.makedirs(path, exist_ok=True)
+            meta_path = os.path.join(path, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path, "r") as f:
+                    meta = json.load(f)
+                if meta.get("dim") != dim:
+                    raise ValueError(f"Local vector store {path} holds dim {meta.get('dim')} vectors, expected {dim}")
+            else:
+                with open(meta_path, "w") as f:
+                    json.dump({"dim": dim}, f)
+            log_path = os.path.join(path, "rows.jsonl")
+            if os.path.exists(log_path):
+                with open(log_path, "r") as f:
+                    replay = [json.loads(line) for line in f if line.strip()]
+            rows = sum(1 for r in replay if "deleted" not in r)
+            while capacity < rows:
+                capacity *= 2
+            self._log = open(log_path, "a")
+
+        self._vectors = self._open_vectors(capacity)
+        capacity = len(self._vectors)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._lists = np.full(capacity, -1, dtype=np.int32)
+        self._last_modified = np.zeros(capacity, dtype=np.int64)
+        self._coded = {f: np.zeros(capacity, dtype=np.int32) for f in CODED_FIELDS}
+
+        for record in replay:
+            if "deleted" in record:
+                self._alive[record["deleted"]] = False
+            else:
+                self._add_row(record)
+        if self._count:
+            self._sq_norms[:self._count] = np.einsum("ij,ij->i", self._vectors[:self._count], self._vectors[:self._count])
+            print(f"Opened local vector store {path} with {len(self)} chunks")
+        if self.nlist and len(self) >= self.nlist * TRAIN_POINTS_PER_LIST:
+            self.build_ivf()
+
+    def _open_vectors(self, capacity: int) -> np.ndarray:
+        if not self.path:
+            return np.zeros((capacity, self.dim), dtype=np.float32)
+        file_path = os.path.join(self.path, "vectors.f32")
+        size = capacity * self.dim * 4
+        if not os.path.exists(file_path) or os.path.getsize(file_path) < size:
+            # Sparse growth: existing rows keep their bytes, new ones read as zeros
+            with open(file_path, "ab") as f:
+                f.truncate(size)
+        capacity = os.path.getsize(file_path) // (self.dim * 4)
+        return np.memmap(file_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _grow(self, needed: int):
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        if self.path:
+            self._vectors.flush()
+            self._vectors = self._open_vectors(capacity)
+        else:
+            self._vectors = np.concatenate([self._vectors, np.zeros((capacity - len(self._vectors), self.dim), dtype=np.float32)])
+        extra = capacity - len(self._alive)
+
+        def pad(array, fill=0):
+            return np.concatenate([array, np.full(extra, fill, dtype=array.dtype)])
+        self._sq_norms = pad(self._sq_norms)
+        self._alive = pad(self._alive, False)
+        self._lists = pad(self._lists, -1)
+        self._last_modified = pad(self._last_modified)
+        self._coded = {f: pad(a) for f, a in self._coded.items()}
+
+    def _code(self, field: str, value: Any) -> int:
+        codes = self._codes[field]
+        return codes.setdefault(str(value), len(codes))
+
+    def _add_row(self, row: Dict[str, Any]):
+        slot = self._count
+        self._rows.append(row)
+        self._alive[slot] = True
+        self._last_modified[slot] = int(row.get("last_modified") or 0)
+        for f in CODED_FIELDS:
+            self._coded[f][slot] = self._code(f, row.get(f))
+        # Rows logged before permissions were lists hold a comma-separated string
+        for permission in permission_list(row.get("access_permissions")):
+            self._permission_slots.setdefault(permission, []).append(slot)
+        self._count += 1
+
+    def __len__(self) -> int:
+        return int(self._alive[:self._count].sum())
+
+    def _upsert(self, chunks: List[Union[Chunk, str]], metadata: Dict[str, Any], embeddings: np.ndarray):
+        columns = build_columns(chunks, metadata, embeddings)
+        with self._lock:
+            start = self._count
+            self._grow(start + len(chunks))
+            self._vectors[start:start + len(chunks)] = embeddings
+            self._sq_norms[start:start + len(chunks)] = np.einsum("ij,ij->i", embeddings, embeddings)
+            rows = [{f: columns[f][i] for f in ROW_FIELDS} for i in range(len(chunks))]
+            for row in rows:
+                self._add_row(row)
+            if self.centroids is not None:
+                self._lists[start:self._count] = self._nearest_centroid(embeddings)
+            if self._log is not None:
+                # Vectors first: a row line never points at unwritten vector bytes
+                self._vectors.flush()
+                self._log.write("".join(json.dumps(r) + "\n" for r in rows))
+                self._log.flush()
+        if self.nlist and self.centroids is None and len(self) >= self.nlist * TRAIN_POINTS_PER_LIST:
+            self.build_ivf()
+
+    async def upsert(self, chunks: List[Union[Chunk, str]], metadata: Dict[str, Any], embeddings: np.ndarray) -> bool:
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape != (len(chunks), self.dim):
+            raise ValueError(f"Expected embeddings of shape ({len(chunks)}, {self.dim}), got {embeddings.shape}")
+        await asyncio.to_thread(self._upsert, chunks, metadata, embeddings)
+        return True
+
+    def _nearest_centroid(self, vectors: np.ndarray, batch: int = 8192) -> np.ndarray:
+        c_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch):
+            part = vectors[start:start + batch]
+            out[start:start + batch] = np.argmin(c_norms[None, :] - 2.0 * part @ self.centroids.T, axis=1)
+        return out
+
+    def build_ivf(self, nlist: int = None, iterations: int = 10, sample: int = 100_000, seed: int = 0):
+        """
+        Clusters the stored vectors (k-means on a sample) and assigns every row to a list.
+        """
+        nlist = nlist or self.nlist
+        with self._lock:
+            slots = np.flatnonzero(self._alive[:self._count])
+            if len(slots) < nlist:
+                return
+            rng = np.random.default_rng(seed)
+            train = np.asarray(self._vectors[rng.choice(slots, size=min(sample, len(slots)), replace=False)])
+            self.centroids = train[rng.choice(len(train), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = self._nearest_centroid(train)
+                sums = np.zeros_like(self.centroids)
+                np.add.at(sums, assign, train)
+                counts = np.bincount(assign, minlength=nlist)
+                filled = counts > 0
+                # Empty clusters keep their previous centroid
+                self.centroids[filled] = sums[filled] / counts[filled, None]
+            self._lists[:self._count] = -1
+            self._lists[slots] = self._nearest_centroid(np.asarray(self._vectors[slots]))
+        print(f"Built IVF over {len(slots)} chunks with {nlist} lists")
+
+    def _candidates(self, tenant_id: str, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        n = self._count
+        tenant_code = self._codes["tenant_id"].get(validate_tenant_id(tenant_id))
+        if tenant_code is None:
+            return np.empty(0, dtype=np.int64)
+        mask = self._alive[:n] & (self._coded["tenant_id"][:n] == tenant_code)
+        filters = filters or {}
+
+        document_id = filters.get("document_id")
+        if document_id:
+            wanted = document_id if isinstance(document_id, (list, tuple, set)) else [document_id]
+            codes = [self._codes["document_id"][str(d)] for d in wanted if str(d) in self._codes["document_id"]]
+            mask &= np.isin(self._coded["document_id"][:n], codes)
+        if filters.get("language"):
+            mask &= self._coded["language"][:n] == self._codes["language"].get(str(filters["language"]), -1)
+        if filters.get("last_modified_from") is not None:
+            mask &= self._last_modified[:n] >= int(filters["last_modified_from"])
+        if filters.get("last_modified_to") is not None:
+            mask &= self._last_modified[:n] <= int(filters["last_modified_to"])
+        if filters.get("roles") is not None:
+            allowed = np.zeros(n, dtype=bool)
+            for permission in allowed_permissions(filters["roles"]):
+                allowed[self._permission_slots.get(permission, [])] = True
+            mask &= allowed
+        return np.flatnonzero(mask)
+
+    def _dots(self, query_vectors: np.ndarray, slots: np.ndarray) -> np.ndarray:
+        """
+        Inner products (slots x queries). When most rows pass the filters, the contiguous
+        matrix is scanned in one product instead of gathering the rows first.
+        """
+        if len(slots) * 4 >= self._count:
+            return (self._vectors[:self._count] @ query_vectors.T)[slots]
+        return self._vectors[slots] @ query_vectors.T
+
+    def _top_k(self, query: np.ndarray, dots: np.ndarray, slots: np.ndarray, limit: int):
+        # Squared L2 via |x|^2 - 2 q.x + |q|^2
+        distances = self._sq_norms[slots] - 2.0 * dots + float(query @ query)
+        k = min(limit, len(slots))
+        best = np.argpartition(distances, k - 1)[:k] if k < len(slots) else np.arange(len(slots))
+        best = best[np.argsort(distances[best])]
+        return slots[best], distances[best]
+
+    def _search_batch(self, query_vectors: np.ndarray, limit: int, tenant_id: str, min_score: Optional[float], filters):
+        with self._lock:
+            candidates = self._candidates(tenant_id, filters)
+            if self.centroids is None and len(candidates):
+                # Exact scan: every query in one matrix product
+                all_dots = self._dots(query_vectors, candidates)
+            elif len(candidates):
+                probes = np.argsort(
+                    np.einsum("ij,ij->i", self.centroids, self.centroids)[None, :] - 2.0 * query_vectors @ self.centroids.T,
+                    axis=1
+                )[:, :self.nprobe]
+                candidate_lists = self._lists[candidates]
+            batched = []
+            for i, query in enumerate(query_vectors):
+                if not len(candidates):
+                    batched.append([])
+                    continue
+                if self.centroids is None:
+                    slots, dots = candidates, all_dots[:, i]
+                else:
+                    slots = candidates[np.isin(candidate_lists, probes[i])]
+                    dots = self._vectors[slots] @ query
+                if not len(slots):
+                    batched.append([])
+                    continue
+                top_slots, distances = self._top_k(query, dots, slots, limit)
+                hits = []
+                for slot, distance in zip(top_slots, distances):
+                    distance = max(float(distance), 0.0)
+                    score = distance_to_score(distance)
+                    if min_score is not None and score < min_score:
+                        continue
+                    row = self._rows[slot]
+                    hits.append(SearchHit(
+                        id=int(slot),
+                        score=score,
+                        distance=distance,
+                        text=row["text"],
+                        metadata={f: row.get(f) for f in OUTPUT_FIELDS}
+                    ))
+                batched.append(hits)
+            return batched
+
+    async def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        limit: int = 5,
+        tenant_id: str = DEFAULT_TENANT_ID,
+        min_score: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[SearchHit]]:
+        query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+        if query_vectors.ndim == 1:
+            query_vectors = query_vectors.reshape(1, -1)
+        if len(query_vectors) == 0:
+            return []
+        return await asyncio.to_thread(self._search_batch, query_vectors, limit, tenant_id, min_score, filters)
+
+    async def search(self, query_vector: np.ndarray, limit: int = 5, tenant_id: str = DEFAULT_TENANT_ID, roles: Optional[List[str]] = None):
+        hits = await self.search_batch(
+            np.asarray(query_vector, dtype=np.float32).reshape(1, -1), limit=limit, tenant_id=tenant_id, filters={"roles": roles}
+        )
+        return [hit.text for hit in hits[0]]
+
+    def _delete_document(self, document_id: str, tenant_id: str) -> int:
+        with self._lock:
+            slots = self._candidates(tenant_id, {"document_id": document_id})
+            self._alive[slots] = False
+            if self._log is not None and len(slots):
+                self._log.write("".join(json.dumps({"deleted": int(s)}) + "\n" for s in slots))
+                self._log.flush()
+        return len(slots)
+
+    async def delete_document(self, document_id: str, tenant_id: str = DEFAULT_TENANT_ID) -> int:
+        return await asyncio.to_thread(self._delete_document, document_id, tenant_id)
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
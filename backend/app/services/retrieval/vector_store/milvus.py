@@ -3,17 +3,68 @@ milvus.py
 Client wrapper for Milvus Vector Database.
 """
 import os
-from typing import List, Dict, Any
+import json
+import asyncio
+from typing import List, Dict, Any, Optional, Union
+import numpy as np
 from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
+from app.core.tenancy import DEFAULT_TENANT_ID, validate_tenant_id
+from app.services.chunking.base import MAX_HEADING_PATH, Chunk
+from app.services.retrieval.chunk_store import STORED_FIELDS, get_chunk_store
+from app.services.retrieval.vector_store.base import (
+    MAX_PERMISSION_LENGTH, MAX_PERMISSIONS, SearchHit, allowed_permissions, build_columns, distance_to_score,
+    permission_list, score_to_distance
+)
+
+SEARCH_OUTPUT_FIELDS = ["text", "source", "page", "heading_path", "document_id", "tenant_id", "language", "last_modified"]
+
+DEFAULT_INDEX_PARAMS = {
+    "metric_type": "L2",
+    "index_type": "IVF_FLAT",
+    "params": {"nlist": 1024}
+}
+
+# Non-vector columns in schema order (after `id` and `embedding`)
+SCALAR_FIELDS = [
+    "text", "tenant_id", "document_id", "source", "source_system",
+    "language", "version", "last_modified", "access_permissions", "page", "heading_path", "embedding_model"
+]
+
+def schema_columns(collection: Collection) -> List[str]:
+    """
+    Insertable field names in schema order (the auto-id primary key is excluded).
+    Collections created before a field was added simply do not list it.
+    """
+    return [f.name for f in collection.schema.fields if not getattr(f, "auto_id", False)]
+
+def permissions_are_array(collection: Collection) -> bool:
+    """
+    True when access_permissions is ARRAY<VARCHAR>; collections created before it was are VARCHAR.
+    """
+    return any(f.name == "access_permissions" and getattr(f, "dtype", None) == DataType.ARRAY for f in collection.schema.fields)
+
+def permission_column(values: List[Any], as_array: bool) -> List[Any]:
+    # Lists for ARRAY collections, comma-separated strings for legacy VARCHAR ones
+    return [permission_list(v) if as_array else ",".join(permission_list(v)) for v in values]
 
 class MilvusClient:
     def __init__(self):
         self.host = os.getenv("MILVUS_HOST")
         self.port = os.getenv("MILVUS_PORT")
-        self.collection_name = "documents_768"
+        self.collection_name = os.getenv("MILVUS_COLLECTION", "documents_768")
+        # Reads and writes go through this alias so a reindexed collection can be swapped in atomically
+        self.alias = os.getenv("MILVUS_ALIAS", "documents")
         self.dim = 768 # e5-base-v2 dim
+        # Physical partitions backing the tenant_id partition key (tenants are hashed into these)
+        self.num_partitions = int(os.getenv("MILVUS_NUM_PARTITIONS", "64"))
+        # Optional side store for chunk text; new collections then omit the text columns
+        self.chunk_store = get_chunk_store()
         self._connect()
         self._ensure_collection()
+        self.fields = set(schema_columns(self.collection))
+        self.permissions_array = permissions_are_array(self.collection)
+        if not self.permissions_array:
+            print(f"Warning: {self.collection.name} stores access_permissions as VARCHAR; role filters only match single-permission chunks. Reindex to migrate.")
 
     def _connect(self):
         try:
@@ -22,70 +73,132 @@ class MilvusClient:
         except Exception as e:
             print(f"Failed to connect to Milvus: {e}")
 
-    def _ensure_collection(self):
-        if not utility.has_collection(self.collection_name):
-            fields = [
-                FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-                FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.dim),
-                FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
-                
-                # --- Multi-tenant & Metadata Layer Fields ---
-                FieldSchema(name="tenant_id", dtype=DataType.VARCHAR, max_length=64),
-                FieldSchema(name="document_id", dtype=DataType.VARCHAR, max_length=256),
-                FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=512),
-                FieldSchema(name="source_system", dtype=DataType.VARCHAR, max_length=64),
-                FieldSchema(name="language", dtype=DataType.VARCHAR, max_length=16),
-                FieldSchema(name="version", dtype=DataType.VARCHAR, max_length=32),
-                FieldSchema(name="last_modified", dtype=DataType.INT64),
-                FieldSchema(name="access_permissions", dtype=DataType.VARCHAR, max_length=1024),
-                FieldSchema(name="page", dtype=DataType.INT64)
-            ]
-            schema = CollectionSchema(fields, "Document chunks with metadata layer")
-            collection = Collection(self.collection_name, schema)
-            
-            # Create index for faster search (L2 for vectors)
-            index_params = {
-                "metric_type": "L2",
-                "index_type": "IVF_FLAT",
-                "params": {"nlist": 1024}
-            }
-            collection.create_index(field_name="embedding", index_params=index_params)
+    def create_collection(
+        self,
+        name: str,
+        index_params: Optional[Dict[str, Any]] = None,
+        lean: bool = None,
+        build_index: bool = True
+    ) -> Collection:
+        """
+        Creates a collection with the document schema and indexes. Also used by the reindex job
+        to build versioned collections. A lean collection (default when CHUNK_STORE is set) leaves
+        the text and display-only metadata to the chunk store. Bulk loads pass build_index=False
+        and call create_indexes once the data is in.
+        """
+        if lean is None:
+            lean = self.chunk_store is not None
+        fields = [
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.dim),
+            FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
             
-            # Create scalar index for tenant-based filtering
-            collection.create_index(field_name="tenant_id", index_name="idx_tenant")
-            
-            print(f"Created collection {self.collection_name} with advanced metadata schema.")
-        else:
-            print(f"Collection {self.collection_name} exists")
-            self.collection = Collection(self.collection_name)
-            self.collection.load()
+            # --- Multi-tenant & Metadata Layer Fields ---
+            # tenant_id is the partition key: a tenant filter only touches that tenant's partition
+            FieldSchema(name="tenant_id", dtype=DataType.VARCHAR, max_length=64, is_partition_key=True),
+            FieldSchema(name="document_id", dtype=DataType.VARCHAR, max_length=256),
+            FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=512),
+            FieldSchema(name="source_system", dtype=DataType.VARCHAR, max_length=64),
+            FieldSchema(name="language", dtype=DataType.VARCHAR, max_length=16),
+            FieldSchema(name="version", dtype=DataType.VARCHAR, max_length=32),
+            FieldSchema(name="last_modified", dtype=DataType.INT64),
+            # Roles that may see the chunk (e.g. ["role:customer_service"], or ["public"]); INVERTED-indexed
+            FieldSchema(
+                name="access_permissions", dtype=DataType.ARRAY, element_type=DataType.VARCHAR,
+                max_capacity=MAX_PERMISSIONS, max_length=MAX_PERMISSION_LENGTH
+            ),
+            FieldSchema(name="page", dtype=DataType.INT64),
+            # Enclosing section titles of the chunk, e.g. "Setup > Network"
+            FieldSchema(name="heading_path", dtype=DataType.VARCHAR, max_length=MAX_HEADING_PATH),
+            # Model that produced the vector, e.g. intfloat/e5-base-v2
+            FieldSchema(name="embedding_model", dtype=DataType.VARCHAR, max_length=128)
+        ]
+        if lean:
+            fields = [f for f in fields if f.name not in STORED_FIELDS]
+        schema = CollectionSchema(fields, "Document chunks with metadata layer")
+        collection = Collection(name, schema, num_partitions=self.num_partitions)
+        if build_index:
+            self.create_indexes(collection, index_params)
+        
+        print(f"Created collection {name} with advanced metadata schema.")
+        return collection
 
-    async def upsert(self, chunks: List[str], metadata: Dict[str, Any], embeddings: List[List[float]]):
-        print(f"Upserting {len(chunks)} chunks to Milvus collection {self.collection_name}")
+    @staticmethod
+    def create_indexes(collection: Collection, index_params: Optional[Dict[str, Any]] = None):
+        # Create index for faster search (L2 for vectors)
+        collection.create_index(field_name="embedding", index_params=index_params or DEFAULT_INDEX_PARAMS)
         
-        collection = Collection(self.collection_name)
+        # Create scalar index for tenant-based filtering
+        collection.create_index(field_name="tenant_id", index_name="idx_tenant")
+        # Inverted index: the role pre-filter (array_contains_any) looks up the matching rows
+        # instead of scanning every row's array
+        if permissions_are_array(collection):
+            collection.create_index(field_name="access_permissions", index_name="idx_access", index_params={"index_type": "INVERTED"})
+
+    @staticmethod
+    def drop_indexes(collection: Collection) -> Optional[Dict[str, Any]]:
+        """
+        Releases the collection and drops its indexes ahead of a bulk load into it.
+        Returns the vector index params so they can be restored with create_indexes.
+        """
+        index_params = None
+        collection.release()
+        for index in collection.indexes:
+            if index.field_name == "embedding":
+                index_params = index.params
+            collection.drop_index(index_name=index.index_name)
+        return index_params
+
+    def _ensure_collection(self):
+        if self.alias and utility.has_collection(self.alias):
+            # The alias is resolved server-side on every call, so this follows alias swaps
+            print(f"Using alias {self.alias}")
+            self.collection = Collection(self.alias)
+        else:
+            if not utility.has_collection(self.collection_name):
+                self.collection = self.create_collection(self.collection_name)
+            else:
+                print(f"Collection {self.collection_name} exists")
+                self.collection = Collection(self.collection_name)
+            if self.alias:
+                utility.create_alias(self.collection_name, self.alias)
+                print(f"Created alias {self.alias} -> {self.collection_name}")
+                self.collection = Collection(self.alias)
+        if getattr(self.collection.schema, "partition_key_field", None) is None:
+            # Legacy collections still isolate tenants through the filter, but scan every segment
+            print(f"Warning: {self.collection.name} has no tenant partition key; re-ingest to enable partition pruning.")
+        self.collection.load()
+
+    @staticmethod
+    def _tenant_expr(tenant_id: str) -> str:
+        # Validated ids contain no quotes or backslashes, so quoting cannot be broken out of
+        return f'tenant_id == "{validate_tenant_id(tenant_id)}"'
+
+    async def upsert(self, chunks: List[Union[Chunk, str]], metadata: Dict[str, Any], embeddings: np.ndarray):
+        print(f"Upserting {len(chunks)} chunks to Milvus collection {self.collection.name}")
         
-        # Prepare data for insertion (Milvus expects column-based data)
-        # Order must match FieldSchema in _ensure_collection (excluding auto_id if applicable, 
-        # but here we must omit 'id' if auto_id=True)
+        # pymilvus consumes the float32 matrix row by row; make sure it is one contiguous block
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape != (len(chunks), self.dim):
+            raise ValueError(f"Expected embeddings of shape ({len(chunks)}, {self.dim}), got {embeddings.shape}")
         
-        count = len(chunks)
-        entities = [
-            embeddings,                                         # embedding
-            chunks,                                             # text
-            [metadata.get("tenant_id", "default_tenant")] * count, # tenant_id
-            [metadata.get("document_id", "unknown_doc")] * count,  # document_id
-            [metadata.get("source", "unknown")] * count,        # source
-            [metadata.get("source_system", "system")] * count,  # source_system
-            [metadata.get("language", "en")] * count,           # language
-            [metadata.get("version", "1.0")] * count,           # version
-            [int(metadata.get("last_modified", 0))] * count,    # last_modified
-            [metadata.get("access_permissions", "public")] * count, # access_permissions
-            [metadata.get("page", 0)] * count                   # page
-        ]
+        collection = self.collection
+        columns = self.build_columns(chunks, metadata, embeddings)
+        if not self.permissions_array:
+            columns["access_permissions"] = permission_column(columns["access_permissions"], as_array=False)
+        entities = [columns[name] for name in schema_columns(collection)]
         
         try:
-            collection.insert(entities)
+            result = collection.insert(entities)
+            if self.chunk_store is not None:
+                # Keyed by the auto ids Milvus just assigned
+                records = [{f: columns[f][i] for f in STORED_FIELDS} for i in range(len(chunks))]
+                try:
+                    await asyncio.to_thread(self.chunk_store.put_many, result.primary_keys, records)
+                except Exception:
+                    # Lean rows without their text would surface as empty hits; take them back out
+                    await asyncio.to_thread(collection.delete, expr=f"id in {list(result.primary_keys)}")
+                    raise
             collection.flush()
             print("Upsert successful")
             return True
@@ -93,31 +206,135 @@ class MilvusClient:
             print(f"Upsert failed: {e}")
             return False
 
-    async def search(self, query_vector: List[float], limit: int = 5, tenant_id: str = "default_tenant"):
-        print(f"Searching Milvus for tenant: {tenant_id}...")
-        collection = Collection(self.collection_name)
-        collection.load()
-        
+    # Column-based data for one document; shared with the bulk-import writer
+    build_columns = staticmethod(build_columns)
+
+    def _build_expr(self, tenant_id: str, filters: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Builds the boolean filter for a search. Tenant isolation is always applied;
+        supported filters: document_id (str or list), language, last_modified_from, last_modified_to,
+        roles (the caller's roles; None skips the permission check).
+        String values are JSON-quoted so they cannot break out of the expression.
+        """
+        clauses = [self._tenant_expr(tenant_id)]
+        filters = filters or {}
+
+        document_id = filters.get("document_id")
+        if isinstance(document_id, (list, tuple, set)):
+            clauses.append(f"document_id in [{', '.join(json.dumps(str(d)) for d in document_id)}]")
+        elif document_id:
+            clauses.append(f"document_id == {json.dumps(str(document_id))}")
+
+        if filters.get("language"):
+            clauses.append(f"language == {json.dumps(str(filters['language']))}")
+        if filters.get("last_modified_from") is not None:
+            clauses.append(f"last_modified >= {int(filters['last_modified_from'])}")
+        if filters.get("last_modified_to") is not None:
+            clauses.append(f"last_modified <= {int(filters['last_modified_to'])}")
+        if filters.get("roles") is not None:
+            # Pre-filter inside the ANN search: top-k is taken among the chunks the caller may see
+            allowed = "[" + ", ".join(json.dumps(p) for p in allowed_permissions(filters["roles"])) + "]"
+            if self.permissions_array:
+                clauses.append(f"array_contains_any(access_permissions, {allowed})")
+            else:
+                clauses.append(f"access_permissions in {allowed}")
+
+        return " and ".join(clauses)
+
+    async def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        limit: int = 5,
+        tenant_id: str = DEFAULT_TENANT_ID,
+        min_score: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[SearchHit]]:
+        """
+        Searches many query vectors in a single RPC.
+        Returns one list of SearchHit per query, best first. Hits scoring below
+        min_score (cosine similarity) are pruned server-side.
+        """
+        query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+        if query_vectors.ndim == 1:
+            query_vectors = query_vectors.reshape(1, -1)
+        if len(query_vectors) == 0:
+            return []
+        print(f"Batch searching Milvus with {len(query_vectors)} queries for tenant: {tenant_id}...")
+
         search_params = {
             "metric_type": "L2",
             "params": {"nprobe": 10},
         }
-        
-        # Enforce tenant isolation via expression filter
-        expr = f"tenant_id == '{tenant_id}'"
-        
-        results = collection.search(
-            data=[query_vector], 
-            anns_field="embedding", 
-            param=search_params, 
-            limit=limit, 
+        if min_score is not None:
+            # Range search: keep hits whose squared L2 distance is under the equivalent radius
+            search_params["params"]["radius"] = score_to_distance(min_score)
+
+        # Enforce tenant isolation (with tenant_id as partition key Milvus prunes to that tenant's partition)
+        # and, when roles are given, the permission check
+        expr = self._build_expr(tenant_id, filters)
+
+        # pymilvus is blocking; keep the event loop free while the RPC is in flight
+        results = await asyncio.to_thread(
+            self.collection.search,
+            data=list(query_vectors),
+            anns_field="embedding",
+            param=search_params,
+            limit=limit,
             expr=expr,
-            output_fields=["text", "source", "page", "document_id", "tenant_id"]
+            output_fields=[f for f in SEARCH_OUTPUT_FIELDS if f in self.fields]
         )
-        
-        retrieved = []
+
+        batched = []
         for hits in results:
+            query_hits = []
             for hit in hits:
-                retrieved.append(hit.entity.get("text"))
-                
-        return retrieved
+                score = distance_to_score(hit.distance)
+                if min_score is not None and score < min_score:
+                    continue
+                query_hits.append(SearchHit(
+                    id=hit.id,
+                    score=score,
+                    distance=hit.distance,
+                    text=hit.entity.get("text"),
+                    metadata={f: hit.entity.get(f) for f in SEARCH_OUTPUT_FIELDS if f != "text"}
+                ))
+            batched.append(query_hits)
+
+        if self.chunk_store is not None and "text" not in self.fields:
+            await self._resolve_text(batched)
+        return batched
+
+    async def _resolve_text(self, batched: List[List[SearchHit]]):
+        # One lookup for the hits of every query in the batch
+        ids = list({hit.id for hits in batched for hit in hits})
+        if not ids:
+            return
+        records = await asyncio.to_thread(self.chunk_store.get_many, ids)
+        for hits in batched:
+            for hit in hits:
+                record = records.get(hit.id)
+                if record is None:
+                    print(f"Chunk {hit.id} missing from the chunk store")
+                    hit.text = ""
+                    continue
+                hit.text = record["text"]
+                hit.metadata["source"] = record.get("source")
+                hit.metadata["heading_path"] = record.get("heading_path") or ""
+
+    async def delete_document(self, document_id: str, tenant_id: str = DEFAULT_TENANT_ID) -> int:
+        expr = self._build_expr(tenant_id, {"document_id": document_id})
+        # Resolve primary keys first: Milvus 2.3 deletes by primary key expressions
+        rows = await asyncio.to_thread(self.collection.query, expr=expr, output_fields=["id"], consistency_level="Strong")
+        ids = [r["id"] for r in rows]
+        if ids:
+            await asyncio.to_thread(self.collection.delete, expr=f"id in {ids}")
+            if self.chunk_store is not None:
+                await asyncio.to_thread(self.chunk_store.delete_many, ids)
+        print(f"Deleted {len(ids)} chunks of {document_id} for tenant {tenant_id}")
+        return len(ids)
+
+    async def search(self, query_vector: np.ndarray, limit: int = 5, tenant_id: str = DEFAULT_TENANT_ID, roles: Optional[List[str]] = None):
+        print(f"Searching Milvus for tenant: {tenant_id}...")
+        query_vector = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        hits = await self.search_batch(query_vector, limit=limit, tenant_id=tenant_id, filters={"roles": roles})
+        return [hit.text for hit in hits[0]]
@@ -11,7 +11,7 @@ celery_app = Celery(
     "worker",
     broker=redis_url,
     backend=redis_url,
-    include=["app.workers.tasks.ingestion_tasks"]
+    include=["app.workers.tasks.ingestion_tasks", "app.workers.tasks.profiling_tasks"]
 )
 
 celery_app.conf.update(
@@ -3,16 +3,24 @@ ingestion_tasks.py
 Celery tasks for document ingestion.
 """
 from app.workers.celery_app import celery_app
-from app.services.ingestion.orchestrator import IngestionOrchestrator
+from app.core.profiling import get_slow_request_log
 import asyncio
 
 @celery_app.task(name="ingest_pipeline")
 def run_ingest_pipeline(doc_id: str, content: str):
     print(f"Task received: ingest_pipeline for {doc_id}")
     
+    # Imported on first use so worker startup (and diagnostics tasks) don't load the model stack
+    from app.services.ingestion.orchestrator import IngestionOrchestrator
+
     # Run async orchestrator in sync task
     orchestrator = IngestionOrchestrator()
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(orchestrator.ingest_document({"id": doc_id}, content))
+    slow_log = get_slow_request_log()
+    trace = slow_log.begin("ingest", document_id=doc_id)
+    try:
+        loop.run_until_complete(orchestrator.ingest_document({"id": doc_id}, content))
+    finally:
+        slow_log.finish(trace)
     
     return {"status": "success", "doc_id": doc_id}
@@ -0,0 +1,33 @@
+"""
+profiling_tasks.py
+Celery task exposing the worker process's tracemalloc tracker and slow-request log.
+
+With a prefork pool each child process has its own tracker; replies include the pid so
+snapshots and diffs can be matched to the child that took them (run the worker with
+--concurrency=1 while chasing a leak).
+"""
+from app.workers.celery_app import celery_app
+from app.core.profiling import get_memory_tracker, get_slow_request_log
+
+ACTIONS = {"status", "start", "snapshot", "diff", "stop", "slow_requests"}
+
+@celery_app.task(name="worker_diagnostics")
+def worker_diagnostics(action: str, frames: int = 25, from_id: int = None, to_id: int = None, limit: int = 25):
+    tracker = get_memory_tracker()
+    try:
+        if action == "status":
+            return tracker.status()
+        if action == "start":
+            return tracker.start(frames)
+        if action == "snapshot":
+            return tracker.snapshot(limit)
+        if action == "diff":
+            return tracker.diff(from_id, to_id, limit)
+        if action == "stop":
+            return tracker.stop()
+        if action == "slow_requests":
+            log = get_slow_request_log()
+            return {**log.metrics(), "entries": log.entries(limit)}
+    except (RuntimeError, KeyError) as e:
+        return {"error": str(e), **tracker.status()}
+    return {"error": f"Unknown action {action!r}"}
@@ -0,0 +1,113 @@
+"""
+bench_bulk_import.py
+Rows/sec of the bulk-import path vs the row-insert path, against a live Milvus + MinIO.
+
+- insert path: MilvusClient.upsert per document (column lists, one insert RPC + flush each),
+  into an indexed collection (previous behaviour for every load)
+- bulk path:   BulkImporter NumPy shards -> MinIO -> do_bulk_insert, index built once at the end
+
+Both load the same synthetic rows (random unit vectors, texts sampled from resources/source_docs)
+into throwaway collections, which are dropped afterwards. Embedding time is excluded.
+
+Run: python benchmarks/bench_bulk_import.py [--rows 200000] [--chunks-per-doc 50]
+     (MILVUS_HOST/MILVUS_PORT and MINIO_ADDRESS must point at the running stack)
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "backend"))
+
+from pymilvus import utility
+from app.services.retrieval.vector_store.milvus import MilvusClient
+from app.services.retrieval.bulk_import import BulkImporter
+
+SOURCE_DIR = os.path.join(project_root, "resources", "source_docs")
+
+
+def sample_texts(chunk_chars: int = 1000):
+    texts = []
+    for name in sorted(os.listdir(SOURCE_DIR)):
+        if name.endswith((".txt", ".html")):
+            with open(os.path.join(SOURCE_DIR, name), "r", encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+            texts.extend(text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars))
+    return [t for t in texts if t.strip()]
+
+
+def documents(rows: int, per_doc: int, dim: int):
+    texts = sample_texts()
+    rng = np.random.default_rng(0)
+    for doc, start in enumerate(range(0, rows, per_doc)):
+        count = min(per_doc, rows - start)
+        vectors = rng.standard_normal((count, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        chunks = [texts[(start + i) % len(texts)] for i in range(count)]
+        metadata = {"tenant_id": f"tenant_{doc % 8}", "document_id": f"doc{doc}", "source": f"doc{doc}.pdf",
+                    "embedding_model": "bench"}
+        yield chunks, metadata, vectors
+
+
+async def insert_path(store: MilvusClient, name: str, args) -> float:
+    store.collection = store.create_collection(name)
+    started = time.perf_counter()
+    for chunks, metadata, vectors in documents(args.rows, args.chunks_per_doc, store.dim):
+        await store.upsert(chunks, metadata, vectors)
+    # Same end state as the bulk path: every row indexed
+    utility.wait_for_index_building_complete(name)
+    return time.perf_counter() - started
+
+
+def bulk_path(store: MilvusClient, name: str, args) -> float:
+    collection = store.create_collection(name, build_index=False)
+    started = time.perf_counter()
+    importer = BulkImporter(collection, chunk_store=store.chunk_store)
+    try:
+        for chunks, metadata, vectors in documents(args.rows, args.chunks_per_doc, store.dim):
+            importer.add(store.build_columns(chunks, metadata, vectors))
+        importer.finish()
+    finally:
+        importer.close()
+    store.create_indexes(collection)
+    utility.wait_for_index_building_complete(name)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunks-per-doc", type=int, default=50)
+    parser.add_argument("--skip-insert", action="store_true", help="Only time the bulk path")
+    args = parser.parse_args()
+
+    store = MilvusClient()
+    # Keep benchmark rows out of the real chunk store (throwaway collections are created full)
+    store.chunk_store = None
+    suffix = int(time.time())
+    names = {"insert": f"bench_insert_{suffix}", "bulk": f"bench_bulk_{suffix}"}
+    timings = {}
+    try:
+        if not args.skip_insert:
+            timings["insert"] = asyncio.run(insert_path(store, names["insert"], args))
+        timings["bulk"] = bulk_path(store, names["bulk"], args)
+    finally:
+        for name in names.values():
+            if utility.has_collection(name):
+                utility.drop_collection(name)
+
+    print(f"\nLoading {args.rows} rows ({args.chunks_per_doc} chunks per document)")
+    print(f"{'path':<8} {'seconds':>10} {'rows/sec':>12}")
+    for path, seconds in timings.items():
+        print(f"{path:<8} {seconds:>10.1f} {args.rows / seconds:>12,.0f}")
+    if "insert" in timings:
+        print(f"Speedup: {timings['insert'] / timings['bulk']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+bench_chunk_store.py
+Milvus memory per million chunks with the text inline vs in the chunk store, plus the latency
+of the extra lookup the lean layout adds to every search.
+
+Chunk texts are sampled from resources/source_docs (text files, split like the ingestion
+chunker); the memory model counts the vector, the scalar fields Milvus keeps resident for
+filtering/output and, for the full layout, the text and display metadata.
+
+Run: python benchmarks/bench_chunk_store.py [--chunks 200000] [--top-k 5] [--queries 2000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "backend"))
+
+from app.services.retrieval.chunk_store import ChunkStore
+
+SOURCE_DIR = os.path.join(project_root, "resources", "source_docs")
+DIM = 768
+# Per-row bytes of the scalar fields kept in both layouts (ids, tenant, language, page, ...)
+SCALAR_BYTES = 8 + 32 + 36 + 4 + 8 + 32 + 8 + 24
+
+
+def sample_chunks(chunk_chars: int = 1000):
+    chunks = []
+    for name in sorted(os.listdir(SOURCE_DIR)):
+        if not name.endswith((".txt", ".html", ".md")):
+            continue
+        with open(os.path.join(SOURCE_DIR, name), "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        chunks.extend(text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars))
+    return [c for c in chunks if c.strip()]
+
+
+def record(text: str, i: int):
+    return {"text": text, "source": f"/resources/source_docs/doc-{i % 50}.pdf", "source_system": "local_filesystem", "version": "1.0"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    texts = sample_chunks()
+    records = [record(texts[i % len(texts)], i) for i in range(args.chunks)]
+    stored_bytes = np.mean([sum(len(str(v).encode("utf-8")) for v in r.values()) for r in records[:len(texts)]])
+
+    vector_bytes = DIM * 4
+    full = vector_bytes + SCALAR_BYTES + stored_bytes
+    lean = vector_bytes + SCALAR_BYTES
+    print(f"Sampled {len(texts)} chunks from {SOURCE_DIR}; {stored_bytes:.0f} B of text + display metadata per chunk")
+    print(f"{'layout':<8} {'bytes/chunk':>12} {'GB per 1M chunks':>18}")
+    print(f"{'full':<8} {full:>12.0f} {full * 1e6 / 1e9:>18.2f}")
+    print(f"{'lean':<8} {lean:>12.0f} {lean * 1e6 / 1e9:>18.2f}")
+    print(f"Milvus memory saved: {(full - lean) / full:.1%}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ChunkStore(os.path.join(tmp, "chunks.db"))
+        ids = np.arange(1, args.chunks + 1, dtype=np.int64) + (1 << 56)
+        start = time.perf_counter()
+        for i in range(0, args.chunks, 10_000):
+            store.put_many(ids[i:i + 10_000].tolist(), records[i:i + 10_000])
+        write_seconds = time.perf_counter() - start
+        stats = store.stats()
+        raw = sum(len(str(r["text"]).encode("utf-8")) for r in records)
+        print(f"\nChunk store ({stats['codec']}): {args.chunks / write_seconds:,.0f} chunks/s written, "
+              f"{stats['file_bytes'] / 1e6:.1f} MB on disk for {raw / 1e6:.1f} MB of text "
+              f"({stats['payload_bytes'] / raw:.2f}x)")
+
+        rng = np.random.default_rng(0)
+        timings = []
+        for _ in range(args.queries):
+            hit_ids = rng.choice(ids, size=args.top_k, replace=False).tolist()
+            start = time.perf_counter()
+            store.get_many(hit_ids)
+            timings.append(time.perf_counter() - start)
+        timings = np.array(timings) * 1000
+        print(f"Lookup of {args.top_k} hits: p50 {np.percentile(timings, 50):.3f} ms, p99 {np.percentile(timings, 99):.3f} ms")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
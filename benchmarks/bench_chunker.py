@@ -0,0 +1,82 @@
+"""
+bench_chunker.py
+Chunking throughput and token-limit check: the token-exact TokenChunker against the 1000/200
+character split SemanticChunker falls back to.
+
+The corpus is resources/source_docs (text and HTML read as plain text, PDFs via Docling when it
+is installed), repeated --repeat times. Every chunk is re-encoded as the embedding model sees it
+("passage: " prefix plus special tokens) and counted against the model limit: chunks over it are
+silently truncated at embedding time. Exits 1 when a token-mode chunk exceeds the limit.
+
+Requires transformers (the model's fast tokenizer).
+Run: python benchmarks/bench_chunker.py [--max-tokens 512] [--overlap 50] [--repeat 5]
+"""
+import os
+import sys
+import time
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "backend"))
+
+from app.services.chunking.semantic import SemanticChunker
+from app.services.chunking.token_chunker import TokenChunker, load_tokenizer
+
+SOURCE_DIR = os.path.join(project_root, "resources", "source_docs")
+
+
+def load_corpus():
+    documents = []
+    for name in sorted(os.listdir(SOURCE_DIR)):
+        path = os.path.join(SOURCE_DIR, name)
+        if name.endswith((".txt", ".html", ".md")):
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                documents.append(f.read())
+        elif name.endswith(".pdf"):
+            from app.services.ingestion.docling_processor import DOCLING_AVAILABLE, DoclingProcessor
+            if DOCLING_AVAILABLE:
+                result = DoclingProcessor().process(path)
+                if result is not None:
+                    documents.append(result)
+    return documents
+
+
+def run(name, chunk, documents, chunker: TokenChunker, max_tokens: int):
+    start = time.perf_counter()
+    chunks = [c for doc in documents for c in chunk(doc)]
+    seconds = time.perf_counter() - start
+    counts = chunker.count_tokens([c.text for c in chunks])
+    over = sum(n > max_tokens for n in counts)
+    print(
+        f"{name:<10} {len(chunks):>8} {len(chunks) / seconds:>12.0f} {max(counts):>10} "
+        f"{sum(counts) / len(counts):>10.1f} {over:>8} ({over / len(chunks):.1%})"
+    )
+    return over
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "intfloat/e5-base-v2"))
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5, help="Corpus copies, for stable timings")
+    args = parser.parse_args()
+
+    tokenizer = load_tokenizer(args.model)
+    token_chunker = TokenChunker(tokenizer, max_tokens=args.max_tokens, overlap=args.overlap)
+    # mode="token" builds nothing up front; only the character fallback is used here
+    char_chunker = SemanticChunker(tokenizer=args.model, mode="token")
+    documents = load_corpus() * args.repeat
+    print(f"{len(documents)} documents, model {args.model}, limit {token_chunker.max_tokens} tokens (chunk budget {token_chunker.budget})")
+
+    print(f"{'mode':<10} {'chunks':>8} {'chunks/sec':>12} {'max tok':>10} {'mean tok':>10} {'over limit':>8}")
+    run("chars", lambda doc: char_chunker._fallback_chunk(doc if isinstance(doc, str) else doc.document.export_to_markdown()), documents, token_chunker, token_chunker.max_tokens)
+    over = run("token", token_chunker.chunk, documents, token_chunker, token_chunker.max_tokens)
+    if over:
+        print(f"{over} token-mode chunk(s) exceed the model limit")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
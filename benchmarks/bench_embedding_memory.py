@@ -0,0 +1,66 @@
+"""
+bench_embedding_memory.py
+Microbenchmark: Python float lists vs float32 ndarrays for a 10k-chunk ingest.
+
+Simulates the embedding hand-off from the model to MilvusClient.upsert:
+- list path:    model output -> .tolist() -> per-row float lists (previous behaviour)
+- ndarray path: model output -> contiguous float32 matrix (current behaviour)
+
+Run: python benchmarks/bench_embedding_memory.py [--chunks 10000] [--dim 768]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def list_path(model_output: np.ndarray):
+    embeddings = model_output.tolist()
+    # pymilvus then builds its own flat float buffer from the nested lists
+    flat = [x for row in embeddings for x in row]
+    return embeddings, flat
+
+
+def ndarray_path(model_output: np.ndarray):
+    embeddings = np.ascontiguousarray(model_output, dtype=np.float32)
+    flat = embeddings.reshape(-1)  # zero-copy view
+    return embeddings, flat
+
+
+def measure(fn, model_output: np.ndarray, repeats: int):
+    timings = []
+    peak = 0
+    for _ in range(repeats):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = fn(model_output)
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del result
+    return min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    model_output = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+
+    list_time, list_peak = measure(list_path, model_output, args.repeats)
+    array_time, array_peak = measure(ndarray_path, model_output, args.repeats)
+
+    print(f"Embedding hand-off for {args.chunks} chunks x {args.dim} dims")
+    print(f"{'path':<10} {'time (ms)':>12} {'peak alloc (MB)':>18}")
+    print(f"{'list':<10} {list_time * 1000:>12.1f} {list_peak / 1e6:>18.1f}")
+    print(f"{'ndarray':<10} {array_time * 1000:>12.1f} {array_peak / 1e6:>18.1f}")
+    print(f"Raw float32 payload: {model_output.nbytes / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+bench_local_vector_store.py
+Search latency and recall of the in-process vector store: exact scan vs IVF partitioning.
+
+Loads synthetic clustered unit vectors (embedding-like) for one tenant into LocalVectorStore,
+then runs single-query searches and reports p50/p99 latency and recall@k of IVF against the
+exact scan. No Milvus needed.
+
+Run: python benchmarks/bench_local_vector_store.py [--rows 100000] [--nlist 256] [--nprobe 16]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "backend"))
+
+from app.services.retrieval.vector_store.local import LocalVectorStore
+
+
+def clustered(rng, n, dim, centers):
+    vectors = centers[rng.integers(0, len(centers), size=n)] + 0.5 * rng.standard_normal((n, dim), dtype=np.float32) / np.sqrt(dim)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def load(store: LocalVectorStore, vectors: np.ndarray, per_doc: int = 100):
+    for start in range(0, len(vectors), per_doc):
+        part = vectors[start:start + per_doc]
+        await store.upsert([f"chunk {start + i}" for i in range(len(part))], {"document_id": f"doc{start // per_doc}"}, part)
+
+
+async def timed_search(store: LocalVectorStore, queries: np.ndarray, k: int):
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = await store.search_batch(query, limit=k)
+        timings.append(time.perf_counter() - start)
+        results.append({h.id for h in hits[0]})
+    return np.array(timings) * 1000, results
+
+
+async def run(args):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.nlist, args.dim), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = clustered(rng, args.rows, args.dim, centers)
+    queries = clustered(rng, args.queries, args.dim, centers)
+
+    exact = LocalVectorStore(dim=args.dim, nlist=0)
+    await load(exact, vectors)
+    ivf = LocalVectorStore(dim=args.dim, nlist=args.nlist, nprobe=args.nprobe)
+    await load(ivf, vectors)
+    if ivf.centroids is None:
+        ivf.build_ivf()
+
+    exact_ms, truth = await timed_search(exact, queries, args.k)
+    ivf_ms, approx = await timed_search(ivf, queries, args.k)
+    recall = np.mean([len(a & t) / args.k for a, t in zip(approx, truth)])
+
+    print(f"{args.rows} chunks x {args.dim} dims, {args.queries} queries, top-{args.k}")
+    print(f"{'mode':<22} {'p50 (ms)':>10} {'p99 (ms)':>10} {'recall':>8}")
+    print(f"{'exact':<22} {np.percentile(exact_ms, 50):>10.2f} {np.percentile(exact_ms, 99):>10.2f} {1.0:>8.3f}")
+    label = f"ivf nlist={args.nlist} nprobe={args.nprobe}"
+    print(f"{label:<22} {np.percentile(ivf_ms, 50):>10.2f} {np.percentile(ivf_ms, 99):>10.2f} {recall:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+bench_permission_filter.py
+Benchmark: filtered search latency and recall at different permission selectivities.
+
+Every row gets a random u in [0, 1) and, for each selectivity s, the role `role:top_<s>` when
+u < s. A search for that role can therefore see a fraction s of the tenant's rows. Three
+strategies are compared per selectivity:
+- prefilter:       array_contains_any on the INVERTED-indexed access_permissions inside the ANN
+                   search, next to the tenant filter (the MilvusClient layout)
+- prefilter_noidx: the same expression after dropping the INVERTED index
+- postfilter:      over-fetch limit x --overfetch without the role filter, then drop rows the
+                   role may not see in Python (what enforcing roles looked like before)
+
+Recall@k is measured against an exact search over the rows the role may see. Post-filtering
+loses recall once fewer than k of the over-fetched rows are visible.
+
+--backend local runs prefilter and postfilter against LocalVectorStore instead (no Milvus needed).
+Run: MILVUS_HOST=localhost MILVUS_PORT=19530 python benchmarks/bench_permission_filter.py [--rows 200000]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "backend"))
+
+DIM = 768
+TENANT = "bench_tenant"
+COLLECTION = "bench_permissions"
+
+
+def role(selectivity: float) -> str:
+    return f"role:top_{selectivity:g}"
+
+
+def make_data(rows: int, selectivities, rng):
+    vectors = rng.standard_normal((rows, DIM), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    u = rng.random(rows)
+    permissions = [[role(s) for s in selectivities if x < s] or ["role:none"] for x in u]
+    return vectors, u, permissions
+
+
+def exact_top_k(vectors: np.ndarray, visible: np.ndarray, query: np.ndarray, k: int) -> set:
+    rows = np.flatnonzero(visible)
+    distances = np.sum((vectors[rows] - query) ** 2, axis=1)
+    return set(rows[np.argsort(distances)[:k]].tolist())
+
+
+def summarize(latencies, recalls):
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), float(np.mean(recalls))
+
+
+def build_collection(vectors, permissions, batch: int = 10_000):
+    from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+    from app.services.retrieval.vector_store.base import MAX_PERMISSION_LENGTH, MAX_PERMISSIONS
+    if utility.has_collection(COLLECTION):
+        utility.drop_collection(COLLECTION)
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=DIM),
+        FieldSchema(name="tenant_id", dtype=DataType.VARCHAR, max_length=64, is_partition_key=True),
+        FieldSchema(
+            name="access_permissions", dtype=DataType.ARRAY, element_type=DataType.VARCHAR,
+            max_capacity=MAX_PERMISSIONS, max_length=MAX_PERMISSION_LENGTH
+        ),
+    ]
+    collection = Collection(COLLECTION, CollectionSchema(fields, "permission filter benchmark"), num_partitions=16)
+    for start in range(0, len(vectors), batch):
+        end = min(start + batch, len(vectors))
+        collection.insert([list(range(start, end)), vectors[start:end], [TENANT] * (end - start), permissions[start:end]])
+    collection.flush()
+    collection.create_index("embedding", {"metric_type": "L2", "index_type": "IVF_FLAT", "params": {"nlist": 1024}})
+    collection.create_index("tenant_id", index_name="idx_tenant")
+    collection.create_index("access_permissions", index_name="idx_access", index_params={"index_type": "INVERTED"})
+    collection.load()
+    return collection
+
+
+def milvus_search(collection, query, limit, expr, nprobe):
+    start = time.perf_counter()
+    hits = collection.search(
+        data=[query], anns_field="embedding", param={"metric_type": "L2", "params": {"nprobe": nprobe}},
+        limit=limit, expr=expr
+    )[0]
+    return [hit.id for hit in hits], (time.perf_counter() - start) * 1000
+
+
+def run_milvus(args, vectors, u, permissions, queries, selectivities):
+    from pymilvus import connections, utility
+    connections.connect(alias="default", host=os.getenv("MILVUS_HOST", "localhost"), port=os.getenv("MILVUS_PORT", "19530"))
+    print(f"Loading {len(vectors)} rows into {COLLECTION}...")
+    collection = build_collection(vectors, permissions)
+    tenant_expr = f'tenant_id == "{TENANT}"'
+    limit = min(args.k * args.overfetch, 16384)
+    results = []
+    try:
+        for strategy in ("prefilter", "postfilter", "prefilter_noidx"):
+            if strategy == "prefilter_noidx":
+                collection.release()
+                collection.drop_index(index_name="idx_access")
+                collection.load()
+            for s in selectivities:
+                visible = u < s
+                latencies, recalls = [], []
+                for q in queries:
+                    truth = exact_top_k(vectors, visible, q, args.k)
+                    if strategy == "postfilter":
+                        ids, ms = milvus_search(collection, q, limit, tenant_expr, args.nprobe)
+                        found = [i for i in ids if visible[i]][:args.k]
+                    else:
+                        expr = f"{tenant_expr} and array_contains_any(access_permissions, {json.dumps([role(s)])})"
+                        found, ms = milvus_search(collection, q, args.k, expr, args.nprobe)
+                    latencies.append(ms)
+                    recalls.append(len(truth.intersection(found)) / max(len(truth), 1))
+                results.append((strategy, s, *summarize(latencies, recalls)))
+    finally:
+        utility.drop_collection(COLLECTION)
+    return results
+
+
+def run_local(args, vectors, u, permissions, queries, selectivities):
+    from app.services.retrieval.vector_store.local import LocalVectorStore
+    store = LocalVectorStore(dim=DIM, initial_capacity=len(vectors))
+    # One upsert per permission set: metadata applies to the whole call
+    groups = {}
+    for i, p in enumerate(permissions):
+        groups.setdefault(tuple(p), []).append(i)
+    for p, rows in groups.items():
+        asyncio.run(store.upsert([str(i) for i in rows], {"tenant_id": TENANT, "access_permissions": list(p)}, vectors[rows]))
+    results = []
+    for strategy in ("prefilter", "postfilter"):
+        for s in selectivities:
+            visible = u < s
+            latencies, recalls = [], []
+            for q in queries:
+                truth = exact_top_k(vectors, visible, q, args.k)
+                start = time.perf_counter()
+                if strategy == "postfilter":
+                    hits = asyncio.run(store.search_batch(q, limit=args.k * args.overfetch, tenant_id=TENANT))[0]
+                    found = [i for i in (int(h.text) for h in hits) if visible[i]][:args.k]
+                else:
+                    hits = asyncio.run(store.search_batch(q, limit=args.k, tenant_id=TENANT, filters={"roles": [role(s)]}))[0]
+                    found = [int(h.text) for h in hits]
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(truth.intersection(found)) / max(len(truth), 1))
+            results.append((strategy, s, *summarize(latencies, recalls)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["milvus", "local"], default="milvus")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--selectivities", type=float, nargs="+", default=[1.0, 0.5, 0.1, 0.01, 0.001])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--overfetch", type=int, default=10, help="Post-filter fetches k x this many hits")
+    parser.add_argument("--nprobe", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors, u, permissions = make_data(args.rows, args.selectivities, rng)
+    queries = rng.standard_normal((args.queries, DIM), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    run = run_milvus if args.backend == "milvus" else run_local
+    results = run(args, vectors, u, permissions, queries, args.selectivities)
+
+    print(f"{args.rows} rows, k={args.k}, {args.queries} queries ({args.backend})")
+    print(f"{'strategy':>16} {'visible':>8} {'p50 (ms)':>10} {'p95 (ms)':>10} {'recall@k':>9}")
+    for strategy, s, p50, p95, recall in results:
+        print(f"{strategy:>16} {s:>8.1%} {p50:>10.2f} {p95:>10.2f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
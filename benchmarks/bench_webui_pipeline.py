@@ -0,0 +1,114 @@
+"""
+bench_webui_pipeline.py
+Connection reuse and time-to-first-token of the Open WebUI pipeline bridge.
+
+Starts a local stub of the backend's /chat/completions (OpenAI-style SSE, with a fixed delay
+before the first token and between tokens) and sends the same messages through the pipeline
+twice: with a new HTTP client per message (the old requests.post behaviour) and with the
+pooled client opened in on_startup. Reports TCP connections accepted by the stub and
+time-to-first-token / total latency per message.
+
+Run: python benchmarks/bench_webui_pipeline.py [--messages 200] [--first-token-ms 5]
+"""
+import os
+import sys
+import json
+import socket
+import time
+import asyncio
+import argparse
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "open-webui", "pipelines"))
+
+from rag_pipeline import Pipeline
+
+
+def make_stub(first_token_s: float, token_s: float, tokens: int):
+    class Stub(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        connections = 0
+
+        def setup(self):
+            super().setup()
+            # As uvicorn does; otherwise small SSE writes on a kept-alive socket wait on delayed ACKs
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            Stub.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _chunk(self, text: str):
+            data = text.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(first_token_s)
+            for i in range(tokens):
+                if i:
+                    time.sleep(token_s)
+                self._chunk(f"data: {json.dumps({'choices': [{'delta': {'content': f'tok{i} '}}]})}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Stub
+
+
+def run_messages(pipeline: Pipeline, messages: int, pooled: bool):
+    ttft, total = [], []
+    for i in range(messages):
+        if not pooled:
+            pipeline.client = None
+        start = time.perf_counter()
+        first = None
+        for _ in pipeline.pipe(f"question {i}", "auto", [{"role": "user", "content": f"question {i}"}], {"stream": True, "chat_id": "bench"}):
+            if first is None:
+                first = time.perf_counter() - start
+        total.append(time.perf_counter() - start)
+        ttft.append(first)
+        if not pooled:
+            pipeline.client.close()
+    return np.array(ttft) * 1000, np.array(total) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--first-token-ms", type=float, default=5.0)
+    parser.add_argument("--token-ms", type=float, default=0.5)
+    parser.add_argument("--tokens", type=int, default=20)
+    args = parser.parse_args()
+
+    stub = make_stub(args.first_token_ms / 1000, args.token_ms / 1000, args.tokens)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["BACKEND_URL"] = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+    print(f"{args.messages} streamed messages, {args.tokens} tokens each, first token after {args.first_token_ms} ms")
+    print(f"{'client':<18} {'connections':>12} {'ttft p50':>10} {'ttft p99':>10} {'total p50':>10}")
+    for label, pooled in (("per-message", False), ("pooled", True)):
+        pipeline = Pipeline()
+        before = stub.connections
+        # The pipeline logs every message
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            asyncio.run(pipeline.on_startup())
+            ttft, total = run_messages(pipeline, args.messages, pooled)
+            asyncio.run(pipeline.on_shutdown())
+        print(f"{label:<18} {stub.connections - before:>12} {np.percentile(ttft, 50):>10.2f} {np.percentile(ttft, 99):>10.2f} {np.percentile(total, 50):>10.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
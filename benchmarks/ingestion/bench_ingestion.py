@@ -0,0 +1,289 @@
+"""
+bench_ingestion.py
+Ingestion throughput suite over the bundled corpus (resources/source_docs).
+
+Runs the pipeline stage by stage (DoclingProcessor -> SemanticChunker -> EmbeddingService ->
+vector store upsert) and then end to end through IngestionOrchestrator in a fresh process.
+Storage is the in-process LocalVectorStore, so no Milvus is needed; the embedding cache is
+disabled so every chunk is encoded. Model/converter loading is reported separately and not
+counted in the stage times.
+
+Reports pages/sec, chunks/sec, embeddings/sec, per-stage wall time and peak RSS, writes
+JSON for trend tracking, and exits 1 when a metric regresses beyond --tolerance from
+baseline.json. Refresh the baseline on the reference machine with --update-baseline.
+
+Run: python benchmarks/ingestion/bench_ingestion.py [--output results.json] [--tolerance 0.2]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from queue import Empty
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(os.path.join(project_root, "backend"))
+
+CORPUS_DIR = os.path.join(project_root, "resources", "source_docs")
+BASELINE = os.path.join(current_dir, "baseline.json")
+
+# Metrics compared against the baseline: dotted path -> True when higher is better
+CHECKED = {
+    "stages.parse.pages_per_sec": True,
+    "stages.chunk.chunks_per_sec": True,
+    "stages.embed.embeddings_per_sec": True,
+    "stages.store.chunks_per_sec": True,
+    "end_to_end.pages_per_sec": True,
+    "end_to_end.chunks_per_sec": True,
+    "peak_rss_mb.stages": False,
+    "peak_rss_mb.end_to_end": False,
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def isolate_environment(workdir: str):
+    # Local stand-ins for every store the pipeline writes to; nothing shared, nothing cached
+    os.environ["VECTOR_STORE_BACKEND"] = "local"
+    os.environ["LOCAL_VECTOR_STORE_PATH"] = os.path.join(workdir, "vectors")
+    os.environ["FAQ_INDEX_DIR"] = os.path.join(workdir, "faq_index")
+    os.environ.pop("EMBEDDING_CACHE_DIR", None)
+    os.environ.pop("CHUNK_STORE", None)
+
+
+def corpus_files():
+    return sorted(os.path.join(CORPUS_DIR, name) for name in os.listdir(CORPUS_DIR) if not name.startswith("."))
+
+
+def page_count(content) -> int:
+    if isinstance(content, str):
+        return 1
+    # HTML has no pages in Docling's model; count it as one
+    return max(len(content.document.pages), 1)
+
+
+def rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds > 0 else None
+
+
+def run_stages(files, workdir: str):
+    from app.services.ingestion.docling_processor import DOCLING_AVAILABLE, DoclingProcessor
+    from app.services.chunking.semantic import SemanticChunker
+    from app.services.generation.embeddings import EmbeddingService
+    from app.services.retrieval.vector_store.local import LocalVectorStore
+
+    if not DOCLING_AVAILABLE:
+        raise SystemExit("docling is not installed; the suite measures the real pipeline")
+
+    setup_start = time.perf_counter()
+    processor = DoclingProcessor()
+    chunker = SemanticChunker()
+    embedder = EmbeddingService()
+    store = LocalVectorStore(os.path.join(workdir, "stage_vectors"), dim=embedder.dimension)
+    setup_seconds = time.perf_counter() - setup_start
+
+    totals = {"parse": 0.0, "chunk": 0.0, "embed": 0.0, "store": 0.0}
+    pages = chunks = 0
+    per_file = []
+    for path in files:
+        name = os.path.basename(path)
+        start = time.perf_counter()
+        content = processor.process(path)
+        parse_s = time.perf_counter() - start
+        if content is None:
+            raise SystemExit(f"Failed to parse {name}")
+
+        start = time.perf_counter()
+        doc_chunks = chunker.chunk(content)
+        chunk_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        embeddings = embedder.get_embeddings([c.text for c in doc_chunks]) if doc_chunks else None
+        embed_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if doc_chunks:
+            asyncio.run(store.upsert(doc_chunks, {"document_id": name, "tenant_id": "bench", "source": name}, embeddings))
+        store_s = time.perf_counter() - start
+
+        n_pages = page_count(content)
+        pages += n_pages
+        chunks += len(doc_chunks)
+        for stage, seconds in (("parse", parse_s), ("chunk", chunk_s), ("embed", embed_s), ("store", store_s)):
+            totals[stage] += seconds
+        per_file.append({
+            "file": name, "bytes": os.path.getsize(path), "pages": n_pages, "chunks": len(doc_chunks),
+            "parse_s": round(parse_s, 3), "chunk_s": round(chunk_s, 3), "embed_s": round(embed_s, 3), "store_s": round(store_s, 3),
+        })
+    store.close()
+
+    return {
+        "setup_s": round(setup_seconds, 2),
+        "pages": pages,
+        "chunks": chunks,
+        "stages": {
+            "parse": {"seconds": round(totals["parse"], 3), "pages_per_sec": rate(pages, totals["parse"])},
+            "chunk": {"seconds": round(totals["chunk"], 3), "chunks_per_sec": rate(chunks, totals["chunk"])},
+            "embed": {"seconds": round(totals["embed"], 3), "embeddings_per_sec": rate(chunks, totals["embed"])},
+            "store": {"seconds": round(totals["store"], 3), "chunks_per_sec": rate(chunks, totals["store"])},
+        },
+        "per_file": per_file,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _end_to_end(corpus_dir: str, pages: int, queue):
+    from app.services.ingestion.orchestrator import IngestionOrchestrator
+    from app.services.retrieval.vector_store.base import get_vector_store
+
+    setup_start = time.perf_counter()
+    orchestrator = IngestionOrchestrator()
+    setup_seconds = time.perf_counter() - setup_start
+
+    start = time.perf_counter()
+    ok = asyncio.run(orchestrator.ingest_directory(corpus_dir, tenant_id="bench", bulk=False))
+    seconds = time.perf_counter() - start
+    stored = len(get_vector_store())
+    queue.put({
+        "ok": ok,
+        "setup_s": round(setup_seconds, 2),
+        "seconds": round(seconds, 3),
+        "chunks": stored,
+        "pages_per_sec": rate(pages, seconds),
+        "chunks_per_sec": rate(stored, seconds),
+        "peak_rss_mb": peak_rss_mb(),
+    })
+
+
+def run_end_to_end(pages: int):
+    # Fresh process: its peak RSS and model loads are not mixed up with the stage run
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    child = context.Process(target=_end_to_end, args=(CORPUS_DIR, pages, queue))
+    child.start()
+    while True:
+        try:
+            result = queue.get(timeout=5)
+            break
+        except Empty:
+            if not child.is_alive():
+                raise SystemExit(f"End-to-end run exited with code {child.exitcode}")
+    child.join()
+    if not result["ok"]:
+        raise SystemExit("End-to-end ingestion reported failures")
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def lookup(results: dict, path: str):
+    value = results
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """
+    (metric, baseline, current, change) rows and the list of regressions beyond tolerance.
+    Metrics missing from the baseline are reported but never fail the run.
+    """
+    rows, regressions = [], []
+    for path, higher_is_better in CHECKED.items():
+        base, current = lookup(baseline, path), lookup(results, path)
+        if base in (None, 0) or current is None:
+            rows.append((path, base, current, None))
+            continue
+        change = (current - base) / base
+        rows.append((path, base, current, change))
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append(path)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="Write the results JSON here")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression per metric")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--skip-end-to-end", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_ingestion_")
+    try:
+        isolate_environment(workdir)
+        files = corpus_files()
+        stage_results = run_stages(files, workdir)
+        end_to_end = None if args.skip_end_to_end else run_end_to_end(stage_results["pages"])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "timestamp": int(time.time()),
+        "git_revision": git_revision(),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "corpus": {"files": [os.path.basename(f) for f in files], "bytes": sum(os.path.getsize(f) for f in files)},
+        "pages": stage_results["pages"],
+        "chunks": stage_results["chunks"],
+        "setup_s": stage_results["setup_s"],
+        "stages": stage_results["stages"],
+        "end_to_end": end_to_end,
+        "peak_rss_mb": {"stages": stage_results["peak_rss_mb"], "end_to_end": end_to_end and end_to_end["peak_rss_mb"]},
+        "per_file": stage_results["per_file"],
+    }
+
+    print(f"{len(files)} files, {results['pages']} pages, {results['chunks']} chunks (setup {results['setup_s']} s)")
+    print(f"{'stage':<12} {'seconds':>9} {'rate':>12}")
+    for stage, values in results["stages"].items():
+        unit, value = next((k, v) for k, v in values.items() if k != "seconds")
+        print(f"{stage:<12} {values['seconds']:>9.2f} {value:>12} {unit}")
+    if end_to_end:
+        print(f"{'end-to-end':<12} {end_to_end['seconds']:>9.2f} {end_to_end['pages_per_sec']:>12} pages_per_sec")
+    print(f"peak RSS: stages {results['peak_rss_mb']['stages']} MB, end-to-end {results['peak_rss_mb']['end_to_end']} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows, regressions = compare(results, baseline, args.tolerance)
+    print(f"\nAgainst baseline {baseline.get('git_revision')} (tolerance {args.tolerance:.0%}):")
+    for path, base, current, change in rows:
+        note = "no baseline" if change is None else f"{change:+.1%}" + ("  REGRESSION" if path in regressions else "")
+        print(f"  {path:<34} {str(base):>10} -> {str(current):>10}  {note}")
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
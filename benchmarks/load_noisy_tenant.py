@@ -0,0 +1,106 @@
+"""
+load_noisy_tenant.py
+In-process load test for admission control under one noisy tenant.
+
+Simulates the chat pipeline as three capacity-bound stages (embed, search, llm) with fixed
+service times. Several well-behaved tenants send a steady trickle of requests while one noisy
+tenant floods the service. The run is repeated with admission control off and on, and the p99
+latency of the well-behaved tenants is reported alongside rejection counts.
+
+Run: python benchmarks/load_noisy_tenant.py [--duration 5] [--noisy-rps 400]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from types import MappingProxyType
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "backend"))
+
+from app.core.admission import AdmissionController, RateLimited
+from app.core.registry import TenantEntry
+
+# Simulated service time (seconds) and hardware capacity per stage
+STAGES = {"embed": (0.010, 4), "search": (0.005, 16), "llm": (0.150, 32)}
+
+class _Config:
+    version = "bench"
+
+    def __init__(self, tenants):
+        self.tenants = MappingProxyType(tenants)
+
+    def tenant(self, tenant_id):
+        return self.tenants.get(tenant_id) or self.tenants.get("default")
+
+def make_config(noisy_rps_limit: float):
+    rate_limit = MappingProxyType({"rate_limit": MappingProxyType({"requests_per_second": noisy_rps_limit, "burst": int(noisy_rps_limit * 2)})})
+    return _Config({"default": TenantEntry("default", "Default", "standard", rate_limit)})
+
+async def run(admission_enabled: bool, duration: float, good_tenants: int, good_rps: float, noisy_rps: float, rate_limit: float):
+    # Hardware capacity exists either way; admission control adds rate limits and queue deadlines in front of it
+    hardware = {name: asyncio.Semaphore(capacity) for name, (_, capacity) in STAGES.items()}
+    controller = AdmissionController(
+        stage_limits={name: (capacity, 0.25 if name != "llm" else 1.0) for name, (_, capacity) in STAGES.items()},
+        config_source=lambda: make_config(rate_limit)
+    )
+    latencies = {"good": [], "noisy": []}
+    rejected = {"good": 0, "noisy": 0}
+
+    async def request(tenant_id: str, kind: str):
+        start = time.perf_counter()
+        try:
+            if admission_enabled:
+                controller.admit(tenant_id)
+            for name, (service_time, _) in STAGES.items():
+                if admission_enabled:
+                    await controller.stage(name).acquire()
+                try:
+                    async with hardware[name]:
+                        await asyncio.sleep(service_time)
+                finally:
+                    if admission_enabled:
+                        controller.stage(name).release()
+            latencies[kind].append((time.perf_counter() - start) * 1000)
+        except RateLimited:
+            rejected[kind] += 1
+
+    async def client(tenant_id: str, kind: str, rps: float):
+        tasks = []
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            tasks.append(asyncio.create_task(request(tenant_id, kind)))
+            await asyncio.sleep(random.expovariate(rps))
+        await asyncio.gather(*tasks)
+
+    clients = [client(f"good_{i}", "good", good_rps) for i in range(good_tenants)]
+    clients.append(client("noisy", "noisy", noisy_rps))
+    await asyncio.gather(*clients)
+    return latencies, rejected
+
+def pct(values, p):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[int(p / 100 * (len(ordered) - 1))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--good-tenants", type=int, default=5)
+    parser.add_argument("--good-rps", type=float, default=5.0)
+    parser.add_argument("--noisy-rps", type=float, default=400.0)
+    parser.add_argument("--rate-limit", type=float, default=20.0, help="requests/second allowed per tenant")
+    args = parser.parse_args()
+    random.seed(0)
+
+    print(f"{'admission':<10} {'good p50':>9} {'good p99':>9} {'good rej':>9} {'noisy ok':>9} {'noisy rej':>10}")
+    for enabled in (False, True):
+        latencies, rejected = asyncio.run(run(enabled, args.duration, args.good_tenants, args.good_rps, args.noisy_rps, args.rate_limit))
+        print(f"{'on' if enabled else 'off':<10} {pct(latencies['good'], 50):>9.0f} {pct(latencies['good'], 99):>9.0f} "
+              f"{rejected['good']:>9} {len(latencies['noisy']):>9} {rejected['noisy']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,111 @@
 """
 ragas_runner.py
-Script to run RAGAS metrics evaluation.
-"""
+Runs the RAG evaluation (app.services.evaluation.runner) over a golden set against the
+configured vector store and LLM providers, in this process.
+
+Retrieval hit rate/MRR, answer metrics (token F1 and RAGAS-style LLM-judged faithfulness and
+answer correctness) and per-stage latency percentiles are printed together. Generation and
+judge calls are cached in EVAL_CACHE_DIR, so a re-run after a retrieval change only pays for
+the answers whose context changed. Exits 1 when a metric regresses beyond --tolerance from
+the baseline report; refresh it with --update-baseline.
 
+Run: python evaluation/runners/ragas_runner.py [--dataset golden_set] [--concurrency 4] [--output report.json]
+"""
+import os
 import sys
+import json
+import asyncio
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(os.path.join(project_root, "backend"))
+
+from app.services.evaluation.runner import (
+    ANSWER_METRICS, EvalRunner, DiskCache, compare_reports, dataset_path, load_golden_set
+)
+
+BASELINE = os.path.join(project_root, "evaluation", "baseline.json")
+
+
+async def run_evaluation(args):
+    from app.services.generation.embeddings import get_embedding_service
+    from app.services.generation.llm_gateway import close_llm_gateway, get_llm_gateway
+    from app.services.retrieval.vector_store.base import get_vector_store
+
+    path = args.dataset if os.path.isfile(args.dataset) else dataset_path(args.dataset)
+    questions = load_golden_set(path)
+    cache = None if args.no_cache else DiskCache(os.getenv("EVAL_CACHE_DIR", os.path.join(project_root, "evaluation", ".cache")))
+    runner = EvalRunner(
+        get_embedding_service(), get_vector_store(), get_llm_gateway(), cache=cache,
+        model=args.model, judge_model=args.judge_model, metrics=args.metrics,
+        top_k=args.top_k, concurrency=args.concurrency, tenant_id=args.tenant
+    )
+    print(f"Evaluating {len(questions)} questions from {path} ({runner.concurrency} at a time)...")
+    try:
+        return await runner.run(questions)
+    finally:
+        await close_llm_gateway()
+
+
+def print_report(report):
+    retrieval = report["retrieval"]
+    print(f"\n{report['questions']} questions, {report['errors']} errors, {report['seconds']} s")
+    print(f"retrieval@{report['config']['top_k']}: hit rate {retrieval['hit_rate']}, MRR {retrieval['mrr']}, recall {retrieval['recall']} ({retrieval['evaluated']} with labelled contexts)")
+    for metric, value in report["answers"].items():
+        print(f"  {metric:<20} {value}")
+    print(f"\n{'stage':<10} {'count':>6} {'p50':>9} {'p90':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for name, values in report["latency_ms"].items():
+        if values["count"]:
+            print(f"{name:<10} {values['count']:>6} " + " ".join(f"{values[k]:>9}" for k in ("p50", "p90", "p95", "p99", "max")))
+    if report["cache"]:
+        print(f"cache: {report['cache']['hits']} hits, {report['cache']['misses']} misses")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG evaluation over a golden question set")
+    parser.add_argument("--dataset", default="golden_set", help="Dataset id in EVAL_DATASET_DIR, or a path")
+    parser.add_argument("--tenant", default="default_tenant")
+    parser.add_argument("--model", default=None, help="Generation model (gateway default)")
+    parser.add_argument("--judge-model", default=None, help="Judge model (EVAL_JUDGE_MODEL, else --model)")
+    parser.add_argument("--metrics", nargs="+", choices=ANSWER_METRICS, default=None)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=None, help="Questions in flight (EVAL_CONCURRENCY)")
+    parser.add_argument("--no-cache", action="store_true", help="Call the LLM for every generation and verdict")
+    parser.add_argument("--output", help="Write the full report JSON here")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression per metric")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this report as the new baseline")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_evaluation(args))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({k: v for k, v in report.items() if k != "per_question"}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    comparison = compare_reports(report, baseline, args.tolerance)
+    print(f"\nAgainst baseline (tolerance {args.tolerance:.0%}):")
+    for path, change in comparison["changes"].items():
+        note = "  REGRESSION" if path in comparison["regressions"] else ""
+        print(f"  {path:<28} {change['baseline']:>10} -> {change['current']:>10}  {change['change']:+.1%}{note}")
+    if comparison["regressions"]:
+        print(f"{len(comparison['regressions'])} metric(s) regressed beyond {args.tolerance:.0%}")
+        sys.exit(1)
 
-def run_evaluation():
-    print("Running RAGAS evaluation...")
-    # Implementation using ragas library would go here
-    print("Evaluation complete. Results saved.")
 
 if __name__ == "__main__":
-    run_evaluation()
+    main()
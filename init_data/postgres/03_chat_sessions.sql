@@ -0,0 +1,11 @@
+-- 03_chat_sessions.sql
+-- Rolling summary of older turns per server-side chat session
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id UUID PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_turns INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Session reload reads the most recent turns of one session
+CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, id DESC);
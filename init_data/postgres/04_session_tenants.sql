@@ -0,0 +1,4 @@
+-- 04_session_tenants.sql
+-- Sessions belong to one tenant; reloads only return rows of the requesting tenant
+ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS tenant_id VARCHAR(64);
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS tenant_id VARCHAR(64);
@@ -1,52 +1,152 @@
 """
 rag_pipeline.py
 Bridge to backend API for Open WebUI.
+
+One pooled HTTP client per pipeline process (created in on_startup, closed in on_shutdown)
+keeps connections to the backend alive across messages. Streaming responses are parsed from
+SSE `data:` events into content deltas as they arrive.
+
+WebUI users authenticate against Open WebUI, so the bridge is the trusted front end: it sends
+the roles its users hold (PIPELINE_ROLES) signed with ROLES_SIGNING_KEY. The backend ignores
+unsigned roles and then serves public content only.
 """
 
-from typing import List, Union, Generator, Iterator
+from typing import List, Union, Generator, Iterator, Optional, Dict
 import os
-import requests
+import json
+import hmac
+import hashlib
+import httpx
 
 class Pipeline:
     def __init__(self):
         self.backend_url = os.getenv("BACKEND_URL", "http://backend:8000/api/v1")
+        # Tenant the bridge serves unless the request body names one
+        self.tenant_id = os.getenv("PIPELINE_TENANT_ID", "")
+        # Roles of WebUI users (comma-separated); signed so the backend can trust them
+        self.roles = os.getenv("PIPELINE_ROLES", "role:customer_service")
+        self.signing_key = os.getenv("ROLES_SIGNING_KEY", "")
+        self.timeout = httpx.Timeout(
+            connect=float(os.getenv("PIPELINE_CONNECT_TIMEOUT", "5")),
+            # Between streamed chunks; the first one waits for retrieval and the model
+            read=float(os.getenv("PIPELINE_READ_TIMEOUT", "120")),
+            write=10.0,
+            pool=10.0,
+        )
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("PIPELINE_MAX_CONNECTIONS", "32")),
+            max_keepalive_connections=int(os.getenv("PIPELINE_MAX_KEEPALIVE", "16")),
+            keepalive_expiry=60.0,
+        )
+        self.client: Optional[httpx.Client] = None
 
     async def on_startup(self):
+        self._open()
         print(f"RAG Pipeline started. Backend: {self.backend_url}")
 
     async def on_shutdown(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
         print(f"RAG Pipeline stopped.")
 
+    def _open(self) -> httpx.Client:
+        # pipe runs in worker threads; httpx.Client is safe to share between them
+        if self.client is None:
+            self.client = httpx.Client(
+                base_url=self.backend_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', 'sk-dummy')}"},
+            )
+        return self.client
+
+    def _headers(self, body: dict) -> Dict[str, str]:
+        headers = {}
+        metadata = body.get("metadata") or {}
+        tenant_id = body.get("tenant_id") or metadata.get("tenant_id") or self.tenant_id
+        if tenant_id:
+            headers["X-Tenant"] = tenant_id
+        if self.roles and self.signing_key:
+            # Same message as app.core.access.sign_roles; the backend's default tenant when none is set
+            message = f"{tenant_id or 'default_tenant'}\n{self.roles}".encode("utf-8")
+            headers["X-Roles"] = self.roles
+            headers["X-Roles-Signature"] = hmac.new(self.signing_key.encode("utf-8"), message, hashlib.sha256).hexdigest()
+        # Open WebUI's chat id keeps one backend session per conversation
+        session_id = body.get("session_id") or body.get("chat_id") or metadata.get("chat_id")
+        if session_id:
+            headers["X-Session-Id"] = str(session_id)
+        return headers
+
     def pipe(self, user_message: str, model_id: str, messages: List[dict], body: dict) -> Union[str, Generator, Iterator]:
         print(f"Processing message: {user_message}")
-        
-        # Simple pass-through to backend chat completion for now
-        # In a real scenario, this might do some pre-processing
-        
-        headers = {
-            "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', 'sk-dummy')}",
-            "Content-Type": "application/json"
-        }
-        
+
         payload = {
             "model": model_id,
             "messages": messages,
             "stream": body.get("stream", False)
         }
+        headers = self._headers(body)
 
+        if payload["stream"]:
+            return self._stream(payload, headers)
         try:
-            response = requests.post(
-                f"{self.backend_url}/chat/completions",
-                json=payload,
-                headers=headers,
-                stream=body.get("stream", False)
-            )
+            response = self._open().post("/chat/completions", json=payload, headers=headers)
             response.raise_for_status()
-
-            if body.get("stream", False):
-                return response.iter_lines(decode_unicode=True)
-            else:
-                return response.json()['choices'][0]['message']['content']
-                
+            return response.json()['choices'][0]['message']['content']
         except Exception as e:
             return f"Error communicating with backend: {e}"
+
+    def _stream(self, payload: dict, headers: Dict[str, str]) -> Generator[str, None, None]:
+        """
+        Content deltas of a streamed completion. The response is closed (and its connection
+        returned to the pool) when the generator finishes or is closed by the caller.
+        """
+        try:
+            with self._open().stream("POST", "/chat/completions", json=payload, headers=headers) as response:
+                if response.status_code >= 400:
+                    response.read()
+                response.raise_for_status()
+                for delta in iter_sse_deltas(response.iter_lines()):
+                    yield delta
+        except Exception as e:
+            yield f"Error communicating with backend: {e}"
+
+def iter_sse_deltas(lines: Iterator[str]) -> Generator[str, None, None]:
+    """
+    Content deltas from OpenAI-style SSE lines, up to `data: [DONE]`. Events may span several
+    `data:` lines; comments and other fields are ignored. Lines after [DONE] are still read so
+    the response ends cleanly and its connection can go back to the pool.
+    """
+    data: List[str] = []
+    done = False
+    for line in lines:
+        if done:
+            continue
+        if line.startswith("data:"):
+            data.append(line[5:].lstrip(" "))
+            continue
+        if line or not data:
+            continue
+        # Blank line: end of event
+        event, data = "\n".join(data), []
+        if event == "[DONE]":
+            done = True
+            continue
+        delta = _delta(event)
+        if delta:
+            yield delta
+    if data and not done and "\n".join(data) != "[DONE]":
+        delta = _delta("\n".join(data))
+        if delta:
+            yield delta
+
+def _delta(event: str) -> str:
+    try:
+        chunk = json.loads(event)
+    except ValueError:
+        return ""
+    if "error" in chunk:
+        return f"Error from backend: {chunk['error']}"
+    choices = chunk.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
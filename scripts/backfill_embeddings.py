@@ -1,10 +1,50 @@
 """
 backfill_embeddings.py
-Script to backfill missing embeddings.
+Script to re-embed stored chunks whose embedding_model differs from the current model.
+
+Resumable: progress is checkpointed after every page, so rerunning the same command after a crash
+continues where it stopped. Reports chunks/sec and ETA while running.
+
+Usage: python scripts/backfill_embeddings.py [--model intfloat/e5-base-v2] [--batch-size 1024]
+                                             [--processes 4] [--checkpoint backfill.checkpoint.json]
 """
+import os
+import sys
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "backend"))
 
 def main():
+    parser = argparse.ArgumentParser(description="Re-embed stale chunks in the vector store")
+    parser.add_argument("--model", default=None, help="Target model id (defaults to EMBEDDING_MODEL)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per page (BACKFILL_BATCH_SIZE)")
+    parser.add_argument("--processes", type=int, default=None, help="Encoder processes (BACKFILL_PROCESSES)")
+    parser.add_argument("--checkpoint", default="backfill.checkpoint.json")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many rows")
+    args = parser.parse_args()
+
+    if args.model:
+        os.environ["EMBEDDING_MODEL"] = args.model
+
+    from app.services.generation.embeddings import EmbeddingService
+    from app.services.retrieval.vector_store.milvus import MilvusClient
+    from app.services.retrieval.backfill import EmbeddingBackfill
+
     print("Backfilling embeddings...")
+    store = MilvusClient()
+    backfill = EmbeddingBackfill(
+        store.collection,
+        EmbeddingService(),
+        checkpoint_path=args.checkpoint,
+        chunk_store=store.chunk_store,
+        batch_size=args.batch_size,
+        processes=args.processes
+    )
+    summary = backfill.run(limit=args.limit)
+    if summary["remaining"]:
+        print(f"{summary['remaining']} chunks left; rerun to continue")
 
 if __name__ == "__main__":
     main()
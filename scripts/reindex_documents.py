@@ -1,11 +1,45 @@
 """
 reindex_documents.py
-Script to trigger reindexing of documents.
+Script to trigger an online reindex through the backend API and follow its progress.
+
+Usage: python scripts/reindex_documents.py [--api http://localhost:8000/api/v1] [--keep-vectors] [--drop-old]
 """
+import sys
+import time
+import argparse
+import requests
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--api", default="http://localhost:8000/api/v1")
+    parser.add_argument("--keep-vectors", action="store_true", help="Copy stored vectors instead of re-embedding")
+    parser.add_argument("--drop-old", action="store_true", help="Drop the previous collection after the swap")
+    parser.add_argument("--poll", type=float, default=5.0)
+    args = parser.parse_args()
+
     print("Reindexing documents...")
-    # Logic to call backend reindex endpoint or service
+    response = requests.post(
+        f"{args.api}/db/reindex",
+        json={"reembed": not args.keep_vectors, "drop_old": args.drop_old},
+        timeout=30
+    )
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    print(f"Started job {job_id}")
+
+    while True:
+        time.sleep(args.poll)
+        job = requests.get(f"{args.api}/db/reindex/{job_id}", timeout=30).json()
+        progress = f"{job['progress'] * 100:.1f}%" if job.get("progress") is not None else "-"
+        eta = f", ETA {job['eta_seconds']:.0f}s" if job.get("eta_seconds") else ""
+        print(f"[{job['status']}] {job['copied']}/{job['total']} rows ({progress}, {job['rows_per_sec']} rows/s{eta})")
+        if job["status"] in ("completed", "failed"):
+            break
+
+    if job["status"] == "failed":
+        print(f"Reindex failed: {job['error']}")
+        sys.exit(1)
+    print(f"Alias now serves {job['target']}; verification: {job['verification']}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,99 @@
+"""
+replay_router.py
+Offline replay of logged chat requests through the model router.
+
+Reads the JSONL routing log written when ROUTER_LOG_PATH is set and compares
+estimated latency and cost for three policies: always the large default model,
+always the small model, and the router.
+
+Usage: python scripts/replay_router.py /path/to/router_log.jsonl [--plan standard]
+"""
+import os
+import sys
+import json
+import argparse
+from collections import defaultdict
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(os.path.join(project_root, "backend"))
+os.environ.setdefault("RESOURCES_DIR", os.path.join(project_root, "resources"))
+
+from app.services.generation.model_router import ModelRouter, estimate_tokens
+
+# Completion length assumed when the log carries no usage
+DEFAULT_COMPLETION_TOKENS = 200
+
+def load_records(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def observed_latency(records):
+    # Median observed latency per model, used in preference to the models.yaml prior
+    by_model = defaultdict(list)
+    for r in records:
+        if r.get("ok") and r.get("latency_ms") is not None:
+            by_model[r["model"]].append(r["latency_ms"])
+    return {m: sorted(v)[len(v) // 2] for m, v in by_model.items()}
+
+def request_tokens(record):
+    usage = record.get("usage") or {}
+    if usage.get("total_tokens"):
+        return usage["total_tokens"]
+    signals = record.get("signals", {})
+    return estimate_tokens(signals.get("context_chars", 0) + len(record.get("query", ""))) + DEFAULT_COMPLETION_TOKENS
+
+def replay(router, records, choose):
+    observed = observed_latency(records)
+    profiles = {m.id: m for m in router.models}
+    latencies, cost, small = [], 0.0, 0
+    for record in records:
+        model = profiles[choose(record)]
+        latencies.append(observed.get(model.id, model.latency_p50_ms))
+        cost += request_tokens(record) / 1000.0 * model.cost_per_1k_tokens
+        small += model.tier == "small"
+    latencies.sort()
+    return {
+        "mean_ms": sum(latencies) / len(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "cost_usd": cost,
+        "small_share": small / len(records),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log_path")
+    parser.add_argument("--plan", help="Override every tenant's plan")
+    args = parser.parse_args()
+
+    records = load_records(args.log_path)
+    if not records:
+        print("No records to replay.")
+        return
+
+    router = ModelRouter.from_config()
+    if args.plan:
+        router.tenant_plans = {"default": args.plan}
+    large = min((m for m in router.models if m.tier == "large"), key=lambda m: m.cost_per_1k_tokens)
+    small = min((m for m in router.models if m.tier == "small"), key=lambda m: m.cost_per_1k_tokens)
+
+    def routed(record):
+        s = record.get("signals", {})
+        # Rebuild cheap scores from the logged top score and margin
+        scores = [s.get("top_score", 0.0), s.get("top_score", 0.0) - s.get("score_margin", 0.0)]
+        return router.route(record.get("query", ""), scores, s.get("context_chars", 0), record.get("tenant_id", "default")).model
+
+    policies = {
+        f"always {large.id}": lambda r: large.id,
+        f"always {small.id}": lambda r: small.id,
+        "router": routed,
+    }
+
+    print(f"Replaying {len(records)} logged requests")
+    print(f"{'policy':<36} {'mean ms':>9} {'p95 ms':>9} {'cost $':>10} {'small %':>8}")
+    for name, choose in policies.items():
+        r = replay(router, records, choose)
+        print(f"{name:<36} {r['mean_ms']:>9.0f} {r['p95_ms']:>9.0f} {r['cost_usd']:>10.4f} {r['small_share'] * 100:>7.0f}%")
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,10 @@ import socket
 import time
 from typing import Any
 
+# The in-process backend replaces Milvus, but parsing and embedding still need the real models
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("docling")
+
 # Ensure backend can be imported
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(os.path.dirname(current_dir))
@@ -14,7 +18,7 @@ if backend_dir not in sys.path:
     sys.path.append(backend_dir)
 
 from app.services.ingestion.orchestrator import IngestionOrchestrator
-from app.services.retrieval.vector_store.milvus import MilvusClient
+from app.services.retrieval.vector_store.base import get_vector_store
 from app.services.generation.embeddings import EmbeddingService
 
 def is_milvus_ready(host="localhost", port=19530):
@@ -25,21 +29,23 @@ def is_milvus_ready(host="localhost", port=19530):
         return False
 
 @pytest.mark.asyncio
-async def test_full_ingestion_pipeline():
+async def test_full_ingestion_pipeline(monkeypatch, tmp_path):
     """
     Integration test for the full ingestion pipeline:
-    Docling Processing -> Structure-Aware Chunking -> E5 Embedding -> Milvus Storage
+    Docling Processing -> Structure-Aware Chunking -> E5 Embedding -> Vector Storage
+    Runs against Milvus when it is up on localhost, otherwise against the in-process store.
     """
     # Environment Setup
-    os.environ["MILVUS_HOST"] = "localhost"
-    os.environ["MILVUS_PORT"] = "19530"
+    monkeypatch.setenv("MILVUS_HOST", "localhost")
+    monkeypatch.setenv("MILVUS_PORT", "19530")
 
     if not is_milvus_ready():
-        pytest.skip("Milvus is not running on localhost:19530. Skipping integration test.")
+        monkeypatch.setenv("VECTOR_STORE_BACKEND", "local")
+        monkeypatch.setenv("LOCAL_VECTOR_STORE_PATH", str(tmp_path / "vectors"))
 
     # 1. Initialize Services
     orchestrator = IngestionOrchestrator()
-    vector_store = MilvusClient()
+    vector_store = get_vector_store()
     embedder = EmbeddingService()
 
     # 2. Define Sample File (PDF Manual)
@@ -52,14 +58,14 @@ async def test_full_ingestion_pipeline():
     success = await orchestrator.ingest_file(sample_file, tenant_id=tenant_id)
     assert success is True, "Ingestion failed"
 
-    # 4. Verify in Milvus
+    # 4. Verify in the vector store
     query = "What are the rules for provider disputes?"
     query_vector = embedder.get_embedding(query, is_query=True)
     
     # Search specifically for the test tenant
     results = await vector_store.search(query_vector, limit=3, tenant_id=tenant_id)
     
-    assert len(results) > 0, "No results retrieved from Milvus after ingestion"
+    assert len(results) > 0, "No results retrieved from the vector store after ingestion"
     
     # Check for keywords in the results to ensure semantic relevance
     found_relevant = any("dispute" in res.lower() or "kp" in res.lower() for res in results)
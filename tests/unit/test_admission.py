@@ -0,0 +1,125 @@
+import os
+import sys
+import asyncio
+import pytest
+from types import MappingProxyType
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.core.admission import AdmissionController, RateLimited, TokenBucket, StageLimiter
+from app.core.registry import TenantEntry
+
+class FakeConfig:
+    version = "test"
+
+    def __init__(self, **tenants):
+        self.tenants = tenants
+
+    def tenant(self, tenant_id):
+        return self.tenants.get(tenant_id) or self.tenants.get("default")
+
+def tenant(plan, rate_limit=None):
+    options = MappingProxyType({"rate_limit": rate_limit} if rate_limit else {})
+    return TenantEntry("t", "t", plan, options)
+
+def test_token_bucket_refills_over_time():
+    now = [0.0]
+    bucket = TokenBucket(rate=2.0, burst=2, clock=lambda: now[0])
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    now[0] = 0.5
+    assert bucket.try_acquire() == 0
+
+def test_tenants_get_independent_buckets_from_config():
+    config = FakeConfig(default=tenant("basic"), vip=tenant("enterprise", {"requests_per_second": 1, "burst": 3}))
+    controller = AdmissionController(config_source=lambda: config)
+
+    for _ in range(3):
+        controller.admit("vip")
+    with pytest.raises(RateLimited) as exc:
+        controller.admit("vip")
+    assert exc.value.retry_after_header == "1"
+
+    # basic plan default burst is 5 and unaffected by the noisy tenant
+    for _ in range(5):
+        controller.admit("other")
+    assert controller.metrics()["tenants"]["vip"]["rejected"] == 1
+
+def test_unlisted_tenants_share_one_bucket():
+    config = FakeConfig(default=tenant("basic"))
+    controller = AdmissionController(config_source=lambda: config)
+    # Rotating the tenant header does not buy a fresh burst
+    for i in range(5):
+        controller.admit(f"random-{i}")
+    with pytest.raises(RateLimited):
+        controller.admit("random-5")
+    assert list(controller.metrics()["tenants"]) == ["default"]
+    shared = controller.metrics()["tenants"]["default"]
+    assert (shared["admitted"], shared["rejected"], shared["burst"]) == (5, 1, 5)
+
+@pytest.mark.asyncio
+async def test_stage_rejects_after_queue_wait_deadline():
+    stage = StageLimiter("llm", max_in_flight=1, max_queue_wait=0.05)
+    await stage.acquire()
+    with pytest.raises(RateLimited):
+        await stage.acquire()
+    stage.release()
+    async with stage.slot():
+        assert stage.in_flight == 1
+    assert stage.snapshot()["rejected"] == 1
+
+def test_api_returns_429_with_retry_after():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    import app.core.admission as admission
+    from app.main import app
+
+    config = FakeConfig(default=tenant("basic", {"requests_per_second": 0.1, "burst": 1}))
+    previous = admission._controller
+    admission._controller = AdmissionController(config_source=lambda: config)
+    admission._controller.admit("limited")
+    try:
+        response = TestClient(app).post(
+            "/v1/chat/completions",
+            json={"model": "auto", "messages": [{"role": "user", "content": "hi"}]},
+            headers={"X-Tenant": "limited"}
+        )
+    finally:
+        admission._controller = previous
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+@pytest.mark.asyncio
+async def test_stream_slot_is_released_when_the_client_leaves_early():
+    pytest.importorskip("fastapi")
+    from app.api.v1.chat import _release_once, _stream_completion
+
+    class Gateway:
+        async def stream_chat(self, messages, model=None, result=None):
+            yield "never reached"
+
+    stage = StageLimiter("llm", max_in_flight=1, max_queue_wait=0.05)
+    # Client gone after the first chunk: closing the generator releases the slot
+    await stage.acquire()
+    chunks = _stream_completion(Gateway(), [], None, release=_release_once(stage))
+    await chunks.__anext__()
+    await chunks.aclose()
+    assert stage.in_flight == 0
+
+    # Never iterated: the response's background release frees it, exactly once
+    await stage.acquire()
+    release = _release_once(stage)
+    _stream_completion(Gateway(), [], None, release=release)
+    release()
+    release()
+    assert stage.in_flight == 0
+    async with stage.slot():
+        assert stage.in_flight == 1
@@ -0,0 +1,157 @@
+import os
+import re
+import sys
+import json
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pymilvus")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.retrieval.backfill import EmbeddingBackfill, BackfillCheckpoint
+
+FIELDS = ["embedding", "text", "document_id", "embedding_model"]
+
+class FakeField:
+    def __init__(self, name, auto_id=False):
+        self.name = name
+        self.auto_id = auto_id
+
+class FakeSchema:
+    fields = [FakeField("id", auto_id=True)] + [FakeField(f) for f in FIELDS]
+
+class FakeIterator:
+    def __init__(self, collection, batch_size, expr, output_fields):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.expr = expr
+        self.output_fields = output_fields
+        self.cursor = int(re.match(r"id > (-?\d+)", expr).group(1))
+
+    def next(self):
+        # Like pymilvus: pk-ordered pages, re-evaluated against the live data
+        rows = [r for r in self.collection.matching(self.expr) if r["id"] > self.cursor][:self.batch_size]
+        if rows:
+            self.cursor = rows[-1]["id"]
+        return [{f: r[f] for f in self.output_fields} for r in rows]
+
+    def close(self):
+        pass
+
+class FakeCollection:
+    schema = FakeSchema()
+
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 1
+
+    def add(self, **row):
+        self.rows[self.next_id] = {"id": self.next_id, **row}
+        self.next_id += 1
+
+    def matching(self, expr):
+        rows = sorted(self.rows.values(), key=lambda r: r["id"])
+        m = re.match(r'id > (-?\d+) and embedding_model != "([^"]*)"', expr)
+        if m:
+            return [r for r in rows if r["id"] > int(m.group(1)) and r["embedding_model"] != m.group(2)]
+        m = re.match(r"id in (\[.*\])", expr)
+        if m:
+            ids = set(json.loads(m.group(1)))
+            return [r for r in rows if r["id"] in ids]
+        m = re.match(r'embedding_model == "([^"]*)" and document_id in (\[.*\])', expr)
+        docs = set(json.loads(m.group(2)))
+        return [r for r in rows if r["embedding_model"] == m.group(1) and r["document_id"] in docs]
+
+    def query(self, expr, output_fields, consistency_level=None):
+        rows = self.matching(expr)
+        if output_fields == ["count(*)"]:
+            return [{"count(*)": len(rows)}]
+        return [{f: r[f] for f in output_fields} for r in rows]
+
+    def query_iterator(self, batch_size, expr, output_fields):
+        return FakeIterator(self, batch_size, expr, output_fields)
+
+    def insert(self, entities):
+        columns = dict(zip(FIELDS, entities))
+        for i in range(len(columns["text"])):
+            self.add(**{f: columns[f][i] for f in FIELDS})
+
+    def delete(self, expr):
+        for row in self.matching(expr):
+            del self.rows[row["id"]]
+
+    def flush(self):
+        pass
+
+class FakeEmbedder:
+    model_name = "e5-v2"
+
+    def stats(self):
+        return {"cache_hits": 0, "encoded": 0, "encode_seconds": 0.0}
+
+    def flush_cache(self):
+        pass
+
+    def __init__(self, fail_on_call=None):
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+
+    def get_embeddings(self, texts, is_query=False):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("encoder crashed")
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+@pytest.fixture
+def collection():
+    c = FakeCollection()
+    for i in range(100):
+        # Legacy rows: written before the field existed, some with placeholder vectors
+        c.add(embedding=np.zeros(4), text=f"chunk {i}", document_id=f"doc{i // 10}", embedding_model="")
+    return c
+
+def test_backfill_reembeds_every_stale_row_once(collection, tmp_path):
+    backfill = EmbeddingBackfill(collection, FakeEmbedder(), str(tmp_path / "cp.json"), batch_size=16, processes=1)
+    summary = backfill.run()
+
+    rows = list(collection.rows.values())
+    assert len(rows) == 100
+    assert {r["embedding_model"] for r in rows} == {"e5-v2"}
+    assert sorted(r["text"] for r in rows) == sorted(f"chunk {i}" for i in range(100))
+    assert summary["processed_total"] == 100 and summary["remaining"] == 0
+
+def test_backfill_resumes_after_crash(collection, tmp_path):
+    checkpoint = str(tmp_path / "cp.json")
+    crashing = EmbeddingBackfill(collection, FakeEmbedder(fail_on_call=4), checkpoint, batch_size=16, processes=1)
+    with pytest.raises(RuntimeError):
+        crashing.run()
+    saved = BackfillCheckpoint.load(checkpoint, "e5-v2")
+    assert saved.processed == 48
+
+    embedder = FakeEmbedder()
+    EmbeddingBackfill(collection, embedder, checkpoint, batch_size=16, processes=1).run()
+    rows = list(collection.rows.values())
+    assert len(rows) == 100
+    assert {r["embedding_model"] for r in rows} == {"e5-v2"}
+    # Only the 52 remaining rows were embedded on the second run
+    assert embedder.calls == 4
+
+def test_recover_deletes_rows_replaced_before_the_crash(collection, tmp_path):
+    checkpoint = str(tmp_path / "cp.json")
+    # Simulate a crash between insert and delete for the first page
+    old_ids = [1, 2, 3]
+    for i in old_ids:
+        row = collection.rows[i]
+        collection.add(embedding=np.ones(4), text=row["text"], document_id=row["document_id"], embedding_model="e5-v2")
+    BackfillCheckpoint(target_model="e5-v2", pending_ids=old_ids).save(checkpoint)
+
+    EmbeddingBackfill(collection, FakeEmbedder(), checkpoint, batch_size=16, processes=1).run()
+    rows = list(collection.rows.values())
+    assert len(rows) == 100
+    assert len({r["text"] for r in rows}) == 100
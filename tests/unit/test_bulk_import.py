@@ -0,0 +1,200 @@
+import os
+import re
+import sys
+import json
+import shutil
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pymilvus")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.retrieval import bulk_import
+from app.services.retrieval.bulk_import import BulkImporter, BulkImportError
+from app.services.retrieval.chunk_store import ChunkStore
+from app.services.retrieval.vector_store.milvus import MilvusClient, SCALAR_FIELDS, STORED_FIELDS
+from pymilvus import DataType
+
+class FakeField:
+    def __init__(self, name, auto_id=False, dtype=None):
+        self.name = name
+        self.auto_id = auto_id
+        self.dtype = dtype
+
+class FakeSchema:
+    def __init__(self, scalar_fields, array_fields=()):
+        self.fields = [FakeField("id", auto_id=True), FakeField("embedding")] + [
+            FakeField(f, dtype=DataType.ARRAY if f in array_fields else DataType.VARCHAR) for f in scalar_fields
+        ]
+
+class FakeCollection:
+    def __init__(self, scalar_fields=SCALAR_FIELDS, array_fields=()):
+        self.name = "documents"
+        self.schema = FakeSchema(scalar_fields, array_fields)
+        self.rows = []
+
+    def delete(self, expr):
+        tenant_id, document_ids = re.match(r'tenant_id == (".*?") and document_id in (\[.*\])$', expr).groups()
+        tenant_id, document_ids = json.loads(tenant_id), json.loads(document_ids)
+        self.rows = [r for r in self.rows if not (r["tenant_id"] == tenant_id and r["document_id"] in document_ids)]
+
+    def describe(self):
+        return {"collection_name": "documents_v2"}
+
+class FakeMinio:
+    def __init__(self, tmp_path):
+        self.root = tmp_path / "minio"
+        self.objects = {}
+
+    def bucket_exists(self, bucket):
+        return bucket == "a-bucket"
+
+    def fput_object(self, bucket, object_name, path):
+        target = self.root / object_name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(path, target)
+        self.objects[object_name] = str(target)
+
+    def remove_object(self, bucket, object_name):
+        os.remove(self.objects.pop(object_name))
+
+class FakeState:
+    def __init__(self, state_name, row_count=0, ids=None, failed_reason=""):
+        self.state_name = state_name
+        self.row_count = row_count
+        self.ids = ids or []
+        self.failed_reason = failed_reason
+
+class FakeUtility:
+    """
+    Imports numpy shards like Milvus: one task per file set, auto ids assigned in row order.
+    """
+    def __init__(self, collection, minio, fail=False):
+        self.collection = collection
+        self.minio = minio
+        self.fail = fail
+        self.tasks = {}
+        self.next_id = 1000
+        self.polls = 0
+        # Task ids whose state comes back without auto ids, as Milvus 2.4 sometimes does
+        self.without_ids = set()
+
+    def do_bulk_insert(self, collection_name, files):
+        assert collection_name == "documents_v2"
+        if files[0].endswith(".json"):
+            with open(self.minio.objects[files[0]]) as f:
+                rows = json.load(f)["rows"]
+        else:
+            columns = {os.path.basename(f)[:-len(".npy")]: np.load(self.minio.objects[f]) for f in files}
+            rows = [{name: col[i] for name, col in columns.items()} for i in range(len(columns["embedding"]))]
+        count = len(rows)
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+        for row_id, row in zip(ids, rows):
+            self.collection.rows.append({"id": row_id, **row})
+        task_id = len(self.tasks) + 1
+        self.tasks[task_id] = FakeState("Completed", count, [] if task_id in self.without_ids else ids)
+        return task_id
+
+    def get_bulk_insert_state(self, task_id):
+        self.polls += 1
+        if self.fail:
+            return FakeState("Failed", failed_reason="field text: invalid utf-8")
+        # First poll of every task still reports it running
+        return self.tasks[task_id] if self.polls > len(self.tasks) else FakeState("Started")
+
+def document(doc, count):
+    embeddings = np.full((count, 4), doc, dtype=np.float32)
+    metadata = {"tenant_id": "acme", "document_id": f"doc{doc}", "source": f"doc{doc}.pdf", "last_modified": 7, "page": 2}
+    return MilvusClient.build_columns([f"doc{doc} chunk {i}" for i in range(count)], metadata, embeddings)
+
+@pytest.fixture
+def importer_env(tmp_path, monkeypatch):
+    def make(collection, fail=False, chunk_store=None):
+        minio = FakeMinio(tmp_path)
+        fake_utility = FakeUtility(collection, minio, fail=fail)
+        monkeypatch.setattr(bulk_import, "utility", fake_utility)
+        importer = BulkImporter(collection, chunk_store=chunk_store, minio_client=minio, shard_rows=20, poll_interval=0)
+        return importer, minio, fake_utility
+    return make
+
+def test_bulk_import_writes_shards_and_imports_every_row(importer_env):
+    collection = FakeCollection()
+    importer, minio, fake_utility = importer_env(collection)
+    for doc in range(6):
+        importer.add(document(doc, 10))
+    summary = importer.finish()
+
+    assert summary["rows"] == 60 and summary["shards"] == 3
+    assert len(fake_utility.tasks) == 3
+    assert len(collection.rows) == 60
+    row = collection.rows[-1]
+    assert row["text"] == "doc5 chunk 9" and row["tenant_id"] == "acme"
+    assert row["last_modified"] == 7 and row["embedding"].dtype == np.float32
+
+    importer.close()
+    assert not minio.objects
+    assert not os.path.exists(importer.staging_dir)
+
+def test_lean_import_fills_chunk_store_from_auto_ids(importer_env, tmp_path):
+    collection = FakeCollection([f for f in SCALAR_FIELDS if f not in STORED_FIELDS])
+    store = ChunkStore(str(tmp_path / "chunks.db"))
+    importer, _, _ = importer_env(collection, chunk_store=store)
+    for doc in range(3):
+        importer.add(document(doc, 20))
+    importer.finish()
+
+    assert "text" not in collection.rows[0]
+    records = store.get_many([r["id"] for r in collection.rows])
+    assert len(records) == 60
+    for row in collection.rows:
+        assert records[row["id"]]["text"].startswith(row["document_id"])
+    importer.close()
+
+def test_array_fields_are_imported_from_json_rows(importer_env):
+    collection = FakeCollection(array_fields=("access_permissions",))
+    importer, _, fake_utility = importer_env(collection)
+    assert importer.format == "json"
+    for doc in range(3):
+        columns = document(doc, 10)
+        columns["access_permissions"] = [["role:billing", "role:support"]] * 10
+        importer.add(columns, source_ids=list(range(doc * 10, doc * 10 + 10)))
+    summary = importer.finish()
+
+    assert summary["rows"] == 30 and summary["shards"] == 2
+    assert len(collection.rows) == 30
+    row = collection.rows[0]
+    assert row["access_permissions"] == ["role:billing", "role:support"]
+    assert row["page"] == 2 and len(row["embedding"]) == 4
+    # Source row ids map to the auto ids Milvus assigned, in file order
+    assert importer.id_map == {i: r["id"] for i, r in enumerate(collection.rows)}
+    importer.close()
+
+def test_failed_task_raises(importer_env):
+    importer, _, _ = importer_env(FakeCollection(), fail=True)
+    importer.add(document(0, 5))
+    with pytest.raises(BulkImportError, match="invalid utf-8"):
+        importer.finish()
+    importer.close()
+
+def test_lean_shard_without_reported_ids_is_removed_and_fails_the_import(importer_env, tmp_path):
+    collection = FakeCollection([f for f in SCALAR_FIELDS if f not in STORED_FIELDS])
+    store = ChunkStore(str(tmp_path / "chunks.db"))
+    importer, _, fake_utility = importer_env(collection, chunk_store=store)
+    fake_utility.without_ids.add(2)
+    for doc in range(3):
+        importer.add(document(doc, 20))
+    with pytest.raises(BulkImportError, match="reported 0 auto ids"):
+        importer.finish()
+
+    # The other shards still completed with their text; none of doc1's rows is left without it
+    assert sorted({r["document_id"] for r in collection.rows}) == ["doc0", "doc2"]
+    records = store.get_many([r["id"] for r in collection.rows])
+    assert len(records) == len(collection.rows) == 40
+    importer.close()
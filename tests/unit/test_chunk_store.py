@@ -0,0 +1,50 @@
+import os
+import sys
+import pytest
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.retrieval.chunk_store import ChunkStore, attach_stored_fields, CODEC_ZLIB
+
+def record(i):
+    return {"text": f"Claims must be filed within 90 days. Chunk {i}. " * 20, "source": f"manual-{i}.pdf", "source_system": "local_filesystem", "version": "1.0"}
+
+def test_round_trip_and_batched_lookup(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.db"))
+    ids = [10 ** 17 + i for i in range(2000)]
+    store.put_many(ids, [record(i) for i in range(2000)])
+    # More ids than SQLite binds per statement, plus one unknown id
+    found = store.get_many(ids + [42])
+    assert len(found) == 2000
+    assert found[ids[7]] == record(7)
+
+    stats = store.stats()
+    raw = sum(len(record(i)["text"]) for i in range(2000))
+    assert stats["payload_bytes"] < raw / 3
+
+    store.delete_many(ids[:1000])
+    assert len(store.get_many(ids)) == 1000
+    store.close()
+
+def test_reads_records_written_with_another_codec(tmp_path):
+    path = str(tmp_path / "chunks.db")
+    store = ChunkStore(path)
+    store.codec = CODEC_ZLIB
+    store.put_many([1], [record(1)])
+    store.close()
+    assert ChunkStore(path).get_many([1])[1]["source"] == "manual-1.pdf"
+
+def test_attach_stored_fields_fills_lean_rows(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.db"))
+    store.put_many([1, 2], [record(1), record(2)])
+    rows = [{"id": 1, "tenant_id": "t"}, {"id": 2, "tenant_id": "t", "text": "kept"}, {"id": 3, "tenant_id": "t"}]
+    attach_stored_fields(store, rows)
+    assert rows[0]["text"] == record(1)["text"] and rows[0]["source"] == "manual-1.pdf"
+    assert rows[1]["text"] == "kept"
+    assert "text" not in rows[2]
+    store.close()
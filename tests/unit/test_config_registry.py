@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import shutil
+import pytest
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.core.registry import ConfigRegistry, ConfigError
+
+RESOURCES = os.path.join(project_root, "resources")
+SYSTEM_PROMPTS = os.path.join(project_root, "init_data", "prompts", "system_prompts.yaml")
+
+@pytest.fixture
+def resources(tmp_path):
+    for name in ("models.yaml", "prompts.yaml", "tenants.yaml"):
+        shutil.copy(os.path.join(RESOURCES, name), tmp_path / name)
+    return tmp_path
+
+def test_loads_bundled_config_into_read_only_snapshot(resources):
+    registry = ConfigRegistry(str(resources), SYSTEM_PROMPTS)
+    config = registry.snapshot
+
+    assert "llama-3.1-8b-instant" in [m.id for m in config.models]
+    assert config.providers["groq"].default_model == "llama-3.3-70b-versatile"
+    assert config.tenant("unknown_tenant").plan == "enterprise"
+    assert config.system_prompt.startswith("You are a helpful and accurate customer service agent")
+    assert "{context}" in config.context_template
+    with pytest.raises(TypeError):
+        config.tenants["new"] = None
+
+def test_invalid_edit_keeps_previous_snapshot(resources):
+    registry = ConfigRegistry(str(resources), SYSTEM_PROMPTS)
+    before = registry.snapshot
+
+    (resources / "tenants.yaml").write_text("tenants:\n  - id: acme\n    plan: platinum\n")
+
+    assert registry.reload() is False
+    assert registry.snapshot is before
+    assert "platinum" in registry.last_error
+
+@pytest.mark.parametrize("prompts, error", [
+    ('rag: "text"\n', "AttributeError"),
+    ('rag:\n  system_context_template: "{system_prompt} {foo} {context}"\n', "{context}"),
+])
+def test_malformed_prompts_are_rejected(resources, prompts, error):
+    registry = ConfigRegistry(str(resources), SYSTEM_PROMPTS)
+    before = registry.snapshot
+    (resources / "prompts.yaml").write_text(prompts)
+
+    assert registry.reload() is False
+    assert registry.snapshot is before
+    assert error in registry.last_error
+
+def test_watcher_swaps_snapshot_on_change(resources):
+    registry = ConfigRegistry(str(resources), SYSTEM_PROMPTS)
+    before = registry.snapshot
+    registry.start_watching(interval=0.05)
+    try:
+        (resources / "tenants.yaml").write_text("tenants:\n  - id: acme\n    plan: basic\n    faq_fast_path: true\n")
+        os.utime(resources / "tenants.yaml", (time.time() + 5, time.time() + 5))
+        deadline = time.time() + 2
+        while registry.snapshot is before and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        registry.stop_watching()
+
+    config = registry.snapshot
+    assert config.version != before.version
+    assert config.tenants["acme"].plan == "basic"
+    assert config.tenants["acme"].options["faq_fast_path"] is True
+
+def test_first_load_failure_raises(tmp_path):
+    (tmp_path / "models.yaml").write_text("models:\n  - id: x\n")
+    with pytest.raises(ConfigError):
+        ConfigRegistry(str(tmp_path), str(tmp_path / "missing.yaml")).snapshot
+
+def test_config_routes_require_the_admin_token(resources, monkeypatch):
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.v1 import admin
+
+    registry = ConfigRegistry(str(resources), SYSTEM_PROMPTS)
+    monkeypatch.setattr(admin, "get_registry", lambda: registry)
+    app = FastAPI()
+    app.include_router(admin.router)
+    client = TestClient(app)
+
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.post("/config/reload").status_code == 404
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    assert client.post("/config/reload").status_code == 403
+    assert client.get("/config/version", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.post("/config/reload", headers={"X-Admin-Token": "s3cret"}).status_code == 200
+    assert client.get("/config/version", headers={"X-Admin-Token": "s3cret"}).status_code == 200
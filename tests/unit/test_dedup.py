@@ -0,0 +1,137 @@
+import os
+import sys
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.ingestion.dedup import MinHashDeduper, DedupStats, shingle_hashes
+
+DISCLAIMER = (
+    "This provider manual is for informational purposes only. Kaiser Permanente reserves the right "
+    "to change its policies and procedures at any time. For questions about claims, eligibility or "
+    "referrals please contact the Provider Contact Center at 1-877-226-3968, Monday through Friday, "
+    "8 a.m. to 5 p.m. Pacific Time, excluding holidays. Please have your provider number available."
+)
+
+def test_near_duplicate_boilerplate_is_detected():
+    deduper = MinHashDeduper(threshold=0.7)
+    variant = DISCLAIMER.replace("Monday through Friday", "Monday through Friday,").upper()
+    other = "Claims must be submitted within 90 days of the date of service using the CMS-1500 form or electronically via EDI."
+    result = deduper.dedup([DISCLAIMER, other, variant], [("doc1", 0), ("doc1", 1), ("doc2", 0)])
+    assert result.keep == [0, 1]
+    assert result.duplicates == {2: ("doc1", 0)}
+    assert result.similarities[2] >= 0.7
+
+def test_partial_overlap_is_kept():
+    deduper = MinHashDeduper(threshold=0.85)
+    half = DISCLAIMER[:len(DISCLAIMER) // 2] + " Referral requests for out-of-network specialists require prior authorization from the medical group."
+    result = deduper.dedup([DISCLAIMER, half], ["a", "b"])
+    assert result.keep == [0, 1]
+
+def test_similarity_estimate_tracks_jaccard():
+    deduper = MinHashDeduper(num_perm=256, bands=32)
+    words = [f"w{i}" for i in range(400)]
+    a = " ".join(words[:300])
+    b = " ".join(words[100:400])
+    sa, sb = set(shingle_hashes(a, 5).tolist()), set(shingle_hashes(b, 5).tolist())
+    jaccard = len(sa & sb) / len(sa | sb)
+    estimate = deduper.similarity(deduper.signature(a), deduper.signature(b))
+    assert abs(estimate - jaccard) < 0.1
+
+def test_stats_report_savings():
+    deduper = MinHashDeduper()
+    stats = DedupStats(dim=768)
+    texts = [DISCLAIMER, DISCLAIMER]
+    stats.record("doc", texts, deduper.dedup(texts, [0, 1]))
+    stats.record_embedding(10, 0.5)
+    report = stats.report()
+    assert report["duplicates"] == 1
+    assert report["vector_bytes_saved"] == 768 * 4
+    assert report["text_bytes_saved"] == len(DISCLAIMER)
+    assert report["embedding_seconds_saved"] == 0.05
+
+def test_deferred_index_only_counts_committed_chunks():
+    deduper = MinHashDeduper(threshold=0.7)
+    keys = [("doc1", 0), ("doc1", 1)]
+    result = deduper.dedup([DISCLAIMER, DISCLAIMER.upper()], keys, index=False)
+    # Still compared within the batch, but nothing is indexed until the chunks are stored
+    assert result.keep == [0] and result.duplicates == {1: ("doc1", 0)}
+    assert len(deduper) == 0
+    assert deduper.dedup([DISCLAIMER], [("doc2", 0)], index=False).keep == [0]
+
+    deduper.commit(keys, result)
+    assert len(deduper) == 1
+    assert deduper.dedup([DISCLAIMER], [("doc3", 0)], index=False).duplicates == {0: ("doc1", 0)}
+
+@pytest.mark.asyncio
+async def test_orchestrator_dedups_per_permission_set_after_storing():
+    from app.services.chunking.base import Chunk
+    from app.services.ingestion.orchestrator import IngestionOrchestrator
+
+    class Embedder:
+        model_name = "fake"
+        def get_embeddings(self, texts):
+            return np.zeros((len(texts), 4), dtype=np.float32)
+
+    class Store:
+        def __init__(self):
+            self.fail = False
+            self.stored = []
+        async def upsert(self, chunks, metadata, embeddings):
+            if self.fail:
+                return False
+            self.stored.append((metadata["document_id"], [c.text for c in chunks]))
+            return True
+
+    orchestrator = IngestionOrchestrator.__new__(IngestionOrchestrator)
+    orchestrator.chunker = type("Chunker", (), {"chunk": lambda self, content: [Chunk(text=content)]})()
+    orchestrator.embedder, orchestrator.vector_store, orchestrator.bulk = Embedder(), Store(), None
+    orchestrator.dedup_mode, orchestrator.dedupers, orchestrator.dedup_stats = "skip", {}, DedupStats(dim=4)
+    orchestrator.dedup_scope = "tenant"
+
+    # A failed store leaves nothing behind for later documents to be deduplicated against
+    orchestrator.vector_store.fail = True
+    with pytest.raises(RuntimeError):
+        await orchestrator.ingest_document({"document_id": "a", "access_permissions": ["role:billing"]}, DISCLAIMER)
+    orchestrator.vector_store.fail = False
+    await orchestrator.ingest_document({"document_id": "b", "access_permissions": ["role:billing"]}, DISCLAIMER)
+    # Restricted copy does not hide the public one
+    await orchestrator.ingest_document({"document_id": "c"}, DISCLAIMER)
+    await orchestrator.ingest_document({"document_id": "d", "access_permissions": "public"}, DISCLAIMER)
+    assert [doc for doc, _ in orchestrator.vector_store.stored] == ["b", "c"]
+
+@pytest.mark.asyncio
+async def test_default_scope_only_drops_repeats_within_a_document():
+    from app.services.chunking.base import Chunk
+    from app.services.ingestion.orchestrator import IngestionOrchestrator
+
+    class Embedder:
+        model_name = "fake"
+        def get_embeddings(self, texts):
+            return np.zeros((len(texts), 4), dtype=np.float32)
+
+    class Store:
+        def __init__(self):
+            self.stored = []
+        async def upsert(self, chunks, metadata, embeddings):
+            self.stored.append((metadata["document_id"], len(chunks)))
+            return True
+
+    orchestrator = IngestionOrchestrator.__new__(IngestionOrchestrator)
+    orchestrator.chunker = type("Chunker", (), {"chunk": lambda self, content: [Chunk(text=t) for t in content]})()
+    orchestrator.embedder, orchestrator.vector_store, orchestrator.bulk = Embedder(), Store(), None
+    orchestrator.dedup_mode, orchestrator.dedup_scope = "skip", "document"
+    orchestrator.dedupers, orchestrator.dedup_stats = {}, DedupStats(dim=4)
+
+    await orchestrator.ingest_document({"document_id": "a"}, [DISCLAIMER, DISCLAIMER.upper()])
+    # Another document's copy is kept: deleting or re-ingesting "a" must not take its content with it
+    await orchestrator.ingest_document({"document_id": "b"}, [DISCLAIMER])
+    assert orchestrator.vector_store.stored == [("a", 1), ("b", 1)]
+    assert orchestrator.dedupers == {}
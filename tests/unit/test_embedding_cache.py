@@ -0,0 +1,107 @@
+import os
+import sys
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.generation.embedding_cache import EmbeddingCache, cache_key, embedding_report
+
+def vectors(n, dim=8, offset=0):
+    return np.arange(offset, offset + n * dim, dtype=np.float32).reshape(n, dim)
+
+def test_hits_misses_and_persistence(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = EmbeddingCache(path, dim=8, capacity=100)
+    keys = [cache_key("e5", f"passage: chunk {i}") for i in range(5)]
+    out, missing = cache.get_many(keys)
+    assert missing == [0, 1, 2, 3, 4]
+    cache.put_many(keys, vectors(5))
+    cache.close()
+
+    # Reopened from disk: everything is a hit with identical vectors
+    reopened = EmbeddingCache(path, dim=8)
+    out, missing = reopened.get_many(keys[2:] + [cache_key("e5", "passage: new")])
+    assert missing == [3]
+    np.testing.assert_array_equal(out[:3], vectors(5)[2:])
+    assert reopened.stats()["hit_rate"] == 0.75
+    reopened.close()
+
+def test_model_id_is_part_of_the_key():
+    assert cache_key("e5-base-v2", "passage: x") != cache_key("e5-large-v2", "passage: x")
+
+def test_evicts_least_recently_used_when_full(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache"), dim=8, capacity=10, evict_fraction=0.2)
+    keys = [cache_key("e5", str(i)) for i in range(10)]
+    cache.put_many(keys[:5], vectors(5))
+    cache.put_many(keys[5:], vectors(5, offset=100))
+    # Touch the first batch so the second one is the least recently used
+    cache.get_many(keys[:5])
+    cache.put_many([cache_key("e5", "new")], vectors(1))
+    assert len(cache) == 9
+    _, missing = cache.get_many(keys)
+    assert set(missing) <= {5, 6, 7, 8, 9} and len(missing) == 2
+    cache.close()
+
+def test_second_process_opens_read_only(tmp_path):
+    path = str(tmp_path / "cache")
+    writer = EmbeddingCache(path, dim=8, capacity=10)
+    key = cache_key("e5", "a")
+    writer.put_many([key], vectors(1))
+    writer.flush()
+    reader = EmbeddingCache(path, dim=8)
+    assert not reader.writable
+    _, missing = reader.get_many([key])
+    assert missing == []
+    reader.put_many([cache_key("e5", "b")], vectors(1))
+    assert len(reader) == 1
+    reader.close()
+    writer.close()
+
+def test_reader_started_before_the_writer_runs_uncached_until_it_exists(tmp_path, monkeypatch):
+    from app.services.generation import embeddings
+    path = str(tmp_path / "cache")
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", path)
+    monkeypatch.setattr(embeddings, "_caches", {})
+
+    # The API can come up before ingestion has created the shared cache
+    assert embeddings.get_embedding_cache(8, writer=False) is None
+    writer = EmbeddingCache(path, dim=8, capacity=10)
+    reader = embeddings.get_embedding_cache(8, writer=False)
+    assert reader is not None and not reader.writable
+    assert embeddings.get_embedding_cache(8, writer=False) is reader
+    reader.close()
+    writer.close()
+
+def test_reader_never_returns_a_reused_slot_and_sees_new_keys(tmp_path):
+    path = str(tmp_path / "cache")
+    writer = EmbeddingCache(path, dim=8, capacity=2, evict_fraction=0.5)
+    old = [cache_key("e5", "t0"), cache_key("e5", "t1")]
+    writer.put_many(old, vectors(2))
+    writer.flush()
+    reader = EmbeddingCache(path, dim=8, writer=False, refresh_seconds=0)
+    assert reader.get_many(old)[1] == []
+
+    # Evicts t0 and reuses its slot for the new key
+    new = cache_key("e5", "t2")
+    writer.get_many(old[1:])
+    writer.put_many([new], vectors(1, offset=100))
+    writer.flush()
+    out, missing = reader.get_many([old[0], new])
+    assert missing == [0]
+    np.testing.assert_array_equal(out[1], vectors(1, offset=100)[0])
+    reader.close()
+    writer.close()
+
+def test_embedding_report():
+    before = {"cache_hits": 10, "encoded": 5, "encode_seconds": 1.0}
+    after = {"cache_hits": 40, "encoded": 15, "encode_seconds": 3.0}
+    report = embedding_report(before, after)
+    assert report["hit_rate"] == 0.75
+    assert report["seconds_saved"] == 6.0
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import asyncio
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.evaluation import runner as eval_runner
+from app.services.evaluation.runner import (
+    DiskCache, EvalRunner, compare_reports, parse_judge_score, token_f1
+)
+from app.services.generation.llm_gateway import LLMResult
+from app.services.retrieval.vector_store.local import LocalVectorStore
+
+TOPICS = ["deductible", "copay", "referral", "pharmacy"]
+
+class KeywordEmbedder:
+    # One dimension per topic word: a question retrieves the document about its topic
+    def get_embeddings(self, texts, is_query=False):
+        vectors = np.full((len(texts), len(TOPICS)), 0.05, dtype=np.float32)
+        for i, text in enumerate(texts):
+            for j, topic in enumerate(TOPICS):
+                if topic in text.lower():
+                    vectors[i, j] = 1.0
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+class FakeGateway:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def complete(self, messages, model=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        prompt = messages[-1]["content"]
+        if prompt.startswith("You grade"):
+            content = '{"score": 0.8, "reason": "mostly supported"}'
+        else:
+            # Echo the first retrieved line as the answer
+            context = messages[0]["content"].split("Context:\n", 1)[-1]
+            content = context.split("\n")[0]
+        return LLMResult(content=content, model=model or "fake", provider="fake", first_token_ms=1.0, total_ms=self.delay * 1000)
+
+class PromptConfig:
+    system_prompt = "You answer benefit questions."
+    context_template = "{system_prompt}\n\nContext:\n{context}\n"
+
+QUESTIONS = [
+    {"query": "What is the deductible?", "ground_truth": "The deductible is $500.", "contexts": ["deductible.pdf"]},
+    {"query": "How much is the copay?", "ground_truth": "The copay is $20.", "contexts": ["copay.pdf"]},
+    {"query": "Do I need a referral?", "ground_truth": "Specialists need a referral.", "contexts": ["referral.pdf"]},
+    # No document covers this one
+    {"query": "Which pharmacy should I use?", "ground_truth": "Any network pharmacy.", "contexts": ["pharmacy.pdf"]},
+]
+
+async def build_store():
+    store = LocalVectorStore(dim=len(TOPICS))
+    embedder = KeywordEmbedder()
+    for topic, answer in [("deductible", "The deductible is $500."), ("copay", "The copay is $20."), ("referral", "Specialists need a referral.")]:
+        await store.upsert([answer], {"document_id": f"{topic}.pdf", "source": f"{topic}.pdf"}, embedder.get_embeddings([answer]))
+    return store, embedder
+
+@pytest.mark.asyncio
+async def test_report_combines_retrieval_answers_and_latency(tmp_path):
+    store, embedder = await build_store()
+    gateway = FakeGateway()
+    runner = EvalRunner(embedder, store, gateway, cache=DiskCache(str(tmp_path)), prompt_config=PromptConfig(), top_k=1, concurrency=2)
+    report = await runner.run(QUESTIONS)
+
+    assert report["errors"] == 0
+    assert report["retrieval"]["hit_rate"] == 0.75
+    assert report["retrieval"]["mrr"] == 0.75
+    # Answers echo the retrieved passage, which is the ground truth for the three covered questions
+    assert report["answers"]["answer_f1"] == pytest.approx(0.75, abs=0.01)
+    assert report["answers"]["faithfulness"] == 0.8
+    for name in ("embed", "search", "generate", "judge", "total"):
+        assert report["latency_ms"][name]["count"] == 4
+        assert report["latency_ms"][name]["p50"] <= report["latency_ms"][name]["p95"] <= report["latency_ms"][name]["max"]
+    # One generation and two verdicts per question
+    assert gateway.calls == 12
+    assert gateway.max_in_flight <= 2 * 2
+
+@pytest.mark.asyncio
+async def test_rerun_only_pays_for_changed_inputs(tmp_path):
+    store, embedder = await build_store()
+    cache = DiskCache(str(tmp_path))
+    await EvalRunner(embedder, store, FakeGateway(), cache=cache, prompt_config=PromptConfig(), top_k=1).run(QUESTIONS)
+
+    gateway = FakeGateway()
+    report = await EvalRunner(embedder, store, gateway, cache=DiskCache(str(tmp_path)), prompt_config=PromptConfig(), top_k=1).run(QUESTIONS)
+    assert gateway.calls == 0
+    assert report["cache"] == {"hits": 12, "misses": 0}
+    # Cached calls are not timed; retrieval always runs
+    assert report["latency_ms"]["generate"] == {"count": 0}
+    assert report["latency_ms"]["search"]["count"] == 4
+
+    # New context for one question: only its answer and verdicts are recomputed
+    await store.upsert(["Pharmacy: any network pharmacy."], {"document_id": "pharmacy.pdf"}, embedder.get_embeddings(["pharmacy"]))
+    gateway = FakeGateway()
+    report = await EvalRunner(embedder, store, gateway, cache=DiskCache(str(tmp_path)), prompt_config=PromptConfig(), top_k=1).run(QUESTIONS)
+    assert gateway.calls == 3
+    assert report["retrieval"]["hit_rate"] == 1.0
+
+def test_scoring_helpers():
+    assert token_f1("The copay is $20.", "the copay is $20") == 1.0
+    assert token_f1("no idea", "The copay is $20.") == 0.0
+    assert parse_judge_score('Sure: {"score": 0.5, "reason": "partly"}') == 0.5
+    assert parse_judge_score("Score: 1") == 1.0
+    assert parse_judge_score("7") == 1.0
+    assert parse_judge_score("cannot tell") is None
+
+def test_compare_reports_flags_regressions():
+    baseline = {"retrieval": {"hit_rate": 0.9, "mrr": 0.8}, "latency_ms": {"search": {"p95": 10.0}, "total": {"p95": 100.0}}}
+    report = {"retrieval": {"hit_rate": 0.88, "mrr": 0.5}, "latency_ms": {"search": {"p95": 15.0}, "total": {"p95": 110.0}}}
+    comparison = compare_reports(report, baseline, tolerance=0.2)
+    assert sorted(comparison["regressions"]) == ["latency_ms.search.p95", "retrieval.mrr"]
+    assert "latency_ms.total.p95" in comparison["changes"]
+
+@pytest.mark.asyncio
+async def test_background_job_results_are_saved(tmp_path, monkeypatch):
+    datasets = tmp_path / "datasets"
+    datasets.mkdir()
+    (datasets / "golden.json").write_text(json.dumps(QUESTIONS))
+    monkeypatch.setenv("EVAL_DATASET_DIR", str(datasets))
+    monkeypatch.setenv("EVAL_RESULTS_DIR", str(tmp_path / "results"))
+    monkeypatch.setenv("EVAL_CACHE_DIR", str(tmp_path / "cache"))
+    store, embedder = await build_store()
+    monkeypatch.setattr("app.services.generation.embeddings.get_embedding_service", lambda: embedder)
+    monkeypatch.setattr("app.services.retrieval.vector_store.base.get_vector_store", lambda: store)
+    monkeypatch.setattr("app.services.generation.llm_gateway.get_llm_gateway", lambda: FakeGateway())
+    monkeypatch.setattr("app.core.registry.get_config", lambda: PromptConfig())
+
+    with pytest.raises(FileNotFoundError):
+        eval_runner.start_eval("missing")
+    with pytest.raises(ValueError):
+        eval_runner.start_eval("../golden")
+    with pytest.raises(ValueError):
+        eval_runner.start_eval("golden", metrics=["bleu"])
+
+    job = eval_runner.start_eval("golden", metrics=["answer_f1"], top_k=1)
+    assert job.total == 4
+    await eval_runner._tasks[job.run_id]
+    assert job.status == "completed"
+    assert job.completed == 4
+    assert list(job.report["answers"]) == ["answer_f1"]
+
+    # Served from the saved results once the process no longer has the job
+    eval_runner._jobs.pop(job.run_id)
+    saved = eval_runner.get_eval_job(job.run_id)
+    assert saved.status == "completed"
+    assert saved.report["retrieval"] == job.report["retrieval"]
+    assert eval_runner.get_eval_job("eval-unknown") is None
+
+def test_eval_routes_need_the_admin_token_and_bounded_options(monkeypatch):
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.v1 import eval as eval_api
+
+    started = []
+    def fake_start(dataset_id, baseline_run_id=None, **options):
+        started.append(options)
+        return type("Job", (), {"run_id": "eval-test", "total": 4})()
+    monkeypatch.setattr("app.services.evaluation.runner.start_eval", fake_start)
+
+    app = FastAPI()
+    app.include_router(eval_api.router)
+    client = TestClient(app)
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    admin = {"X-Admin-Token": "s3cret"}
+
+    assert client.post("/eval/run", json={}).status_code == 403
+    assert client.get("/eval/results/eval-test").status_code == 403
+    assert client.post("/eval/run", json={"concurrency": 10000}, headers=admin).status_code == 422
+    assert client.post("/eval/run", json={"concurrency": 0}, headers=admin).status_code == 422
+    assert client.post("/eval/run", json={"top_k": 100000}, headers=admin).status_code == 422
+    assert started == []
+
+    response = client.post("/eval/run", json={"concurrency": 8, "top_k": 3}, headers=admin)
+    assert response.status_code == 200 and response.json()["run_id"] == "eval-test"
+    assert started == [{"top_k": 3, "concurrency": 8}]
@@ -0,0 +1,94 @@
+import os
+import sys
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.retrieval.faq import FaqIndex, QAPair, extract_qa_pairs
+
+FAQ_FILE = os.path.join(project_root, "resources", "source_docs", "national-contracting-faq.txt")
+
+def test_extracts_numbered_questions_from_the_scraped_faq():
+    with open(FAQ_FILE, "r", encoding="utf-8") as f:
+        pairs = extract_qa_pairs(f.read())
+    assert len(pairs) == 9
+    assert pairs[6].question == "How do I know which Tax ID’s I have access to?"
+    assert pairs[6].answer.startswith("You can view your provider Tax ID associations")
+    # Site footer after "Back to top" is not part of the last answer
+    assert "Privacy Practices" not in pairs[-1].answer
+    assert not any("Figure" in p.answer for p in pairs)
+
+def test_numbered_steps_inside_answers_stay_in_the_answer():
+    text = "\n".join([
+        "1. How do I reset my password?",
+        "Follow these steps:",
+        "1. Open the sign-in page.",
+        "2. Select Forgot password.",
+        "2. Who do I call about claims?",
+        "Q: Is there a fax number?",
+        "A: Yes, 877-516-0126.",
+    ])
+    pairs = extract_qa_pairs(text)
+    assert [p.question for p in pairs] == ["How do I reset my password?", "Is there a fax number?"]
+    assert "Select Forgot password." in pairs[0].answer
+    assert pairs[1].answer == "Yes, 877-516-0126."
+
+def unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+def test_index_matches_above_threshold_and_tracks_hit_rate(tmp_path):
+    index = FaqIndex(str(tmp_path), threshold=0.9)
+    pairs = [QAPair("How do I reset my password?", "Use Forgot password."), QAPair("Who handles claims?", "The claims team.")]
+    index.put("acme", "faq.txt", pairs, np.stack([unit([1, 0, 0]), unit([0, 1, 0])]), source="faq.txt")
+
+    hit = index.match("acme", unit([0.95, 0.05, 0]))
+    assert hit["answer"] == "Use Forgot password." and hit["score"] > 0.9
+    assert index.match("acme", unit([1, 1, 0])) is None
+    assert index.match("globex", unit([1, 0, 0])) is None
+
+    metrics = index.metrics()
+    assert metrics["lookups"] == 3 and metrics["hits"] == 1
+    assert metrics["tenants"]["acme"]["hit_rate"] == 0.5
+
+def test_reingest_replaces_document_entries_and_readers_reload(tmp_path):
+    writer = FaqIndex(str(tmp_path), threshold=0.9)
+    reader = FaqIndex(str(tmp_path), threshold=0.9)
+    writer.put("acme", "faq.txt", [QAPair("Old question?", "Old answer.")], np.stack([unit([1, 0, 0])]))
+    writer.put("acme", "other.txt", [QAPair("Other question?", "Other answer.")], np.stack([unit([0, 0, 1])]))
+    assert reader.match("acme", unit([1, 0, 0]))["answer"] == "Old answer."
+
+    writer.put("acme", "faq.txt", [QAPair("New question?", "New answer.")], np.stack([unit([1, 0, 0])]))
+    # Same second as the first write on coarse filesystems: force a new mtime
+    path = os.path.join(str(tmp_path), "acme.npz")
+    os.utime(path, (os.stat(path).st_atime, os.stat(path).st_mtime + 5))
+    assert reader.match("acme", unit([1, 0, 0]))["answer"] == "New answer."
+    assert reader.match("acme", unit([0, 0, 1]))["answer"] == "Other answer."
+
+def test_remove_drops_only_that_documents_entries(tmp_path):
+    index = FaqIndex(str(tmp_path), threshold=0.9)
+    assert index.remove("acme", "faq.txt") is False
+    index.put("acme", "faq.txt", [QAPair("Old question?", "Old answer.")], np.stack([unit([1, 0, 0])]))
+    index.put("acme", "other.txt", [QAPair("Other question?", "Other answer.")], np.stack([unit([0, 0, 1])]))
+
+    assert index.remove("acme", "faq.txt") is True
+    assert index.match("acme", unit([1, 0, 0])) is None
+    assert index.match("acme", unit([0, 0, 1]))["answer"] == "Other answer."
+    assert index.remove("acme", "faq.txt") is False
+
+def test_restricted_answers_are_only_served_to_their_roles(tmp_path):
+    index = FaqIndex(str(tmp_path), threshold=0.9)
+    index.put("acme", "billing.txt", [QAPair("How do refunds work?", "Billing issues refunds.")], np.stack([unit([1, 0, 0])]), access_permissions=["role:billing"])
+    index.put("acme", "public.txt", [QAPair("Where is the office?", "Main street.")], np.stack([unit([0, 1, 0])]))
+
+    assert index.match("acme", unit([1, 0, 0]))["answer"] == "Billing issues refunds."
+    assert index.match("acme", unit([1, 0, 0]), roles=["role:billing"])["answer"] == "Billing issues refunds."
+    assert index.match("acme", unit([1, 0, 0]), roles=["role:support"]) is None
+    assert index.match("acme", unit([0, 1, 0]), roles=["role:support"])["answer"] == "Main street."
@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+pytest.importorskip("openai")
+pytest.importorskip("httpx")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.generation.llm_gateway import LLMGateway, ProviderConfig
+
+class StubProvider:
+    """
+    Local OpenAI-compatible server streaming a fixed answer.
+    `failures` is a list of status codes returned (in order) before succeeding.
+    """
+    def __init__(self, answer: str, first_token_delay: float = 0.0, failures=None):
+        self.answer = answer
+        self.first_token_delay = first_token_delay
+        self.failures = list(failures or [])
+        self.requests = 0
+        self.connections = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                stub.requests += 1
+                stub.connections.add(self.client_address)
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if stub.failures:
+                    status = stub.failures.pop(0)
+                    body = json.dumps({"error": {"message": "stub failure"}}).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                time.sleep(stub.first_token_delay)
+                events = []
+                for word in stub.answer.split(" "):
+                    chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": "stub-model",
+                             "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                    events.append(f"data: {json.dumps(chunk)}\n\n")
+                events.append("data: [DONE]\n\n")
+                body = "".join(events).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The gateway cancelled this request (losing hedge)
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stubs():
+    created = []
+
+    def make(*args, **kwargs):
+        stub = StubProvider(*args, **kwargs)
+        created.append(stub)
+        return stub
+
+    yield make
+    for stub in created:
+        stub.close()
+
+def make_gateway(primary, secondary=None, **kwargs):
+    providers = {"primary": ProviderConfig("primary", primary.base_url, "key", "primary-model")}
+    if secondary is not None:
+        providers["secondary"] = ProviderConfig("secondary", secondary.base_url, "key", "secondary-model")
+    kwargs.setdefault("first_token_timeout", 2.0)
+    kwargs.setdefault("total_timeout", 5.0)
+    return LLMGateway(providers, "primary", "secondary" if secondary else None, **kwargs)
+
+@pytest.mark.asyncio
+async def test_complete_reuses_pooled_connection(stubs):
+    primary = stubs("hello from primary")
+    gateway = make_gateway(primary, max_retries=0)
+    try:
+        for _ in range(3):
+            result = await gateway.complete([{"role": "user", "content": "hi"}])
+            assert result.content.strip() == "hello from primary"
+            assert result.provider == "primary"
+    finally:
+        await gateway.aclose()
+    assert primary.requests == 3
+    assert len(primary.connections) == 1
+
+@pytest.mark.asyncio
+async def test_retries_rate_limit_then_succeeds(stubs):
+    primary = stubs("ok", failures=[429, 503])
+    gateway = make_gateway(primary, max_retries=2)
+    try:
+        result = await gateway.complete([{"role": "user", "content": "hi"}])
+    finally:
+        await gateway.aclose()
+    assert result.content.strip() == "ok"
+    assert gateway.stats["primary"].retries == 2
+
+@pytest.mark.asyncio
+async def test_fails_over_to_secondary_when_primary_keeps_failing(stubs):
+    primary = stubs("never", failures=[500, 500])
+    secondary = stubs("from secondary")
+    gateway = make_gateway(primary, secondary, max_retries=1)
+    try:
+        result = await gateway.complete([{"role": "user", "content": "hi"}])
+    finally:
+        await gateway.aclose()
+    assert result.provider == "secondary"
+    assert result.model == "secondary-model"
+
+@pytest.mark.asyncio
+async def test_hedges_to_secondary_when_first_token_is_late(stubs):
+    primary = stubs("slow primary", first_token_delay=1.0)
+    secondary = stubs("fast secondary")
+    gateway = make_gateway(primary, secondary, max_retries=0, hedge_after=0.1)
+    try:
+        start = time.perf_counter()
+        deltas = [d async for d in gateway.stream_chat([{"role": "user", "content": "hi"}])]
+        elapsed = time.perf_counter() - start
+    finally:
+        await gateway.aclose()
+    assert "".join(deltas).strip() == "fast secondary"
+    assert elapsed < 0.9
+    metrics = gateway.metrics()["providers"]
+    assert metrics["primary"]["hedges"] == 1
+    assert metrics["secondary"]["hedge_wins"] == 1
+    assert metrics["secondary"]["first_token_ms"]["p50"] is not None
+
+@pytest.mark.asyncio
+async def test_does_not_fail_over_on_a_bad_request(stubs):
+    primary = stubs("never", failures=[400])
+    secondary = stubs("from secondary")
+    gateway = make_gateway(primary, secondary, max_retries=1)
+    try:
+        with pytest.raises(Exception):
+            await gateway.complete([{"role": "user", "content": "hi"}])
+    finally:
+        await gateway.aclose()
+    # The same request would be rejected there too, and on a different model
+    assert primary.requests == 1
+    assert secondary.requests == 0
+
+class FakeAttempt:
+    def __init__(self, provider):
+        self.provider = provider
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+@pytest.mark.asyncio
+async def test_hedge_attempts_are_released_when_the_caller_goes_away(stubs, monkeypatch):
+    import asyncio
+    from app.services.generation import llm_gateway
+    monkeypatch.setattr(llm_gateway, "_Attempt", FakeAttempt)
+    gateway = make_gateway(stubs("unused"), stubs("unused"), max_retries=0, hedge_after=0.01)
+    opened, cancelled, ready = [], [], asyncio.Event()
+
+    async def fake_open(provider, model, messages):
+        try:
+            await ready.wait()
+        except asyncio.CancelledError:
+            cancelled.append(provider)
+            raise
+        attempt = FakeAttempt(provider)
+        opened.append(attempt)
+        return attempt
+    monkeypatch.setattr(gateway, "_open_with_retries", fake_open)
+
+    try:
+        # Client disconnects while both attempts are still waiting for a first token
+        caller = asyncio.create_task(gateway._start(None, [{"role": "user", "content": "hi"}]))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        assert sorted(cancelled) == ["primary", "secondary"]
+
+        # Both attempts open in the same loop iteration: the loser's stream is closed, the winner's kept
+        caller = asyncio.create_task(gateway._start(None, [{"role": "user", "content": "hi"}]))
+        await asyncio.sleep(0.05)
+        ready.set()
+        winner = await caller
+        assert len(opened) == 2
+        assert [a.closed for a in opened if a is not winner] == [True]
+        assert winner.closed is False
+    finally:
+        await gateway.aclose()
@@ -0,0 +1,137 @@
+import os
+import sys
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.retrieval.vector_store.base import VectorStore, build_columns, get_vector_store, permission_list
+from app.services.retrieval.vector_store.local import LocalVectorStore
+
+DIM = 16
+
+def unit(rng, n):
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+async def load(store, rng, docs=10, per_doc=20, tenant="acme"):
+    vectors = {}
+    for d in range(docs):
+        v = unit(rng, per_doc)
+        await store.upsert([f"{tenant} doc{d} chunk {i}" for i in range(per_doc)], {"tenant_id": tenant, "document_id": f"doc{d}"}, v)
+        vectors[f"doc{d}"] = v
+    return vectors
+
+def test_local_store_implements_the_protocol():
+    assert isinstance(LocalVectorStore(dim=DIM), VectorStore)
+
+@pytest.mark.asyncio
+async def test_search_is_exact_and_tenant_isolated():
+    rng = np.random.default_rng(0)
+    store = LocalVectorStore(dim=DIM, initial_capacity=8)
+    vectors = await load(store, rng)
+    await load(store, rng, docs=3, tenant="globex")
+
+    queries = unit(rng, 5)
+    results = await store.search_batch(queries, limit=5, tenant_id="acme")
+    all_acme = np.concatenate([vectors[f"doc{d}"] for d in range(10)])
+    for query, hits in zip(queries, results):
+        expected = np.sort(np.sum((all_acme - query) ** 2, axis=1))[:5]
+        assert np.allclose([h.distance for h in hits], expected, atol=1e-4)
+        assert all(h.metadata["tenant_id"] == "acme" for h in hits)
+        assert hits[0].score == pytest.approx(1 - hits[0].distance / 2)
+
+    assert await store.search_batch(queries, tenant_id="initech") == [[] for _ in queries]
+
+@pytest.mark.asyncio
+async def test_filters_min_score_and_delete():
+    rng = np.random.default_rng(1)
+    store = LocalVectorStore(dim=DIM)
+    vectors = await load(store, rng)
+
+    hits = (await store.search_batch(vectors["doc3"][0], limit=50, filters={"document_id": ["doc3", "doc4"]}, tenant_id="acme"))[0]
+    assert {h.metadata["document_id"] for h in hits} == {"doc3", "doc4"}
+    assert hits[0].text == "acme doc3 chunk 0"
+
+    close = (await store.search_batch(vectors["doc3"][0], limit=50, min_score=0.99, tenant_id="acme"))[0]
+    assert [h.text for h in close] == ["acme doc3 chunk 0"]
+
+    assert await store.delete_document("doc3", tenant_id="acme") == 20
+    hits = (await store.search_batch(vectors["doc3"][0], limit=200, tenant_id="acme"))[0]
+    assert len(hits) == 180 and "doc3" not in {h.metadata["document_id"] for h in hits}
+
+@pytest.mark.asyncio
+async def test_store_reopens_from_disk(tmp_path):
+    rng = np.random.default_rng(2)
+    path = str(tmp_path / "store")
+    store = LocalVectorStore(path, dim=DIM, initial_capacity=16)
+    vectors = await load(store, rng)
+    await store.delete_document("doc0", tenant_id="acme")
+    store.close()
+
+    reopened = LocalVectorStore(path, dim=DIM)
+    assert len(reopened) == 180
+    hits = (await reopened.search_batch(vectors["doc5"][7], limit=1, tenant_id="acme"))[0]
+    assert hits[0].text == "acme doc5 chunk 7"
+    assert hits[0].distance == pytest.approx(0.0, abs=1e-5)
+
+@pytest.mark.asyncio
+async def test_ivf_keeps_recall_high():
+    rng = np.random.default_rng(3)
+    exact = LocalVectorStore(dim=DIM)
+    ivf = LocalVectorStore(dim=DIM, nlist=8, nprobe=4)
+    # Clustered data, like real embeddings
+    centers = unit(rng, 8)
+    for d in range(40):
+        v = centers[d % 8] + 0.3 * unit(rng, 20)
+        v /= np.linalg.norm(v, axis=1, keepdims=True)
+        for store in (exact, ivf):
+            await store.upsert([f"doc{d} chunk {i}" for i in range(20)], {"document_id": f"doc{d}"}, v)
+    assert ivf.centroids is not None
+
+    queries = unit(rng, 50)
+    truth = await exact.search_batch(queries, limit=10)
+    approx = await ivf.search_batch(queries, limit=10)
+    recall = np.mean([len({h.id for h in a} & {h.id for h in t}) / 10 for a, t in zip(approx, truth)])
+    assert recall >= 0.9
+
+def test_factory_shares_one_local_store(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_VECTOR_STORE_PATH", str(tmp_path / "shared"))
+    assert get_vector_store() is get_vector_store()
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "faiss")
+    with pytest.raises(ValueError):
+        get_vector_store()
+
+@pytest.mark.asyncio
+async def test_roles_filter_inside_the_search():
+    store = LocalVectorStore(dim=DIM)
+    rng = np.random.default_rng(7)
+    v = unit(rng, 4)
+    await store.upsert(["billing"], {"tenant_id": "acme", "access_permissions": ["role:billing"]}, v[:1])
+    await store.upsert(["support"], {"tenant_id": "acme", "access_permissions": "role:support, role:admin"}, v[1:2])
+    await store.upsert(["public"], {"tenant_id": "acme"}, v[2:3])
+    await store.upsert(["other tenant"], {"tenant_id": "globex", "access_permissions": ["role:billing"]}, v[3:4])
+
+    assert sorted(await store.search(v[0], limit=10, tenant_id="acme")) == ["billing", "public", "support"]
+    assert sorted(await store.search(v[0], limit=10, tenant_id="acme", roles=["role:billing"])) == ["billing", "public"]
+    assert sorted(await store.search(v[0], limit=10, tenant_id="acme", roles=["role:admin"])) == ["public", "support"]
+    assert sorted(await store.search(v[0], limit=10, tenant_id="acme", roles=["role:unknown"])) == ["public"]
+    # The filter runs before top-k: a restricted best match does not crowd out visible rows
+    top = await store.search_batch(v[0], limit=1, tenant_id="acme", filters={"roles": ["role:support"]})
+    assert len(top[0]) == 1 and top[0][0].text != "billing"
+
+def test_permission_list_normalizes_and_bounds():
+    assert permission_list("role:a, role:b,role:a,") == ["role:a", "role:b"]
+    assert permission_list(None) == ["public"]
+    assert permission_list([]) == ["public"]
+    with pytest.raises(ValueError):
+        permission_list([f"role:{i}" for i in range(33)])
+    columns = build_columns(["a", "b"], {"access_permissions": "role:x,role:y"}, np.zeros((2, DIM), dtype=np.float32))
+    assert columns["access_permissions"] == [["role:x", "role:y"], ["role:x", "role:y"]]
@@ -0,0 +1,162 @@
+import os
+import re
+import sys
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pymilvus")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.retrieval.vector_store.milvus import SCALAR_FIELDS, MilvusClient
+
+LEAN_FIELDS = [f for f in SCALAR_FIELDS if f not in ("text", "source", "heading_path")]
+
+class FakeField:
+    def __init__(self, name, auto_id=False):
+        self.name = name
+        self.auto_id = auto_id
+
+class FakeCollection:
+    def __init__(self, scalar_fields):
+        self.name = "documents_768"
+        self.schema = type("Schema", (), {"fields": [FakeField("id", auto_id=True), FakeField("embedding")] + [FakeField(f) for f in scalar_fields]})()
+        self.ids = []
+        self.flushed = False
+        self.results = []
+        self.searches = []
+
+    def insert(self, entities):
+        keys = list(range(len(self.ids) + 1, len(self.ids) + 1 + len(entities[0])))
+        self.ids.extend(keys)
+        return type("MutationResult", (), {"primary_keys": keys})()
+
+    def delete(self, expr):
+        gone = set(int(i) for i in re.findall(r"\d+", expr))
+        self.ids = [i for i in self.ids if i not in gone]
+
+    def flush(self):
+        self.flushed = True
+
+    def search(self, data, anns_field, param, limit, expr, output_fields):
+        self.searches.append({"queries": len(data), "param": param, "limit": limit, "expr": expr, "output_fields": output_fields})
+        return self.results[:len(data)]
+
+class FakeHit:
+    def __init__(self, id, distance, **entity):
+        self.id, self.distance, self.entity = id, distance, entity
+
+class FakeChunkStore:
+    def __init__(self, records):
+        self.records = records
+        self.lookups = []
+
+    def get_many(self, ids):
+        self.lookups.append(sorted(ids))
+        return {i: self.records[i] for i in ids if i in self.records}
+
+class FailingChunkStore:
+    def put_many(self, ids, records):
+        raise ConnectionError("chunk store unavailable")
+
+def make_client(collection, chunk_store=None):
+    client = MilvusClient.__new__(MilvusClient)
+    client.collection, client.dim, client.chunk_store = collection, 4, chunk_store
+    client.fields = {f.name for f in collection.schema.fields}
+    client.permissions_array = True
+    return client
+
+@pytest.mark.asyncio
+async def test_upsert_rolls_back_rows_when_the_chunk_store_fails():
+    collection = FakeCollection(LEAN_FIELDS)
+    client = make_client(collection, FailingChunkStore())
+
+    stored = await client.upsert(["a", "b"], {"document_id": "doc"}, np.ones((2, 4), dtype=np.float32))
+
+    # Lean rows without their text would otherwise come back as empty hits
+    assert stored is False
+    assert collection.ids == [] and not collection.flushed
+
+@pytest.mark.parametrize("tenant_id", ['acme" || tenant_id != "', "acme\\", 'acme\\" or true', "acme\n", ""])
+def test_build_expr_rejects_tenant_ids_that_could_break_the_quotes(tenant_id):
+    client = make_client(FakeCollection(SCALAR_FIELDS))
+    with pytest.raises(ValueError):
+        client._build_expr(tenant_id)
+
+def test_build_expr_quotes_filter_values():
+    client = make_client(FakeCollection(SCALAR_FIELDS))
+    expr = client._build_expr("acme", {
+        "document_id": 'a.pdf" || tenant_id != "acme',
+        "language": "en\\",
+        "last_modified_from": "1700000000",
+        "roles": ['role:x") || true || ("', "role:billing"],
+    })
+    clauses = expr.split(" and ")
+    assert clauses[0] == 'tenant_id == "acme"'
+    # Quotes and backslashes stay escaped inside the string literal
+    assert clauses[1] == 'document_id == "a.pdf\\" || tenant_id != \\"acme"'
+    assert clauses[2] == 'language == "en\\\\"'
+    assert clauses[3] == "last_modified >= 1700000000"
+    assert clauses[4] == 'array_contains_any(access_permissions, ["role:x\\") || true || (\\"", "role:billing", "public"])'
+
+    listed = client._build_expr("acme", {"document_id": ["a.pdf", 'b"c.pdf']})
+    assert listed == 'tenant_id == "acme" and document_id in ["a.pdf", "b\\"c.pdf"]'
+
+    client.permissions_array = False
+    assert client._build_expr("acme", {"roles": []}).endswith('access_permissions in ["public"]')
+    with pytest.raises(ValueError):
+        client._build_expr("acme", {"last_modified_to": "yesterday"})
+
+@pytest.mark.asyncio
+async def test_search_batch_groups_hits_per_query_and_converts_distances():
+    collection = FakeCollection(SCALAR_FIELDS)
+    collection.results = [
+        [FakeHit(1, 0.0, text="exact", document_id="a"), FakeHit(2, 0.5, text="close", document_id="b")],
+        [],
+        [FakeHit(3, 2.0, text="orthogonal", document_id="c")],
+    ]
+    client = make_client(collection)
+
+    batched = await client.search_batch(np.ones((3, 4), dtype=np.float32), limit=2, tenant_id="acme")
+
+    assert collection.searches[0]["queries"] == 3 and collection.searches[0]["limit"] == 2
+    assert collection.searches[0]["expr"] == 'tenant_id == "acme"'
+    assert [[hit.id for hit in hits] for hits in batched] == [[1, 2], [], [3]]
+    # Squared L2 between unit vectors: score is the cosine similarity 1 - d/2
+    assert [[hit.score for hit in hits] for hits in batched] == [[1.0, 0.75], [], [0.0]]
+    assert batched[0][1].distance == 0.5
+    assert batched[0][1].text == "close" and batched[0][1].metadata["document_id"] == "b"
+
+@pytest.mark.asyncio
+async def test_search_batch_min_score_becomes_the_range_radius():
+    collection = FakeCollection(SCALAR_FIELDS)
+    collection.results = [[FakeHit(1, 0.2, text="kept"), FakeHit(2, 0.9, text="below")]]
+    client = make_client(collection)
+
+    batched = await client.search_batch(np.ones(4, dtype=np.float32), min_score=0.7)
+
+    # A single vector is searched as a batch of one
+    assert collection.searches[0]["queries"] == 1
+    assert collection.searches[0]["param"]["params"]["radius"] == pytest.approx(0.6)
+    assert [hit.text for hit in batched[0]] == ["kept"]
+    assert await client.search_batch(np.zeros((0, 4), dtype=np.float32)) == []
+    assert len(collection.searches) == 1
+
+@pytest.mark.asyncio
+async def test_search_batch_resolves_lean_text_in_one_lookup():
+    collection = FakeCollection(LEAN_FIELDS)
+    collection.results = [[FakeHit(7, 0.1), FakeHit(8, 0.2)], [FakeHit(7, 0.3)]]
+    chunk_store = FakeChunkStore({7: {"text": "seven", "source": "s.pdf", "heading_path": "A > B"}})
+    client = make_client(collection, chunk_store)
+
+    batched = await client.search_batch(np.ones((2, 4), dtype=np.float32))
+
+    assert chunk_store.lookups == [[7, 8]]
+    assert "text" not in collection.searches[0]["output_fields"]
+    assert [[hit.text for hit in hits] for hits in batched] == [["seven", ""], ["seven"]]
+    assert batched[1][0].metadata["heading_path"] == "A > B"
@@ -0,0 +1,67 @@
+import os
+import sys
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.generation.model_router import ModelRouter, ModelProfile
+
+MODELS = [
+    ModelProfile("big", "groq", tier="large", cost_per_1k_tokens=0.0007, latency_p50_ms=900),
+    ModelProfile("small", "groq", tier="small", cost_per_1k_tokens=0.00006, latency_p50_ms=250),
+    ModelProfile("other-big", "openai", tier="large", cost_per_1k_tokens=0.005, latency_p50_ms=1200),
+]
+
+def make_router(plan="enterprise", providers=None):
+    return ModelRouter(MODELS, {"default": plan}, available_providers=providers)
+
+def test_simple_lookup_goes_to_small_model():
+    decision = make_router().route("What is the claims fax number?", [0.92, 0.80], 1500, "default_tenant")
+    assert decision.model == "small"
+    assert decision.signals["complexity"] == 0
+
+def test_ambiguous_long_question_escalates_on_enterprise_plan():
+    query = " ".join(["word"] * 30)
+    decision = make_router().route(query, [0.70, 0.69], 8000, "default_tenant")
+    assert decision.model == "big"
+
+def test_basic_plan_never_escalates():
+    query = " ".join(["word"] * 30)
+    decision = make_router(plan="basic").route(query, [0.70, 0.69], 8000, "default_tenant")
+    assert decision.tier == "small"
+
+def test_degraded_model_is_routed_around():
+    router = make_router()
+    for _ in range(10):
+        router.record("big", 5000)
+    decision = router.route(" ".join(["word"] * 30), [0.7, 0.69], 8000, "default_tenant")
+    assert decision.model == "other-big"
+    assert router.metrics()["big"]["degraded"] is True
+
+def test_degraded_model_recovers_once_its_samples_expire():
+    router = make_router()
+    now = [1000.0]
+    router.health["big"].clock = lambda: now[0]
+    router.health["big"].ttl = 60
+    for _ in range(10):
+        router.record("big", 5000)
+    assert router.is_degraded("big")
+    # No traffic reaches a degraded model; old samples age out instead
+    now[0] += 61
+    assert not router.is_degraded("big")
+    decision = router.route(" ".join(["word"] * 30), [0.7, 0.69], 8000, "default_tenant")
+    assert decision.model == "big"
+
+def test_margin_uses_the_two_best_scores_in_any_order():
+    # RRF-fused hits: the best score is not first
+    decision = make_router().route("What is the claims fax number?", [0.80, 0.95, 0.60], 1500, "default_tenant")
+    assert decision.signals["top_score"] == 0.95
+    assert decision.signals["score_margin"] == 0.15
+
+def test_unavailable_providers_are_excluded():
+    router = make_router(providers=["openai"])
+    assert [m.id for m in router.models] == ["other-big"]
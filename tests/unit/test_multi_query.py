@@ -0,0 +1,129 @@
+import os
+import sys
+import asyncio
+import pytest
+from dataclasses import dataclass, field
+
+np = pytest.importorskip("numpy")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.retrieval.multi_query import MultiQueryRetriever, fuse_history, reciprocal_rank_fusion
+
+@dataclass
+class FakeHit:
+    id: int
+    score: float
+    text: str = ""
+    metadata: dict = field(default_factory=dict)
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def get_embeddings(self, texts, is_query=False):
+        self.calls.append(list(texts))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+class FakeStore:
+    def __init__(self, ranked_lists):
+        self.ranked_lists = ranked_lists
+        self.batch_sizes = []
+
+    async def search_batch(self, query_vectors, limit=5, tenant_id="default_tenant", min_score=None, filters=None):
+        self.batch_sizes.append(len(query_vectors))
+        return self.ranked_lists[:len(query_vectors)]
+
+def test_fuse_history_prefixes_short_follow_up():
+    messages = [
+        {"role": "user", "content": "How do I reset my Online Affiliate password?"},
+        {"role": "assistant", "content": "Use the self-service feature."},
+        {"role": "user", "content": "and my user id?"},
+    ]
+    assert fuse_history(messages) == "How do I reset my Online Affiliate password? and my user id?"
+    assert fuse_history(messages[:1]) == messages[0]["content"]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([
+        [FakeHit(1, 0.9), FakeHit(2, 0.8)],
+        [FakeHit(2, 0.85), FakeHit(3, 0.7)],
+    ])
+    assert [h.id for h in fused] == [2, 1, 3]
+    assert fused[0].score == 0.85
+
+@pytest.mark.asyncio
+async def test_retrieve_embeds_and_searches_variants_in_one_batch():
+    embedder = FakeEmbedder()
+    store = FakeStore([[FakeHit(1, 0.9)], [FakeHit(2, 0.8), FakeHit(1, 0.7)]])
+    retriever = MultiQueryRetriever(embedder, store)
+    messages = [
+        {"role": "user", "content": "What is the claims address?"},
+        {"role": "assistant", "content": "..."},
+        {"role": "user", "content": "for Colorado?"},
+    ]
+
+    hits = await retriever.retrieve(messages, limit=2)
+
+    assert len(embedder.calls) == 1 and len(embedder.calls[0]) == 2
+    assert store.batch_sizes == [2]
+    assert [h.id for h in hits] == [1, 2]
+
+@pytest.mark.asyncio
+async def test_slow_rewrite_is_dropped_after_timeout():
+    async def slow_rewriter(messages):
+        await asyncio.sleep(1)
+        return "never used"
+
+    embedder = FakeEmbedder()
+    store = FakeStore([[FakeHit(1, 0.9)], [FakeHit(2, 0.8)], [FakeHit(3, 0.7)]])
+    retriever = MultiQueryRetriever(embedder, store, rewriter=slow_rewriter, rewrite_timeout=0.05)
+    messages = [{"role": "user", "content": "claims?"}, {"role": "assistant", "content": "..."}, {"role": "user", "content": "and appeals?"}]
+
+    await retriever.retrieve(messages)
+
+    assert store.batch_sizes == [2]
+
+@pytest.mark.asyncio
+async def test_precomputed_query_vector_is_not_embedded_again():
+    embedder = FakeEmbedder()
+    store = FakeStore([[FakeHit(1, 0.9)], [FakeHit(2, 0.8)]])
+    retriever = MultiQueryRetriever(embedder, store)
+    faq_vector = np.full(4, 0.5, dtype=np.float32)
+
+    # Single turn: the FAQ lookup's embedding is the only variant
+    await retriever.retrieve([{"role": "user", "content": "What is the claims address?"}], query_vector=faq_vector)
+    assert embedder.calls == [] and store.batch_sizes == [1]
+
+    # Follow-up: only the history-fused variant still needs encoding
+    messages = [{"role": "user", "content": "What is the claims address?"}, {"role": "assistant", "content": "..."}, {"role": "user", "content": "for Colorado?"}]
+    await retriever.retrieve(messages, query_vector=faq_vector)
+    assert embedder.calls == [["What is the claims address? for Colorado?"]]
+    assert store.batch_sizes == [1, 2]
+
+@pytest.mark.asyncio
+async def test_llm_rewriter_feeds_the_rewrite_into_the_batch(monkeypatch):
+    pytest.importorskip("openai")
+    from app.services.retrieval.multi_query import llm_rewriter
+
+    prompts = []
+    class FakeGateway:
+        async def complete(self, messages, model=None):
+            prompts.append(messages)
+            return type("Result", (), {"content": "  Colorado claims mailing address \n"})()
+    monkeypatch.setattr("app.services.generation.llm_gateway.get_llm_gateway", lambda: FakeGateway())
+
+    embedder = FakeEmbedder()
+    store = FakeStore([[FakeHit(1, 0.9)], [FakeHit(2, 0.8)], [FakeHit(3, 0.7)]])
+    retriever = MultiQueryRetriever(embedder, store, rewriter=llm_rewriter, rewrite_timeout=1.0)
+    messages = [{"role": "user", "content": "What is the claims address?"}, {"role": "assistant", "content": "..."}, {"role": "user", "content": "for Colorado?"}]
+
+    await retriever.retrieve(messages)
+
+    assert "User: for Colorado?" in prompts[0][-1]["content"]
+    assert embedder.calls[-1] == ["Colorado claims mailing address"]
+    assert store.batch_sizes == [3]
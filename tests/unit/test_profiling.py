@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import pytest
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.core.profiling import MemoryTracker, ProfilerBusy, SlowRequestLog, annotate, sample_stacks, stage
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sampler_returns_collapsed_stacks_of_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        profile = sample_stacks(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+    assert profile["samples"] > 5
+    lines = profile["collapsed"].splitlines()
+    busy = [l for l in lines if l.startswith("busy-worker;") and "busy_loop (test_profiling.py:" in l]
+    assert busy
+    # "stack count" per line, as flamegraph.pl expects
+    assert all(l.rsplit(" ", 1)[1].isdigit() for l in lines)
+    assert not any("sample_stacks" in l for l in lines)
+
+def test_only_one_profile_at_a_time():
+    worker = threading.Thread(target=sample_stacks, args=(0.3,))
+    worker.start()
+    time.sleep(0.05)
+    with pytest.raises(ProfilerBusy):
+        sample_stacks(0.01)
+    worker.join()
+
+def test_memory_diff_points_at_the_growing_allocation():
+    tracker = MemoryTracker(max_snapshots=3)
+    with pytest.raises(RuntimeError):
+        tracker.snapshot()
+    tracker.start(frames=5)
+    try:
+        tracker.snapshot()
+        leak = [bytearray(10_000) for _ in range(200)]
+        tracker.snapshot()
+        diff = tracker.diff()
+        assert diff["size_diff_kb"] > 1500
+        assert "test_profiling.py" in diff["top"][0]["location"]
+        for _ in range(3):
+            tracker.snapshot()
+        assert [s["id"] for s in tracker.status()["snapshots"]] == [3, 4, 5]
+        with pytest.raises(KeyError):
+            tracker.diff(1, 5)
+    finally:
+        status = tracker.stop()
+    assert not status["tracing"] and len(leak) == 200
+
+@pytest.mark.asyncio
+async def test_slow_log_keeps_stage_breakdown_of_slow_requests_only():
+    log = SlowRequestLog(threshold_ms=30, size=2)
+
+    async def request(delay):
+        trace = log.begin("chat", tenant_id="acme")
+        with stage("embed"):
+            await asyncio.sleep(0.001)
+        with stage("llm"):
+            await asyncio.sleep(delay)
+        annotate(model="small")
+        log.finish(trace)
+
+    # Separate tasks, like separate HTTP requests
+    await asyncio.gather(asyncio.create_task(request(0.0)), asyncio.create_task(request(0.05)))
+    entries = log.entries()
+    assert len(entries) == 1 and log.metrics()["traced"] == 2
+    entry = entries[0]
+    assert set(entry["stages"]) == {"embed", "llm"} and entry["stages"]["llm"] >= 45
+    assert entry["tenant_id"] == "acme" and entry["model"] == "small"
+
+    for _ in range(3):
+        await asyncio.create_task(request(0.04))
+    assert len(log.entries()) == 2
+
+def test_stage_outside_a_trace_and_disabled_log_are_noops():
+    with stage("embed"):
+        pass
+    disabled = SlowRequestLog(threshold_ms=0)
+    assert disabled.begin("chat") is None
+    disabled.finish(None)
+    assert disabled.metrics()["traced"] == 0
+
+def test_admin_routes_require_the_token(monkeypatch):
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.v1 import profiling
+
+    app = FastAPI()
+    app.include_router(profiling.router, prefix="/admin")
+    client = TestClient(app)
+
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.get("/admin/slow-requests").status_code == 404
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    assert client.get("/admin/slow-requests").status_code == 403
+    assert client.get("/admin/slow-requests", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.post("/admin/profile/cpu?seconds=0.05", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200 and int(response.headers["X-Profile-Samples"]) > 0
@@ -0,0 +1,259 @@
+import os
+import re
+import sys
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pymilvus")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.retrieval import reindex
+from app.services.retrieval.reindex import Reindexer, ReindexJob
+from app.services.retrieval.vector_store.milvus import SCALAR_FIELDS
+
+class FakeIterator:
+    def __init__(self, rows, batch_size):
+        self.rows = rows
+        self.batch_size = batch_size
+
+    def next(self):
+        batch, self.rows = self.rows[:self.batch_size], self.rows[self.batch_size:]
+        return batch
+
+    def close(self):
+        pass
+
+class FakeHit:
+    def __init__(self, row):
+        self.entity = row
+
+class FakeField:
+    def __init__(self, name, auto_id=False):
+        self.name = name
+        self.auto_id = auto_id
+
+class FakeSchema:
+    def __init__(self, scalar_fields):
+        self.fields = [FakeField("id", auto_id=True), FakeField("embedding")] + [FakeField(f) for f in scalar_fields]
+
+class FakeCollection:
+    """
+    In-memory collection with monotonic auto ids, enough of the pymilvus surface for the reindexer.
+    """
+    next_id = 1
+
+    def __init__(self, name, scalar_fields=SCALAR_FIELDS):
+        self.name = name
+        self.rows = []
+        self.schema = FakeSchema(scalar_fields)
+
+    def add(self, vector, **scalars):
+        row = {"id": FakeCollection.next_id, "embedding": np.asarray(vector, dtype=np.float32), **scalars}
+        FakeCollection.next_id += 1
+        self.rows.append(row)
+        return row["id"]
+
+    def insert(self, entities):
+        names = [f.name for f in self.schema.fields if not f.auto_id]
+        columns = dict(zip(names, entities))
+        ids = [self.add(vector, **{f: col[i] for f, col in columns.items()}) for i, vector in enumerate(columns.pop("embedding"))]
+        return type("MutationResult", (), {"primary_keys": ids})()
+
+    def delete(self, expr):
+        ids = set(int(i) for i in re.findall(r"\d+", expr))
+        self.rows = [r for r in self.rows if r["id"] not in ids]
+
+    def query_iterator(self, batch_size, expr, output_fields):
+        op, value = re.match(r"id (>=|>) (-?\d+)", expr).groups()
+        rows = [r for r in self.rows if (r["id"] >= int(value) if op == ">=" else r["id"] > int(value))]
+        return FakeIterator([{f: r[f] for f in output_fields} for r in rows], batch_size)
+
+    def query(self, expr, output_fields, consistency_level=None):
+        return [{"count(*)": len(self.rows)}]
+
+    def search(self, data, anns_field, param, limit, expr, output_fields):
+        tenant = re.search(r'tenant_id == "([^"]+)"', expr).group(1)
+        rows = [r for r in self.rows if r["tenant_id"] == tenant]
+        results = []
+        for q in data:
+            ranked = sorted(rows, key=lambda r: float(np.sum((r["embedding"] - q) ** 2)))
+            results.append([FakeHit(r) for r in ranked[:limit]])
+        return results
+
+    def describe(self):
+        return {"collection_name": self.name}
+
+    def flush(self):
+        pass
+
+    def load(self):
+        pass
+
+class FakeUtility:
+    def __init__(self, collections, aliases):
+        self.collections = collections
+        self.aliases = aliases
+
+    def alter_alias(self, collection_name, alias):
+        self.aliases[alias] = collection_name
+
+    def has_collection(self, name):
+        return name in self.collections
+
+    def drop_collection(self, name):
+        self.collections.pop(name, None)
+
+class FakeStore:
+    alias = "documents"
+    collection_name = "documents_768"
+
+    def __init__(self, collections):
+        self.collections = collections
+
+    def create_collection(self, name, index_params=None):
+        self.collections[name] = FakeCollection(name)
+        return self.collections[name]
+
+    @staticmethod
+    def _tenant_expr(tenant_id):
+        return f'tenant_id == "{tenant_id}"'
+
+class FakeEmbedder:
+    model_name = "test/e5-v2"
+
+    def stats(self):
+        return {"cache_hits": 0, "encoded": 0, "encode_seconds": 0.0}
+
+    def flush_cache(self):
+        pass
+
+    def get_embeddings(self, texts, is_query=False):
+        # Deterministic per text so recall can be checked
+        vectors = np.stack([np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(8) for t in texts])
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def scalars(i, tenant):
+    return {
+        "text": f"chunk {i}", "tenant_id": tenant, "document_id": f"doc{i % 3}", "source": "s",
+        "source_system": "system", "language": "en", "version": "1.0", "last_modified": 0,
+        "access_permissions": "public", "page": 0
+    }
+
+@pytest.fixture
+def milvus(monkeypatch):
+    # A legacy collection created before embedding_model and heading_path existed
+    legacy_fields = [f for f in SCALAR_FIELDS if f not in ("embedding_model", "heading_path")]
+    collections = {"documents_768": FakeCollection("documents_768", legacy_fields)}
+    aliases = {"documents": "documents_768"}
+    utility = FakeUtility(collections, aliases)
+
+    def collection(name):
+        return collections[aliases.get(name, name)]
+
+    monkeypatch.setattr(reindex, "Collection", collection)
+    monkeypatch.setattr(reindex, "utility", utility)
+    source = collections["documents_768"]
+    for i in range(50):
+        source.add(np.zeros(8), **scalars(i, "tenant_a" if i % 2 else "tenant_b"))
+    return collections, aliases
+
+@pytest.mark.asyncio
+async def test_reindex_copies_verifies_and_swaps_alias(milvus):
+    collections, aliases = milvus
+    reindexer = Reindexer(FakeStore(collections), embedder=FakeEmbedder(), batch_size=16, max_rows_per_sec=0, recall_sample=20)
+    job = ReindexJob(job_id="j1")
+    await reindexer.run(job)
+
+    assert job.status == "completed", job.error
+    assert aliases["documents"] == job.target
+    target = collections[job.target]
+    assert len(target.rows) == 50
+    assert {r["text"] for r in target.rows} == {f"chunk {i}" for i in range(50)}
+    # Re-embedded, not copied: the source vectors were all zeros
+    assert all(np.linalg.norm(r["embedding"]) > 0.99 for r in target.rows)
+    assert {r["embedding_model"] for r in target.rows} == {"test/e5-v2"}
+    assert job.verification["passed"] and job.verification["recall_at_10"] == 1.0
+    assert job.to_dict()["progress"] == 1.0
+
+@pytest.mark.asyncio
+async def test_failed_verification_keeps_alias_and_drops_shadow(milvus):
+    collections, aliases = milvus
+
+    class BrokenEmbedder(FakeEmbedder):
+        def get_embeddings(self, texts, is_query=False):
+            # Every chunk gets the same vector, so self-recall collapses
+            return np.ones((len(texts), 8), dtype=np.float32)
+
+    reindexer = Reindexer(FakeStore(collections), embedder=BrokenEmbedder(), batch_size=16, max_rows_per_sec=0, min_recall=0.95)
+    job = ReindexJob(job_id="j2")
+    await reindexer.run(job)
+
+    assert job.status == "failed"
+    assert aliases["documents"] == "documents_768"
+    assert job.target not in collections
+
+@pytest.mark.asyncio
+async def test_rows_deleted_during_the_copy_do_not_come_back(milvus):
+    collections, aliases = milvus
+    source = collections["documents_768"]
+
+    class DeletingEmbedder(FakeEmbedder):
+        calls = 0
+        def get_embeddings(self, texts, is_query=False):
+            # Re-ingest of doc0 while the copy runs: its old rows go, a new version is written
+            DeletingEmbedder.calls += 1
+            if DeletingEmbedder.calls == 2:
+                source.rows = [r for r in source.rows if r["document_id"] != "doc0"]
+                source.add(np.zeros(8), **{**scalars(99, "tenant_a"), "document_id": "doc0", "text": "doc0 v2"})
+            return super().get_embeddings(texts, is_query)
+
+    reindexer = Reindexer(FakeStore(collections), embedder=DeletingEmbedder(), batch_size=16, max_rows_per_sec=0, recall_sample=0)
+    job = ReindexJob(job_id="j3")
+    await reindexer.run(job)
+
+    assert job.status == "completed", job.error
+    target = collections[job.target]
+    assert sorted(r["text"] for r in target.rows) == sorted(r["text"] for r in source.rows)
+    assert [r["text"] for r in target.rows if r["document_id"] == "doc0"] == ["doc0 v2"]
+    assert job.deleted == 17
+
+@pytest.mark.asyncio
+async def test_start_reindex_loads_the_model_and_store_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    loop_thread = threading.get_ident()
+    loaded_on = {}
+
+    def fake_embedding_service():
+        loaded_on["embedder"] = threading.get_ident()
+        return FakeEmbedder()
+
+    def fake_client():
+        loaded_on["store"] = threading.get_ident()
+        return object()
+
+    async def fake_run(self, job):
+        job.status = "completed"
+
+    monkeypatch.setattr("app.services.generation.embeddings.get_embedding_service", fake_embedding_service)
+    monkeypatch.setattr(reindex, "MilvusClient", fake_client)
+    monkeypatch.setattr(Reindexer, "run", fake_run)
+    monkeypatch.setattr(reindex, "_tasks", {})
+    monkeypatch.setattr(reindex, "_jobs", {})
+
+    job = await reindex.start_reindex()
+    await reindex._tasks[job.job_id]
+    assert job.status == "completed"
+    assert loop_thread not in (loaded_on["embedder"], loaded_on["store"])
+
+    # One job at a time
+    reindex._tasks["running"] = asyncio.create_task(asyncio.sleep(1))
+    with pytest.raises(reindex.ReindexInProgress):
+        await reindex.start_reindex()
+    reindex._tasks["running"].cancel()
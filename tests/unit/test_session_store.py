@@ -0,0 +1,157 @@
+import os
+import sys
+import asyncio
+import pytest
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.conversation.session_store import SessionStore, normalize_session_id, session_key
+
+class FakePersister:
+    def __init__(self):
+        self.turn_batches = []
+        self.summary_batches = []
+
+    async def write_turns(self, rows):
+        self.turn_batches.append(list(rows))
+
+    async def write_summaries(self, rows):
+        self.summary_batches.append(list(rows))
+
+    async def load(self, session_id, tenant_id, recent_turns):
+        return None
+
+def test_non_uuid_session_ids_map_to_stable_uuid():
+    assert normalize_session_id("chat-abc") == normalize_session_id("chat-abc")
+    uid = "8d3c2a8e-4f55-4a8b-9f0c-2d9e1b7c6a10"
+    assert normalize_session_id(uid) == uid
+
+@pytest.mark.asyncio
+async def test_prompt_history_stays_bounded_as_conversation_grows():
+    store = SessionStore(keep_recent_turns=2, summarize_batch=2, max_summary_chars=500)
+    session = await store.get("s1", "acme")
+    sizes = []
+    for i in range(20):
+        store.append_turn(session, f"question {i} " + "x" * 50, f"answer {i}. More detail " + "y" * 50)
+        await asyncio.sleep(0)
+        sizes.append(sum(len(m["content"]) for m in session.history_messages()))
+    await store.close()
+
+    assert len(session.turns) < 4
+    assert session.summarized_turns >= 16
+    assert max(sizes[10:]) <= 500 + 4 * 200
+
+@pytest.mark.asyncio
+async def test_turns_are_written_in_batches_off_the_request_path():
+    persister = FakePersister()
+    store = SessionStore(persister=persister, keep_recent_turns=10, summarize_batch=10, flush_interval=0.05, flush_batch=100)
+    session = await store.get("s2", "acme")
+    for i in range(5):
+        store.append_turn(session, f"q{i}", f"a{i}")
+    assert persister.turn_batches == []
+
+    await asyncio.sleep(0.15)
+    await store.close()
+
+    assert len(persister.turn_batches) == 1
+    assert [row[1] for row in persister.turn_batches[0]] == ["q0", "q1", "q2", "q3", "q4"]
+
+@pytest.mark.asyncio
+async def test_llm_summary_is_used_when_available():
+    async def summarizer(summary, turns):
+        return f"{summary} +{len(turns)}".strip()
+
+    store = SessionStore(summarizer=summarizer, keep_recent_turns=1, summarize_batch=2)
+    session = await store.get("s3", "acme")
+    for i in range(3):
+        store.append_turn(session, f"q{i}", f"a{i}")
+    await store.close()
+
+    assert session.summary == "+2"
+    assert session.history_messages()[0]["role"] == "system"
+
+@pytest.mark.asyncio
+async def test_sessions_are_scoped_to_their_tenant():
+    uid = "8d3c2a8e-4f55-4a8b-9f0c-2d9e1b7c6a10"
+    assert session_key("acme", uid) != session_key("globex", uid)
+    store = SessionStore(keep_recent_turns=10, summarize_batch=10)
+    mine = await store.get(uid, "acme")
+    store.append_turn(mine, "my account number?", "It is 1234.")
+    other = await store.get(uid, "globex")
+    assert other is not mine and other.turns == []
+    assert (await store.get(uid, "acme")).turns[0].assistant == "It is 1234."
+
+@pytest.mark.asyncio
+async def test_pending_turns_are_capped_while_persistence_fails():
+    class DownPersister(FakePersister):
+        async def write_turns(self, rows):
+            raise ConnectionError("postgres is down")
+
+    store = SessionStore(persister=DownPersister(), keep_recent_turns=100, summarize_batch=100, flush_interval=60, max_pending=5)
+    session = await store.get("s4", "acme")
+    for i in range(8):
+        store.append_turn(session, f"q{i}", f"a{i}")
+    await store.flush()
+    assert [row[1] for row in store._pending_turns] == ["q3", "q4", "q5", "q6", "q7"]
+    assert store.dropped_turns == 3
+    store._writer.cancel()
+
+@pytest.mark.asyncio
+async def test_written_turns_are_not_requeued_when_the_summary_write_fails():
+    class SummaryDownPersister(FakePersister):
+        async def write_summaries(self, rows):
+            raise ConnectionError("postgres is down")
+
+    persister = SummaryDownPersister()
+    store = SessionStore(persister=persister, keep_recent_turns=1, summarize_batch=2, flush_interval=60)
+    session = await store.get("s5", "acme")
+    for i in range(3):
+        store.append_turn(session, f"q{i}", f"a{i}")
+    await asyncio.gather(*store._background)
+    await store.flush()
+    assert [row[1] for row in persister.turn_batches[0]] == ["q0", "q1", "q2"]
+    assert store._pending_turns == [] and len(store._pending_summaries) == 1
+
+    # Only the summary is retried; chat_history gets every turn once
+    await store.flush()
+    assert len(persister.turn_batches) == 1
+    store._writer.cancel()
+
+@pytest.mark.asyncio
+async def test_postgres_load_skips_turns_already_in_the_summary():
+    from app.services.conversation.session_store import PostgresPersister
+
+    class Conn:
+        def __init__(self):
+            self.fetches = []
+        async def fetchrow(self, query, *args):
+            return {"summary": "- User asked: q0", "summarized_turns": 4}
+        async def fetch(self, query, *args):
+            self.fetches.append(args)
+            return [{"user_message": "q5", "assistant_message": "a5", "ts": 2.0}, {"user_message": "q4", "assistant_message": "a4", "ts": 1.0}]
+
+    class Pool:
+        def __init__(self, conn):
+            self.conn = conn
+        def acquire(self):
+            pool = self
+            class Acquire:
+                async def __aenter__(self):
+                    return pool.conn
+                async def __aexit__(self, *exc):
+                    return False
+            return Acquire()
+
+    conn = Conn()
+    persister = PostgresPersister("postgresql://unused")
+    persister.pool = Pool(conn)
+    session = await persister.load("sid", "acme", 6)
+
+    assert conn.fetches == [("sid", "acme", 4, 6)]
+    assert session.summarized_turns == 4
+    assert [t.user for t in session.turns] == ["q4", "q5"]
@@ -0,0 +1,102 @@
+import os
+import sys
+import asyncio
+import pytest
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.core.singleflight import SingleFlight, request_key
+
+def test_request_key_is_canonical():
+    a = request_key("t1", "auto", [{"role": "user", "content": "hi"}])
+    b = request_key("t1", "auto", [{"content": "hi", "role": "user"}])
+    assert a == b
+    assert a != request_key("t2", "auto", [{"role": "user", "content": "hi"}])
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight(timeout=5)
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    results = await asyncio.gather(*(flights.do("k", work) for _ in range(10)))
+    assert calls == 1
+    assert all(r == {"answer": 42} for r in results)
+    assert flights.metrics()["coalesced"] == 9
+    # Once finished the key is free again
+    await flights.do("k", work)
+    assert calls == 2
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flights = SingleFlight(timeout=5)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*(flights.do("k", failing) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flights.metrics()["in_flight_calls"] == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_work():
+    flights = SingleFlight(timeout=5)
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    leader = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    assert await follower == "done"
+
+@pytest.mark.asyncio
+async def test_stream_fans_out_with_replay_for_late_subscribers():
+    flights = SingleFlight(timeout=5)
+    starts = 0
+
+    async def source():
+        for i in range(5):
+            await asyncio.sleep(0.01)
+            yield f"chunk-{i}"
+
+    async def start():
+        nonlocal starts
+        starts += 1
+        return source()
+
+    async def consume(delay):
+        await asyncio.sleep(delay)
+        return [c async for c in await flights.stream("s", start)]
+
+    # The second subscriber joins after a few chunks were produced and still sees all of them
+    first, late = await asyncio.gather(consume(0), consume(0.025))
+    assert starts == 1
+    assert first == late == [f"chunk-{i}" for i in range(5)]
+    assert flights.metrics()["in_flight_streams"] == 0
+
+@pytest.mark.asyncio
+async def test_stream_start_error_propagates():
+    flights = SingleFlight(timeout=5)
+
+    async def start():
+        await asyncio.sleep(0.01)
+        raise ValueError("saturated")
+
+    results = await asyncio.gather(*(flights.stream("s", start) for _ in range(2)), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flights.metrics()["in_flight_streams"] == 0
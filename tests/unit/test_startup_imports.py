@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+
+# Budgets for `import app.main` in a fresh interpreter (the API's cold start before uvicorn binds)
+IMPORT_SECONDS_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET_S", "2.0"))
+MODULE_BUDGET = int(os.getenv("STARTUP_MODULE_BUDGET", "800"))
+
+# Loaded only by the subsystem that needs them, never at API import time
+MODEL_STACK = {"torch", "transformers", "sentence_transformers", "docling", "docling_core", "selenium", "boto3"}
+API_HEAVY = MODEL_STACK | {"numpy", "pymilvus", "minio", "zstandard", "openai", "celery"}
+
+# Records import statements too, so `try: import x except ImportError` counts even where x is
+# not installed; availability checks with importlib.util.find_spec do not import and are allowed
+PROBE = """
+import sys, time, json, builtins, importlib
+heavy = set(sys.argv[2].split(","))
+attempted = set()
+real_import = builtins.__import__
+def watch(name, *args, **kwargs):
+    if name.split(".")[0] in heavy:
+        attempted.add(name.split(".")[0])
+    return real_import(name, *args, **kwargs)
+builtins.__import__ = watch
+before = len(sys.modules)
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": len(sys.modules) - before, "heavy": sorted(attempted)}))
+"""
+
+def probe(module: str, heavy: set) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, module, ",".join(sorted(heavy))],
+        cwd=backend_dir, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_api_import_stays_within_budget():
+    runs = [probe("app.main", API_HEAVY) for _ in range(2)]
+    assert runs[0]["heavy"] == [], f"app.main imports {runs[0]['heavy']} at startup"
+    # Best of two: the first run also pays for cold .pyc and disk caches
+    seconds = min(r["seconds"] for r in runs)
+    assert seconds < IMPORT_SECONDS_BUDGET, f"import app.main took {seconds:.2f}s"
+    assert runs[0]["modules"] < MODULE_BUDGET, f"import app.main loaded {runs[0]['modules']} modules"
+
+@pytest.mark.parametrize("module", [
+    "app.services.ingestion.orchestrator",
+    "app.services.ingestion.scrapers",
+    "app.services.generation.embeddings",
+])
+def test_ingestion_modules_defer_the_model_stack(module):
+    pytest.importorskip("numpy")
+    if module.endswith("scrapers"):
+        pytest.importorskip("bs4")
+    assert probe(module, MODEL_STACK)["heavy"] == []
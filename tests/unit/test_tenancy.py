@@ -0,0 +1,36 @@
+import os
+import sys
+import pytest
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.core.tenancy import DEFAULT_TENANT_ID, validate_tenant_id
+
+@pytest.mark.parametrize("tenant_id", [DEFAULT_TENANT_ID, "acme", "Acme-2_eu", "a", "x" * 64])
+def test_valid_tenant_ids_pass_unchanged(tenant_id):
+    assert validate_tenant_id(tenant_id) == tenant_id
+
+@pytest.mark.parametrize("tenant_id", [
+    "",
+    "x" * 65,
+    'acme" || tenant_id != "',
+    "acme' or '1'=='1",
+    "acme\\",
+    'acme\\" || true',
+    "acme\n",
+    "acme\nglobex",
+    "acme globex",
+    "acme.eu",
+    "tenant/../other",
+    "ácme",
+    None,
+    42,
+])
+def test_unsafe_tenant_ids_are_rejected(tenant_id):
+    with pytest.raises(ValueError):
+        validate_tenant_id(tenant_id)
@@ -0,0 +1,134 @@
+import os
+import re
+import sys
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# Ensure backend can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+backend_dir = os.path.join(project_root, "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from app.services.chunking.base import Chunk
+from app.services.chunking.token_chunker import TokenChunker
+from app.services.retrieval.vector_store.base import build_columns
+from app.services.retrieval.vector_store.local import LocalVectorStore
+
+class FakeTokenizer:
+    """
+    Fast-tokenizer stand-in: words and punctuation are tokens, words longer than six
+    characters are split into four-character pieces (like word-pieces), and two special
+    tokens wrap every sequence.
+    """
+    model_max_length = 512
+
+    def _offsets(self, text):
+        offsets = []
+        for m in re.finditer(r"\w+|[^\w\s]", text):
+            if len(m.group()) <= 6:
+                offsets.append(m.span())
+                continue
+            for start in range(m.start(), m.end(), 4):
+                offsets.append((start, min(start + 4, m.end())))
+        return offsets
+
+    def __call__(self, texts, add_special_tokens=True, return_offsets_mapping=False):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        offsets = [self._offsets(t) for t in batch]
+        ids = [[0] * (len(o) + (2 if add_special_tokens else 0)) for o in offsets]
+        result = {"input_ids": ids[0] if single else ids}
+        if return_offsets_mapping:
+            result["offset_mapping"] = offsets[0] if single else offsets
+        return result
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+SENTENCES = [
+    "The ingestion service converts uploaded documents into searchable passages.",
+    "Each passage is embedded separately.",
+    "Retrieval quality depends on passages staying within the encoder window!",
+    "Short one.",
+    "Overlapping context helps when an answer straddles two neighbouring chunks.",
+]
+
+def document(repeat=6):
+    return " ".join(SENTENCES * repeat)
+
+def test_no_chunk_exceeds_the_model_limit():
+    chunker = TokenChunker(FakeTokenizer(), max_tokens=40, overlap=8)
+    # 40 - 2 special tokens - 3 prefix tokens ("pass", "age", ":")
+    assert chunker.budget == 35
+    text = document() + " " + "Supercalifragilisticexpialidocious" * 30
+    chunks = chunker.chunk(text)
+
+    assert len(chunks) > 5
+    assert chunker.oversized(chunks) == []
+    assert all(0 < c.token_count <= chunker.budget for c in chunks)
+    assert max(chunker.count_tokens([c.text for c in chunks])) <= 40
+
+def test_chunks_cover_the_text_with_token_overlap():
+    tokenizer = FakeTokenizer()
+    chunker = TokenChunker(tokenizer, max_tokens=40, overlap=8)
+    text = document()
+    chunks = chunker.chunk(text)
+
+    # Chunk text is an exact source span, in order, starting at the first token and ending at the last
+    positions = [0]
+    for c in chunks[1:]:
+        positions.append(text.index(c.text, positions[-1] + 1))
+    assert text.startswith(chunks[0].text)
+    assert text.rstrip().endswith(chunks[-1].text)
+    for prev, prev_pos, pos in zip(chunks, positions, positions[1:]):
+        prev_end = prev_pos + len(prev.text)
+        # Consecutive chunks share `overlap` tokens, widened to the start of a split word, without gaps
+        assert 8 <= len(tokenizer._offsets(text[pos:prev_end])) < 8 + 3
+    # Chunks end on sentence boundaries where one fits the budget
+    assert sum(c.text.rstrip().endswith((".", "!")) for c in chunks) >= len(chunks) - 1
+
+def test_long_words_are_not_cut_mid_word():
+    chunker = TokenChunker(FakeTokenizer(), max_tokens=40, overlap=0)
+    words = " ".join(["internationalization"] * 30)
+    chunks = chunker.chunk(words)
+    assert len(chunks) > 1
+    assert all(set(c.text.split()) == {"internationalization"} for c in chunks)
+
+def test_markdown_headings_and_pages_are_carried():
+    chunker = TokenChunker(FakeTokenizer(), max_tokens=40, overlap=4)
+    text = (
+        "Preface text before any heading.\n"
+        "# Setup\nInstall the package.\n"
+        "## Network\nOpen port 8000 for the API.\f"
+        "More about ports on the second page.\n"
+        "# Usage\nRun the server."
+    )
+    chunks = chunker.chunk(text)
+    assert [(c.heading_path, c.page) for c in chunks] == [
+        ("", 1),
+        ("Setup", 1),
+        ("Setup > Network", 1),
+        ("Usage", 2),
+    ]
+    assert "second page" in chunks[2].text
+    assert chunks[3].text.startswith("# Usage")
+
+@pytest.mark.asyncio
+async def test_page_and_heading_path_reach_storage():
+    chunks = [Chunk("alpha", page=3, heading_path="Intro"), Chunk("beta", heading_path="Intro > Scope"), "gamma"]
+    vectors = np.eye(3, 8, dtype=np.float32)
+    columns = build_columns(chunks, {"document_id": "doc", "page": 1}, vectors)
+    assert columns["text"] == ["alpha", "beta", "gamma"]
+    # Chunks without a page fall back to the document's
+    assert columns["page"] == [3, 1, 1]
+    assert columns["heading_path"] == ["Intro", "Intro > Scope", ""]
+
+    store = LocalVectorStore(dim=8)
+    await store.upsert(chunks, {"tenant_id": "acme", "document_id": "doc"}, vectors)
+    hits = (await store.search_batch(vectors[:1], limit=1, tenant_id="acme"))[0]
+    assert hits[0].text == "alpha"
+    assert hits[0].metadata["page"] == 3
+    assert hits[0].metadata["heading_path"] == "Intro"
@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+# Ensure the pipeline can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+pipelines_dir = os.path.join(project_root, "open-webui", "pipelines")
+if pipelines_dir not in sys.path:
+    sys.path.append(pipelines_dir)
+
+from rag_pipeline import Pipeline, iter_sse_deltas
+
+def sse(*deltas):
+    events = [{"choices": [{"delta": {"role": "assistant"}}]}]
+    events += [{"choices": [{"delta": {"content": d}}]} for d in deltas]
+    events.append({"choices": [{"delta": {}, "finish_reason": "stop"}]})
+    return "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+
+def test_sse_parser_yields_content_deltas_only():
+    lines = [": keep-alive", "", 'data: {"choices": [{"delta": {"content": "Hel"}}]}', "",
+             "data: {\"choices\": [{\"delta\":", "data: {\"content\": \"lo\"}}]}", "",
+             "data: [DONE]", "", 'data: {"choices": [{"delta": {"content": "late"}}]}', ""]
+    assert list(iter_sse_deltas(iter(lines))) == ["Hel", "lo"]
+
+def pipeline_with(handler, tenant_id="", signing_key=""):
+    pipeline = Pipeline()
+    pipeline.tenant_id = tenant_id
+    pipeline.signing_key = signing_key
+    pipeline.client = httpx.Client(base_url="http://backend/api/v1", transport=httpx.MockTransport(handler))
+    return pipeline
+
+def test_streaming_pipe_parses_deltas_and_forwards_headers():
+    seen = []
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, text=sse("Hello", ", world"), headers={"content-type": "text/event-stream"})
+
+    pipeline = pipeline_with(handler, tenant_id="acme")
+    body = {"stream": True, "chat_id": "chat-42"}
+    out = pipeline.pipe("hi", "auto", [{"role": "user", "content": "hi"}], body)
+    assert "".join(out) == "Hello, world"
+    assert seen[0].url.path == "/api/v1/chat/completions"
+    assert seen[0].headers["X-Tenant"] == "acme" and seen[0].headers["X-Session-Id"] == "chat-42"
+    assert json.loads(seen[0].content)["stream"] is True
+
+def test_non_streaming_pipe_and_errors():
+    def handler(request):
+        if request.headers.get("X-Tenant") == "broken":
+            return httpx.Response(503, json={"detail": "busy"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": "42"}}]})
+
+    pipeline = pipeline_with(handler)
+    assert pipeline.pipe("q", "auto", [], {}) == "42"
+    assert "X-Tenant" not in pipeline._headers({})
+    assert "503" in pipeline.pipe("q", "auto", [], {"tenant_id": "broken"})
+    assert "503" in "".join(pipeline.pipe("q", "auto", [], {"tenant_id": "broken", "stream": True}))
+
+def test_roles_are_signed_for_the_backend(monkeypatch):
+    backend_dir = os.path.join(project_root, "backend")
+    if backend_dir not in sys.path:
+        sys.path.append(backend_dir)
+    from app.core.access import trusted_roles
+
+    pipeline = pipeline_with(lambda request: None, tenant_id="acme", signing_key="secret")
+    pipeline.roles = "role:customer_service"
+    headers = pipeline._headers({})
+    monkeypatch.setenv("ROLES_SIGNING_KEY", "secret")
+    assert trusted_roles("acme", headers["X-Roles"], headers["X-Roles-Signature"]) == "role:customer_service"
+    # Replayed for another tenant, tampered with or unsigned: no roles
+    assert trusted_roles("globex", headers["X-Roles"], headers["X-Roles-Signature"]) == ""
+    assert trusted_roles("acme", "role:admin", headers["X-Roles-Signature"]) == ""
+    assert trusted_roles("acme", "role:customer_service", None) == ""
+    assert "X-Roles" not in pipeline_with(lambda request: None)._headers({})